@@ -170,6 +170,15 @@ def create_app():
     with app.app_context():
         run_seed()
 
+    # Background posting queue writer (POSTING_QUEUE_WORKERS, default off)
+    try:
+        posting_workers = int(os.getenv("POSTING_QUEUE_WORKERS", "0"))
+        if posting_workers > 0:
+            from services.posting_queue import start_posting_workers
+            start_posting_workers(app, workers=posting_workers)
+    except Exception as e:
+        app.logger.warning("posting queue workers not started: %s", e)
+
     return app
 
 
@@ -5,3 +5,8 @@ class BaseDoc(Document):
     meta = {"abstract": True}
     created_at = DateTimeField(default=datetime.utcnow)
     updated_at = DateTimeField(default=datetime.utcnow)
+
+    def save(self, *args, **kwargs):
+        """Override save to update timestamp"""
+        self.updated_at = datetime.utcnow()
+        return super().save(*args, **kwargs)
@@ -0,0 +1,47 @@
+"""
+Capacity Daily Model - Capacity ledger rolled up per work center and day
+"""
+from sqlalchemy import Column, String, Integer, Date, DateTime, Numeric, UniqueConstraint
+from datetime import datetime
+from config.db import db
+from models.base import BaseModel
+
+class CapacityDaily(BaseModel):
+    __tablename__ = 'capacity_daily'
+    
+    # Key (posting_day = posting_date of the ledger entries, UTC)
+    tenant_id = Column(String(50), nullable=False)
+    work_center_code = Column(String(50), nullable=False)
+    posting_day = Column(Date, nullable=False)
+    
+    # Sums of capacity_ledger_entries for the key (minutes / units)
+    setup_time = Column(Numeric(15, 2), nullable=False, default=0)
+    run_time = Column(Numeric(15, 2), nullable=False, default=0)
+    stop_time = Column(Numeric(15, 2), nullable=False, default=0)
+    scrap_time = Column(Numeric(15, 2), nullable=False, default=0)
+    quantity = Column(Numeric(15, 3), nullable=False, default=0)
+    scrap_quantity = Column(Numeric(15, 3), nullable=False, default=0)
+    entry_count = Column(Integer, nullable=False, default=0)
+    
+    updated_at = Column(DateTime, default=datetime.utcnow)
+    
+    # The unique key doubles as the (tenant, work center, day range) index
+    __table_args__ = (
+        UniqueConstraint('tenant_id', 'work_center_code', 'posting_day', name='uq_capacity_daily_key'),
+    )
+    
+    def to_dict(self):
+        """Convert to dictionary"""
+        return {
+            'tenant_id': self.tenant_id,
+            'work_center_code': self.work_center_code,
+            'posting_day': self.posting_day.isoformat() if self.posting_day else None,
+            'setup_time': float(self.setup_time or 0),
+            'run_time': float(self.run_time or 0),
+            'stop_time': float(self.stop_time or 0),
+            'scrap_time': float(self.scrap_time or 0),
+            'quantity': float(self.quantity or 0),
+            'scrap_quantity': float(self.scrap_quantity or 0),
+            'entry_count': self.entry_count,
+            'updated_at': self.updated_at.isoformat() if self.updated_at else None
+        }
@@ -57,6 +57,12 @@ class CapacityLedgerEntry(BaseModel):
         Index('ix_cle_tenant_order', 'tenant_id', 'production_order_no'),
         Index('ix_cle_posting_date', 'posting_date'),
         Index('ix_cle_operator', 'operator_id'),
+        # Keyset pagination on (posting_date, id) per ledger filter
+        Index('ix_cle_tenant_date_id', 'tenant_id', 'posting_date', 'id'),
+        Index('ix_cle_tenant_wc_date_id', 'tenant_id', 'work_center_code', 'posting_date', 'id'),
+        Index('ix_cle_tenant_mc_date_id', 'tenant_id', 'machine_center_code', 'posting_date', 'id'),
+        Index('ix_cle_tenant_order_date_id', 'tenant_id', 'production_order_no', 'posting_date', 'id'),
+        Index('ix_cle_tenant_operator_date_id', 'tenant_id', 'operator_id', 'posting_date', 'id'),
     )
     
     def to_dict(self):
@@ -0,0 +1,40 @@
+"""
+Item Balance Model - Running on-hand quantity per item and location
+"""
+from sqlalchemy import Column, String, Integer, DateTime, Index, Numeric, UniqueConstraint
+from datetime import datetime
+from config.db import db
+from models.base import BaseModel
+
+class ItemBalance(BaseModel):
+    __tablename__ = 'item_balances'
+    
+    # Key (location_code '' = no location, so the unique key also covers it)
+    tenant_id = Column(String(50), nullable=False)
+    item_no = Column(String(50), nullable=False)
+    location_code = Column(String(20), nullable=False, default='')
+    
+    # Sum of item_ledger_entries.quantity for the key
+    quantity = Column(Numeric(15, 3), nullable=False, default=0)
+    entry_count = Column(Integer, nullable=False, default=0)
+    
+    # Last change (posting or reconcile)
+    updated_at = Column(DateTime, default=datetime.utcnow)
+    reconciled_at = Column(DateTime)
+    
+    __table_args__ = (
+        UniqueConstraint('tenant_id', 'item_no', 'location_code', name='uq_item_balance_key'),
+        Index('ix_ib_tenant_item', 'tenant_id', 'item_no'),
+    )
+    
+    def to_dict(self):
+        """Convert to dictionary"""
+        return {
+            'tenant_id': self.tenant_id,
+            'item_no': self.item_no,
+            'location_code': self.location_code or None,
+            'quantity': float(self.quantity) if self.quantity else 0,
+            'entry_count': self.entry_count,
+            'updated_at': self.updated_at.isoformat() if self.updated_at else None,
+            'reconciled_at': self.reconciled_at.isoformat() if self.reconciled_at else None
+        }
@@ -28,6 +28,7 @@ class ItemLedgerEntry(BaseModel):
     production_order_no = Column(String(50))
     
     # Location & operation
+    location_code = Column(String(20))  # Stock location (None = no location)
     work_center_code = Column(String(50))
     operation_no = Column(Integer)
     
@@ -46,10 +47,17 @@ class ItemLedgerEntry(BaseModel):
     # Indexes for performance
     __table_args__ = (
         Index('ix_ile_tenant_item', 'tenant_id', 'item_no'),
+        Index('ix_ile_tenant_item_location', 'tenant_id', 'item_no', 'location_code'),
         Index('ix_ile_tenant_posting', 'tenant_id', 'posting_id'),
         Index('ix_ile_tenant_order', 'tenant_id', 'production_order_no'),
         Index('ix_ile_posting_date', 'posting_date'),
         Index('ix_ile_entry_type', 'entry_type'),
+        # Keyset pagination on (posting_date, id) per ledger filter
+        Index('ix_ile_tenant_date_id', 'tenant_id', 'posting_date', 'id'),
+        Index('ix_ile_tenant_item_date_id', 'tenant_id', 'item_no', 'posting_date', 'id'),
+        Index('ix_ile_tenant_order_date_id', 'tenant_id', 'production_order_no', 'posting_date', 'id'),
+        Index('ix_ile_tenant_type_date_id', 'tenant_id', 'entry_type', 'posting_date', 'id'),
+        Index('ix_ile_tenant_location_date_id', 'tenant_id', 'location_code', 'posting_date', 'id'),
     )
     
     def to_dict(self):
@@ -66,6 +74,7 @@ class ItemLedgerEntry(BaseModel):
             'source_type': self.source_type,
             'source_id': self.source_id,
             'production_order_no': self.production_order_no,
+            'location_code': self.location_code,
             'work_center_code': self.work_center_code,
             'operation_no': self.operation_no,
             'unit_cost': float(self.unit_cost) if self.unit_cost else 0,
@@ -3,6 +3,8 @@ from .base import BaseDoc
 from .laboratory import Laboratory
 from .client import Client
 
+ORDER_STATUSES = ("open", "invoiced", "closed")
+
 class Order(BaseDoc):
     lab = ReferenceField(Laboratory, required=True)
     number = StringField()
@@ -10,8 +12,9 @@ class Order(BaseDoc):
     client = ReferenceField(Client, required=True)
     client_code = StringField(required=True)
     currency = StringField(default="EUR")
-    lines = ListField(DictField())  # [{description, qty, price, total}]
+    lines = ListField(DictField())  # [{description, qty, price, total, item_no?, shipped_qty?, shipment_date?}]
     total = FloatField(default=0.0)
+    status = StringField(default="open", choices=ORDER_STATUSES)
     notes = StringField()
     # Global discounts
     discount_rate = FloatField(default=0.0)
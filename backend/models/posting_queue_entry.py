@@ -0,0 +1,48 @@
+"""
+Posting Queue Entry Model - Write-ahead queue for asynchronous journal postings
+"""
+from sqlalchemy import Column, String, Integer, DateTime, Text, Index, JSON
+from sqlalchemy.dialects.postgresql import UUID
+from datetime import datetime
+from config.db import db
+from models.base import BaseModel
+
+class PostingQueueEntry(BaseModel):
+    __tablename__ = 'posting_queue'
+
+    # Primary fields (posting_id is the journal's posting_id)
+    posting_id = Column(UUID(as_uuid=True), nullable=False, unique=True)
+    tenant_id = Column(String(50), nullable=False)
+    posting_type = Column(String(20), nullable=False)  # 'consumption', 'output', 'capacity'
+    payload = Column(JSON, nullable=False)
+    posted_by = Column(String(100))
+
+    # Processing state
+    status = Column(String(20), nullable=False, default='Queued')  # 'Queued', 'Processing', 'Posted', 'Failed'
+    attempts = Column(Integer, nullable=False, default=0)
+    message = Column(Text)
+
+    # Timestamps (queued_at -> processed_at is the posting lag)
+    queued_at = Column(DateTime, nullable=False, default=datetime.utcnow)
+    started_at = Column(DateTime)
+    processed_at = Column(DateTime)
+
+    # Indexes for performance
+    __table_args__ = (
+        Index('ix_pq_status_queued', 'status', 'queued_at'),
+        Index('ix_pq_tenant_posting', 'tenant_id', 'posting_id'),
+    )
+
+    def to_dict(self):
+        """Convert to dictionary"""
+        return {
+            'posting_id': str(self.posting_id),
+            'tenant_id': self.tenant_id,
+            'posting_type': self.posting_type,
+            'status': self.status,
+            'attempts': self.attempts,
+            'message': self.message,
+            'queued_at': self.queued_at.isoformat() if self.queued_at else None,
+            'started_at': self.started_at.isoformat() if self.started_at else None,
+            'processed_at': self.processed_at.isoformat() if self.processed_at else None
+        }
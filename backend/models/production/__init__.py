@@ -7,10 +7,12 @@ from .uom import UnitOfMeasure
 from .item import Item
 from .location import Location
 from .supplier import Supplier
-from .bom import BOM, BOMLine
+from .bom import BOM, BOMLine, BOMWhereUsed, BOMWhereUsedState
 from .routing import Routing, RoutingOperation
 from .work_center import WorkCenter, MachineCenter
+from .calendar import WorkCenterCalendar, CalendarShift, CalendarHoliday, CalendarException
 from .production_order import ProductionOrder, ProductionOrderLine, ProductionOrderRouting
+from .planning import PlanningRun, PlanningSuggestion, PeggingEntry
 
 __all__ = [
     'UnitOfMeasure',
@@ -19,11 +21,20 @@ __all__ = [
     'Supplier',
     'BOM',
     'BOMLine',
+    'BOMWhereUsed',
+    'BOMWhereUsedState',
     'Routing',
     'RoutingOperation',
     'WorkCenter',
     'MachineCenter',
+    'WorkCenterCalendar',
+    'CalendarShift',
+    'CalendarHoliday',
+    'CalendarException',
     'ProductionOrder',
     'ProductionOrderLine',
     'ProductionOrderRouting',
+    'PlanningRun',
+    'PlanningSuggestion',
+    'PeggingEntry',
 ]
@@ -13,7 +13,7 @@ NAV/BC Patterns:
 """
 
 from mongoengine import Document, StringField, IntField, FloatField, DateTimeField, EmbeddedDocument, \
-    EmbeddedDocumentListField, BooleanField
+    EmbeddedDocumentListField, BooleanField, ObjectIdField
 from datetime import datetime
 
 
@@ -139,9 +139,16 @@ class BOM(Document):
     }
     
     def save(self, *args, **kwargs):
-        """Override save to update timestamp"""
+        """Override save to update timestamp and the where-used index"""
         self.updated_at = datetime.utcnow()
-        return super().save(*args, **kwargs)
+        result = super().save(*args, **kwargs)
+        BOMWhereUsed.sync(self)
+        return result
+    
+    def delete(self, *args, **kwargs):
+        """Override delete to drop the BOM's where-used entries"""
+        BOMWhereUsed.objects(bom_id=self.id).delete()
+        return super().delete(*args, **kwargs)
     
     def certify(self, user_email: str):
         """
@@ -163,6 +170,11 @@ class BOM(Document):
             set__status="Closed",
             set__updated_at=datetime.utcnow()
         )
+        BOMWhereUsed.objects(
+            tenant_id=self.tenant_id,
+            parent_item_no=self.item_no,
+            status="Certified"
+        ).update(set__status="Closed")
         
         # Certify this version
         self.status = "Certified"
@@ -217,3 +229,103 @@ class BOM(Document):
             "certified_date": self.certified_date.isoformat() if self.certified_date else None,
             "certified_by": self.certified_by
         }
+
+
+class BOMWhereUsed(Document):
+    """
+    Where-used index: one entry per BOM line, keyed by component.
+    
+    Answers "which BOMs use this item" with an indexed lookup instead of
+    scanning every BOM's embedded lines. Maintained by BOM.save() (entries
+    of the saved version are replaced), BOM.delete() and BOM.certify()
+    (the closed versions' entries are marked Closed).
+    
+    Changes that bypass the document methods (QuerySet.update/delete) are
+    not reflected; rebuild with
+    services.production.where_used.rebuild_where_used_index().
+    """
+    tenant_id = StringField(required=True, max_length=100)
+    component_item_no = StringField(required=True, max_length=50)
+    parent_item_no = StringField(required=True, max_length=50)
+    
+    # Source BOM line
+    bom_id = ObjectIdField(required=True)
+    version_code = StringField(max_length=20)
+    status = StringField(max_length=20)  # BOM status, copied for filtering
+    line_no = IntField()
+    quantity_per = FloatField()
+    scrap_pct = FloatField(default=0.0)
+    uom_code = StringField(max_length=20)
+    
+    meta = {
+        'collection': 'production_bom_where_used',
+        'indexes': [
+            # Sorted like the where-used pages (parent, version, line)
+            ('tenant_id', 'component_item_no', 'status', 'parent_item_no', 'version_code', 'line_no'),
+            'bom_id',
+            ('tenant_id', 'parent_item_no', 'status'),
+        ],
+        'strict': False,
+    }
+    
+    @classmethod
+    def entries_for(cls, bom: "BOM") -> list:
+        """Index entries for every line of a BOM (unsaved)"""
+        return [
+            cls(
+                tenant_id=bom.tenant_id,
+                component_item_no=line.component_item_no,
+                parent_item_no=bom.item_no,
+                bom_id=bom.id,
+                version_code=bom.version_code,
+                status=bom.status,
+                line_no=line.line_no,
+                quantity_per=line.quantity_per,
+                scrap_pct=line.scrap_pct,
+                uom_code=line.uom_code,
+            )
+            for line in bom.lines
+        ]
+    
+    @classmethod
+    def sync(cls, bom: "BOM") -> None:
+        """Replace the index entries of one BOM version"""
+        cls.objects(bom_id=bom.id).delete()
+        entries = cls.entries_for(bom)
+        if entries:
+            cls.objects.insert(entries, load_bulk=False)
+    
+    def to_dict(self):
+        """Serialize to JSON-compatible dict"""
+        return {
+            "component_item_no": self.component_item_no,
+            "parent_item_no": self.parent_item_no,
+            "bom_id": str(self.bom_id),
+            "version_code": self.version_code,
+            "status": self.status,
+            "line_no": self.line_no,
+            "quantity_per": self.quantity_per,
+            "scrap_pct": self.scrap_pct,
+            "uom_code": self.uom_code,
+        }
+
+
+class BOMWhereUsedState(Document):
+    """
+    Per-tenant marker: the tenant's where-used index holds every BOM.
+    
+    Written by services.production.where_used.rebuild_where_used_index().
+    BOM.save() only indexes the saved version, so a tenant whose BOMs
+    predate the index has a partial index until it is rebuilt; the
+    where-used lookups only trust the index once status is Built.
+    """
+    tenant_id = StringField(required=True, unique=True, max_length=100)
+    status = StringField(max_length=20)  # Building | Built
+    started_at = DateTimeField()
+    built_at = DateTimeField()
+    entries = IntField(default=0)
+    
+    meta = {
+        'collection': 'production_bom_where_used_state',
+        'strict': False,
+    }
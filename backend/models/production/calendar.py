@@ -0,0 +1,180 @@
+"""
+Work Center Calendar Model - NAV/BC-style
+
+A calendar defines when a work center (or machine center) works:
+- Shifts: daily working windows on given weekdays (e.g. 06:00-14:00 Mon-Fri)
+- Holidays: dates without any shift
+- Exceptions: per-date overrides (extra Saturday shift, one shift cancelled, ...)
+
+WorkCenter.calendar_code / MachineCenter.calendar_code refer to a calendar
+by code. Capacity buckets derived from it are precomputed and cached by
+services.production.capacity_calendar.
+
+NAV/BC Patterns:
+- Shop calendar (shifts per weekday) + base calendar changes (holidays)
+- A shift whose end is not after its start runs past midnight; its time
+  belongs to the day it starts on
+"""
+
+from mongoengine import Document, StringField, IntField, DateTimeField, DateField, BooleanField, \
+    EmbeddedDocument, EmbeddedDocumentListField, ListField, ValidationError
+from datetime import datetime
+
+TIME_REGEX = r"^([01]\d|2[0-3]):[0-5]\d$"
+
+
+def _minutes(value: str) -> int:
+    """'HH:MM' -> minutes after midnight"""
+    hours, minutes = value.split(":")
+    return int(hours) * 60 + int(minutes)
+
+
+class CalendarShift(EmbeddedDocument):
+    """
+    A working window repeated on the given weekdays.
+
+    weekdays: 0 = Monday ... 6 = Sunday
+    """
+    code = StringField(required=True, max_length=20)
+    name = StringField(max_length=100)
+    start_time = StringField(required=True, regex=TIME_REGEX)  # "HH:MM"
+    end_time = StringField(required=True, regex=TIME_REGEX)    # "HH:MM", <= start_time: next day
+    weekdays = ListField(IntField(min_value=0, max_value=6), default=lambda: [0, 1, 2, 3, 4])
+
+    meta = {
+        'strict': False
+    }
+
+    def window(self) -> tuple:
+        """(start, end) in minutes after midnight of the start day (end may exceed 1440)"""
+        start = _minutes(self.start_time)
+        end = _minutes(self.end_time)
+        if end <= start:
+            end += 1440
+        return start, end
+
+
+class CalendarHoliday(EmbeddedDocument):
+    """Non-working date (no shift runs)"""
+    date = DateField(required=True)
+    description = StringField(max_length=200)
+
+    meta = {
+        'strict': False
+    }
+
+
+class CalendarException(EmbeddedDocument):
+    """
+    Per-date override, applied after weekdays and holidays in list order.
+
+    - working=False, no shift_code: the date is off
+    - working=False, shift_code: that shift does not run on the date
+    - working=True, shift_code: that shift runs on the date (e.g. extra Saturday)
+    - working=True, no shift_code: every shift runs on the date
+    """
+    date = DateField(required=True)
+    shift_code = StringField(max_length=20)
+    working = BooleanField(default=False)
+    description = StringField(max_length=200)
+
+    meta = {
+        'strict': False
+    }
+
+
+class WorkCenterCalendar(Document):
+    """
+    Work Center Calendar - shifts, holidays and exceptions.
+
+    NAV/BC Fields:
+    - code: Unique identifier referenced by WorkCenter.calendar_code
+    - shifts: Weekly working windows
+    - holidays: Non-working dates
+    - exceptions: Date-specific changes to the shifts
+    """
+    # Multi-tenancy
+    tenant_id = StringField(required=True, max_length=100)
+
+    # Calendar Header
+    code = StringField(required=True, max_length=50)
+    name = StringField(required=True, max_length=200)
+    description = StringField(max_length=500)
+
+    # Rules
+    shifts = EmbeddedDocumentListField(CalendarShift)
+    holidays = EmbeddedDocumentListField(CalendarHoliday)
+    exceptions = EmbeddedDocumentListField(CalendarException)
+
+    # Audit fields
+    created_at = DateTimeField(default=datetime.utcnow)
+    updated_at = DateTimeField(default=datetime.utcnow)
+    created_by = StringField(max_length=100)
+    updated_by = StringField(max_length=100)
+
+    meta = {
+        'collection': 'production_calendars',
+        'indexes': [
+            {
+                'fields': ['tenant_id', 'code'],
+                'unique': True
+            },
+            'tenant_id'
+        ],
+        'strict': False,
+        'ordering': ['code']
+    }
+
+    def clean(self):
+        """Shift codes are unique; exceptions refer to existing shifts"""
+        codes = [shift.code for shift in self.shifts]
+        if len(codes) != len(set(codes)):
+            raise ValidationError("Shift codes must be unique")
+        for exception in self.exceptions:
+            if exception.shift_code and exception.shift_code not in codes:
+                raise ValidationError(f"Exception on {exception.date}: shift {exception.shift_code} not found")
+
+    def save(self, *args, **kwargs):
+        """Override save to update timestamp"""
+        self.updated_at = datetime.utcnow()
+        return super().save(*args, **kwargs)
+
+    def to_dict(self):
+        """Serialize to JSON-compatible dict"""
+        return {
+            "id": str(self.id),
+            "tenant_id": self.tenant_id,
+            "code": self.code,
+            "name": self.name,
+            "description": self.description,
+            "shifts": [
+                {
+                    "code": shift.code,
+                    "name": shift.name,
+                    "start_time": shift.start_time,
+                    "end_time": shift.end_time,
+                    "weekdays": list(shift.weekdays or [])
+                }
+                for shift in self.shifts
+            ],
+            "holidays": [
+                {
+                    "date": holiday.date.isoformat() if holiday.date else None,
+                    "description": holiday.description
+                }
+                for holiday in self.holidays
+            ],
+            "exceptions": [
+                {
+                    "date": exception.date.isoformat() if exception.date else None,
+                    "shift_code": exception.shift_code,
+                    "working": exception.working,
+                    "description": exception.description
+                }
+                for exception in self.exceptions
+            ],
+            "created_at": self.created_at.isoformat() if self.created_at else None,
+            "updated_at": self.updated_at.isoformat() if self.updated_at else None,
+            "created_by": self.created_by,
+            "updated_by": self.updated_by
+        }
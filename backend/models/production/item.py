@@ -28,6 +28,7 @@ class Item(Document):
             'item_no',
             'item_type',
             'status',
+            ('tenant_id', 'low_level_code'),
         ]
     }
     
@@ -77,6 +78,11 @@ class Item(Document):
     critical_item = BooleanField(default=False)  # Mark as critical for MRP
     phantom_bom = BooleanField(default=False)  # BOM components explode through
     
+    # Planning: lowest BOM level the item appears on (0 = top-level item).
+    # Maintained by services.production.low_level_code; None = not computed yet
+    low_level_code = IntField(min_value=0)
+    low_level_code_updated_at = DateTimeField()
+    
     # Audit fields
     created_at = DateTimeField(default=datetime.utcnow)
     updated_at = DateTimeField(default=datetime.utcnow)
@@ -109,6 +115,7 @@ class Item(Document):
             'posting_groups': self.posting_groups,
             'critical_item': self.critical_item,
             'phantom_bom': self.phantom_bom,
+            'low_level_code': self.low_level_code,
             'created_at': self.created_at.isoformat() if self.created_at else None,
             'updated_at': self.updated_at.isoformat() if self.updated_at else None,
             'created_by': self.created_by,
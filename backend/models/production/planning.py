@@ -0,0 +1,201 @@
+"""
+Planning Models - NAV/BC-style MRP run results
+
+- PlanningRun: one MRP run (regenerative or net change) and its statistics;
+  the start time of the last completed run is the cut-off for the next
+  net-change run
+- PlanningSuggestion: planning worksheet line - a planned production order
+  or purchase proposed by the run (replaced per item on every replan)
+- PeggingEntry: quantity of an item a supply (stock, production order,
+  planned order) provides to a demand (sales line, order, safety stock);
+  replaced per item with the suggestions (services.production.pegging)
+
+Written by services.production.mrp.
+"""
+
+from mongoengine import Document, StringField, IntField, FloatField, DateTimeField, DateField, \
+    BooleanField, ListField
+from datetime import datetime
+
+
+class PlanningRun(Document):
+    """
+    An MRP run.
+
+    Modes:
+    - regenerative: every item is planned, all suggestions are replaced
+    - net_change: only items touched since the last completed run (and the
+      items below them in the BOM structure) are replanned
+
+    At most one run per tenant is Running (unique partial index): the
+    Running run is the tenant's planning lock.
+    """
+    # Multi-tenancy
+    tenant_id = StringField(required=True, max_length=100)
+
+    mode = StringField(required=True, choices=["regenerative", "net_change"], default="net_change")
+    status = StringField(required=True, choices=["Running", "Completed", "Failed"], default="Running")
+
+    # Net change: changes after this time were considered
+    changes_since = DateTimeField()
+
+    # Statistics
+    items_planned = IntField(default=0, min_value=0)
+    suggestions = IntField(default=0, min_value=0)
+    production_suggestions = IntField(default=0, min_value=0)
+    purchase_suggestions = IntField(default=0, min_value=0)
+    pegs = IntField(default=0, min_value=0)
+    duration_ms = FloatField(default=0.0, min_value=0)
+    message = StringField(max_length=1000)
+    unknown_items = ListField(StringField(max_length=50))
+
+    # Audit fields
+    started_at = DateTimeField(default=datetime.utcnow)
+    finished_at = DateTimeField()
+    started_by = StringField(max_length=100)
+
+    meta = {
+        'collection': 'production_planning_runs',
+        'indexes': [
+            ('tenant_id', 'status', '-started_at'),
+            ('tenant_id', '-started_at'),
+            {
+                'fields': ['tenant_id'],
+                'name': 'uq_planning_run_running',
+                'unique': True,
+                'partialFilterExpression': {'status': 'Running'}
+            }
+        ],
+        'strict': False,
+        'ordering': ['-started_at']
+    }
+
+    def to_dict(self):
+        """Serialize to JSON-compatible dict"""
+        return {
+            "id": str(self.id),
+            "tenant_id": self.tenant_id,
+            "mode": self.mode,
+            "status": self.status,
+            "changes_since": self.changes_since.isoformat() if self.changes_since else None,
+            "items_planned": self.items_planned,
+            "suggestions": self.suggestions,
+            "production_suggestions": self.production_suggestions,
+            "purchase_suggestions": self.purchase_suggestions,
+            "pegs": self.pegs,
+            "duration_ms": self.duration_ms,
+            "message": self.message,
+            "unknown_items": list(self.unknown_items or []),
+            "started_at": self.started_at.isoformat() if self.started_at else None,
+            "finished_at": self.finished_at.isoformat() if self.finished_at else None,
+            "started_by": self.started_by
+        }
+
+
+class PlanningSuggestion(Document):
+    """
+    Planning worksheet line.
+
+    NAV/BC Fields:
+    - suggestion_type: Production (planned production order) or Purchase
+    - quantity: Quantity to order (after lot sizing)
+    - due_date: When the quantity must be available
+    - start_date: When to start production / place the purchase (due - lead time)
+    - reason: Demand / Safety stock / Reorder point
+    """
+    # Multi-tenancy
+    tenant_id = StringField(required=True, max_length=100)
+
+    run_id = StringField(max_length=50)
+    item_no = StringField(required=True, max_length=50)
+    description = StringField(max_length=200)
+
+    suggestion_type = StringField(required=True, choices=["Production", "Purchase"])
+    quantity = FloatField(required=True, min_value=0)
+    uom_code = StringField(max_length=20)
+
+    due_date = DateField()
+    start_date = DateField()
+    late = BooleanField(default=False)  # start_date would be in the past
+
+    reason = StringField(choices=["Demand", "Safety stock", "Reorder point"], default="Demand")
+    low_level_code = IntField(min_value=0)
+    supplier_id = StringField(max_length=50)
+
+    created_at = DateTimeField(default=datetime.utcnow)
+
+    meta = {
+        'collection': 'production_planning_suggestions',
+        'indexes': [
+            ('tenant_id', 'item_no'),
+            ('tenant_id', 'suggestion_type', 'due_date'),
+            'run_id'
+        ],
+        'strict': False,
+        'ordering': ['due_date', 'item_no']
+    }
+
+    def to_dict(self):
+        """Serialize to JSON-compatible dict"""
+        return {
+            "id": str(self.id),
+            "tenant_id": self.tenant_id,
+            "run_id": self.run_id,
+            "item_no": self.item_no,
+            "description": self.description,
+            "suggestion_type": self.suggestion_type,
+            "quantity": self.quantity,
+            "uom_code": self.uom_code,
+            "due_date": self.due_date.isoformat() if self.due_date else None,
+            "start_date": self.start_date.isoformat() if self.start_date else None,
+            "late": self.late,
+            "reason": self.reason,
+            "low_level_code": self.low_level_code,
+            "supplier_id": self.supplier_id,
+            "created_at": self.created_at.isoformat() if self.created_at else None
+        }
+
+
+class PeggingEntry(Document):
+    """
+    One pegging edge: demand_id consumes quantity of item_no from supply_id.
+
+    Node ids (services.production.pegging):
+    - SO:<order>:<line>, SAFETY:<item> - demands only
+    - STOCK:<item> - supply only
+    - PO:<order_no>, PLAN:<item>:<due date> - supply of their item and
+      demand for their components
+    """
+    # Multi-tenancy
+    tenant_id = StringField(required=True, max_length=100)
+
+    run_id = StringField(max_length=50)
+    item_no = StringField(required=True, max_length=50)  # item supplied
+    demand_id = StringField(required=True, max_length=200)
+    supply_id = StringField(required=True, max_length=200)
+    quantity = FloatField(required=True, min_value=0)
+
+    created_at = DateTimeField(default=datetime.utcnow)
+
+    meta = {
+        'collection': 'production_pegging',
+        'indexes': [
+            ('tenant_id', 'supply_id'),
+            ('tenant_id', 'demand_id'),
+            ('tenant_id', 'item_no')
+        ],
+        'strict': False
+    }
+
+    def to_dict(self):
+        """Serialize to JSON-compatible dict"""
+        return {
+            "id": str(self.id),
+            "tenant_id": self.tenant_id,
+            "run_id": self.run_id,
+            "item_no": self.item_no,
+            "demand_id": self.demand_id,
+            "supply_id": self.supply_id,
+            "quantity": self.quantity,
+            "created_at": self.created_at.isoformat() if self.created_at else None
+        }
@@ -69,6 +69,15 @@ class ProductionOrderRouting(EmbeddedDocument):
     actual_run_time = FloatField(default=0.0, min_value=0)
     remaining_time = FloatField(default=0.0, min_value=0)
     
+    # Lead time elements (from Routing operation, minutes)
+    wait_time = FloatField(default=0.0, min_value=0)
+    move_time = FloatField(default=0.0, min_value=0)
+    send_ahead_quantity = FloatField(default=0.0, min_value=0)
+    
+    # Schedule (set by the finite-capacity scheduler)
+    starting_datetime = DateTimeField()
+    ending_datetime = DateTimeField()
+    
     # Routing reference
     routing_operation_no = IntField()
     
@@ -145,6 +154,9 @@ class ProductionOrder(Document):
     routing_no = StringField(max_length=50)  # item_no if using certified Routing
     routing_version_code = StringField(max_length=20)
     
+    # Multi-level explosion: top-level order this sub-assembly order was generated for
+    parent_order_no = StringField(max_length=50)
+    
     # Lines (from BOM explosion)
     lines = EmbeddedDocumentListField(ProductionOrderLine)
     
@@ -172,6 +184,7 @@ class ProductionOrder(Document):
     # Status change tracking
     released_date = DateTimeField()
     released_by = StringField(max_length=100)
+    release_token = StringField(max_length=50)  # Batch release that released the order (order_release)
     finished_date = DateTimeField()
     finished_by = StringField(max_length=100)
     
@@ -189,7 +202,9 @@ class ProductionOrder(Document):
             'due_date',
             ('tenant_id', 'status'),
             ('tenant_id', 'item_no'),
-            ('tenant_id', 'status', 'due_date')
+            ('tenant_id', 'status', 'due_date'),
+            ('tenant_id', 'parent_order_no'),
+            ('tenant_id', '-due_date', 'order_no')  # list order / keyset pagination
         ],
         'strict': False,
         'ordering': ['order_no']
@@ -322,6 +337,7 @@ class ProductionOrder(Document):
             "bom_version_code": self.bom_version_code,
             "routing_no": self.routing_no,
             "routing_version_code": self.routing_version_code,
+            "parent_order_no": self.parent_order_no,
             "lines": [
                 {
                     "line_no": line.line_no,
@@ -349,6 +365,11 @@ class ProductionOrder(Document):
                     "actual_setup_time": op.actual_setup_time,
                     "actual_run_time": op.actual_run_time,
                     "remaining_time": op.remaining_time,
+                    "wait_time": op.wait_time,
+                    "move_time": op.move_time,
+                    "send_ahead_quantity": op.send_ahead_quantity,
+                    "starting_datetime": op.starting_datetime.isoformat() if op.starting_datetime else None,
+                    "ending_datetime": op.ending_datetime.isoformat() if op.ending_datetime else None,
                     "status": op.status
                 }
                 for op in self.routing_lines
@@ -46,7 +46,7 @@ class WorkCenter(Document):
     efficiency_pct = FloatField(default=100.0, min_value=0, max_value=200)
     
     # Calendar
-    calendar_code = StringField(max_length=50)  # FK to Calendar (future)
+    calendar_code = StringField(max_length=50)  # FK to WorkCenterCalendar (None = flat capacity)
     
     # Costing
     unit_cost = FloatField(default=0.0, min_value=0)  # Cost per minute
@@ -112,6 +112,15 @@ def register_blueprints(app):
     except Exception as e:
         app.logger.warning("journals not registered: %s", e)
 
+    # 13) /api/production/planning  (Production: MRP runs and planning worksheet)
+    try:
+        from .production.planning import bp as production_planning_bp  # type: ignore
+        app.register_blueprint(production_planning_bp)
+        app.logger.info("✔ registered blueprint: production_planning -> %s",
+                        getattr(production_planning_bp, "url_prefix", "/api/production/planning"))
+    except Exception as e:
+        app.logger.warning("production_planning not registered: %s", e)
+
     # (exemplos para outros módulos)
     # try:
     #     from .patients import bp as patients_bp
@@ -8,5 +8,6 @@ from .bom import bp as bom_bp
 from .routing import bp as routing_bp
 from .work_centers import bp as work_centers_bp
 from .production_orders import bp as production_orders_bp
+from .planning import bp as planning_bp
 
-__all__ = ['masterdata_bp', 'bom_bp', 'routing_bp', 'work_centers_bp', 'production_orders_bp']
+__all__ = ['masterdata_bp', 'bom_bp', 'routing_bp', 'work_centers_bp', 'production_orders_bp', 'planning_bp']
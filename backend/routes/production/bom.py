@@ -3,7 +3,9 @@
 BOM (Bill of Materials) Routes - NAV/BC-style
 Endpoints for managing BOMs with versioning and certification workflow
 """
-from flask import Blueprint, request, jsonify, g
+import json
+
+from flask import Blueprint, Response, request, jsonify, g, stream_with_context
 from flask_jwt_extended import jwt_required, get_jwt_identity, get_jwt
 from mongoengine.errors import ValidationError, DoesNotExist, NotUniqueError
 from typing import Tuple
@@ -12,10 +14,19 @@ from models.production import BOM, BOMLine, Item
 from models.laboratory import Laboratory
 from models.user import User
 from .._authz import check_permission, require
-from services.production.bom_explosion import explode_bom
+from services.production.bom_explosion import (
+    BOMExplosionService, explode_batch, explode_bom, stream_bom, EXPLOSION_MODES
+)
+from services.production.bom_graph import bom_graph_cache, invalidate_bom_graph
+from services.production.low_level_code import recalculate_low_level_codes, schedule_low_level_code_update
+from services.production.where_used import where_used_page, rebuild_where_used_index, MAX_WHERE_USED_LEVELS, \
+    WhereUsedIndexBuilding
 
 bp = Blueprint("production_bom", __name__, url_prefix="/api/production/boms")
 
+# Maximum number of orders accepted by explode-batch
+MAX_BATCH_ORDERS = 1000
+
 # ========================================
 # HELPER FUNCTIONS (DRY pattern)
 # ========================================
@@ -218,6 +229,9 @@ def bom_create():
             bom.lines.append(line)
         
         bom.save()
+        if bom.status == "Certified":
+            invalidate_bom_graph(bom.tenant_id)
+            schedule_low_level_code_update(bom.tenant_id)
         
         return jsonify(bom.to_dict()), 201
         
@@ -314,6 +328,7 @@ def bom_update(bom_id: str):
         
         bom.updated_by = user_email
         bom.save()
+        invalidate_bom_graph(bom.tenant_id)
         
         return jsonify(bom.to_dict()), 200
         
@@ -348,6 +363,7 @@ def bom_delete(bom_id: str):
     # TODO: Check if BOM is used in Production Orders
     
     bom.delete()
+    invalidate_bom_graph(str(lab.id))
     return jsonify({"message": "BOM deleted successfully"}), 200
 
 @bp.post("/<bom_id>/certify")
@@ -380,6 +396,8 @@ def bom_certify(bom_id: str):
     
     user_email = get_jwt_identity()
     bom.certify(user_email)
+    invalidate_bom_graph(bom.tenant_id)
+    schedule_low_level_code_update(bom.tenant_id)
     
     return jsonify(bom.to_dict()), 200
 
@@ -407,6 +425,8 @@ def bom_close(bom_id: str):
     
     user_email = get_jwt_identity()
     bom.close(user_email)
+    invalidate_bom_graph(bom.tenant_id)
+    schedule_low_level_code_update(bom.tenant_id)
     
     return jsonify(bom.to_dict()), 200
 
@@ -446,6 +466,119 @@ def bom_certified(item_no: str):
     return jsonify(bom.to_dict()), 200
 
 
+@bp.get("/cache-stats")
+@jwt_required()
+@require('read', get_lab=_get_lab)
+def bom_cache_stats():
+    """
+    BOM graph cache counters (hits, misses, invalidations) and the
+    current tenant's cache state.
+    """
+    lab = g.lab
+    return jsonify(bom_graph_cache.stats(str(lab.id))), 200
+
+
+@bp.post("/low-level-codes/recalculate")
+@jwt_required()
+@require('update', get_lab=_get_lab)
+def bom_recalculate_low_level_codes():
+    """
+    Recalculate the low-level codes of all items of the tenant now.
+    
+    Codes are also recalculated in the background whenever a BOM is
+    certified or closed; this endpoint runs it synchronously.
+    
+    Returns:
+        {"items": 120, "changed": 4, "max_level": 6, "cyclic": []}
+    """
+    lab = g.lab
+    try:
+        return jsonify(recalculate_low_level_codes(str(lab.id))), 200
+    except Exception as e:
+        return _error_response(f"Low-level code recalculation failed: {str(e)}", 500)
+
+
+@bp.get("/where-used/<item_no>")
+@jwt_required()
+@require('read', get_lab=_get_lab)
+def bom_where_used(item_no: str):
+    """
+    List the BOMs that use an item, walking up through sub-assemblies.
+    
+    Query params:
+    - levels: How many levels to walk up (default all, max 50; 1 = direct parents)
+    - status: BOM status to include (default Certified; "all" = every version)
+    - page: Page number (default 1)
+    - page_size: Rows per page (default 50, max 100)
+    
+    The first lookup of a tenant builds its where-used index from the BOMs
+    (503 while another request is building it).
+    
+    Returns:
+        {
+            "item_no": "RM-ZIRCONIA-98",
+            "total": 12,
+            "max_level": 3,
+            "page": 1,
+            "page_size": 50,
+            "items": [
+                {"level": 1, "parent_item_no": "SUB-COPING-001", "component_item_no": "RM-ZIRCONIA-98",
+                 "path": ["RM-ZIRCONIA-98", "SUB-COPING-001"], "version_code": "V1",
+                 "quantity_per": 0.2, ...}
+            ]
+        }
+    """
+    lab = g.lab
+    page, size = _pagination()
+    
+    try:
+        levels = int(request.args.get("levels", MAX_WHERE_USED_LEVELS))
+    except ValueError:
+        return _error_response("Invalid levels parameter")
+    if levels < 1:
+        return _error_response("levels must be at least 1")
+    
+    status = request.args.get("status", "Certified")
+    if status == "all":
+        status = None
+    
+    try:
+        result = where_used_page(
+            str(lab.id), item_no, max_levels=levels, status=status, offset=(page - 1) * size, limit=size
+        )
+    except WhereUsedIndexBuilding as e:
+        return _error_response(f"{str(e)}; retry shortly", 503)
+    
+    return jsonify({
+        "item_no": item_no,
+        "total": result["total"],
+        "max_level": result["max_level"],
+        "page": page,
+        "page_size": size,
+        "items": result["items"]
+    }), 200
+
+
+@bp.post("/where-used/rebuild")
+@jwt_required()
+@require('update', get_lab=_get_lab)
+def bom_where_used_rebuild():
+    """
+    Rebuild the tenant's where-used index from its BOMs.
+    
+    The index is kept up to date by BOM save/certify/delete; use this after
+    imports or bulk changes made directly in the database.
+    
+    Returns:
+        {"entries": 340}
+    """
+    lab = g.lab
+    try:
+        return jsonify({"entries": rebuild_where_used_index(str(lab.id))}), 200
+    except Exception as e:
+        return _error_response(f"Where-used rebuild failed: {str(e)}", 500)
+
+
 @bp.route('/<bom_id>/explode', methods=['POST'])
 @jwt_required()
 @require('read', get_lab=_get_lab)
@@ -456,9 +589,23 @@ def explode_bom_endpoint(bom_id: str):
     Query Parameters:
         - quantity (float): Production quantity (default: 1.0)
         - check_availability (bool): Check inventory (default: false)
+        - mode (str): "cached" reads the tenant's cached BOM graph (default;
+          the root BOM's certified version is checked with one indexed
+          lookup, sub-assemblies may lag changes made in other processes by
+          up to BOM_GRAPH_CACHE_TTL), "level" prefetches the BOM level by
+          level, "dfs" loads each BOM/Item while traversing,
+          "memo" returns consolidated components only, reusing each
+          sub-assembly's per-unit requirements
+        - stream (bool): Write NDJSON while the traversal runs (not with mode=memo
+          or check_availability):
+          one {"type": "component", ...} line per BOM line in DFS order, then
+          one {"type": "consolidated", ...} line per item, then a final
+          {"type": "summary", ...} line (status, messages, max_level, cycles)
     
     Returns:
         - 200: Explosion result with hierarchy + consolidated components
+        - 200 (stream): application/x-ndjson
+        - 400: Invalid parameters (e.g. stream with mode=memo or check_availability)
         - 404: BOM not found
     
     Example:
@@ -471,7 +618,8 @@ def explode_bom_endpoint(bom_id: str):
             "components": [...],
             "consolidated_components": {...},
             "max_level": 2,
-            "has_cycles": false
+            "has_cycles": false,
+            "query_count": 4
         }
     """
     lab = _get_lab()
@@ -502,16 +650,172 @@ def explode_bom_endpoint(bom_id: str):
     if quantity <= 0:
         return _error_response("Quantity must be positive", 400)
     
+    mode = request.args.get('mode', 'cached')
+    if mode not in EXPLOSION_MODES:
+        return _error_response(f"Invalid mode '{mode}'. Use one of: {', '.join(EXPLOSION_MODES)}", 400)
+    
+    if request.args.get('stream', '').lower() in ('1', 'true'):
+        if mode == 'memo':
+            return _error_response("stream is not available with mode 'memo'", 400)
+        if check_availability:
+            return _error_response("stream is not available with check_availability", 400)
+        
+        stream = stream_bom(str(lab.id), bom.item_no, quantity, mode=mode)
+        
+        def generate():
+            try:
+                for component in stream:
+                    yield json.dumps({"type": "component", **component.to_dict()}) + "\n"
+                result = stream.result()
+                for component in result.consolidated_components.values():
+                    yield json.dumps({"type": "consolidated", **component.to_dict()}) + "\n"
+                yield json.dumps({"type": "summary", **result.to_dict(include_components=False)}) + "\n"
+            except Exception as e:
+                yield json.dumps({"type": "error", "error": f"Explosion failed: {str(e)}"}) + "\n"
+        
+        return Response(stream_with_context(generate()), mimetype="application/x-ndjson")
+    
     # Perform explosion
     try:
         result = explode_bom(
             tenant_id=str(lab.id),
             item_no=bom.item_no,
             quantity=quantity,
-            check_availability=check_availability
+            check_availability=check_availability,
+            mode=mode
         )
         
         return jsonify(result.to_dict()), 200
     
     except Exception as e:
         return _error_response(f"Explosion failed: {str(e)}", 500)
+
+
+def _parse_batch_orders(data: dict):
+    """
+    Parse explode-batch orders.
+    
+    Returns:
+        (orders, error) - orders is a list of (item_no, quantity); error is a
+        message when the payload is invalid
+    """
+    raw_orders = data.get("orders")
+    if not isinstance(raw_orders, list) or not raw_orders:
+        return None, "orders must be a non-empty list"
+    if len(raw_orders) > MAX_BATCH_ORDERS:
+        return None, f"At most {MAX_BATCH_ORDERS} orders per batch"
+    
+    orders = []
+    for index, entry in enumerate(raw_orders):
+        if isinstance(entry, (list, tuple)) and len(entry) == 2:
+            item_no, quantity = entry
+        elif isinstance(entry, dict):
+            item_no, quantity = entry.get("item_no"), entry.get("quantity")
+        else:
+            return None, f"orders[{index}] must be {{item_no, quantity}} or [item_no, quantity]"
+        
+        if not item_no:
+            return None, f"orders[{index}]: item_no is required"
+        try:
+            quantity = float(quantity)
+        except (TypeError, ValueError):
+            return None, f"orders[{index}]: invalid quantity"
+        if quantity <= 0:
+            return None, f"orders[{index}]: quantity must be positive"
+        orders.append((str(item_no), quantity))
+    
+    return orders, None
+
+
+@bp.post("/explode-batch")
+@jwt_required()
+@require('read', get_lab=_get_lab)
+def explode_batch_endpoint():
+    """
+    Explode many orders in one pass over a shared BOM/Item snapshot.
+    
+    Body:
+    {
+        "orders": [
+            {"item_no": "FG-CROWN-001", "quantity": 20},
+            ["FG-BRIDGE-002", 5]
+        ],
+        "mode": "memo",     // "memo" (consolidated per order, default) or "cached" (full components)
+        "stream": false     // or ?stream=1
+    }
+    
+    Returns:
+        - 200: {"orders": [{"index", "item_no", "quantity", "result"}],
+                "consolidated_requirements": [{"item_no", "description", "total_quantity"}],
+                "order_count", "query_count"}
+        - 200 (stream): application/x-ndjson, one {"type": "order", ...} line per
+          order as it finishes, then one {"type": "consolidated", ...} line
+          (a final {"type": "error", ...} line if the explosion fails midway)
+        - 400: Invalid payload
+    """
+    lab = g.lab
+    
+    data = request.get_json(silent=True) or {}
+    orders, error = _parse_batch_orders(data)
+    if error:
+        return _error_response(error)
+    
+    mode = data.get("mode", "memo")
+    if mode not in ("memo", "cached"):
+        return _error_response("mode must be 'memo' or 'cached'")
+    
+    stream = bool(data.get("stream")) or request.args.get("stream", "").lower() in ("1", "true")
+    
+    tenant_id = str(lab.id)
+    graph, loaded = bom_graph_cache.fetch_current_many(tenant_id, (item_no for item_no, _ in orders))
+    query_count = 1 + (graph.query_count if loaded else 0)
+    service = BOMExplosionService(tenant_id, graph=graph)
+    
+    def order_entries():
+        for index, ((item_no, quantity), result) in enumerate(
+            zip(orders, explode_batch(service, orders, mode=mode))
+        ):
+            payload = result.to_dict()
+            payload.pop("query_count", None)
+            yield {"index": index, "item_no": item_no, "quantity": quantity, "result": payload}
+    
+    def consolidated():
+        demands = {}
+        for item_no, quantity in orders:
+            demands[item_no] = demands.get(item_no, 0.0) + quantity
+        requirements = service.consolidated_requirements(demands)
+        return [
+            {
+                "item_no": item_no,
+                "description": graph.item(item_no).description if graph.item(item_no) else "",
+                "total_quantity": total,
+            }
+            for item_no, total in sorted(requirements.items())
+        ]
+    
+    if stream:
+        def generate():
+            try:
+                for entry in order_entries():
+                    yield json.dumps({"type": "order", **entry}) + "\n"
+                yield json.dumps({
+                    "type": "consolidated",
+                    "order_count": len(orders),
+                    "query_count": query_count,
+                    "consolidated_requirements": consolidated(),
+                }) + "\n"
+            except Exception as e:
+                yield json.dumps({"type": "error", "error": f"Batch explosion failed: {str(e)}"}) + "\n"
+        
+        return Response(stream_with_context(generate()), mimetype="application/x-ndjson")
+    
+    try:
+        entries = list(order_entries())
+        return jsonify({
+            "orders": entries,
+            "consolidated_requirements": consolidated(),
+            "order_count": len(orders),
+            "query_count": query_count,
+        }), 200
+    except Exception as e:
+        return _error_response(f"Batch explosion failed: {str(e)}", 500)
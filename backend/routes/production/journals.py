@@ -1,18 +1,70 @@
 """
 Production Journals API Routes - Consumption/Output/Capacity posting
 """
-from flask import Blueprint, request, jsonify
+from flask import Blueprint, Response, request, jsonify, stream_with_context
 from functools import wraps
-from datetime import datetime
+from flask_jwt_extended import get_jwt, get_jwt_identity
+from datetime import datetime, timedelta
 from config.db import db
 from config.auth import token_required, get_tenant_from_token
 from models.production_journal import ProductionJournal
 from models.item_ledger_entry import ItemLedgerEntry
 from models.capacity_ledger_entry import CapacityLedgerEntry
 from services.posting_service import PostingService
+from services.posting_queue import PostingQueue, writer_stats
+from services.ledger_query import (
+    item_ledger_query, capacity_ledger_query, keyset_page, page_size
+)
+from services.capacity_rollup_service import CapacityRollupService
+from services.ledger_export import (
+    EXPORT_FORMATS, ITEM_LEDGER_COLUMNS, CAPACITY_LEDGER_COLUMNS,
+    iter_csv, iter_parquet, parquet_available, export_filename
+)
 
 journals_bp = Blueprint('journals', __name__)
 
+def _async_requested():
+    """?async=1 - queue the posting and answer 202 instead of posting in the request"""
+    return request.args.get('async', '').lower() in ('1', 'true', 'yes')
+
+def _export_response(query, model, columns, name):
+    """Stream a ledger query as CSV (default) or Parquet (?format=parquet)"""
+    fmt = request.args.get('format', 'csv').lower()
+    if fmt not in EXPORT_FORMATS:
+        return jsonify({'error': f"format must be one of {', '.join(EXPORT_FORMATS)}"}), 400
+    if fmt == 'parquet':
+        if not parquet_available():
+            return jsonify({'error': 'Parquet export requires pyarrow'}), 501
+        body = iter_parquet(query, model, columns)
+        mimetype = 'application/vnd.apache.parquet'
+    else:
+        body = iter_csv(query, model, columns)
+        mimetype = 'text/csv'
+    return Response(
+        stream_with_context(body),
+        mimetype=mimetype,
+        headers={'Content-Disposition': f'attachment; filename="{export_filename(name, fmt)}"'}
+    )
+
+def _is_sysadmin():
+    """Sysadmin role in the JWT claims (False when no claims are available)"""
+    try:
+        claims = get_jwt() or {}
+    except Exception:
+        return False
+    return (claims.get('role') or '').lower() == 'sysadmin'
+
+def _posted_by():
+    """Audit user of a posting: the caller's JWT identity (same for every posting path)"""
+    return str(get_jwt_identity() or "system")
+
+
+def _queued_response(result):
+    """Response for PostingQueue.enqueue()"""
+    if not result['success']:
+        return jsonify(result), 400
+    return jsonify(result), 202 if result.get('queued') else 200
+
 @journals_bp.route('/consumption', methods=['POST'])
 @token_required
 def post_consumption():
@@ -31,13 +83,17 @@ def post_consumption():
         ],
         "notes": "Material consumption for Op 10"
     }
+    
+    ?async=1 validates and queues the posting (202); poll /queue/<posting_id>
     """
     try:
         tenant_id = get_tenant_from_token()
         data = request.json
         
-        # Get user from token (future: extract from JWT)
-        posted_by = "system"  # TODO: Extract from JWT
+        posted_by = _posted_by()
+        
+        if _async_requested():
+            return _queued_response(PostingQueue.enqueue(tenant_id, 'consumption', data, posted_by))
         
         # Post consumption
         result = PostingService.post_consumption(tenant_id, data, posted_by)
@@ -67,12 +123,17 @@ def post_output():
         "operation_no": 20,
         "notes": "Finished 10 chairs"
     }
+    
+    ?async=1 validates and queues the posting (202); poll /queue/<posting_id>
     """
     try:
         tenant_id = get_tenant_from_token()
         data = request.json
         
-        posted_by = "system"  # TODO: Extract from JWT
+        posted_by = _posted_by()
+        
+        if _async_requested():
+            return _queued_response(PostingQueue.enqueue(tenant_id, 'output', data, posted_by))
         
         # Post output
         result = PostingService.post_output(tenant_id, data, posted_by)
@@ -109,12 +170,17 @@ def post_capacity():
         "operator_name": "João Silva",
         "notes": "Operation 10 completed"
     }
+    
+    ?async=1 validates and queues the posting (202); poll /queue/<posting_id>
     """
     try:
         tenant_id = get_tenant_from_token()
         data = request.json
         
-        posted_by = "system"  # TODO: Extract from JWT
+        posted_by = _posted_by()
+        
+        if _async_requested():
+            return _queued_response(PostingQueue.enqueue(tenant_id, 'capacity', data, posted_by))
         
         # Post capacity
         result = PostingService.post_capacity(tenant_id, data, posted_by)
@@ -127,6 +193,126 @@ def post_capacity():
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
+@journals_bp.route('/batch', methods=['POST'])
+@token_required
+def post_batch():
+    """
+    Post many consumption/output postings in chunked transactions
+    
+    Body:
+    {
+        "chunk_size": 500,
+        "postings": [
+            {"type": "consumption", "posting_id": "uuid", "production_order_no": "PO-2025-001",
+             "items": [{"item_no": "RM-001", "quantity": 5.0, "uom_code": "KG"}]},
+            {"type": "output", "posting_id": "uuid", "production_order_no": "PO-2025-002",
+             "item_no": "FG-CHAIR-001", "quantity": 10.0}
+        ]
+    }
+    
+    Returns per-posting status (posted/already_posted/invalid/failed) and a
+    summary; postings of other chunks are committed even if one chunk fails.
+    """
+    try:
+        tenant_id = get_tenant_from_token()
+        data = request.json or {}
+        
+        posted_by = _posted_by()
+        
+        # Post batch
+        result = PostingService.post_batch(
+            tenant_id,
+            data.get('postings'),
+            posted_by,
+            chunk_size=data.get('chunk_size')
+        )
+        
+        if 'results' in result:
+            return jsonify(result), 200
+        else:
+            return jsonify(result), 400
+            
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+@journals_bp.route('/capacity/utilization', methods=['GET'])
+@token_required
+def capacity_utilization():
+    """
+    Daily capacity utilization per work center (from the capacity_daily roll-up)
+    
+    Query params:
+    - from_date, to_date: Inclusive date range (YYYY-MM-DD, max 366 days; default last 7 days)
+    - work_center_code: Filter by work center
+    """
+    try:
+        tenant_id = get_tenant_from_token()
+        
+        to_day = request.args.get('to_date')
+        to_day = datetime.fromisoformat(to_day).date() if to_day else datetime.utcnow().date()
+        from_day = request.args.get('from_date')
+        from_day = datetime.fromisoformat(from_day).date() if from_day else to_day - timedelta(days=6)
+        
+        work_centers = CapacityRollupService.utilization(
+            tenant_id, from_day, to_day, request.args.get('work_center_code')
+        )
+        
+        return jsonify({
+            'from_date': from_day.isoformat(),
+            'to_date': to_day.isoformat(),
+            'work_centers': work_centers,
+            'count': len(work_centers)
+        }), 200
+        
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+@journals_bp.route('/queue/metrics', methods=['GET'])
+@token_required
+def posting_queue_metrics():
+    """
+    Posting queue depth per status and lag of the oldest pending posting
+    of the tenant
+    """
+    try:
+        tenant_id = get_tenant_from_token()
+        
+        return jsonify(PostingQueue.metrics(tenant_id)), 200
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+@journals_bp.route('/queue/metrics/writer', methods=['GET'])
+@token_required
+def posting_queue_writer_metrics():
+    """
+    Counters of the background writer in this process (all tenants; sysadmin only)
+    """
+    if not _is_sysadmin():
+        return jsonify({'error': 'Forbidden'}), 403
+    try:
+        return jsonify(writer_stats.to_dict()), 200
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+@journals_bp.route('/queue/<posting_id>', methods=['GET'])
+@token_required
+def posting_queue_status(posting_id):
+    """
+    Status of an asynchronous posting (Queued/Processing/Posted/Failed)
+    """
+    try:
+        tenant_id = get_tenant_from_token()
+        
+        result = PostingQueue.status(tenant_id, posting_id)
+        if result is None:
+            return jsonify({'error': f'Posting {posting_id} not found'}), 404
+        return jsonify(result), 200
+        
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
 @journals_bp.route('/', methods=['GET'])
 @token_required
 def list_journals():
@@ -184,56 +370,63 @@ def list_journals():
 @token_required
 def query_item_ledger():
     """
-    Query Item Ledger Entries
+    Query Item Ledger Entries (newest first)
     
     Query params:
     - item_no: Filter by item
     - entry_type: Filter by type (Consumption/Output)
     - production_order_no: Filter by order
+    - location_code: Filter by location
     - from_date, to_date: Date range
-    - limit, offset: Pagination
+    - limit: Page size (default 100, max 1000)
+    - cursor: next_cursor of the previous page
+    - offset: Legacy pagination (prefer cursor)
     """
     try:
         tenant_id = get_tenant_from_token()
         
         # Build query
-        query = ItemLedgerEntry.query.filter_by(tenant_id=tenant_id)
-        
-        # Apply filters
-        item_no = request.args.get('item_no')
-        if item_no:
-            query = query.filter_by(item_no=item_no)
-        
-        entry_type = request.args.get('entry_type')
-        if entry_type:
-            query = query.filter_by(entry_type=entry_type)
-        
-        order_no = request.args.get('production_order_no')
-        if order_no:
-            query = query.filter_by(production_order_no=order_no)
-        
-        from_date = request.args.get('from_date')
-        if from_date:
-            query = query.filter(ItemLedgerEntry.posting_date >= datetime.fromisoformat(from_date))
-        
-        to_date = request.args.get('to_date')
-        if to_date:
-            query = query.filter(ItemLedgerEntry.posting_date <= datetime.fromisoformat(to_date))
+        query = item_ledger_query(tenant_id, request.args)
         
         # Pagination
-        limit = int(request.args.get('limit', 100))
+        limit = page_size(request.args)
         offset = int(request.args.get('offset', 0))
         
         # Execute
-        entries = query.order_by(ItemLedgerEntry.posting_date.desc()).limit(limit).offset(offset).all()
+        entries, next_cursor = keyset_page(
+            query, ItemLedgerEntry, limit, request.args.get('cursor'), offset
+        )
         
         return jsonify({
             'entries': [e.to_dict() for e in entries],
             'count': len(entries),
             'limit': limit,
-            'offset': offset
+            'offset': offset,
+            'next_cursor': next_cursor
         }), 200
         
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+@journals_bp.route('/ledger/items/export', methods=['GET'])
+@token_required
+def export_item_ledger():
+    """
+    Export Item Ledger Entries (oldest first), streamed
+    
+    Query params:
+    - format: csv (default) or parquet
+    - item_no, entry_type, production_order_no, location_code, from_date, to_date:
+      Same filters as /ledger/items
+    """
+    try:
+        tenant_id = get_tenant_from_token()
+        query = item_ledger_query(tenant_id, request.args)
+        return _export_response(query, ItemLedgerEntry, ITEM_LEDGER_COLUMNS, 'item_ledger')
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
@@ -241,7 +434,7 @@ def query_item_ledger():
 @token_required
 def query_capacity_ledger():
     """
-    Query Capacity Ledger Entries
+    Query Capacity Ledger Entries (newest first)
     
     Query params:
     - work_center_code: Filter by work center
@@ -249,52 +442,54 @@ def query_capacity_ledger():
     - production_order_no: Filter by order
     - operator_id: Filter by operator
     - from_date, to_date: Date range
-    - limit, offset: Pagination
+    - limit: Page size (default 100, max 1000)
+    - cursor: next_cursor of the previous page
+    - offset: Legacy pagination (prefer cursor)
     """
     try:
         tenant_id = get_tenant_from_token()
         
         # Build query
-        query = CapacityLedgerEntry.query.filter_by(tenant_id=tenant_id)
-        
-        # Apply filters
-        wc_code = request.args.get('work_center_code')
-        if wc_code:
-            query = query.filter_by(work_center_code=wc_code)
-        
-        mc_code = request.args.get('machine_center_code')
-        if mc_code:
-            query = query.filter_by(machine_center_code=mc_code)
-        
-        order_no = request.args.get('production_order_no')
-        if order_no:
-            query = query.filter_by(production_order_no=order_no)
-        
-        operator_id = request.args.get('operator_id')
-        if operator_id:
-            query = query.filter_by(operator_id=operator_id)
-        
-        from_date = request.args.get('from_date')
-        if from_date:
-            query = query.filter(CapacityLedgerEntry.posting_date >= datetime.fromisoformat(from_date))
-        
-        to_date = request.args.get('to_date')
-        if to_date:
-            query = query.filter(CapacityLedgerEntry.posting_date <= datetime.fromisoformat(to_date))
+        query = capacity_ledger_query(tenant_id, request.args)
         
         # Pagination
-        limit = int(request.args.get('limit', 100))
+        limit = page_size(request.args)
         offset = int(request.args.get('offset', 0))
         
         # Execute
-        entries = query.order_by(CapacityLedgerEntry.posting_date.desc()).limit(limit).offset(offset).all()
+        entries, next_cursor = keyset_page(
+            query, CapacityLedgerEntry, limit, request.args.get('cursor'), offset
+        )
         
         return jsonify({
             'entries': [e.to_dict() for e in entries],
             'count': len(entries),
             'limit': limit,
-            'offset': offset
+            'offset': offset,
+            'next_cursor': next_cursor
         }), 200
         
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+@journals_bp.route('/ledger/capacity/export', methods=['GET'])
+@token_required
+def export_capacity_ledger():
+    """
+    Export Capacity Ledger Entries (oldest first), streamed
+    
+    Query params:
+    - format: csv (default) or parquet
+    - work_center_code, machine_center_code, production_order_no, operator_id,
+      from_date, to_date: Same filters as /ledger/capacity
+    """
+    try:
+        tenant_id = get_tenant_from_token()
+        query = capacity_ledger_query(tenant_id, request.args)
+        return _export_response(query, CapacityLedgerEntry, CAPACITY_LEDGER_COLUMNS, 'capacity_ledger')
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
     except Exception as e:
         return jsonify({'error': str(e)}), 500
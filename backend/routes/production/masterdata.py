@@ -8,11 +8,13 @@ from flask_jwt_extended import jwt_required, get_jwt_identity
 from mongoengine.errors import ValidationError, DoesNotExist, NotUniqueError
 from typing import Tuple
 
-from models.production import UnitOfMeasure, Item, Location, Supplier
+from models.production import UnitOfMeasure, Item, Location, Supplier, BOM
 from models.laboratory import Laboratory
 from models.user import User
 from services.permissions import ensure
 from services.production import check_production_dependencies
+from services.production.bom_graph import invalidate_bom_graph
+from services.production.where_used import count_bom_usage
 
 bp = Blueprint("production_masterdata", __name__, url_prefix="/api/production/masterdata")
 
@@ -323,6 +325,7 @@ def items_create():
             created_by=uid,
             updated_by=uid,
         ).save()
+        invalidate_bom_graph(lab.id)
         
         return jsonify({"item": item.to_dict()}), 201
     except NotUniqueError:
@@ -359,6 +362,7 @@ def items_update(item_id):
         
         item.updated_by = uid
         item.save()
+        invalidate_bom_graph(lab.id)
         
         return jsonify({"item": item.to_dict()})
     except DoesNotExist:
@@ -378,10 +382,18 @@ def items_delete(item_id):
     try:
         item = Item.objects.get(id=item_id, tenant_id=lab)
         
-        # TODO: Check if item is used in BOMs, orders, etc.
-        # For now, allow deletion
+        # Check if item is used in BOMs (where-used index once built, BOM lines before) or has its own BOM
+        usage_count = count_bom_usage(lab.id, item.item_no)
+        if usage_count > 0:
+            return _error_response(
+                f"Cannot delete item '{item.item_no}': used as component in {usage_count} BOM line(s)", 409
+            )
+        bom_count = BOM.objects(tenant_id=str(lab.id), item_no=item.item_no).count()
+        if bom_count > 0:
+            return _error_response(f"Cannot delete item '{item.item_no}': has {bom_count} BOM version(s)", 409)
         
         item.delete()
+        invalidate_bom_graph(lab.id)
         return jsonify({"status": "deleted"})
     except DoesNotExist:
         return _not_found()
@@ -0,0 +1,236 @@
+# backend/routes/production/planning.py
+"""
+Planning Routes - NAV/BC-style
+Endpoints for MRP runs (regenerative / net change), the planning worksheet
+and pegging (which demand drives which supply)
+"""
+from flask import Blueprint, request, jsonify
+from flask_jwt_extended import jwt_required, get_jwt_identity
+from typing import Tuple
+
+from models.production import PlanningRun, PlanningSuggestion
+from models.laboratory import Laboratory
+from .._authz import require
+from services.production import check_production_dependencies
+from services.production.mrp import run_mrp, MRP_MODES, MRPRunInProgress
+from services.production.pegging import pegging_cache
+
+bp = Blueprint("production_planning", __name__, url_prefix="/api/production/planning")
+
+# ========================================
+# HELPER FUNCTIONS (DRY pattern)
+# ========================================
+
+def _error_response(message: str, status: int = 400):
+    """Standard error response"""
+    return jsonify({"error": message}), status
+
+## permission checks centralized in routes/_authz.py
+
+def _get_lab() -> Laboratory:
+    """Get laboratory from X-Tenant-Id header or JWT"""
+    from flask import current_app
+    from flask_jwt_extended import get_jwt
+
+    # X-Tenant-Id header
+    tenant_id = request.headers.get("X-Tenant-Id")
+    if tenant_id and tenant_id != "default":
+        try:
+            return Laboratory.objects.get(id=tenant_id)
+        except Exception as e:
+            current_app.logger.warning("X-Tenant-Id inválido: %s", e)
+
+    # JWT tenant_id
+    claims = get_jwt() or {}
+    tid = claims.get("tenant_id")
+    try:
+        if tid and tid != "default":
+            return Laboratory.objects.get(id=tid)
+    except Exception as e:
+        current_app.logger.warning("tenant_id inválido no JWT: %s", e)
+
+    # Fallback
+    lab = Laboratory.objects.first()
+    if not lab:
+        lab = Laboratory(name="Default Lab").save()
+    return lab
+
+def _pagination() -> Tuple[int, int]:
+    """Get pagination parameters from request"""
+    page = max(1, int(request.args.get("page", 1) or 1))
+    size = min(100, max(1, int(request.args.get("page_size", 50) or 50)))
+    return page, size
+
+# ========================================
+# MRP RUN
+# ========================================
+
+@bp.post("/run")
+@jwt_required()
+@require('create', get_lab=_get_lab)
+def planning_run():
+    """
+    Run MRP and refresh the planning worksheet.
+
+    Body (optional):
+    {
+        "mode": "net_change"    # or "regenerative" (default: net_change;
+                                # the first run is always regenerative)
+    }
+
+    Returns 409 with the dependency checks when production setup is incomplete,
+    and 409 while another run of the tenant is in progress.
+    """
+    lab = _get_lab()  # permission enforced by decorator
+
+    data = request.get_json(silent=True) or {}
+    mode = data.get("mode", "net_change")
+    if mode not in MRP_MODES:
+        return _error_response(f"mode must be one of: {', '.join(MRP_MODES)}")
+
+    all_ok, checks = check_production_dependencies(lab)
+    if not all_ok:
+        return jsonify({"ok": False, "checks": checks}), 409
+
+    try:
+        summary = run_mrp(str(lab.id), mode=mode, user_email=get_jwt_identity())
+        return jsonify(summary), 200
+    except MRPRunInProgress as e:
+        return _error_response(str(e), 409)
+    except ValueError as e:
+        return _error_response(str(e), 409)
+    except Exception as e:
+        return _error_response(f"Error running MRP: {str(e)}", 500)
+
+@bp.get("/runs")
+@jwt_required()
+@require('read', get_lab=_get_lab)
+def planning_runs():
+    """List MRP runs, newest first"""
+    lab = _get_lab()  # permission enforced by decorator
+
+    page, size = _pagination()
+    qs = PlanningRun.objects(tenant_id=str(lab.id)).order_by("-started_at")
+    total = qs.count()
+    runs = qs.skip((page - 1) * size).limit(size)
+
+    return jsonify({
+        "total": total,
+        "page": page,
+        "page_size": size,
+        "items": [run.to_dict() for run in runs]
+    }), 200
+
+# ========================================
+# PLANNING WORKSHEET
+# ========================================
+
+@bp.get("/suggestions")
+@jwt_required()
+@require('read', get_lab=_get_lab)
+def planning_suggestions():
+    """
+    List planning suggestions by due date.
+
+    Query params:
+    - page, page_size: Pagination (default 1 / 50, max 100)
+    - item_no: Filter by item
+    - type: Production or Purchase
+    - late: true = only suggestions that should already have started
+    """
+    lab = _get_lab()  # permission enforced by decorator
+
+    page, size = _pagination()
+    qs = PlanningSuggestion.objects(tenant_id=str(lab.id))
+    if request.args.get("item_no"):
+        qs = qs.filter(item_no=request.args["item_no"])
+    if request.args.get("type"):
+        qs = qs.filter(suggestion_type=request.args["type"])
+    if request.args.get("late"):
+        qs = qs.filter(late=request.args["late"].lower() == "true")
+
+    total = qs.count()
+    items = qs.order_by("due_date", "item_no").skip((page - 1) * size).limit(size)
+
+    return jsonify({
+        "total": total,
+        "page": page,
+        "page_size": size,
+        "items": [suggestion.to_dict() for suggestion in items]
+    }), 200
+
+# ========================================
+# PEGGING
+# ========================================
+
+@bp.get("/pegging")
+@jwt_required()
+@require('read', get_lab=_get_lab)
+def pegging_node():
+    """
+    Direct pegs of a node.
+
+    Query params:
+    - node: Pegging node id (SO:<order>:<line>, PO:<order_no>,
+      PLAN:<item>:<date>, STOCK:<item>, SAFETY:<item>)
+    """
+    lab = _get_lab()  # permission enforced by decorator
+
+    node = request.args.get("node")
+    if not node:
+        return _error_response("node is required")
+    return jsonify(pegging_cache.get(str(lab.id)).pegs(node)), 200
+
+@bp.get("/pegging/drivers")
+@jwt_required()
+@require('read', get_lab=_get_lab)
+def pegging_drivers():
+    """
+    What drives a requirement / what a shortage of a supply affects.
+
+    Query params:
+    - node: Pegging node id of a supply (order, planned order, stock)
+
+    Returns the orders above it (affected) and the demands at the top
+    (drivers), with the node's quantity shared out proportionally.
+    """
+    lab = _get_lab()  # permission enforced by decorator
+
+    node = request.args.get("node")
+    if not node:
+        return _error_response("node is required")
+    index = pegging_cache.get(str(lab.id))
+    if not index.has(node):
+        return _error_response("Node not found in pegging", 404)
+
+    return jsonify({
+        "node": node,
+        "item_no": index.item_of(node),
+        "drivers": index.drivers(node),
+        "affected": index.upstream(node)
+    }), 200
+
+@bp.get("/pegging/supplies")
+@jwt_required()
+@require('read', get_lab=_get_lab)
+def pegging_supplies():
+    """
+    Supplies covering a demand at every BOM level.
+
+    Query params:
+    - node: Pegging node id of a demand (sales line, order, planned order)
+    """
+    lab = _get_lab()  # permission enforced by decorator
+
+    node = request.args.get("node")
+    if not node:
+        return _error_response("node is required")
+    index = pegging_cache.get(str(lab.id))
+    if not index.has(node):
+        return _error_response("Node not found in pegging", 404)
+
+    return jsonify({
+        "node": node,
+        "item_no": index.item_of(node),
+        "supplies": index.downstream(node)
+    }), 200
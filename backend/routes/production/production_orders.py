@@ -9,10 +9,15 @@ from mongoengine.errors import ValidationError, DoesNotExist, NotUniqueError
 from typing import Tuple
 from datetime import datetime, timedelta
 
-from models.production import ProductionOrder, ProductionOrderLine, ProductionOrderRouting, BOM, Routing, Item, Location
+from models.production import ProductionOrder, Routing, Item, Location
 from models.laboratory import Laboratory
 from models.user import User
 from .._authz import check_permission, require
+from services.production.bom_graph import bom_graph_cache
+from services.production.scheduler import schedule_production_orders, SCHEDULE_DIRECTIONS
+from services.production.order_release import explode_bom, explode_routing, release_production_orders
+from services.production.order_explosion import create_multilevel_orders, ORDER_EXPLOSION_MODES
+from services.production.order_list import production_order_page
 
 bp = Blueprint("production_orders", __name__, url_prefix="/api/production/production-orders")
 
@@ -72,80 +77,6 @@ def _query() -> str:
     """Get search query from request"""
     return (request.args.get("q", "") or "").strip()
 
-def _explode_bom(bom: BOM, quantity: float, location_code: str) -> list:
-    """
-    Explode BOM into production order lines.
-    
-    Args:
-        bom: BOM to explode
-        quantity: Order quantity
-        location_code: Default location for components
-        
-    Returns:
-        List of ProductionOrderLine objects
-    """
-    lines = []
-    
-    for bom_line in bom.lines:
-        # Calculate expected quantity considering scrap
-        scrap_multiplier = 1.0 + (bom_line.scrap_pct / 100.0)
-        expected_qty = bom_line.quantity_per * quantity * scrap_multiplier
-        
-        po_line = ProductionOrderLine(
-            line_no=bom_line.line_no,
-            component_item_no=bom_line.component_item_no,
-            description=bom_line.description,
-            quantity_per=bom_line.quantity_per,
-            expected_quantity=expected_qty,
-            consumed_quantity=0.0,
-            remaining_quantity=expected_qty,
-            uom_code=bom_line.uom_code,
-            location_code=location_code,
-            bom_line_no=bom_line.line_no,
-            position=bom_line.position
-        )
-        lines.append(po_line)
-    
-    return lines
-
-def _explode_routing(routing: Routing, quantity: float) -> list:
-    """
-    Explode Routing into production order routing lines.
-    
-    Args:
-        routing: Routing to explode
-        quantity: Order quantity
-        
-    Returns:
-        List of ProductionOrderRouting objects
-    """
-    routing_lines = []
-    
-    for operation in routing.operations:
-        # Calculate expected capacity need
-        setup_time = operation.setup_time or 0.0
-        run_time_per_unit = (operation.run_time or 0.0) / operation.concurrent_capacities
-        total_run_time = run_time_per_unit * quantity
-        expected_capacity = setup_time + total_run_time
-        
-        po_routing = ProductionOrderRouting(
-            operation_no=operation.operation_no,
-            work_center_code=operation.work_center_code,
-            machine_center_code=operation.machine_center_code,
-            description=operation.description,
-            setup_time=setup_time,
-            run_time=total_run_time,
-            expected_capacity_need=expected_capacity,
-            actual_setup_time=0.0,
-            actual_run_time=0.0,
-            remaining_time=expected_capacity,
-            routing_operation_no=operation.operation_no,
-            status="Planned"
-        )
-        routing_lines.append(po_routing)
-    
-    return routing_lines
-
 # ========================================
 # PRODUCTION ORDER ENDPOINTS
 # ========================================
@@ -155,12 +86,16 @@ def _explode_routing(routing: Routing, quantity: float) -> list:
 @require('read', get_lab=_get_lab)
 def production_order_list():
     """
-    List all Production Orders with filters and pagination.
+    List Production Orders with filters, pagination and dashboard counts.
+    
+    One aggregation returns the page, the total and the counts per status
+    and per due week (services.production.order_list).
     
     Query params:
-    - page: Page number (default 1)
     - page_size: Items per page (default 50, max 100)
-    - q: Search by order_no or item_no
+    - cursor: next_cursor of the previous page
+    - page: Legacy page number (prefer cursor)
+    - q: Order no. or item no. prefix (case-sensitive)
     - status: Filter by status
     - item_no: Filter by item
     - due_date_from: Filter by due date range (ISO format)
@@ -169,46 +104,16 @@ def production_order_list():
     lab = _get_lab()  # permission enforced by decorator
     
     page, size = _pagination()
-    q = _query()
     
-    # Base query
-    qs = ProductionOrder.objects(tenant_id=str(lab.id))
-    
-    # Search
-    if q:
-        qs = qs.filter(order_no__icontains=q) | ProductionOrder.objects(tenant_id=str(lab.id), item_no__icontains=q)
-    
-    # Filters
-    if request.args.get("status"):
-        qs = qs.filter(status=request.args["status"])
-    
-    if request.args.get("item_no"):
-        qs = qs.filter(item_no=request.args["item_no"])
-    
-    if request.args.get("due_date_from"):
-        try:
-            date_from = datetime.fromisoformat(request.args["due_date_from"]).date()
-            qs = qs.filter(due_date__gte=date_from)
-        except ValueError:
-            pass
-    
-    if request.args.get("due_date_to"):
-        try:
-            date_to = datetime.fromisoformat(request.args["due_date_to"]).date()
-            qs = qs.filter(due_date__lte=date_to)
-        except ValueError:
-            pass
-    
-    # Pagination
-    total = qs.count()
-    items = qs.order_by("-due_date", "order_no").skip((page - 1) * size).limit(size)
+    try:
+        result = production_order_page(
+            str(lab.id), request.args, size, cursor=request.args.get("cursor"), page=page
+        )
+    except ValueError as e:
+        return _error_response(str(e))
     
-    return jsonify({
-        "total": total,
-        "page": page,
-        "page_size": size,
-        "items": [po.to_dict() for po in items]
-    }), 200
+    result["page"] = page
+    return jsonify(result), 200
 
 @bp.post("")
 @jwt_required()
@@ -225,10 +130,17 @@ def production_order_create():
         "due_date": "2025-11-01",
         "location_code": "MAIN",
         "status": "Planned",
-        "priority": 1
+        "priority": 1,
+        "explosion": "single"    # or "multi_level" / "flatten"
     }
     
     Auto-explodes certified BOM and Routing if available.
+    
+    Explosion modes:
+    - single: one BOM level (default)
+    - multi_level: child production orders (<order_no>-01, ...) for every
+      manufactured sub-assembly, phantoms flattened; returned in child_orders
+    - flatten: one order with the leaf components of all levels
     """
     lab = _get_lab()  # permission enforced by decorator
     
@@ -243,6 +155,9 @@ def production_order_create():
         return _error_response("item_no is required")
     if not data.get("quantity"):
         return _error_response("quantity is required")
+    explosion = data.get("explosion", "single")
+    if explosion not in ORDER_EXPLOSION_MODES:
+        return _error_response(f"explosion must be one of: {', '.join(ORDER_EXPLOSION_MODES)}")
     
     # Verify item exists
     item = Item.objects(tenant_id=str(lab.id), item_no=data["item_no"]).first()
@@ -265,8 +180,9 @@ def production_order_create():
         if location:
             location_code = location.code
     
-    # Get certified BOM
-    bom = BOM.objects(tenant_id=str(lab.id), item_no=data["item_no"], status="Certified").first()
+    # Get certified BOM from the cached graph (root version checked against the database)
+    graph, _ = bom_graph_cache.fetch_current(str(lab.id), data["item_no"])
+    bom = graph.bom(data["item_no"])
     if not bom:
         return _error_response(f"No certified BOM found for item {data['item_no']}", 404)
     
@@ -313,23 +229,34 @@ def production_order_create():
             # Calculate start date from due date and lead time
             po.start_date = (datetime.combine(po.due_date, datetime.min.time()) - timedelta(days=item.lead_time_days)).date()
         
+        if explosion != "single":
+            # Child orders / flattened lines from one explosion, one bulk insert
+            orders = create_multilevel_orders(str(lab.id), po, mode=explosion, graph=graph)
+            result = orders[0].to_dict()
+            result["child_orders"] = [child.to_dict() for child in orders[1:]]
+            return jsonify(result), 201
+        
         # Explode BOM into lines
-        po.lines = _explode_bom(bom, quantity, location_code)
+        po.lines = explode_bom(bom, quantity, location_code)
         
         # Explode Routing into routing lines (if exists)
         if routing:
             po.routing_no = routing.item_no
             po.routing_version_code = routing.version_code
-            po.routing_lines = _explode_routing(routing, quantity)
+            po.routing_lines = explode_routing(routing, quantity)
         
         po.save()
         
         return jsonify(po.to_dict()), 201
         
-    except NotUniqueError:
+    except NotUniqueError as e:
+        if explosion != "single":
+            return _error_response(str(e), 409)
         return _error_response(f"Production Order {data['order_no']} already exists", 409)
     except ValidationError as e:
         return _validation_error(e)
+    except ValueError as e:
+        return _error_response(str(e))
     except Exception as e:
         return _error_response(f"Error creating Production Order: {str(e)}", 500)
 
@@ -458,6 +385,59 @@ def production_order_release(po_id: str):
     else:
         return _error_response("Failed to release Production Order", 500)
 
+@bp.post("/release-batch")
+@jwt_required()
+@require('update', get_lab=_get_lab)
+def production_orders_release_batch():
+    """
+    Release several Production Orders at once.
+    
+    Body - either ids:
+    {
+        "ids": ["665f...", "665f..."]
+    }
+    or a filter (all optional):
+    {
+        "status": "Firm Planned",        # Planned or Firm Planned (default both)
+        "due_date_from": "2025-11-01",
+        "due_date_to": "2025-11-30"
+    }
+    
+    Orders are releasable on the same terms as a single release (Planned or
+    Firm Planned). They are exploded concurrently (missing component and
+    routing lines) and written with one bulk_write of conditional updates;
+    an order changed since it was loaded is a Conflict. Returns the outcome per
+    order (Released / Failed / Conflict) and elapsed_ms.
+    """
+    lab = _get_lab()  # permission enforced by decorator
+    
+    data = request.get_json(silent=True) or {}
+    ids = data.get("ids")
+    if ids is not None and (not isinstance(ids, list) or not ids):
+        return _error_response("ids must be a non-empty list")
+    
+    dates = {}
+    for key in ("due_date_from", "due_date_to"):
+        if data.get(key):
+            try:
+                dates[key] = datetime.fromisoformat(data[key]).date()
+            except ValueError:
+                return _error_response(f"{key} must be an ISO date")
+    
+    try:
+        summary = release_production_orders(
+            str(lab.id),
+            order_ids=ids,
+            status=data.get("status"),
+            user_email=get_jwt_identity(),
+            **dates
+        )
+        return jsonify(summary), 200
+    except ValueError as e:
+        return _error_response(str(e))
+    except Exception as e:
+        return _error_response(f"Error releasing Production Orders: {str(e)}", 500)
+
 @bp.post("/<po_id>/finish")
 @jwt_required()
 @require('update', get_lab=_get_lab)
@@ -546,6 +526,54 @@ def production_order_cancel(po_id: str):
     else:
         return _error_response("Failed to cancel Production Order", 500)
 
+@bp.post("/schedule")
+@jwt_required()
+@require('update', get_lab=_get_lab)
+def production_orders_schedule():
+    """
+    Finite-capacity schedule of released Production Orders.
+    
+    Body (all optional):
+    {
+        "direction": "forward",          # or "backward" (from due_date)
+        "order_nos": ["PO-2025-001"],    # default: every released order
+        "origin": "2025-11-03T06:00:00", # default: now (UTC)
+        "save": true                     # false = preview only
+    }
+    
+    Writes starting/ending datetimes to the routing lines, start_date and
+    has_capacity_shortage (late against due_date / start in the past).
+    """
+    lab = _get_lab()  # permission enforced by decorator
+    
+    data = request.get_json(silent=True) or {}
+    direction = data.get("direction", "forward")
+    if direction not in SCHEDULE_DIRECTIONS:
+        return _error_response(f"direction must be one of: {', '.join(SCHEDULE_DIRECTIONS)}")
+    
+    origin = None
+    if data.get("origin"):
+        try:
+            origin = datetime.fromisoformat(data["origin"])
+        except ValueError:
+            return _error_response("origin must be an ISO datetime")
+    
+    order_nos = data.get("order_nos")
+    if order_nos is not None and not isinstance(order_nos, list):
+        return _error_response("order_nos must be a list")
+    
+    try:
+        summary = schedule_production_orders(
+            str(lab.id),
+            direction=direction,
+            order_nos=order_nos,
+            origin=origin,
+            save=bool(data.get("save", True))
+        )
+        return jsonify(summary), 200
+    except Exception as e:
+        return _error_response(f"Error scheduling Production Orders: {str(e)}", 500)
+
 @bp.get("/by-item/<item_no>")
 @jwt_required()
 @require('read', get_lab=_get_lab)
@@ -1,17 +1,21 @@
 # backend/routes/production/work_centers.py
 """
-Work Centers and Machine Centers Routes - NAV/BC-style
+Work Centers, Machine Centers and Calendars Routes - NAV/BC-style
 Endpoints for managing production resources (work centers and machines)
+and the calendars (shifts, holidays, exceptions) they work
 """
 from flask import Blueprint, request, jsonify
 from flask_jwt_extended import jwt_required, get_jwt_identity, get_jwt
 from mongoengine.errors import ValidationError, DoesNotExist, NotUniqueError
+from datetime import date, datetime, timedelta
 from typing import Tuple
 
-from models.production import WorkCenter, MachineCenter, Location
+from models.production import WorkCenter, MachineCenter, Location, WorkCenterCalendar, \
+    CalendarShift, CalendarHoliday, CalendarException
 from models.laboratory import Laboratory
 from models.user import User
 from .._authz import check_permission, require
+from services.production.capacity_calendar import calendar_timeline_cache, invalidate_calendar
 
 bp = Blueprint("production_work_centers", __name__, url_prefix="/api/production")
 
@@ -557,3 +561,257 @@ def machine_centers_by_work_center(work_center_code: str):
         "total": machines.count(),
         "machines": [mc.to_dict() for mc in machines]
     }), 200
+
+# ========================================
+# CALENDAR ENDPOINTS
+# ========================================
+
+# Upper bound for a calendar capacity date range
+MAX_CALENDAR_CAPACITY_DAYS = 366
+
+def _calendar_rules(data: dict) -> dict:
+    """Embedded shifts/holidays/exceptions from request data (only the keys present)"""
+    rules = {}
+    if "shifts" in data:
+        rules["shifts"] = [
+            CalendarShift(
+                code=shift.get("code"),
+                name=shift.get("name"),
+                start_time=shift.get("start_time"),
+                end_time=shift.get("end_time"),
+                weekdays=shift.get("weekdays", [0, 1, 2, 3, 4])
+            )
+            for shift in data["shifts"] or []
+        ]
+    if "holidays" in data:
+        rules["holidays"] = [
+            CalendarHoliday(
+                date=date.fromisoformat(holiday["date"]),
+                description=holiday.get("description")
+            )
+            for holiday in data["holidays"] or []
+        ]
+    if "exceptions" in data:
+        rules["exceptions"] = [
+            CalendarException(
+                date=date.fromisoformat(exception["date"]),
+                shift_code=exception.get("shift_code"),
+                working=bool(exception.get("working", False)),
+                description=exception.get("description")
+            )
+            for exception in data["exceptions"] or []
+        ]
+    return rules
+
+@bp.get("/calendars")
+@jwt_required()
+@require('read', get_lab=_get_lab)
+def calendar_list():
+    """
+    List Work Center Calendars with pagination.
+    
+    Query params:
+    - page: Page number (default 1)
+    - page_size: Items per page (default 50, max 100)
+    - q: Search by code or name
+    """
+    lab = _get_lab()
+    # permission enforced by decorator
+    
+    page, size = _pagination()
+    q = _query()
+    
+    qs = WorkCenterCalendar.objects(tenant_id=str(lab.id))
+    if q:
+        qs = qs.filter(code__icontains=q) | WorkCenterCalendar.objects(tenant_id=str(lab.id), name__icontains=q)
+    
+    total = qs.count()
+    items = qs.order_by("code").skip((page - 1) * size).limit(size)
+    
+    return jsonify({
+        "total": total,
+        "page": page,
+        "page_size": size,
+        "items": [calendar.to_dict() for calendar in items]
+    }), 200
+
+@bp.post("/calendars")
+@jwt_required()
+@require('create', get_lab=_get_lab)
+def calendar_create():
+    """
+    Create a Work Center Calendar.
+    
+    Body:
+    {
+        "code": "2-SHIFT",
+        "name": "Two shifts Mon-Fri",
+        "shifts": [
+            {"code": "EARLY", "start_time": "06:00", "end_time": "14:00", "weekdays": [0, 1, 2, 3, 4]},
+            {"code": "LATE", "start_time": "14:00", "end_time": "22:00", "weekdays": [0, 1, 2, 3, 4]}
+        ],
+        "holidays": [{"date": "2025-12-25", "description": "Christmas"}],
+        "exceptions": [{"date": "2025-11-29", "shift_code": "EARLY", "working": true}]
+    }
+    """
+    lab = _get_lab()
+    # permission enforced by decorator
+    
+    data = request.get_json()
+    if not data:
+        return _error_response("No data provided")
+    
+    if not data.get("code"):
+        return _error_response("code is required")
+    if not data.get("name"):
+        return _error_response("name is required")
+    
+    try:
+        user_email = get_jwt_identity()
+        
+        calendar = WorkCenterCalendar(
+            tenant_id=str(lab.id),
+            code=data["code"],
+            name=data["name"],
+            description=data.get("description", ""),
+            created_by=user_email,
+            updated_by=user_email,
+            **_calendar_rules(data)
+        )
+        calendar.save()
+        invalidate_calendar(calendar.tenant_id)
+        
+        return jsonify(calendar.to_dict()), 201
+        
+    except NotUniqueError:
+        return _error_response(f"Calendar with code {data['code']} already exists", 409)
+    except (KeyError, TypeError, ValueError) as e:
+        return _error_response(f"Invalid calendar data: {str(e)}")
+    except ValidationError as e:
+        return _validation_error(e)
+    except Exception as e:
+        return _error_response(f"Error creating Calendar: {str(e)}", 500)
+
+@bp.get("/calendars/<calendar_id>")
+@jwt_required()
+@require('read', get_lab=_get_lab)
+def calendar_get(calendar_id: str):
+    """Get a single Work Center Calendar by ID"""
+    lab = _get_lab()
+    # permission enforced by decorator
+    
+    try:
+        calendar = WorkCenterCalendar.objects.get(id=calendar_id, tenant_id=str(lab.id))
+        return jsonify(calendar.to_dict()), 200
+    except DoesNotExist:
+        return _not_found("Calendar")
+
+@bp.patch("/calendars/<calendar_id>")
+@jwt_required()
+@require('update', get_lab=_get_lab)
+def calendar_update(calendar_id: str):
+    """
+    Update a Work Center Calendar.
+    
+    shifts/holidays/exceptions replace the whole list when present. Cached
+    capacity buckets are regenerated on next use - only the changed days
+    when the shifts stay the same.
+    """
+    lab = _get_lab()
+    # permission enforced by decorator
+    
+    try:
+        calendar = WorkCenterCalendar.objects.get(id=calendar_id, tenant_id=str(lab.id))
+    except DoesNotExist:
+        return _not_found("Calendar")
+    
+    data = request.get_json()
+    if not data:
+        return _error_response("No data provided")
+    
+    try:
+        if "name" in data:
+            calendar.name = data["name"]
+        if "description" in data:
+            calendar.description = data["description"]
+        for field, values in _calendar_rules(data).items():
+            setattr(calendar, field, values)
+        
+        calendar.updated_by = get_jwt_identity()
+        calendar.save()
+        invalidate_calendar(calendar.tenant_id)
+        
+        return jsonify(calendar.to_dict()), 200
+        
+    except (KeyError, TypeError, ValueError) as e:
+        return _error_response(f"Invalid calendar data: {str(e)}")
+    except ValidationError as e:
+        return _validation_error(e)
+    except Exception as e:
+        return _error_response(f"Error updating Calendar: {str(e)}", 500)
+
+@bp.delete("/calendars/<calendar_id>")
+@jwt_required()
+@require('delete', get_lab=_get_lab)
+def calendar_delete(calendar_id: str):
+    """
+    Delete a Work Center Calendar.
+    
+    Business Rules:
+    - Cannot delete if Work Centers or Machine Centers use it
+    """
+    lab = _get_lab()
+    # permission enforced by decorator
+    
+    try:
+        calendar = WorkCenterCalendar.objects.get(id=calendar_id, tenant_id=str(lab.id))
+    except DoesNotExist:
+        return _not_found("Calendar")
+    
+    users = (WorkCenter.objects(tenant_id=str(lab.id), calendar_code=calendar.code).count()
+             + MachineCenter.objects(tenant_id=str(lab.id), calendar_code=calendar.code).count())
+    if users > 0:
+        return _error_response(f"Cannot delete Calendar. It is used by {users} Work/Machine Center(s).", 403)
+    
+    calendar.delete()
+    invalidate_calendar(calendar.tenant_id)
+    return jsonify({"message": "Calendar deleted successfully"}), 200
+
+@bp.get("/calendars/<calendar_id>/capacity")
+@jwt_required()
+@require('read', get_lab=_get_lab)
+def calendar_capacity(calendar_id: str):
+    """
+    Working minutes per day and shift from the precomputed capacity buckets.
+    
+    Query params:
+    - from_date: First day (YYYY-MM-DD, default today)
+    - to_date: Last day, inclusive (default from_date + 6 days, max 366 days)
+    """
+    lab = _get_lab()
+    # permission enforced by decorator
+    
+    try:
+        calendar = WorkCenterCalendar.objects.only("code").get(id=calendar_id, tenant_id=str(lab.id))
+    except DoesNotExist:
+        return _not_found("Calendar")
+    
+    try:
+        from_day = date.fromisoformat(request.args["from_date"]) if request.args.get("from_date") \
+            else datetime.utcnow().date()
+        to_day = date.fromisoformat(request.args["to_date"]) if request.args.get("to_date") \
+            else from_day + timedelta(days=6)
+    except ValueError:
+        return _error_response("Invalid date format. Use YYYY-MM-DD")
+    
+    days = (to_day - from_day).days + 1
+    if days <= 0:
+        return _error_response("to_date must not be before from_date")
+    if days > MAX_CALENDAR_CAPACITY_DAYS:
+        return _error_response(f"Date range is limited to {MAX_CALENDAR_CAPACITY_DAYS} days")
+    
+    timeline = calendar_timeline_cache.covering(str(lab.id), [calendar.code], from_day, to_day).get(calendar.code)
+    if timeline is None:
+        return _not_found("Calendar")
+    
+    return jsonify(timeline.to_dict(from_day, to_day)), 200
@@ -3,7 +3,7 @@ from flask import Blueprint, request, jsonify, make_response, send_file
 from flask_jwt_extended import jwt_required, get_jwt, get_jwt_identity
 from datetime import date, datetime
 from models.laboratory import Laboratory
-from models.order import Order
+from models.order import Order, ORDER_STATUSES
 from models.invoice import Invoice
 from models.series import Series
 from models.currency import Currency
@@ -76,14 +76,25 @@ def _calc_total(lines):
         disc = max(0.0, min(disc, gross))
         tot = gross - disc
         total += tot
-        out.append({
+        line = {
             "description": ln.get("description"),
             "qty": qty,
             "price": price,
             "discount_rate": ln.get('discount_rate'),
             "discount_amount": ln.get('discount_amount'),
             "total": tot,
-        })
+        }
+        # item lines are independent demand for MRP (services.production.mrp)
+        item_no = (ln.get("item_no") or "").strip()
+        if item_no:
+            line["item_no"] = item_no
+            try:
+                line["shipped_qty"] = max(0.0, float(ln.get("shipped_qty") or 0))
+            except Exception:
+                line["shipped_qty"] = 0.0
+            if ln.get("shipment_date"):
+                line["shipment_date"] = str(ln.get("shipment_date"))[:10]
+        out.append(line)
     return total, out
 
 def _labels_for(lang: str) -> dict:
@@ -168,6 +179,7 @@ def _order_to_dict(o: Order):
         "currency": o.currency,
         "lines": getattr(o, 'lines', []) or [],
         "total": o.total,
+        "status": getattr(o, 'status', None) or "open",
     }
 
 def _invoice_to_dict(i: Invoice):
@@ -508,7 +520,7 @@ def orders_list():
     except Exception:
         pass
     items = Order.objects(lab=lab).order_by("-date")
-    return jsonify({"items": [{"id": str(o.id), "number": o.number, "date": o.date.isoformat() if o.date else None, "total": o.total} for o in items]})
+    return jsonify({"items": [{"id": str(o.id), "number": o.number, "date": o.date.isoformat() if o.date else None, "total": o.total, "status": getattr(o, 'status', None) or "open"} for o in items]})
 
 @bp.get("/orders/<oid>")
 @jwt_required()
@@ -627,6 +639,10 @@ def orders_update(oid):
     for f in ["number","date","currency","notes"]:
         if f in data:
             setattr(o, f, data.get(f))
+    if "status" in data:
+        if data.get("status") not in ORDER_STATUSES:
+            return jsonify({"error": f"status must be one of {', '.join(ORDER_STATUSES)}"}), 400
+        o.status = data.get("status")
     # discounts/taxes
     if "discount_rate" in data:
         try: o.discount_rate = float(data.get('discount_rate') or 0.0)
@@ -860,6 +876,9 @@ def orders_convert_to_invoice(oid):
         tax_rate=float(getattr(o, 'tax_rate', 0.0) or 0.0),
         tax_amount=float(getattr(o, 'tax_amount', 0.0) or 0.0),
     ).save()
+    # an invoiced order is no longer open demand
+    o.status = "invoiced"
+    o.save()
     return jsonify({"invoice_id": str(inv.id), "number": inv.number}), 201
 
 # Invoices
@@ -0,0 +1,127 @@
+# backend/scripts/benchmark_bom_memory.py
+"""
+Measure the memory held by BOM explosion results.
+
+Explodes the finished goods of a generated BOM forest (same generator as
+benchmark_bom_requirements.py, no database needed) until at least
+--components rows are produced, then compares the bytes retained by:
+1. the result as built by BOMExplosionService (slotted ExplosionComponent,
+   shared source_boms lists for repeated items)
+2. the same rows as a regular (dict-backed) dataclass with one
+   source_boms list per row, i.e. the previous representation
+
+Memory is measured with tracemalloc and reported per 10k components.
+
+Usage:
+    python scripts/benchmark_bom_memory.py [--components 10000] [--items 10000] [--seed 42]
+"""
+
+import argparse
+import os
+import sys
+import tracemalloc
+from dataclasses import dataclass, field
+from typing import List, Optional
+
+# Add backend to path
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from benchmark_bom_requirements import generate_forest
+from services.production.bom_explosion import BOMExplosionService
+
+
+@dataclass
+class DictComponent:
+    """ExplosionComponent as a regular dataclass (per-instance __dict__)"""
+    item_no: str
+    description: str
+    uom_code: str
+    quantity_per: float
+    total_quantity: float
+    scrap_pct: float
+    level: int
+    is_phantom: bool = False
+    position: Optional[str] = None
+    source_boms: List[str] = field(default_factory=list)
+
+
+def measure(build):
+    """Bytes still allocated by build()'s return value"""
+    tracemalloc.start()
+    before = tracemalloc.get_traced_memory()[0]
+    value = build()
+    retained = tracemalloc.get_traced_memory()[0] - before
+    tracemalloc.stop()
+    return value, retained
+
+
+def explode_until(service: BOMExplosionService, roots: List[str], target: int) -> list:
+    """Explode roots until at least `target` component rows were produced"""
+    results = []
+    count = 0
+    for item_no in roots:
+        result = service.explode(item_no, 1.0)
+        results.append(result)
+        count += len(result.components)
+        if count >= target:
+            break
+    return results
+
+
+def as_dict_component(c) -> DictComponent:
+    """Copy one row into a DictComponent with its own source_boms list"""
+    return DictComponent(
+        item_no=c.item_no,
+        description=c.description,
+        uom_code=c.uom_code,
+        quantity_per=c.quantity_per,
+        total_quantity=c.total_quantity * 1.0,  # own float, as in the explosion
+        scrap_pct=c.scrap_pct,
+        level=c.level,
+        is_phantom=c.is_phantom,
+        position=c.position,
+        source_boms=list(c.source_boms),
+    )
+
+
+def as_dict_components(results: list) -> list:
+    """Copy the rows and consolidation entries into DictComponent"""
+    rows = []
+    for result in results:
+        rows.extend(as_dict_component(c) for c in result.components)
+        # Consolidation entries are objects of their own, not the rows
+        rows.append({k: as_dict_component(v) for k, v in result.consolidated_components.items()})
+    return rows
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--components", type=int, default=10000)
+    parser.add_argument("--items", type=int, default=10000)
+    parser.add_argument("--seed", type=int, default=42)
+    args = parser.parse_args()
+
+    graph = generate_forest(args.items, 6, 4, args.seed)
+    roots = [item_no for item_no in graph.nodes if item_no.startswith("L0-")]
+    service = BOMExplosionService(graph.tenant_id, graph=graph)
+
+    results, slotted_bytes = measure(lambda: explode_until(service, roots, args.components))
+    components = sum(len(r.components) for r in results)
+    _, dict_bytes = measure(lambda: as_dict_components(results))
+
+    per_10k = 10000.0 / components
+
+    print("=" * 60)
+    print("BOM EXPLOSION MEMORY")
+    print("=" * 60)
+    print(f"Explosions: {len(results)}  Components: {components}")
+    print()
+    print(f"dict dataclass   {dict_bytes * per_10k / 1024:10.1f} KiB per 10k  "
+          f"({dict_bytes / components:.0f} B/row)")
+    print(f"slotted          {slotted_bytes * per_10k / 1024:10.1f} KiB per 10k  "
+          f"({slotted_bytes / components:.0f} B/row)")
+    print(f"reduction        {100.0 * (1 - slotted_bytes / dict_bytes):10.1f} %")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,154 @@
+# backend/scripts/benchmark_bom_requirements.py
+"""
+Benchmark consolidated BOM requirement engines on a generated BOM forest.
+
+Compares, on the same in-memory BOM graph (no database needed):
+1. DFS: BOMExplosionService.explode() per demanded item, totals summed
+2. level: consolidated_requirements() single pass in low-level-code order
+3. matrix: consolidated_requirements(engine="matrix"), NumPy sparse
+   matrix-vector products (matrix build reported separately)
+
+and checks that all engines return the same totals.
+
+The forest is layered: finished goods on level 0, purchased raw materials
+on the last level, manufactured sub-assemblies in between. Each BOM line
+points to an item on a lower level (mostly the next one), so components
+are shared between many parents.
+
+Usage:
+    python scripts/benchmark_bom_requirements.py [--items 10000] [--levels 6]
+        [--fanout 4] [--roots 50] [--seed 42]
+"""
+
+import argparse
+import os
+import random
+import sys
+import time
+
+# Add backend to path
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from services.production.bom_explosion import BOMExplosionService
+from services.production.bom_graph import BOMGraph, GraphItem, GraphLine, GraphNode
+
+
+def generate_forest(items: int, levels: int, fanout: int, seed: int) -> BOMGraph:
+    """Build a layered BOM graph with `items` items over `levels` levels"""
+    rng = random.Random(seed)
+
+    # Level sizes grow towards the raw materials
+    weights = [2 ** level for level in range(levels)]
+    sizes = [max(1, items * w // sum(weights)) for w in weights]
+    sizes[-1] += items - sum(sizes)
+
+    layers = []
+    counter = 0
+    for level, size in enumerate(sizes):
+        layers.append([f"L{level}-{counter + i:05d}" for i in range(size)])
+        counter += size
+
+    graph_items = {}
+    nodes = {}
+    for level, layer in enumerate(layers):
+        last = level == levels - 1
+        for item_no in layer:
+            graph_items[item_no] = GraphItem(
+                item_no=item_no,
+                description=f"Item {item_no}",
+                item_type="purchased" if last else "manufactured",
+                phantom_bom=False,
+            )
+            if last:
+                continue
+
+            lines = []
+            for line_no in range(1, fanout + 1):
+                # 75% next level, otherwise any lower level
+                target = level + 1 if rng.random() < 0.75 else rng.randint(level + 1, levels - 1)
+                lines.append(GraphLine(
+                    line_no=line_no * 10000,
+                    component_item_no=rng.choice(layers[target]),
+                    description=None,
+                    quantity_per=rng.choice([0.5, 1.0, 2.0, 3.0]),
+                    uom_code="PCS",
+                    scrap_pct=rng.choice([0.0, 2.0, 5.0, 10.0]),
+                    position=None,
+                ))
+            nodes[item_no] = GraphNode(
+                item_no=item_no,
+                version_code="V1",
+                is_phantom=False,
+                lines=tuple(lines),
+            )
+
+    return BOMGraph("benchmark", 0, nodes, graph_items)
+
+
+def timed(fn):
+    """Run fn and return (result, seconds)"""
+    start = time.perf_counter()
+    result = fn()
+    return result, time.perf_counter() - start
+
+
+def dfs_totals(graph: BOMGraph, demands: dict) -> dict:
+    """Sum of DFS consolidated totals per demanded item"""
+    service = BOMExplosionService(graph.tenant_id, graph=graph)
+    totals = {}
+    for item_no, quantity in demands.items():
+        result = service.explode(item_no, quantity)
+        for component_no, component in result.consolidated_components.items():
+            totals[component_no] = totals.get(component_no, 0.0) + component.total_quantity
+    return totals
+
+
+def max_relative_difference(expected: dict, actual: dict) -> float:
+    """Largest relative difference between two totals maps (inf if keys differ)"""
+    if set(expected) != set(actual):
+        return float("inf")
+    return max(
+        (abs(expected[k] - actual[k]) / max(1.0, abs(expected[k])) for k in expected),
+        default=0.0,
+    )
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--items", type=int, default=10000)
+    parser.add_argument("--levels", type=int, default=6)
+    parser.add_argument("--fanout", type=int, default=4)
+    parser.add_argument("--roots", type=int, default=50)
+    parser.add_argument("--seed", type=int, default=42)
+    args = parser.parse_args()
+
+    graph = generate_forest(args.items, args.levels, args.fanout, args.seed)
+    finished = [item_no for item_no in graph.nodes if item_no.startswith("L0-")]
+    rng = random.Random(args.seed)
+    demands = {item_no: float(rng.randint(1, 20)) for item_no in finished[:args.roots]}
+    lines = sum(len(node.lines) for node in graph.nodes.values())
+
+    print("=" * 60)
+    print("BOM REQUIREMENT BENCHMARK")
+    print("=" * 60)
+    print(f"Items: {len(graph.items)}  BOMs: {len(graph.nodes)}  Lines: {lines}")
+    print(f"Levels: {args.levels}  Demanded items: {len(demands)}")
+    print()
+
+    expected, dfs_seconds = timed(lambda: dfs_totals(graph, demands))
+    print(f"dfs     {dfs_seconds * 1000:10.1f} ms  ({len(expected)} components)")
+
+    service = BOMExplosionService(graph.tenant_id, graph=graph)
+    level, level_seconds = timed(lambda: service.consolidated_requirements(demands))
+    print(f"level   {level_seconds * 1000:10.1f} ms  "
+          f"(x{dfs_seconds / level_seconds:.1f}, max rel diff {max_relative_difference(expected, level):.2e})")
+
+    matrix, first_seconds = timed(lambda: service.consolidated_requirements(demands, engine="matrix"))
+    matrix, matrix_seconds = timed(lambda: service.consolidated_requirements(demands, engine="matrix"))
+    print(f"matrix  {matrix_seconds * 1000:10.1f} ms  "
+          f"(x{dfs_seconds / matrix_seconds:.1f}, max rel diff {max_relative_difference(expected, matrix):.2e})")
+    print(f"        {first_seconds * 1000:10.1f} ms  first call, including matrix build")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,174 @@
+# backend/scripts/benchmark_scheduler.py
+"""
+Benchmark the finite-capacity scheduler on generated production orders.
+
+Generates --orders released orders with 3-8 routing operations each over
+--work-centers work centers (random capacity, efficiency, queue/wait/move
+times and send-ahead quantities; every fifth work center works a two-shift
+Mon-Fri calendar with holidays instead; no database needed), schedules
+them forward and backward with FiniteScheduler and checks that:
+- no resource runs two operations at the same time
+- operations of an order follow the routing sequence (forward, without send-ahead)
+- every operation starts inside a working window of its resource
+
+Exits with status 1 if a check fails or a run takes longer than --budget
+seconds (default 1.0).
+
+Usage:
+    python scripts/benchmark_scheduler.py [--orders 1000] [--work-centers 50]
+        [--runs 5] [--budget 1.0] [--seed 42]
+"""
+
+import argparse
+import os
+import random
+import sys
+import time
+from datetime import date, timedelta
+
+# Add backend to path
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from services.production.capacity_calendar import CalendarRules, CapacityTimeline, ShiftRule
+from services.production.scheduler import MINUTES_PER_DAY, FiniteScheduler, Job, Operation, Resource
+
+
+# Days the calendar timeline reaches back before the schedule origin (backward scheduling)
+LOOKBACK_DAYS = 365
+
+
+def two_shift_timeline(rng, start: date, days: int = 1100) -> CapacityTimeline:
+    """06:00-14:00 and 14:00-22:00 Mon-Fri with ~15 random holidays"""
+    weekdays = frozenset(range(5))
+    rules = CalendarRules(
+        code="2-SHIFT",
+        shifts=(ShiftRule("EARLY", 360.0, 840.0, weekdays), ShiftRule("LATE", 840.0, 1320.0, weekdays)),
+        holidays=frozenset(start + timedelta(days=rng.randrange(days)) for _ in range(15)),
+        exceptions={},
+    )
+    return CapacityTimeline(rules, start, days)
+
+
+def generate(orders: int, work_centers: int, seed: int):
+    """Resources and a function building fresh jobs (schedule() mutates them)"""
+    rng = random.Random(seed)
+    timeline = two_shift_timeline(rng, date(2025, 1, 1))
+    resources = {
+        f"WC{i:03d}": Resource(
+            f"WC{i:03d}",
+            capacity=rng.choice([480.0, 960.0, 1440.0]),
+            efficiency_pct=rng.uniform(70.0, 120.0),
+            queue_time=rng.choice([0.0, 15.0, 60.0]),
+            timeline=timeline if i % 5 == 0 else None,
+            shift=LOOKBACK_DAYS * MINUTES_PER_DAY,
+        )
+        for i in range(work_centers)
+    }
+    codes = list(resources)
+
+    specs = []
+    for n in range(orders):
+        quantity = float(rng.randint(1, 200))
+        operations = []
+        for k in range(rng.randint(3, 8)):
+            operations.append(dict(
+                operation_no=(k + 1) * 10,
+                resource=rng.choice(codes),
+                setup_time=rng.uniform(0.0, 60.0),
+                run_time=rng.uniform(0.1, 3.0) * quantity,
+                quantity=quantity,
+                wait_time=rng.choice([0.0, 0.0, 30.0]),
+                move_time=rng.choice([0.0, 10.0, 120.0]),
+                send_ahead_quantity=rng.choice([0.0, 0.0, 0.0, quantity / 4]),
+            ))
+        release = rng.uniform(0.0, 10 * MINUTES_PER_DAY)
+        specs.append(dict(
+            order_no=f"PO-{n:05d}",
+            priority=rng.randint(0, 3),
+            release=release,
+            due=release + rng.uniform(5, 60) * MINUTES_PER_DAY,
+            operations=operations,
+        ))
+
+    def jobs():
+        return [
+            Job(
+                order_no=spec["order_no"],
+                priority=spec["priority"],
+                release=spec["release"],
+                due=spec["due"],
+                operations=[Operation(**op) for op in spec["operations"]],
+            )
+            for spec in specs
+        ]
+
+    return resources, jobs
+
+
+def check(resources, jobs, direction: str) -> list:
+    """Schedule invariants; returns the violations found"""
+    problems = []
+    by_resource = {}
+    for job in jobs:
+        if job.error:
+            problems.append(f"{job.order_no}: {job.error}")
+            continue
+        for op in job.operations:
+            by_resource.setdefault(op.resource, []).append((op.start, op.end, job.order_no))
+            if resources[op.resource].next_start(op.start) > op.start + 1e-6:
+                problems.append(f"{job.order_no}/{op.operation_no} starts outside the working window")
+        if direction == "forward":
+            for prev, op in zip(job.operations, job.operations[1:]):
+                if not prev.send_ahead_quantity and op.start < prev.end + prev.move_time - 1e-6:
+                    problems.append(f"{job.order_no}/{op.operation_no} starts before its predecessor ends")
+    for code, slots in by_resource.items():
+        slots.sort()
+        for (s1, e1, o1), (s2, e2, o2) in zip(slots, slots[1:]):
+            if s2 < e1 - 1e-6:
+                problems.append(f"{code}: {o1} and {o2} overlap")
+    return problems
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--orders", type=int, default=1000)
+    parser.add_argument("--work-centers", type=int, default=50)
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--budget", type=float, default=1.0)
+    parser.add_argument("--seed", type=int, default=42)
+    args = parser.parse_args()
+
+    resources, make_jobs = generate(args.orders, args.work_centers, args.seed)
+    scheduler = FiniteScheduler(resources)
+    operations = sum(len(job.operations) for job in make_jobs())
+
+    print("=" * 60)
+    print("FINITE-CAPACITY SCHEDULER")
+    print("=" * 60)
+    print(f"Orders: {args.orders}  Work centers: {args.work_centers}  Operations: {operations}")
+    print()
+
+    failed = False
+    for direction in ("forward", "backward"):
+        timings = []
+        for _ in range(args.runs):
+            jobs = make_jobs()
+            started = time.perf_counter()
+            scheduler.schedule(jobs, direction)
+            timings.append(time.perf_counter() - started)
+
+        problems = check(resources, jobs, direction)
+        late = sum(1 for job in jobs if job.late)
+        worst = max(timings)
+        ok = worst <= args.budget and not problems
+        failed |= not ok
+        print(f"{direction:9s} best {min(timings) * 1000:8.1f} ms  worst {worst * 1000:8.1f} ms  "
+              f"late {late:5d}  {'OK' if ok else 'FAIL'}")
+        for problem in problems[:10]:
+            print(f"  ⚠️  {problem}")
+
+    sys.exit(1 if failed else 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,35 @@
+# backend/scripts/rebuild_where_used_index.py
+"""
+Rebuild the BOM where-used index (production_bom_where_used).
+
+Run once after deploying the index, and after BOM imports or bulk changes
+made directly in the database; BOM save/certify/delete through the models
+keep it up to date otherwise.
+
+Usage:
+    python scripts/rebuild_where_used_index.py [tenant_id ...]
+"""
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from mongoengine import connect
+from services.production.where_used import rebuild_where_used_index
+
+
+def main():
+    mongo_uri = os.getenv("MONGO_URI", "mongodb://localhost:27017/vivae_dental_erp")
+    connect(host=mongo_uri)
+
+    tenant_ids = sys.argv[1:]
+    if not tenant_ids:
+        print(f"All tenants: {rebuild_where_used_index()} entries")
+        return
+
+    for tenant_id in tenant_ids:
+        print(f"{tenant_id}: {rebuild_where_used_index(tenant_id)} entries")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,38 @@
+# backend/scripts/recalculate_low_level_codes.py
+"""
+Recalculate Item low-level codes (LLC) for every laboratory.
+
+Run as a scheduled job (e.g. nightly) to catch BOM changes made outside the
+API; certify/close through the API already schedule a recalculation.
+
+Usage:
+    python scripts/recalculate_low_level_codes.py [tenant_id ...]
+"""
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from mongoengine import connect
+from models.laboratory import Laboratory
+from services.production.low_level_code import recalculate_low_level_codes
+
+
+def main():
+    mongo_uri = os.getenv("MONGO_URI", "mongodb://localhost:27017/vivae_dental_erp")
+    connect(host=mongo_uri)
+
+    tenant_ids = sys.argv[1:] or [str(lab.id) for lab in Laboratory.objects.only("id")]
+
+    for tenant_id in tenant_ids:
+        summary = recalculate_low_level_codes(tenant_id)
+        print(
+            f"{tenant_id}: {summary['items']} item(s), {summary['changed']} changed, "
+            f"max level {summary['max_level']}"
+        )
+        if summary["cyclic"]:
+            print(f"  ⚠️  BOM cycle, not ordered: {', '.join(summary['cyclic'])}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,43 @@
+# backend/scripts/reconcile_item_balances.py
+"""
+Reconcile the item_balances snapshot against item_ledger_entries.
+
+Run nightly. Balances are re-derived from the ledger with one grouped
+aggregate per tenant; drift is printed and corrected (unless --dry-run).
+Exits with status 1 when drift was found, so the scheduler can alert.
+
+Usage:
+    python scripts/reconcile_item_balances.py [--dry-run] [tenant_id ...]
+"""
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app import app
+from services.item_balance_service import ItemBalanceService
+
+
+def main():
+    args = sys.argv[1:]
+    dry_run = "--dry-run" in args
+    tenant_ids = [a for a in args if a != "--dry-run"] or [None]
+
+    drifted = 0
+    with app.app_context():
+        for tenant_id in tenant_ids:
+            for report in ItemBalanceService.reconcile(tenant_id, fix=not dry_run):
+                drifted += report["drifted"]
+                status = "fixed" if report["fixed"] else ("drift" if report["drifted"] else "ok")
+                print(f"{report['tenant_id']}: {report['balances']} balance(s), "
+                      f"{report['drifted']} drifted [{status}]")
+                for row in report["drift"]:
+                    print(f"  ⚠️  {row['item_no']} @ {row['location_code'] or '-'}: "
+                          f"balance {row['balance']} vs ledger {row['ledger']} "
+                          f"({row['difference']:+})")
+
+    sys.exit(1 if drifted else 0)
+
+
+if __name__ == "__main__":
+    main()
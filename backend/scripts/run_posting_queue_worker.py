@@ -0,0 +1,56 @@
+# backend/scripts/run_posting_queue_worker.py
+"""
+Run the posting queue writer as its own process.
+
+Drains the posting_queue table (asynchronous journal postings) with a pool
+of worker threads until interrupted. With --once the queue is drained in
+the foreground and the script exits (cron/backfill use).
+
+Usage:
+    python scripts/run_posting_queue_worker.py [--workers 4] [--batch-size 200] [--once]
+"""
+import argparse
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+# This process runs its own pool; don't let create_app() start another one
+os.environ["POSTING_QUEUE_WORKERS"] = "0"
+
+from app import app
+from services.posting_queue import DEFAULT_BATCH_SIZE, PostingQueue, PostingQueueWorker, writer_stats
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--workers", type=int, default=4)
+    parser.add_argument("--batch-size", type=int, default=DEFAULT_BATCH_SIZE)
+    parser.add_argument("--once", action="store_true", help="drain the queue and exit")
+    args = parser.parse_args()
+
+    worker = PostingQueueWorker(app, workers=args.workers, batch_size=args.batch_size)
+
+    if args.once:
+        processed = worker.run_until_empty()
+        print(f"Processed {processed} queued posting(s)")
+        return
+
+    worker.start()
+    print(f"Posting queue writer running with {worker.workers} worker(s), Ctrl+C to stop")
+    try:
+        while True:
+            time.sleep(60)
+            with app.app_context():
+                metrics = PostingQueue.metrics(None)
+            writer = writer_stats.to_dict()
+            print(f"pending {metrics['pending']}  lag {metrics['lag_seconds']:.1f}s  "
+                  f"posted {writer['posted']}  failed {writer['failed']}")
+    except KeyboardInterrupt:
+        print("Stopping...")
+        worker.stop()
+
+
+if __name__ == "__main__":
+    main()
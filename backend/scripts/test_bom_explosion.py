@@ -8,6 +8,11 @@ Tests multi-level explosion with:
 3. Cycle detection (circular references)
 4. Component consolidation (same component in multiple sub-assemblies)
 5. Scrap calculation in cascade
+6. Level-prefetch mode returns the same result as DFS with fewer queries
+7. Memoized mode consolidates to the same totals as DFS
+8. Availability check answers for every component (unknown without the
+   SQL item ledger)
+9. Streamed components equal the non-streamed components
 """
 
 import os
@@ -20,7 +25,7 @@ sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')
 from mongoengine import connect
 from models.production import BOM, BOMLine, Item
 from models.laboratory import Laboratory
-from services.production.bom_explosion import explode_bom
+from services.production.bom_explosion import explode_bom, stream_bom
 
 # ANSI color codes
 GREEN = '\033[92m'
@@ -413,6 +418,98 @@ def test_cycle_detection(tenant_id: str):
     print_colored("✅ TEST 3 PASSED (Cycle detected!)", GREEN)
 
 
+def test_level_mode_equivalence(tenant_id: str):
+    """Test 4: Level-prefetch mode matches DFS mode"""
+    print("\nTEST 4: Level-Prefetch Mode Equivalence")
+    print("=" * 60)
+    
+    for item_no in ("FG-TEST-001", "FG-COMPLEX-001", "FG-CYCLE-001"):
+        dfs = explode_bom(tenant_id, item_no, quantity=5.0, mode="dfs").to_dict()
+        level = explode_bom(tenant_id, item_no, quantity=5.0, mode="level").to_dict()
+        
+        dfs_queries = dfs.pop("query_count")
+        level_queries = level.pop("query_count")
+        print(f"  {item_no}: dfs={dfs_queries} queries, level={level_queries} queries")
+        
+        assert dfs == level, f"{item_no}: level mode result differs from dfs"
+        assert level_queries <= dfs_queries, f"{item_no}: level mode used more queries"
+    
+    print_colored("✅ TEST 4 PASSED (Same result, fewer round trips)", GREEN)
+
+
+def test_memo_mode_consolidation(tenant_id: str):
+    """Test 5: Memoized (per-unit vector) mode matches DFS consolidation"""
+    print("\nTEST 5: Memoized Mode Consolidation")
+    print("=" * 60)
+    
+    for item_no in ("FG-TEST-001", "FG-COMPLEX-001"):
+        dfs = explode_bom(tenant_id, item_no, quantity=5.0, mode="dfs")
+        memo = explode_bom(tenant_id, item_no, quantity=5.0, mode="memo")
+        
+        assert list(dfs.consolidated_components) == list(memo.consolidated_components), \
+            f"{item_no}: consolidated components differ"
+        for comp_no, comp in dfs.consolidated_components.items():
+            memo_comp = memo.consolidated_components[comp_no]
+            print(f"  {comp_no}: dfs={comp.total_quantity:.4f} memo={memo_comp.total_quantity:.4f}")
+            assert abs(comp.total_quantity - memo_comp.total_quantity) < 1e-6, f"{comp_no} total differs"
+            assert comp.source_boms == memo_comp.source_boms, f"{comp_no} sources differ"
+        assert dfs.max_level == memo.max_level, f"{item_no}: max_level differs"
+    
+    print_colored("✅ TEST 5 PASSED (Per-unit vectors consolidate correctly)", GREEN)
+
+
+def test_availability_check(tenant_id: str):
+    """Test 6: Explosion with availability check"""
+    print("\nTEST 6: Availability Check")
+    print("=" * 60)
+    
+    result = explode_bom(tenant_id, "FG-COMPLEX-001", quantity=5.0, check_availability=True)
+    
+    for item_no, info in result.availability.items():
+        print(f"  {item_no}: available={info['available']} required={info['required']:.2f} ({info['reason']})")
+    
+    assert result.status == "success", "Should succeed"
+    assert set(result.availability) == set(result.consolidated_components), "Should check every component"
+    for item_no, info in result.availability.items():
+        required = result.consolidated_components[item_no].total_quantity
+        assert abs(info["required"] - required) < 1e-6, f"{item_no}: required incorrect"
+        if info["available"] is None:
+            assert info["shortage"] is None, f"{item_no}: unknown availability has no shortage"
+    
+    print_colored("✅ TEST 6 PASSED", GREEN)
+
+
+def test_stream_equivalence(tenant_id: str):
+    """Test 7: Streamed rows match explode_bom().components"""
+    print("\nTEST 7: Stream Equivalence")
+    print("=" * 60)
+    
+    for mode in ("dfs", "level", "cached"):
+        for item_no in ("FG-TEST-001", "FG-COMPLEX-001", "FG-CYCLE-001"):
+            # Serialise as the NDJSON endpoint does, while the stream runs
+            stream = stream_bom(tenant_id, item_no, 5.0, mode=mode)
+            streamed = [component.to_dict() for component in stream]
+            summary = stream.result().to_dict()
+            
+            result = explode_bom(tenant_id, item_no, quantity=5.0, mode=mode)
+            expected = [component.to_dict() for component in result.components]
+            print(f"  {mode:6} {item_no}: {len(streamed)} streamed, {len(expected)} components")
+            
+            assert streamed == expected, f"{mode} {item_no}: streamed components differ"
+            consolidated = result.to_dict()
+            for data in (summary, consolidated):
+                data.pop("components")
+                data.pop("query_count")
+            assert summary == consolidated, f"{mode} {item_no}: stream result differs"
+    
+    # The repeated screw keeps its per-line quantity in the rows
+    screws = [c for c in explode_bom(tenant_id, "FG-COMPLEX-001", quantity=5.0).components
+              if c.item_no == "RM-SCREW-001"]
+    assert len(screws) == 2 and all(len(c.source_boms) == 1 for c in screws), "Rows should be per BOM line"
+    
+    print_colored("✅ TEST 7 PASSED", GREEN)
+
+
 def main():
     """Run all tests"""
     print("\n" + "=" * 60)
@@ -432,6 +529,10 @@ def main():
         test_simple_explosion(tenant_id)
         test_multi_level_explosion(tenant_id)
         test_cycle_detection(tenant_id)
+        test_level_mode_equivalence(tenant_id)
+        test_memo_mode_consolidation(tenant_id)
+        test_availability_check(tenant_id)
+        test_stream_equivalence(tenant_id)
         
         print_colored("\n" + "=" * 60, GREEN)
         print_colored("ALL TESTS PASSED!", GREEN)
@@ -0,0 +1,276 @@
+# backend/scripts/test_mrp_planning.py
+"""
+MRP Planning Run Tests
+
+Runs services.production.mrp.run_mrp end to end against MongoDB:
+1. Regenerative run plans dependent demand through the BOM
+2. Net change replans the items touched since the last run
+3. The run's pegs link the sales line to the supplies at every level
+4. An invoiced sales order is no longer demand
+
+Uses its own laboratory (MRP Test Laboratory), so the planning results of
+real tenants are not replaced. Without the SQL item ledger on-hand is
+zero, which is what the fresh test items have anyway.
+"""
+
+import os
+import sys
+from datetime import date, datetime, timedelta
+
+# Add backend to path
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from mongoengine import connect
+from models.client import Client
+from models.laboratory import Laboratory
+from models.order import Order
+from models.production import BOM, BOMLine, Item, PeggingEntry, PlanningRun, PlanningSuggestion, ProductionOrder
+from routes.sales import _calc_total
+from services.production.mrp import run_mrp
+from services.production.pegging import pegging_cache, planned_order_id, sales_line_id
+
+# ANSI color codes
+GREEN = '\033[92m'
+RED = '\033[91m'
+YELLOW = '\033[93m'
+BLUE = '\033[94m'
+RESET = '\033[0m'
+
+TEST_LAB = "MRP Test Laboratory"
+
+TODAY = date(2025, 3, 3)
+SHIPMENT_DATE = TODAY + timedelta(days=30)
+
+
+def print_colored(message: str, color: str):
+    """Print colored message"""
+    print(f"{color}{message}{RESET}")
+
+
+def setup_test_data():
+    """
+    Create test data in the test laboratory:
+
+    FG-MRP-001 (Finished Good, lead time 2 days)
+    └── RM-MRP-001 (Raw Material, lead time 5 days) x 2.0
+
+    Sales order SO-MRP-001: 10 x FG-MRP-001, shipment in 30 days
+    """
+    print_colored("\nSetting up test data...", BLUE)
+
+    lab = Laboratory.objects(name=TEST_LAB).first()
+    if not lab:
+        lab = Laboratory(name=TEST_LAB).save()
+    tenant_id = str(lab.id)
+
+    # Clean previous runs of this script
+    for model in (Item, BOM, ProductionOrder, PlanningRun, PlanningSuggestion, PeggingEntry):
+        model.objects(tenant_id=tenant_id).delete()
+    Order.objects(lab=lab).delete()
+    Client.objects(lab=lab).delete()
+
+    for item_no, description, item_type, lead_time in (
+        ("FG-MRP-001", "MRP Test FG", "manufactured", 2),
+        ("RM-MRP-001", "MRP Test RM", "purchased", 5),
+    ):
+        Item(
+            tenant_id=tenant_id,
+            item_no=item_no,
+            description=description,
+            item_type=item_type,
+            base_uom="PCS",
+            lead_time_days=lead_time,
+            created_at=datetime.utcnow(),
+            updated_at=datetime.utcnow(),
+        ).save()
+
+    BOM(
+        tenant_id=tenant_id,
+        item_no="FG-MRP-001",
+        version_code="V1",
+        status="Certified",
+        base_uom="PCS",
+        lines=[
+            BOMLine(
+                line_no=10,
+                component_item_no="RM-MRP-001",
+                description="MRP Test RM",
+                quantity_per=2.0,
+                uom_code="PCS",
+                scrap_pct=0.0,
+                component_type="Item",
+                position="MAIN"
+            ),
+        ],
+        created_at=datetime.utcnow(),
+        updated_at=datetime.utcnow(),
+    ).save()
+
+    # Lines as the sales routes store them
+    client = Client(lab=lab, code="MRP-TEST", name="MRP Test Client").save()
+    total, lines = _calc_total([{"item_no": "FG-MRP-001", "description": "MRP Test FG", "qty": 10, "price": 5,
+                                 "shipment_date": SHIPMENT_DATE.isoformat()}])
+    Order(
+        lab=lab,
+        number="SO-MRP-001",
+        date=TODAY,
+        client=client,
+        client_code=client.code,
+        lines=lines,
+        total=total,
+    ).save()
+
+    print_colored("✅ Created 2 items, 1 BOM and 1 sales order", GREEN)
+    return tenant_id
+
+
+def suggestions_by_item(tenant_id: str) -> dict:
+    return {
+        suggestion.item_no: suggestion
+        for suggestion in PlanningSuggestion.objects(tenant_id=tenant_id)
+    }
+
+
+def test_regenerative_run(tenant_id: str):
+    """Test 1: Regenerative run plans the FG and its component"""
+    print("\nTEST 1: Regenerative Run")
+    print("=" * 60)
+
+    run = run_mrp(tenant_id, mode="regenerative", user_email="mrp-test", today=TODAY)
+    print(f"Status: {run['status']}  items: {run['items_planned']}  suggestions: {run['suggestions']}")
+    if run["message"]:
+        print_colored(f"  {run['message']}", YELLOW)
+
+    assert run["status"] == "Completed", f"Run should complete, got {run['status']}: {run['message']}"
+    assert run["mode"] == "regenerative", "Should run regenerative"
+    assert run["production_suggestions"] == 1, "Should suggest 1 production order"
+    assert run["purchase_suggestions"] == 1, "Should suggest 1 purchase"
+
+    suggestions = suggestions_by_item(tenant_id)
+    fg = suggestions["FG-MRP-001"]
+    rm = suggestions["RM-MRP-001"]
+    print(f"  {fg.item_no}: {fg.suggestion_type} {fg.quantity} due {fg.due_date} start {fg.start_date}")
+    print(f"  {rm.item_no}: {rm.suggestion_type} {rm.quantity} due {rm.due_date} start {rm.start_date}")
+
+    assert fg.suggestion_type == "Production" and abs(fg.quantity - 10.0) < 1e-6, "FG should be produced x10"
+    assert fg.due_date == SHIPMENT_DATE, f"FG due date incorrect: {fg.due_date}"
+    assert fg.start_date == SHIPMENT_DATE - timedelta(days=2), f"FG start date incorrect: {fg.start_date}"
+    assert rm.suggestion_type == "Purchase" and abs(rm.quantity - 20.0) < 1e-6, "RM should be purchased x20"
+    assert rm.due_date == fg.start_date, "RM should be due when the FG order starts"
+
+    print_colored("✅ TEST 1 PASSED", GREEN)
+
+
+def test_net_change_run(tenant_id: str):
+    """Test 2: Net change replans after a sales order change"""
+    print("\nTEST 2: Net Change Run")
+    print("=" * 60)
+
+    order = Order.objects(lab=tenant_id, number="SO-MRP-001").first()
+    order.lines[0]["qty"] = 15
+    order.save()
+
+    run = run_mrp(tenant_id, mode="net_change", user_email="mrp-test", today=TODAY)
+    print(f"Status: {run['status']}  items: {run['items_planned']}  suggestions: {run['suggestions']}")
+
+    assert run["status"] == "Completed", f"Run should complete, got {run['status']}: {run['message']}"
+    assert run["mode"] == "net_change", "Should run net change after a completed run"
+    assert run["items_planned"] == 2, "Should replan the FG and its component"
+
+    suggestions = suggestions_by_item(tenant_id)
+    assert PlanningSuggestion.objects(tenant_id=tenant_id).count() == 2, "Old suggestions should be replaced"
+    assert abs(suggestions["FG-MRP-001"].quantity - 15.0) < 1e-6, "FG should be produced x15"
+    assert abs(suggestions["RM-MRP-001"].quantity - 30.0) < 1e-6, "RM should be purchased x30"
+
+    print_colored("✅ TEST 2 PASSED", GREEN)
+
+
+def test_pegging(tenant_id: str):
+    """Test 3: Pegging of the last run (as served by the /pegging endpoints)"""
+    print("\nTEST 3: Pegging")
+    print("=" * 60)
+
+    sales_line = sales_line_id("SO-MRP-001", 0)
+    fg_plan = planned_order_id("FG-MRP-001", SHIPMENT_DATE)
+    rm_plan = planned_order_id("RM-MRP-001", SHIPMENT_DATE - timedelta(days=2))
+
+    pegging_cache.invalidate(tenant_id)
+    index = pegging_cache.get(tenant_id)
+    print(f"Pegs: {len(index)}")
+    for row in index.downstream(sales_line):
+        print(f"  level {row['level']}: {row['node']} x {row['quantity']:.2f}")
+
+    assert PeggingEntry.objects(tenant_id=tenant_id).count() == len(index) == 2, "Should store 2 pegs"
+
+    pegs = index.pegs(sales_line)
+    assert [(peg["supply"], peg["quantity"]) for peg in pegs["supplied_by"]] == [(fg_plan, 15.0)], \
+        f"Sales line should be covered by the FG planned order: {pegs['supplied_by']}"
+
+    supplies = {(row["node"], row["level"]): row["quantity"] for row in index.downstream(sales_line)}
+    assert supplies == {(fg_plan, 1): 15.0, (rm_plan, 2): 30.0}, f"Supplies incorrect: {supplies}"
+
+    drivers = index.drivers(rm_plan)
+    assert drivers and all(row["node"].startswith("SO:") for row in drivers), \
+        f"RM purchase should be driven by a sales order line, not a planning node: {drivers}"
+    assert [(row["node"], row["quantity"]) for row in drivers] == [(sales_line, 30.0)], \
+        f"RM purchase should be driven by the sales line: {drivers}"
+
+    print_colored("✅ TEST 3 PASSED", GREEN)
+
+
+def test_invoiced_order(tenant_id: str):
+    """Test 4: Net change drops the demand of an invoiced sales order"""
+    print("\nTEST 4: Invoiced Sales Order")
+    print("=" * 60)
+
+    order = Order.objects(lab=tenant_id, number="SO-MRP-001").first()
+    order.status = "invoiced"
+    order.save()
+
+    run = run_mrp(tenant_id, mode="net_change", user_email="mrp-test", today=TODAY)
+    print(f"Status: {run['status']}  items: {run['items_planned']}  suggestions: {run['suggestions']}")
+
+    assert run["status"] == "Completed", f"Run should complete, got {run['status']}: {run['message']}"
+    assert run["items_planned"] == 2, "Should replan the items of the invoiced order"
+    assert PlanningSuggestion.objects(tenant_id=tenant_id).count() == 0, "Invoiced order should not be planned"
+
+    print_colored("✅ TEST 4 PASSED", GREEN)
+
+
+def main():
+    """Run all tests"""
+    print("\n" + "=" * 60)
+    print("MRP PLANNING RUN - TEST SUITE")
+    print("=" * 60)
+
+    # Connect to MongoDB
+    mongo_uri = os.getenv("MONGO_URI", "mongodb://localhost:27017/vivae_dental_erp")
+    connect(host=mongo_uri)
+    print_colored(f"✅ Connected to MongoDB: {mongo_uri}", GREEN)
+
+    # Setup
+    tenant_id = setup_test_data()
+
+    # Run tests
+    try:
+        test_regenerative_run(tenant_id)
+        test_net_change_run(tenant_id)
+        test_pegging(tenant_id)
+        test_invoiced_order(tenant_id)
+
+        print_colored("\n" + "=" * 60, GREEN)
+        print_colored("ALL TESTS PASSED!", GREEN)
+        print_colored("=" * 60, GREEN)
+
+    except AssertionError as e:
+        print_colored(f"\n❌ TEST FAILED: {str(e)}", RED)
+        sys.exit(1)
+    except Exception as e:
+        print_colored(f"\n❌ UNEXPECTED ERROR: {str(e)}", RED)
+        import traceback
+        traceback.print_exc()
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,277 @@
+# backend/scripts/test_production_order_explosion.py
+"""
+Multi-Level Production Order Explosion Tests
+
+Creates order trees with services.production.order_explosion against MongoDB:
+1. multi_level: child order per sub-assembly, phantom flattened into the parent
+2. Child order lines equal a standalone order for the same quantity (scrap
+   of the parent levels is not applied again)
+3. flatten: one order with the leaf components of the whole structure,
+   the same totals as the leaf lines of the multi-level tree
+4. A tree whose child order number is taken is not inserted at all
+
+Uses its own laboratory (Order Explosion Test Laboratory).
+"""
+
+import os
+import sys
+from datetime import date, datetime
+
+# Add backend to path
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from mongoengine import connect
+from mongoengine.errors import NotUniqueError
+from models.laboratory import Laboratory
+from models.production import BOM, BOMLine, Item, ProductionOrder
+from services.production.bom_graph import bom_graph_cache
+from services.production.order_explosion import create_multilevel_orders
+from services.production.order_release import explode_bom as explode_order_lines
+
+# ANSI color codes
+GREEN = '\033[92m'
+RED = '\033[91m'
+YELLOW = '\033[93m'
+BLUE = '\033[94m'
+RESET = '\033[0m'
+
+TEST_LAB = "Order Explosion Test Laboratory"
+
+QUANTITY = 5.0
+
+
+def print_colored(message: str, color: str):
+    """Print colored message"""
+    print(f"{color}{message}{RESET}")
+
+
+def setup_test_data():
+    """
+    Create test BOMs in the test laboratory:
+
+    FG-OX-001 (Finished Good)
+    ├── SUB-OX-001 (Sub-Assembly) x 2.0 (10% scrap)
+    │   └── RM-OX-001 x 3.0
+    └── PH-OX-001 (Phantom) x 1.0
+        ├── SUB-OX-001 x 1.0 (25% scrap)   ← same sub-assembly via the phantom
+        └── RM-OX-002 x 2.0
+    """
+    print_colored("\nSetting up test data...", BLUE)
+
+    lab = Laboratory.objects(name=TEST_LAB).first()
+    if not lab:
+        lab = Laboratory(name=TEST_LAB).save()
+    tenant_id = str(lab.id)
+
+    for model in (Item, BOM, ProductionOrder):
+        model.objects(tenant_id=tenant_id).delete()
+
+    for item_no, item_type, phantom in (
+        ("FG-OX-001", "manufactured", False),
+        ("SUB-OX-001", "manufactured", False),
+        ("PH-OX-001", "manufactured", True),
+        ("RM-OX-001", "purchased", False),
+        ("RM-OX-002", "purchased", False),
+    ):
+        Item(
+            tenant_id=tenant_id,
+            item_no=item_no,
+            description=f"Order Explosion Test {item_no}",
+            item_type=item_type,
+            base_uom="PCS",
+            phantom_bom=phantom,
+            created_at=datetime.utcnow(),
+            updated_at=datetime.utcnow(),
+        ).save()
+
+    for item_no, lines in (
+        ("FG-OX-001", [("SUB-OX-001", 2.0, 10.0), ("PH-OX-001", 1.0, 0.0)]),
+        ("SUB-OX-001", [("RM-OX-001", 3.0, 0.0)]),
+        ("PH-OX-001", [("SUB-OX-001", 1.0, 25.0), ("RM-OX-002", 2.0, 0.0)]),
+    ):
+        BOM(
+            tenant_id=tenant_id,
+            item_no=item_no,
+            version_code="V1",
+            status="Certified",
+            base_uom="PCS",
+            lines=[
+                BOMLine(
+                    line_no=10 * (i + 1),
+                    component_item_no=component_no,
+                    description=component_no,
+                    quantity_per=quantity_per,
+                    uom_code="PCS",
+                    scrap_pct=scrap_pct,
+                    component_type="Item",
+                    position="MAIN"
+                )
+                for i, (component_no, quantity_per, scrap_pct) in enumerate(lines)
+            ],
+            created_at=datetime.utcnow(),
+            updated_at=datetime.utcnow(),
+        ).save()
+
+    bom_graph_cache.invalidate(tenant_id)
+    print_colored("✅ Created 5 test items and 3 test BOMs", GREEN)
+    return tenant_id
+
+
+def create_orders(tenant_id: str, order_no: str, mode: str) -> list:
+    root = ProductionOrder(
+        tenant_id=tenant_id,
+        order_no=order_no,
+        item_no="FG-OX-001",
+        quantity=QUANTITY,
+        finished_quantity=0.0,
+        location_code="MAIN",
+        status="Planned",
+        due_date=date(2025, 6, 30),
+        created_by="order-explosion-test",
+        updated_by="order-explosion-test",
+    )
+    return create_multilevel_orders(tenant_id, root, mode=mode)
+
+
+def lines_of(order) -> dict:
+    return {line.component_item_no: line for line in order.lines}
+
+
+def test_multi_level(tenant_id: str):
+    """Test 1: Child order per sub-assembly, phantom flattened"""
+    print("\nTEST 1: Multi-Level Order Tree")
+    print("=" * 60)
+
+    orders = create_orders(tenant_id, "PO-OX-ML", "multi_level")
+    for order in orders:
+        print(f"  {order.order_no}: {order.item_no} x {order.quantity:.2f} (parent {order.parent_order_no})")
+        for line in order.lines:
+            print(f"    {line.component_item_no}: {line.expected_quantity:.4f} (per {line.quantity_per:.4f})")
+
+    assert [order.order_no for order in orders] == ["PO-OX-ML", "PO-OX-ML-01"], "Should create one child order"
+    root, child = orders
+    assert child.item_no == "SUB-OX-001" and child.parent_order_no == "PO-OX-ML", "Child should be the SUB order"
+
+    # SUB: 5 * 2 * 1.10 directly + 5 * 1 * 1.25 through the phantom
+    assert abs(child.quantity - 17.25) < 1e-6, f"SUB quantity incorrect: {child.quantity}"
+
+    root_lines = lines_of(root)
+    assert set(root_lines) == {"SUB-OX-001", "RM-OX-002"}, f"Root lines incorrect: {sorted(root_lines)}"
+    assert abs(root_lines["SUB-OX-001"].expected_quantity - 17.25) < 1e-6, "Root SUB line incorrect"
+    assert abs(root_lines["RM-OX-002"].expected_quantity - 10.0) < 1e-6, "Phantom component incorrect"
+    # Direct line keeps its BOM line number; the phantom's component is numbered on
+    assert (root_lines["SUB-OX-001"].line_no, root_lines["SUB-OX-001"].bom_line_no) == (10, 10), \
+        "Direct line should keep the BOM line number"
+    assert (root_lines["RM-OX-002"].line_no, root_lines["RM-OX-002"].bom_line_no) == (30, None), \
+        "Phantom component should be numbered after the BOM lines"
+    assert ProductionOrder.objects(tenant_id=tenant_id, parent_order_no="PO-OX-ML").count() == 1, \
+        "Child order should be stored"
+
+    print_colored("✅ TEST 1 PASSED", GREEN)
+
+
+def test_child_equals_standalone(tenant_id: str):
+    """Test 2: Child order lines equal a standalone order of the same quantity"""
+    print("\nTEST 2: Child Order Scrap")
+    print("=" * 60)
+
+    child = create_orders(tenant_id, "PO-OX-SA", "multi_level")[1]
+    bom = BOM.objects(tenant_id=tenant_id, item_no="SUB-OX-001", status="Certified").first()
+    standalone = {line.component_item_no: line for line in explode_order_lines(bom, child.quantity, "MAIN")}
+
+    for component_no, line in lines_of(child).items():
+        expected = standalone[component_no]
+        print(f"  {component_no}: child {line.expected_quantity:.4f}  standalone {expected.expected_quantity:.4f}")
+        assert abs(line.expected_quantity - expected.expected_quantity) < 1e-6, \
+            f"{component_no}: child order applies parent scrap again"
+        assert line.quantity_per == expected.quantity_per, f"{component_no}: quantity_per should be the BOM value"
+        assert (line.line_no, line.bom_line_no) == (expected.line_no, expected.bom_line_no), \
+            f"{component_no}: line numbers should be the BOM line's"
+    assert set(lines_of(child)) == set(standalone), "Child order should have the BOM's lines"
+
+    print_colored("✅ TEST 2 PASSED", GREEN)
+
+
+def test_flatten(tenant_id: str):
+    """Test 3: Flatten - one order with the leaf components"""
+    print("\nTEST 3: Flattened Order")
+    print("=" * 60)
+
+    orders = create_orders(tenant_id, "PO-OX-FL", "flatten")
+    assert len(orders) == 1, "Flatten should not create child orders"
+    lines = lines_of(orders[0])
+    for line in orders[0].lines:
+        print(f"  {line.component_item_no}: {line.expected_quantity:.4f}")
+
+    # RM-OX-001: 3 * 17.25 SUB; RM-OX-002: 5 * 1 * 2
+    assert set(lines) == {"RM-OX-001", "RM-OX-002"}, f"Flattened lines incorrect: {sorted(lines)}"
+    assert abs(lines["RM-OX-001"].expected_quantity - 51.75) < 1e-6, "RM-OX-001 incorrect"
+    assert abs(lines["RM-OX-002"].expected_quantity - 10.0) < 1e-6, "RM-OX-002 incorrect"
+
+    # Same totals as the leaf lines of the multi-level tree
+    leaves = {}
+    for order in create_orders(tenant_id, "PO-OX-FL-ML", "multi_level"):
+        for line in order.lines:
+            if line.component_item_no.startswith("RM-"):
+                leaves[line.component_item_no] = leaves.get(line.component_item_no, 0.0) + line.expected_quantity
+    for component_no, line in lines.items():
+        assert abs(line.expected_quantity - leaves[component_no]) < 1e-6, \
+            f"{component_no}: differs from the multi-level tree"
+
+    print_colored("✅ TEST 3 PASSED", GREEN)
+
+
+def test_taken_number(tenant_id: str):
+    """Test 4: A taken child order number leaves no part of the tree behind"""
+    print("\nTEST 4: Taken Order Number")
+    print("=" * 60)
+
+    create_orders(tenant_id, "PO-OX-DUP-01", "flatten")
+    try:
+        create_orders(tenant_id, "PO-OX-DUP", "multi_level")
+        raise AssertionError("Tree with a taken child number should not be created")
+    except NotUniqueError as e:
+        print(f"  Rejected: {e}")
+    assert not ProductionOrder.objects(tenant_id=tenant_id, order_no="PO-OX-DUP").count(), \
+        "Root order should not be left behind"
+
+    print_colored("✅ TEST 4 PASSED", GREEN)
+
+
+def main():
+    """Run all tests"""
+    print("\n" + "=" * 60)
+    print("MULTI-LEVEL ORDER EXPLOSION - TEST SUITE")
+    print("=" * 60)
+
+    # Connect to MongoDB
+    mongo_uri = os.getenv("MONGO_URI", "mongodb://localhost:27017/vivae_dental_erp")
+    connect(host=mongo_uri)
+    print_colored(f"✅ Connected to MongoDB: {mongo_uri}", GREEN)
+
+    # Setup
+    tenant_id = setup_test_data()
+
+    # Run tests
+    try:
+        test_multi_level(tenant_id)
+        test_child_equals_standalone(tenant_id)
+        test_flatten(tenant_id)
+        test_taken_number(tenant_id)
+
+        print_colored("\n" + "=" * 60, GREEN)
+        print_colored("ALL TESTS PASSED!", GREEN)
+        print_colored("=" * 60, GREEN)
+
+    except AssertionError as e:
+        print_colored(f"\n❌ TEST FAILED: {str(e)}", RED)
+        sys.exit(1)
+    except Exception as e:
+        print_colored(f"\n❌ UNEXPECTED ERROR: {str(e)}", RED)
+        import traceback
+        traceback.print_exc()
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,199 @@
+# backend/scripts/test_production_order_list.py
+"""
+Production Order List Tests
+
+Runs services.production.order_list.production_order_page against MongoDB:
+1. Search (q) is an anchored, case-sensitive prefix match on order_no or
+   item_no
+2. total, by_status and by_due_week count the filtered orders
+3. Cursor pages continue where the previous page ended
+
+Uses its own laboratory (Order List Test Laboratory).
+"""
+
+import os
+import sys
+from datetime import date
+
+# Add backend to path
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from mongoengine import connect
+from models.laboratory import Laboratory
+from models.production import ProductionOrder
+from services.production.order_list import production_order_page
+
+# ANSI color codes
+GREEN = '\033[92m'
+RED = '\033[91m'
+YELLOW = '\033[93m'
+BLUE = '\033[94m'
+RESET = '\033[0m'
+
+TEST_LAB = "Order List Test Laboratory"
+
+
+def print_colored(message: str, color: str):
+    """Print colored message"""
+    print(f"{color}{message}{RESET}")
+
+
+def setup_test_data():
+    """
+    Create test orders in the test laboratory:
+
+    PO-OL-001  FG-OL-CROWN   Planned       due 2025-06-02 (2025-W23)
+    PO-OL-002  FG-OL-CROWN   Released      due 2025-06-04 (2025-W23)
+    PO-OL-003  FG-OL-BRIDGE  Released      due 2025-06-11 (2025-W24)
+    XPO-OL-004 FG-OL-PO-OL   Firm Planned  due 2025-06-11 (2025-W24)
+    po-ol-005  FG-OL-BRIDGE  Planned       no due date
+    """
+    print_colored("\nSetting up test data...", BLUE)
+
+    lab = Laboratory.objects(name=TEST_LAB).first()
+    if not lab:
+        lab = Laboratory(name=TEST_LAB).save()
+    tenant_id = str(lab.id)
+
+    ProductionOrder.objects(tenant_id=tenant_id).delete()
+    for order_no, item_no, status, due_date in (
+        ("PO-OL-001", "FG-OL-CROWN", "Planned", date(2025, 6, 2)),
+        ("PO-OL-002", "FG-OL-CROWN", "Released", date(2025, 6, 4)),
+        ("PO-OL-003", "FG-OL-BRIDGE", "Released", date(2025, 6, 11)),
+        ("XPO-OL-004", "FG-OL-PO-OL", "Firm Planned", date(2025, 6, 11)),
+        ("po-ol-005", "FG-OL-BRIDGE", "Planned", None),
+    ):
+        ProductionOrder(
+            tenant_id=tenant_id,
+            order_no=order_no,
+            item_no=item_no,
+            quantity=1.0,
+            finished_quantity=0.0,
+            location_code="MAIN",
+            status=status,
+            due_date=due_date,
+            created_by="order-list-test",
+            updated_by="order-list-test",
+        ).save()
+
+    print_colored("✅ Created 5 test orders", GREEN)
+    return tenant_id
+
+
+def order_nos(page: dict) -> list:
+    return [order["order_no"] for order in page["items"]]
+
+
+def test_prefix_search(tenant_id: str):
+    """Test 1: Anchored, case-sensitive prefix search"""
+    print("\nTEST 1: Prefix Search")
+    print("=" * 60)
+
+    for q, expected in (
+        ("PO-OL", ["PO-OL-003", "PO-OL-002", "PO-OL-001"]),   # not XPO-OL-004, not po-ol-005
+        ("po-ol", ["po-ol-005"]),
+        ("FG-OL-BR", ["PO-OL-003", "po-ol-005"]),              # item_no prefix
+        ("OL-00", []),                                         # not anchored at the start
+        ("FG-OL-PO", ["XPO-OL-004"]),
+    ):
+        page = production_order_page(tenant_id, {"q": q})
+        print(f"  q={q!r}: {order_nos(page)}")
+        assert order_nos(page) == expected, f"q={q!r}: expected {expected}, got {order_nos(page)}"
+        assert page["total"] == len(expected), f"q={q!r}: total incorrect"
+
+    print_colored("✅ TEST 1 PASSED", GREEN)
+
+
+def test_facet_counts(tenant_id: str):
+    """Test 2: total, by_status and by_due_week of the filtered orders"""
+    print("\nTEST 2: Facet Counts")
+    print("=" * 60)
+
+    page = production_order_page(tenant_id, {}, size=2)
+    print(f"  total: {page['total']}  by_status: {page['counts']['by_status']}")
+    print(f"  by_due_week: {page['counts']['by_due_week']}")
+
+    assert page["total"] == 5, "Total should count every order, not the page"
+    assert len(page["items"]) == 2, "Page should hold page_size orders"
+    assert page["counts"]["by_status"] == {"Planned": 2, "Released": 2, "Firm Planned": 1}, \
+        f"by_status incorrect: {page['counts']['by_status']}"
+    assert page["counts"]["by_due_week"] == [
+        {"week": "2025-W23", "count": 2},
+        {"week": "2025-W24", "count": 2},
+        {"week": None, "count": 1},
+    ], f"by_due_week incorrect: {page['counts']['by_due_week']}"
+
+    page = production_order_page(tenant_id, {"status": "Released"})
+    assert page["total"] == 2, "Status filter should narrow the total"
+    assert page["counts"]["by_status"] == {"Released": 2}, "Status filter should narrow by_status"
+    assert page["counts"]["by_due_week"] == [
+        {"week": "2025-W23", "count": 1},
+        {"week": "2025-W24", "count": 1},
+    ], f"Filtered by_due_week incorrect: {page['counts']['by_due_week']}"
+
+    print_colored("✅ TEST 2 PASSED", GREEN)
+
+
+def test_cursor_pages(tenant_id: str):
+    """Test 3: Cursor pages - due date DESC, order_no ASC, no due date last"""
+    print("\nTEST 3: Cursor Pages")
+    print("=" * 60)
+
+    seen = []
+    cursor = None
+    while True:
+        page = production_order_page(tenant_id, {}, size=2, cursor=cursor)
+        print(f"  page: {order_nos(page)}")
+        seen.extend(order_nos(page))
+        cursor = page["next_cursor"]
+        if cursor is None:
+            break
+
+    assert seen == ["PO-OL-003", "XPO-OL-004", "PO-OL-002", "PO-OL-001", "po-ol-005"], \
+        f"Page order incorrect: {seen}"
+
+    try:
+        production_order_page(tenant_id, {}, cursor="not-a-cursor")
+        assert False, "Malformed cursor should be rejected"
+    except ValueError:
+        pass
+
+    print_colored("✅ TEST 3 PASSED", GREEN)
+
+
+def main():
+    """Run all tests"""
+    print("\n" + "=" * 60)
+    print("PRODUCTION ORDER LIST - TEST SUITE")
+    print("=" * 60)
+
+    # Connect to MongoDB
+    mongo_uri = os.getenv("MONGO_URI", "mongodb://localhost:27017/vivae_dental_erp")
+    connect(host=mongo_uri)
+    print_colored(f"✅ Connected to MongoDB: {mongo_uri}", GREEN)
+
+    # Setup
+    tenant_id = setup_test_data()
+
+    # Run tests
+    try:
+        test_prefix_search(tenant_id)
+        test_facet_counts(tenant_id)
+        test_cursor_pages(tenant_id)
+
+        print_colored("\n" + "=" * 60, GREEN)
+        print_colored("ALL TESTS PASSED!", GREEN)
+        print_colored("=" * 60, GREEN)
+
+    except AssertionError as e:
+        print_colored(f"\n❌ TEST FAILED: {str(e)}", RED)
+        sys.exit(1)
+    except Exception as e:
+        print_colored(f"\n❌ UNEXPECTED ERROR: {str(e)}", RED)
+        import traceback
+        traceback.print_exc()
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,348 @@
+# backend/scripts/test_release_batch.py
+"""
+Production Order Batch Release Tests
+
+Runs services.production.order_release.release_production_orders against
+MongoDB:
+1. Release by ids: empty orders are exploded, unknown ids and orders that
+   are not Planned / Firm Planned fail, the rest are released
+2. An order single release accepts (no certified BOM, no lines) is
+   released by the batch too
+3. Release by filter: status and due date range
+4. An order changed by someone else during the release (status, or an
+   edit while still Planned) is a conflict
+5. A BOM certified after the BOM graph was cached is used for explosion
+
+Uses its own laboratory (Release Batch Test Laboratory).
+"""
+
+import os
+import sys
+from datetime import date, datetime
+
+# Add backend to path
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from bson import ObjectId
+from mongoengine import connect
+from models.laboratory import Laboratory
+from models.production import BOM, BOMLine, Item, ProductionOrder
+from services.production import order_release
+from services.production.bom_graph import bom_graph_cache
+from services.production.order_release import release_production_orders
+
+# ANSI color codes
+GREEN = '\033[92m'
+RED = '\033[91m'
+YELLOW = '\033[93m'
+BLUE = '\033[94m'
+RESET = '\033[0m'
+
+TEST_LAB = "Release Batch Test Laboratory"
+
+USER = "release-batch-test"
+
+
+def print_colored(message: str, color: str):
+    """Print colored message"""
+    print(f"{color}{message}{RESET}")
+
+
+def setup_test_data():
+    """
+    Create test data in the test laboratory:
+
+    FG-RB-001 (Finished Good, certified BOM)
+    └── RM-RB-001 x 2.0
+    FG-RB-002 (Finished Good, no BOM)
+    """
+    print_colored("\nSetting up test data...", BLUE)
+
+    lab = Laboratory.objects(name=TEST_LAB).first()
+    if not lab:
+        lab = Laboratory(name=TEST_LAB).save()
+    tenant_id = str(lab.id)
+
+    for model in (Item, BOM, ProductionOrder):
+        model.objects(tenant_id=tenant_id).delete()
+
+    for item_no, item_type in (
+        ("FG-RB-001", "manufactured"),
+        ("FG-RB-002", "manufactured"),
+        ("RM-RB-001", "purchased"),
+    ):
+        Item(
+            tenant_id=tenant_id,
+            item_no=item_no,
+            description=f"Release Batch Test {item_no}",
+            item_type=item_type,
+            base_uom="PCS",
+            created_at=datetime.utcnow(),
+            updated_at=datetime.utcnow(),
+        ).save()
+
+    BOM(
+        tenant_id=tenant_id,
+        item_no="FG-RB-001",
+        version_code="V1",
+        status="Certified",
+        base_uom="PCS",
+        lines=[
+            BOMLine(
+                line_no=10,
+                component_item_no="RM-RB-001",
+                description="Release Batch Test RM",
+                quantity_per=2.0,
+                uom_code="PCS",
+                scrap_pct=0.0,
+                component_type="Item",
+                position="MAIN"
+            ),
+        ],
+        created_at=datetime.utcnow(),
+        updated_at=datetime.utcnow(),
+    ).save()
+
+    print_colored("✅ Created 3 items and 1 BOM", GREEN)
+    return tenant_id
+
+
+def create_order(tenant_id: str, order_no: str, status: str = "Planned", item_no: str = "FG-RB-001",
+                 due_date: date = date(2025, 6, 30)) -> ProductionOrder:
+    return ProductionOrder(
+        tenant_id=tenant_id,
+        order_no=order_no,
+        item_no=item_no,
+        quantity=5.0,
+        finished_quantity=0.0,
+        location_code="MAIN",
+        status=status,
+        due_date=due_date,
+        created_by=USER,
+        updated_by=USER,
+    ).save()
+
+
+def results_by_order(summary: dict) -> dict:
+    return {result["order_no"] or result["id"]: result for result in summary["results"]}
+
+
+def print_summary(summary: dict):
+    print(f"Requested: {summary['requested']}  released: {summary['released']}  "
+          f"failed: {summary['failed']}  conflicts: {summary['conflicts']}")
+    for result in summary["results"]:
+        print(f"  {result['order_no'] or result['id']}: {result['status']}"
+              + (f" ({result['error']})" if result["error"] else ""))
+
+
+def test_release_by_ids(tenant_id: str):
+    """Test 1: Release by ids"""
+    print("\nTEST 1: Release by IDs")
+    print("=" * 60)
+
+    planned = create_order(tenant_id, "PO-RB-101")
+    firm = create_order(tenant_id, "PO-RB-102", status="Firm Planned")
+    finished = create_order(tenant_id, "PO-RB-103", status="Finished")
+    unknown = str(ObjectId())
+
+    summary = release_production_orders(
+        tenant_id, order_ids=[str(planned.id), str(firm.id), str(finished.id), unknown, "not-an-id"],
+        user_email=USER
+    )
+    print_summary(summary)
+    results = results_by_order(summary)
+
+    assert summary["requested"] == 5, "Should report every requested id"
+    assert summary["released"] == 2 and summary["failed"] == 3, "Should release 2 and fail 3"
+    assert results["PO-RB-101"]["status"] == "Released", "Planned order should be released"
+    assert results["PO-RB-101"]["exploded_lines"] == 1, "Empty order should be exploded"
+    assert results["PO-RB-102"]["status"] == "Released", "Firm Planned order should be released"
+    assert results["PO-RB-103"]["status"] == "Failed", "Finished order should fail"
+    assert "Cannot release Finished" in results["PO-RB-103"]["error"], "Should report the status"
+    assert results[unknown]["error"] == "Production Order not found", "Unknown id should fail"
+    assert results["not-an-id"]["error"] == "Production Order not found", "Invalid id should fail"
+
+    planned.reload()
+    assert planned.status == "Released" and planned.released_by == USER, "Release should be stored"
+    assert [(line.component_item_no, line.expected_quantity) for line in planned.lines] == [("RM-RB-001", 10.0)], \
+        "Exploded lines should be stored"
+    finished.reload()
+    assert finished.status == "Finished", "Failed order should not be touched"
+
+    print_colored("✅ TEST 1 PASSED", GREEN)
+
+
+def test_same_terms_as_single_release(tenant_id: str):
+    """Test 2: No certified BOM and no lines - released, as by POST /<id>/release"""
+    print("\nTEST 2: Same Terms as Single Release")
+    print("=" * 60)
+
+    order = create_order(tenant_id, "PO-RB-201", item_no="FG-RB-002")
+    summary = release_production_orders(tenant_id, order_ids=[str(order.id)], user_email=USER)
+    print_summary(summary)
+
+    result = summary["results"][0]
+    assert result["status"] == "Released", f"Should be released: {result['error']}"
+    assert result["exploded_lines"] == 0, "Nothing to explode without a BOM"
+    order.reload()
+    assert order.status == "Released" and not order.lines, "Should be released without lines"
+
+    print_colored("✅ TEST 2 PASSED", GREEN)
+
+
+def test_release_by_filter(tenant_id: str):
+    """Test 3: Release by status and due date range"""
+    print("\nTEST 3: Release by Filter")
+    print("=" * 60)
+
+    ProductionOrder.objects(tenant_id=tenant_id).delete()
+    create_order(tenant_id, "PO-RB-301", status="Firm Planned", due_date=date(2025, 7, 10))
+    create_order(tenant_id, "PO-RB-302", status="Firm Planned", due_date=date(2025, 8, 10))
+    create_order(tenant_id, "PO-RB-303", status="Planned", due_date=date(2025, 7, 12))
+    create_order(tenant_id, "PO-RB-304", status="Released", due_date=date(2025, 7, 15))
+
+    summary = release_production_orders(
+        tenant_id, status="Firm Planned",
+        due_date_from=date(2025, 7, 1), due_date_to=date(2025, 7, 31),
+        user_email=USER
+    )
+    print_summary(summary)
+
+    assert [result["order_no"] for result in summary["results"]] == ["PO-RB-301"], \
+        "Should select only the Firm Planned order due in July"
+    statuses = {po.order_no: po.status for po in ProductionOrder.objects(tenant_id=tenant_id)}
+    assert statuses == {"PO-RB-301": "Released", "PO-RB-302": "Firm Planned",
+                        "PO-RB-303": "Planned", "PO-RB-304": "Released"}, f"Statuses incorrect: {statuses}"
+
+    try:
+        release_production_orders(tenant_id, status="Released", user_email=USER)
+        assert False, "Released is not a valid status filter"
+    except ValueError:
+        pass
+
+    print_colored("✅ TEST 3 PASSED", GREEN)
+
+
+def test_conflict(tenant_id: str):
+    """Test 4: Order changed after it was loaded"""
+    print("\nTEST 4: Conflict")
+    print("=" * 60)
+
+    changed = create_order(tenant_id, "PO-RB-401")
+    other = create_order(tenant_id, "PO-RB-402")
+    edited = create_order(tenant_id, "PO-RB-403")
+
+    prepare_release = order_release.prepare_release
+
+    def prepare_and_change(po, graph, routings):
+        # Someone else moves the order on while the batch is prepared
+        if po.order_no == "PO-RB-401":
+            ProductionOrder.objects(id=po.id).update(set__status="Firm Planned")
+        elif po.order_no == "PO-RB-403":
+            # Still Planned, but its quantity was edited
+            current = ProductionOrder.objects.get(id=po.id)
+            current.quantity = 7.0
+            current.save()
+        return prepare_release(po, graph, routings)
+
+    order_release.prepare_release = prepare_and_change
+    try:
+        summary = release_production_orders(
+            tenant_id, order_ids=[str(changed.id), str(other.id), str(edited.id)], user_email=USER
+        )
+    finally:
+        order_release.prepare_release = prepare_release
+    print_summary(summary)
+    results = results_by_order(summary)
+
+    assert summary["released"] == 1 and summary["conflicts"] == 2, "Should release 1 and report 2 conflicts"
+    assert results["PO-RB-401"]["status"] == "Conflict", "Changed order should be a conflict"
+    assert results["PO-RB-403"]["status"] == "Conflict", "Edited order should be a conflict"
+    assert results["PO-RB-402"]["status"] == "Released", "Other order should be released"
+    changed.reload()
+    assert changed.status == "Firm Planned" and not changed.lines, "Changed order should not be touched"
+    edited.reload()
+    assert edited.status == "Planned" and edited.quantity == 7.0 and not edited.lines, \
+        "Edited order should keep the edit and not be released"
+
+    print_colored("✅ TEST 4 PASSED", GREEN)
+
+
+def test_fresh_bom(tenant_id: str):
+    """Test 5: Explosion reads the BOMs certified now, not the cached graph"""
+    print("\nTEST 5: BOM Certified After Caching")
+    print("=" * 60)
+
+    bom_graph_cache.get(tenant_id)  # cached without a BOM for FG-RB-002
+    BOM(
+        tenant_id=tenant_id,
+        item_no="FG-RB-002",
+        version_code="V1",
+        status="Certified",
+        base_uom="PCS",
+        lines=[
+            BOMLine(
+                line_no=10,
+                component_item_no="RM-RB-001",
+                description="Release Batch Test RM",
+                quantity_per=3.0,
+                uom_code="PCS",
+                scrap_pct=0.0,
+                component_type="Item",
+                position="MAIN"
+            ),
+        ],
+        created_at=datetime.utcnow(),
+        updated_at=datetime.utcnow(),
+    ).save()
+
+    order = create_order(tenant_id, "PO-RB-501", item_no="FG-RB-002")
+    summary = release_production_orders(tenant_id, order_ids=[str(order.id)], user_email=USER)
+    print_summary(summary)
+
+    assert summary["results"][0]["exploded_lines"] == 1, "Should explode the newly certified BOM"
+    order.reload()
+    assert [(line.component_item_no, line.expected_quantity) for line in order.lines] == [("RM-RB-001", 15.0)], \
+        "Exploded lines should come from the new BOM"
+
+    print_colored("✅ TEST 5 PASSED", GREEN)
+
+
+def main():
+    """Run all tests"""
+    print("\n" + "=" * 60)
+    print("PRODUCTION ORDER BATCH RELEASE - TEST SUITE")
+    print("=" * 60)
+
+    # Connect to MongoDB
+    mongo_uri = os.getenv("MONGO_URI", "mongodb://localhost:27017/vivae_dental_erp")
+    connect(host=mongo_uri)
+    print_colored(f"✅ Connected to MongoDB: {mongo_uri}", GREEN)
+
+    # Setup
+    tenant_id = setup_test_data()
+
+    # Run tests
+    try:
+        test_release_by_ids(tenant_id)
+        test_same_terms_as_single_release(tenant_id)
+        test_release_by_filter(tenant_id)
+        test_conflict(tenant_id)
+        test_fresh_bom(tenant_id)
+
+        print_colored("\n" + "=" * 60, GREEN)
+        print_colored("ALL TESTS PASSED!", GREEN)
+        print_colored("=" * 60, GREEN)
+
+    except AssertionError as e:
+        print_colored(f"\n❌ TEST FAILED: {str(e)}", RED)
+        sys.exit(1)
+    except Exception as e:
+        print_colored(f"\n❌ UNEXPECTED ERROR: {str(e)}", RED)
+        import traceback
+        traceback.print_exc()
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,214 @@
+"""
+Inventory Availability Service - On-hand quantities from the item ledger
+
+On-hand per item (and location) is the sum of its ItemLedgerEntry
+quantities (output positive, consumption negative). It is read from the
+item_balances snapshot (services.item_balance_service), which postings
+roll forward in the same transaction, with one indexed query for all
+items that are not cached yet:
+
+    SELECT item_no, location_code, quantity
+    FROM item_balances
+    WHERE tenant_id = :tenant AND item_no IN (...)
+
+Running-balance cache:
+- Balances are kept per tenant once read, so repeat checks don't query
+  the database again
+- PostingService applies the quantities it commits to the cached balances
+  (apply_postings), keeping them current without a rescan
+- A scan that overlaps a posting is not stored (version counter), and a
+  tenant's balances are dropped after ITEM_BALANCE_CACHE_TTL seconds
+  (default 300) to bound staleness across worker processes
+"""
+import os
+import threading
+import time
+from typing import Dict, Iterable, List, Optional, Tuple
+from models.item_ledger_entry import ItemLedgerEntry
+from services.item_balance_service import ItemBalanceService
+
+# item_no -> location_code -> quantity
+Balances = Dict[str, Dict[Optional[str], float]]
+
+
+class ItemBalanceCache:
+    """Per-tenant running item balances"""
+
+    def __init__(self, max_age_seconds: float = 300.0):
+        self.max_age_seconds = max_age_seconds
+        self._lock = threading.Lock()
+        self._versions: Dict[str, int] = {}
+        self._balances: Dict[str, Balances] = {}
+        self._loaded_at: Dict[str, float] = {}
+        self.hits = 0
+        self.misses = 0
+
+    def version(self, tenant_id: str) -> int:
+        """Current version counter of a tenant (bumped by every posting)"""
+        with self._lock:
+            return self._versions.get(tenant_id, 0)
+
+    def lookup(self, tenant_id: str, item_nos: Iterable[str]) -> Tuple[Balances, List[str]]:
+        """
+        Cached balances for items.
+
+        Returns:
+            (balances, missing) - missing lists the items to load from item_balances
+        """
+        with self._lock:
+            self._expire(tenant_id)
+            cached = self._balances.get(tenant_id, {})
+            balances: Balances = {}
+            missing: List[str] = []
+            for item_no in item_nos:
+                if item_no in cached:
+                    balances[item_no] = dict(cached[item_no])
+                    self.hits += 1
+                else:
+                    missing.append(item_no)
+                    self.misses += 1
+            return balances, missing
+
+    def store(self, tenant_id: str, version: int, balances: Balances) -> bool:
+        """Cache scanned balances unless a posting happened since `version` was read"""
+        with self._lock:
+            if self._versions.get(tenant_id, 0) != version:
+                return False
+            if tenant_id not in self._balances:
+                self._loaded_at[tenant_id] = time.monotonic()
+            self._balances.setdefault(tenant_id, {}).update(balances)
+            return True
+
+    def apply(self, tenant_id: str, movements: Iterable[Tuple[str, Optional[str], float]]) -> None:
+        """Add committed ledger quantities (item_no, location_code, quantity) to cached balances"""
+        with self._lock:
+            self._versions[tenant_id] = self._versions.get(tenant_id, 0) + 1
+            cached = self._balances.get(tenant_id)
+            if not cached:
+                return
+            for item_no, location_code, quantity in movements:
+                locations = cached.get(item_no)
+                if locations is None:
+                    continue  # Not cached: will be read with the posting included
+                locations[location_code] = locations.get(location_code, 0.0) + float(quantity)
+
+    def invalidate(self, tenant_id: str) -> None:
+        """Drop a tenant's balances"""
+        with self._lock:
+            self._versions[tenant_id] = self._versions.get(tenant_id, 0) + 1
+            self._balances.pop(tenant_id, None)
+            self._loaded_at.pop(tenant_id, None)
+
+    def stats(self) -> dict:
+        """Hit/miss counters"""
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_ratio": (self.hits / lookups) if lookups else 0.0,
+                "cached_tenants": len(self._balances),
+                "max_age_seconds": self.max_age_seconds,
+            }
+
+    def _expire(self, tenant_id: str) -> None:
+        loaded_at = self._loaded_at.get(tenant_id)
+        if self.max_age_seconds and loaded_at is not None and time.monotonic() - loaded_at > self.max_age_seconds:
+            self._balances.pop(tenant_id, None)
+            self._loaded_at.pop(tenant_id, None)
+
+
+# Process-wide cache instance
+item_balance_cache = ItemBalanceCache(
+    max_age_seconds=float(os.getenv("ITEM_BALANCE_CACHE_TTL", "300"))
+)
+
+
+class AvailabilityService:
+    """On-hand and availability checks from the item ledger"""
+
+    @staticmethod
+    def get_balances(tenant_id: str, item_nos: Iterable[str]) -> Balances:
+        """
+        On-hand quantity per item and location.
+
+        Cached items are served from memory; the rest are read from
+        item_balances with one query. Items without ledger entries get {}.
+        """
+        tenant_id = str(tenant_id)
+        item_nos = list(dict.fromkeys(item_nos))
+        balances, missing = item_balance_cache.lookup(tenant_id, item_nos)
+        if not missing:
+            return balances
+
+        version = item_balance_cache.version(tenant_id)
+        scanned = ItemBalanceService.get_balances(tenant_id, missing)
+
+        item_balance_cache.store(tenant_id, version, scanned)
+        balances.update(scanned)
+        return balances
+
+    @staticmethod
+    def check_availability(
+        tenant_id: str,
+        requirements: Dict[str, float],
+        safety_stock: Optional[Dict[str, float]] = None,
+        location_code: Optional[str] = None
+    ) -> Dict[str, dict]:
+        """
+        Compare required quantities with on-hand stock.
+
+        Args:
+            tenant_id: Laboratory/tenant identifier
+            requirements: item_no -> required quantity
+            safety_stock: item_no -> safety stock kept out of availability
+            location_code: Only count stock at this location (None = all)
+
+        Returns:
+            Dict mapping item_no to availability info
+        """
+        balances = AvailabilityService.get_balances(tenant_id, requirements)
+        safety_stock = safety_stock or {}
+
+        availability = {}
+        for item_no, required in requirements.items():
+            locations = balances.get(item_no, {})
+            if location_code is not None:
+                on_hand = locations.get(location_code, 0.0)
+            else:
+                on_hand = sum(locations.values())
+            item_safety_stock = safety_stock.get(item_no, 0) or 0
+
+            available_qty = max(0, on_hand - item_safety_stock)
+            shortage = max(0, required - available_qty)
+
+            availability[item_no] = {
+                "available": shortage == 0,
+                "reason": "Sufficient stock" if shortage == 0 else "Insufficient stock",
+                "on_hand": on_hand,
+                "safety_stock": item_safety_stock,
+                "available_qty": available_qty,
+                "required": required,
+                "shortage": shortage,
+                "by_location": {
+                    (code or ""): quantity for code, quantity in locations.items()
+                },
+            }
+
+        return availability
+
+    @staticmethod
+    def apply_postings(tenant_id: str, entries: Iterable[ItemLedgerEntry]) -> None:
+        """Roll committed ledger entries into the running-balance cache"""
+        AvailabilityService.apply_movements(
+            tenant_id,
+            [(entry.item_no, entry.location_code, entry.quantity) for entry in entries]
+        )
+
+    @staticmethod
+    def apply_movements(tenant_id: str, movements: Iterable[Tuple[str, Optional[str], object]]) -> None:
+        """Roll committed (item_no, location_code, quantity) movements into the cache"""
+        item_balance_cache.apply(
+            str(tenant_id),
+            [(item_no, location_code, float(quantity)) for item_no, location_code, quantity in movements]
+        )
@@ -0,0 +1,212 @@
+"""
+Capacity Rollup Service - Maintains the capacity_daily roll-up table
+
+capacity_daily holds, per tenant, work center and day, the sums of the
+capacity ledger times and quantities, so capacity analysis reads one row
+per work center and day instead of the raw capacity_ledger_entries:
+
+- apply_entries(): called by PostingService inside the capacity posting
+  transaction; upserts the deltas (INSERT ... ON CONFLICT DO UPDATE)
+- utilization(): used (setup + run) vs available capacity per work center
+  and day, from one range read on the unique key; available time comes
+  from the work center's calendar buckets (capacity_calendar) or, without
+  a calendar, WorkCenter.calculate_effective_capacity()
+- rebuild(): re-derive a tenant's roll-up from the ledger (backfill/repair)
+"""
+from datetime import date, datetime, timedelta
+from decimal import Decimal
+from typing import Dict, Iterable, List, Optional, Tuple
+from sqlalchemy import func
+from sqlalchemy.dialects.postgresql import insert as pg_insert
+from config.db import db
+from models.capacity_ledger_entry import CapacityLedgerEntry
+from models.capacity_daily import CapacityDaily
+
+# Upper bound for a utilization date range
+MAX_UTILIZATION_DAYS = 366
+
+# Summed columns (CapacityLedgerEntry -> CapacityDaily)
+ROLLUP_FIELDS = ('setup_time', 'run_time', 'stop_time', 'scrap_time', 'quantity', 'scrap_quantity')
+
+
+class CapacityRollupService:
+    """Service for the daily capacity roll-up"""
+
+    @staticmethod
+    def apply_entries(tenant_id: str, entries: Iterable[CapacityLedgerEntry]) -> None:
+        """
+        Add capacity ledger entries to capacity_daily in the current transaction (no commit).
+
+        Keys are upserted in sorted order so concurrent postings lock
+        roll-up rows in the same order.
+        """
+        deltas: Dict[Tuple[str, date], List] = {}
+        for entry in entries:
+            posting_day = (entry.posting_date or datetime.utcnow()).date()
+            delta = deltas.setdefault((entry.work_center_code, posting_day), [Decimal(0)] * len(ROLLUP_FIELDS) + [0])
+            for i, name in enumerate(ROLLUP_FIELDS):
+                delta[i] += Decimal(str(getattr(entry, name) or 0))
+            delta[-1] += 1
+
+        table = CapacityDaily.__table__
+        now = datetime.utcnow()
+        for (work_center_code, posting_day), delta in sorted(deltas.items()):
+            values = dict(zip(ROLLUP_FIELDS, delta))
+            stmt = pg_insert(table).values(
+                tenant_id=tenant_id,
+                work_center_code=work_center_code,
+                posting_day=posting_day,
+                entry_count=delta[-1],
+                updated_at=now,
+                **values
+            )
+            set_ = {name: table.c[name] + stmt.excluded[name] for name in ROLLUP_FIELDS}
+            set_['entry_count'] = table.c.entry_count + stmt.excluded.entry_count
+            set_['updated_at'] = now
+            stmt = stmt.on_conflict_do_update(constraint='uq_capacity_daily_key', set_=set_)
+            db.session.execute(stmt)
+
+    @staticmethod
+    def utilization(
+        tenant_id: str,
+        from_day: date,
+        to_day: date,
+        work_center_code: Optional[str] = None
+    ) -> List[Dict]:
+        """
+        Daily utilization per work center.
+
+        Used time is setup + run; available time is the day's calendar
+        minutes * efficiency for work centers with a calendar, else the
+        effective capacity (capacity * efficiency) for every day of the range.
+
+        Args:
+            tenant_id: Laboratory/tenant identifier
+            from_day, to_day: Inclusive date range (at most MAX_UTILIZATION_DAYS)
+            work_center_code: Only this work center (None = all)
+
+        Returns:
+            One entry per work center: {work_center_code, name, effective_capacity, calendar_code,
+            days: [{date, setup_time, run_time, stop_time, used, available,
+            utilization_pct}], totals: {...}}
+
+        Raises:
+            ValueError: Empty or too long date range
+        """
+        from models.production import WorkCenter
+        from services.production.capacity_calendar import calendar_timeline_cache
+
+        days = (to_day - from_day).days + 1
+        if days <= 0:
+            raise ValueError('to_date must not be before from_date')
+        if days > MAX_UTILIZATION_DAYS:
+            raise ValueError(f'Date range is limited to {MAX_UTILIZATION_DAYS} days')
+
+        query = CapacityDaily.query.filter(
+            CapacityDaily.tenant_id == tenant_id,
+            CapacityDaily.posting_day >= from_day,
+            CapacityDaily.posting_day <= to_day
+        )
+        work_centers = WorkCenter.objects(tenant_id=str(tenant_id))
+        if work_center_code:
+            query = query.filter(CapacityDaily.work_center_code == work_center_code)
+            work_centers = work_centers.filter(code=work_center_code)
+
+        rollup: Dict[str, Dict[date, CapacityDaily]] = {}
+        for row in query.all():
+            rollup.setdefault(row.work_center_code, {})[row.posting_day] = row
+
+        work_centers = list(work_centers.only('code', 'name', 'capacity', 'efficiency_pct', 'calendar_code'))
+        timelines = calendar_timeline_cache.covering(
+            str(tenant_id), {wc.calendar_code for wc in work_centers if wc.calendar_code}, from_day, to_day
+        )
+        centers = {
+            wc.code: (wc.name, wc.calculate_effective_capacity(), (wc.efficiency_pct or 0.0) / 100.0,
+                      timelines.get(wc.calendar_code) if wc.calendar_code else None)
+            for wc in work_centers
+        }
+        # Postings on work centers that no longer exist still show up (no capacity)
+        for code in rollup:
+            centers.setdefault(code, (None, 0.0, 0.0, None))
+
+        result = []
+        for code in sorted(centers):
+            name, effective, efficiency, timeline = centers[code]
+            by_day = rollup.get(code, {})
+            totals = dict.fromkeys(('setup_time', 'run_time', 'stop_time', 'used', 'available'), 0.0)
+            rows = []
+            for offset in range(days):
+                day = from_day + timedelta(days=offset)
+                row = by_day.get(day)
+                setup_time = float(row.setup_time or 0) if row else 0.0
+                run_time = float(row.run_time or 0) if row else 0.0
+                stop_time = float(row.stop_time or 0) if row else 0.0
+                used = setup_time + run_time
+                available = timeline.minutes_on(day) * efficiency if timeline else effective
+                rows.append({
+                    'date': day.isoformat(),
+                    'setup_time': setup_time,
+                    'run_time': run_time,
+                    'stop_time': stop_time,
+                    'used': used,
+                    'available': available,
+                    'utilization_pct': round(100.0 * used / available, 2) if available else None
+                })
+                totals['setup_time'] += setup_time
+                totals['run_time'] += run_time
+                totals['stop_time'] += stop_time
+                totals['used'] += used
+                totals['available'] += available
+            totals['utilization_pct'] = (
+                round(100.0 * totals['used'] / totals['available'], 2) if totals['available'] else None
+            )
+            result.append({
+                'work_center_code': code,
+                'name': name,
+                'effective_capacity': effective,
+                'calendar_code': timeline.code if timeline else None,
+                'days': rows,
+                'totals': totals
+            })
+        return result
+
+    @staticmethod
+    def rebuild(tenant_id: str) -> int:
+        """
+        Re-derive a tenant's roll-up from capacity_ledger_entries (commits).
+
+        Returns:
+            Number of roll-up rows written
+        """
+        posting_day = func.date(CapacityLedgerEntry.posting_date)
+        try:
+            CapacityDaily.query.filter_by(tenant_id=tenant_id).delete(synchronize_session=False)
+            rows = db.session.query(
+                CapacityLedgerEntry.work_center_code,
+                posting_day,
+                *[func.coalesce(func.sum(getattr(CapacityLedgerEntry, name)), 0) for name in ROLLUP_FIELDS],
+                func.count(CapacityLedgerEntry.id)
+            ).filter(
+                CapacityLedgerEntry.tenant_id == tenant_id
+            ).group_by(
+                CapacityLedgerEntry.work_center_code,
+                posting_day
+            ).all()
+
+            now = datetime.utcnow()
+            db.session.bulk_insert_mappings(CapacityDaily, [
+                {
+                    'tenant_id': tenant_id,
+                    'work_center_code': row[0],
+                    'posting_day': row[1],
+                    **dict(zip(ROLLUP_FIELDS, row[2:-1])),
+                    'entry_count': row[-1],
+                    'updated_at': now
+                }
+                for row in rows
+            ])
+            db.session.commit()
+            return len(rows)
+        except Exception:
+            db.session.rollback()
+            raise
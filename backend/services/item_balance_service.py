@@ -0,0 +1,215 @@
+"""
+Item Balance Service - Maintains the item_balances snapshot table
+
+item_balances holds, per tenant, item and location, the sum of the item
+ledger quantities, so on-hand reads are one indexed row per item instead
+of a scan of item_ledger_entries.
+
+- apply_entries(): called by PostingService inside the posting transaction;
+  upserts the deltas (INSERT ... ON CONFLICT DO UPDATE), so the balance
+  and its ledger entries commit or roll back together
+- get_balances(): balance rows for a set of items
+- reconcile(): nightly job; re-derives balances from the ledger with one
+  grouped aggregate, reports drift and (optionally) corrects it
+"""
+from datetime import datetime
+from decimal import Decimal
+from typing import Dict, Iterable, List, Optional, Tuple
+from sqlalchemy import func
+from sqlalchemy.dialects.postgresql import insert as pg_insert
+from config.db import db
+from models.item_ledger_entry import ItemLedgerEntry
+from models.item_balance import ItemBalance
+
+# Balances are Numeric(15, 3): smaller differences are rounding, not drift
+DRIFT_TOLERANCE = Decimal('0.0005')
+
+# Drift rows included in a reconcile report
+MAX_REPORTED_DRIFT = 100
+
+
+class ItemBalanceService:
+    """Service for the item balance snapshot"""
+
+    @staticmethod
+    def apply_entries(tenant_id: str, entries: Iterable[ItemLedgerEntry]) -> None:
+        """
+        Add ledger entries to item_balances in the current transaction (no commit).
+
+        Keys are upserted in sorted order so concurrent postings lock
+        balance rows in the same order.
+        """
+        ItemBalanceService.apply_movements(
+            tenant_id,
+            [(entry.item_no, entry.location_code, entry.quantity) for entry in entries]
+        )
+
+    @staticmethod
+    def apply_movements(tenant_id: str, movements: Iterable[Tuple[str, Optional[str], object]]) -> None:
+        """Add (item_no, location_code, quantity) movements to item_balances (no commit)"""
+        deltas: Dict[Tuple[str, str], List] = {}
+        for item_no, location_code, quantity in movements:
+            key = (item_no, location_code or '')
+            delta = deltas.setdefault(key, [Decimal(0), 0])
+            delta[0] += Decimal(str(quantity))
+            delta[1] += 1
+
+        table = ItemBalance.__table__
+        now = datetime.utcnow()
+        for (item_no, location_code), (quantity, count) in sorted(deltas.items()):
+            stmt = pg_insert(table).values(
+                tenant_id=tenant_id,
+                item_no=item_no,
+                location_code=location_code,
+                quantity=quantity,
+                entry_count=count,
+                updated_at=now
+            )
+            stmt = stmt.on_conflict_do_update(
+                constraint='uq_item_balance_key',
+                set_={
+                    'quantity': table.c.quantity + stmt.excluded.quantity,
+                    'entry_count': table.c.entry_count + stmt.excluded.entry_count,
+                    'updated_at': now
+                }
+            )
+            db.session.execute(stmt)
+
+    @staticmethod
+    def get_balances(tenant_id: str, item_nos: List[str]) -> Dict[str, Dict[Optional[str], float]]:
+        """
+        On-hand per item and location (None = no location) from item_balances.
+
+        Items without a balance row are returned with {}.
+        """
+        balances: Dict[str, Dict[Optional[str], float]] = {item_no: {} for item_no in item_nos}
+        if not item_nos:
+            return balances
+
+        rows = db.session.query(
+            ItemBalance.item_no,
+            ItemBalance.location_code,
+            ItemBalance.quantity
+        ).filter(
+            ItemBalance.tenant_id == tenant_id,
+            ItemBalance.item_no.in_(item_nos)
+        ).all()
+        for item_no, location_code, quantity in rows:
+            balances[item_no][location_code or None] = float(quantity or 0)
+        return balances
+
+    @staticmethod
+    def reconcile(tenant_id: Optional[str] = None, fix: bool = True) -> List[Dict]:
+        """
+        Re-derive balances from item_ledger_entries and report drift.
+
+        Each tenant is checked in its own transaction. Its balance rows are
+        locked (SELECT ... FOR UPDATE) before the ledger is aggregated, so
+        postings committing meanwhile wait and then apply on top of the
+        corrected balance.
+
+        Args:
+            tenant_id: Only reconcile this tenant (None = every tenant in the ledger)
+            fix: Correct drifted rows (False = report only)
+
+        Returns:
+            One report per tenant: {tenant_id, balances, drifted, fixed, drift: [...]}
+        """
+        if tenant_id:
+            tenant_ids = [tenant_id]
+        else:
+            tenant_ids = [
+                row[0] for row in db.session.query(ItemLedgerEntry.tenant_id).distinct().all()
+            ]
+
+        reports = []
+        for tid in tenant_ids:
+            try:
+                reports.append(ItemBalanceService._reconcile_tenant(tid, fix))
+                db.session.commit()
+            except Exception:
+                db.session.rollback()
+                raise
+
+        # Running balances cached from the old rows are no longer valid
+        from services.availability_service import item_balance_cache
+        for report in reports:
+            if report['fixed']:
+                item_balance_cache.invalidate(report['tenant_id'])
+
+        return reports
+
+    @staticmethod
+    def _reconcile_tenant(tenant_id: str, fix: bool) -> Dict:
+        """Compare and (optionally) fix one tenant; caller commits"""
+        balances = {
+            (row.item_no, row.location_code or ''): row
+            for row in ItemBalance.query.filter_by(tenant_id=tenant_id).with_for_update().all()
+        }
+
+        location = func.coalesce(ItemLedgerEntry.location_code, '')
+        ledger = {
+            (item_no, location_code): (Decimal(quantity or 0), count)
+            for item_no, location_code, quantity, count in db.session.query(
+                ItemLedgerEntry.item_no,
+                location,
+                func.sum(ItemLedgerEntry.quantity),
+                func.count(ItemLedgerEntry.id)
+            ).filter(
+                ItemLedgerEntry.tenant_id == tenant_id
+            ).group_by(
+                ItemLedgerEntry.item_no,
+                location
+            ).all()
+        }
+
+        now = datetime.utcnow()
+        drift = []
+        for key in sorted(set(balances) | set(ledger)):
+            row = balances.get(key)
+            expected, expected_count = ledger.get(key, (Decimal(0), 0))
+            actual = Decimal(row.quantity or 0) if row else Decimal(0)
+            actual_count = row.entry_count if row else 0
+
+            if abs(expected - actual) <= DRIFT_TOLERANCE and expected_count == actual_count:
+                if row and fix:
+                    row.reconciled_at = now
+                continue
+
+            drift.append({
+                'item_no': key[0],
+                'location_code': key[1] or None,
+                'balance': float(actual),
+                'ledger': float(expected),
+                'difference': float(expected - actual),
+                'balance_entries': actual_count,
+                'ledger_entries': expected_count
+            })
+
+            if not fix:
+                continue
+            if row is None:
+                db.session.add(ItemBalance(
+                    tenant_id=tenant_id,
+                    item_no=key[0],
+                    location_code=key[1],
+                    quantity=expected,
+                    entry_count=expected_count,
+                    updated_at=now,
+                    reconciled_at=now
+                ))
+            elif expected_count == 0:
+                db.session.delete(row)
+            else:
+                row.quantity = expected
+                row.entry_count = expected_count
+                row.updated_at = now
+                row.reconciled_at = now
+
+        return {
+            'tenant_id': tenant_id,
+            'balances': len(ledger),
+            'drifted': len(drift),
+            'fixed': fix and bool(drift),
+            'drift': drift[:MAX_REPORTED_DRIFT]
+        }
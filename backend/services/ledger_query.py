@@ -0,0 +1,117 @@
+"""
+Ledger Query - Filtered item/capacity ledger queries with keyset pagination
+
+Ledger pages are ordered newest first on (posting_date, id) and continued
+with an opaque cursor instead of an offset:
+
+    WHERE tenant_id = :tenant [AND item_no = :item ...]
+      AND (posting_date, id) < (:last_posting_date, :last_id)
+    ORDER BY posting_date DESC, id DESC
+    LIMIT :limit
+
+so every page is an index range scan on the composite
+(tenant_id, <filter>, posting_date, id) indexes, however deep the scroll,
+and postings arriving meanwhile don't shift the following pages.
+"""
+import base64
+import json
+from datetime import datetime
+from typing import Any, List, Mapping, Optional, Tuple
+from sqlalchemy import tuple_
+from models.item_ledger_entry import ItemLedgerEntry
+from models.capacity_ledger_entry import CapacityLedgerEntry
+
+DEFAULT_PAGE_SIZE = 100
+MAX_PAGE_SIZE = 1000
+
+# Query param -> column filtered with equality
+ITEM_LEDGER_FILTERS = ('item_no', 'entry_type', 'production_order_no', 'location_code')
+CAPACITY_LEDGER_FILTERS = ('work_center_code', 'machine_center_code', 'production_order_no', 'operator_id')
+
+
+def item_ledger_query(tenant_id: str, args: Mapping[str, Any]):
+    """ItemLedgerEntry query for a tenant with the ledger endpoint filters applied"""
+    return _filtered(ItemLedgerEntry, tenant_id, args, ITEM_LEDGER_FILTERS)
+
+
+def capacity_ledger_query(tenant_id: str, args: Mapping[str, Any]):
+    """CapacityLedgerEntry query for a tenant with the ledger endpoint filters applied"""
+    return _filtered(CapacityLedgerEntry, tenant_id, args, CAPACITY_LEDGER_FILTERS)
+
+
+def keyset_page(
+    query,
+    model,
+    limit: int,
+    cursor: Optional[str] = None,
+    offset: int = 0
+) -> Tuple[List[Any], Optional[str]]:
+    """
+    One page of a ledger query, newest first.
+
+    Args:
+        query: Filtered query (item_ledger_query/capacity_ledger_query)
+        model: Queried model (ordering columns)
+        limit: Page size
+        cursor: next_cursor of the previous page (None = first page)
+        offset: Rows to skip (legacy limit/offset clients; prefer the cursor)
+
+    Returns:
+        (rows, next_cursor) - next_cursor is None on the last page
+
+    Raises:
+        ValueError: Malformed cursor
+    """
+    if cursor:
+        posting_date, last_id = decode_cursor(cursor)
+        query = query.filter(tuple_(model.posting_date, model.id) < tuple_(posting_date, last_id))
+
+    # One extra row tells whether there is a next page
+    query = query.order_by(model.posting_date.desc(), model.id.desc())
+    if offset:
+        query = query.offset(offset)
+    rows = query.limit(limit + 1).all()
+    if len(rows) <= limit:
+        return rows, None
+    rows = rows[:limit]
+    return rows, encode_cursor(rows[-1].posting_date, rows[-1].id)
+
+
+def page_size(args: Mapping[str, Any]) -> int:
+    """limit query param clamped to 1..MAX_PAGE_SIZE"""
+    return max(1, min(int(args.get('limit', DEFAULT_PAGE_SIZE)), MAX_PAGE_SIZE))
+
+
+def encode_cursor(posting_date: datetime, row_id: int) -> str:
+    """Opaque cursor for the row after which the next page starts"""
+    raw = json.dumps([posting_date.isoformat(), row_id], separators=(',', ':'))
+    return base64.urlsafe_b64encode(raw.encode()).decode().rstrip('=')
+
+
+def decode_cursor(cursor: str) -> Tuple[datetime, int]:
+    """(posting_date, id) of a cursor; ValueError if it is not one of ours"""
+    try:
+        raw = base64.urlsafe_b64decode(cursor + '=' * (-len(cursor) % 4))
+        posting_date, row_id = json.loads(raw)
+        return datetime.fromisoformat(posting_date), int(row_id)
+    except (ValueError, TypeError) as e:
+        raise ValueError('Invalid cursor') from e
+
+
+def _filtered(model, tenant_id: str, args: Mapping[str, Any], filters: Tuple[str, ...]):
+    query = model.query.filter_by(tenant_id=tenant_id)
+
+    for name in filters:
+        value = args.get(name)
+        if value:
+            query = query.filter(getattr(model, name) == value)
+
+    from_date = args.get('from_date')
+    if from_date:
+        query = query.filter(model.posting_date >= datetime.fromisoformat(from_date))
+
+    to_date = args.get('to_date')
+    if to_date:
+        query = query.filter(model.posting_date <= datetime.fromisoformat(to_date))
+
+    return query
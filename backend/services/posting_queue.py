@@ -0,0 +1,394 @@
+"""
+Posting Queue - Write-ahead queue for asynchronous journal postings
+
+In async mode a posting request is validated, stored in the posting_queue
+table (keyed by posting_id, committed before the response) and answered
+with 202; the ledger writes happen later in a background worker pool:
+
+- PostingQueue.enqueue(): validate + durably queue a posting
+- PostingQueue.process_batch(): claim queued rows (SELECT ... FOR UPDATE
+  SKIP LOCKED, so several workers and processes can drain one queue) and
+  post them - consumption/output through PostingService.post_batch(),
+  capacity one by one through post_capacity()
+- PostingQueue.status() / metrics(): polling and queue depth/lag of a tenant
+- writer_stats: counters of the writer in this process (all tenants)
+- PostingQueueWorker: thread pool running process_batch() in a loop
+
+posting_id idempotency is unchanged: a posting_id that is already
+journaled or queued is not queued again, and the writer goes through the
+regular idempotent posting paths. Rows left in Processing by a crashed
+worker are claimed again after POSTING_QUEUE_CLAIM_TIMEOUT seconds.
+Postings that fail validation when they are written (e.g. the order was
+deleted after queueing) are marked Failed at once; other failures are
+retried up to POSTING_QUEUE_MAX_ATTEMPTS times.
+
+Environment:
+    POSTING_QUEUE_WORKERS         worker threads started with the app (default 0 = off)
+    POSTING_QUEUE_BATCH_SIZE      rows claimed per batch (default 200)
+    POSTING_QUEUE_POLL_INTERVAL   idle wait in seconds (default 1.0)
+    POSTING_QUEUE_CLAIM_TIMEOUT   seconds before a Processing row is reclaimed (default 300)
+    POSTING_QUEUE_MAX_ATTEMPTS    attempts before a row is marked Failed (default 5)
+"""
+import logging
+import os
+import threading
+import time
+import uuid
+from datetime import datetime, timedelta
+from typing import Any, Dict, List, Optional
+from sqlalchemy import and_, func, or_
+from sqlalchemy.exc import IntegrityError
+from config.db import db
+from models.posting_queue_entry import PostingQueueEntry
+from models.production_journal import ProductionJournal
+from services.posting_service import PostingService
+from services.posting_validator import PostingValidator
+
+logger = logging.getLogger(__name__)
+
+QUEUE_POSTING_TYPES = ('consumption', 'output', 'capacity')
+
+DEFAULT_WORKERS = int(os.getenv('POSTING_QUEUE_WORKERS', '0'))
+DEFAULT_BATCH_SIZE = int(os.getenv('POSTING_QUEUE_BATCH_SIZE', '200'))
+POLL_INTERVAL = float(os.getenv('POSTING_QUEUE_POLL_INTERVAL', '1.0'))
+CLAIM_TIMEOUT = float(os.getenv('POSTING_QUEUE_CLAIM_TIMEOUT', '300'))
+MAX_ATTEMPTS = int(os.getenv('POSTING_QUEUE_MAX_ATTEMPTS', '5'))
+
+
+class _WriterStats:
+    """Counters of the postings written by this process"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.batches = 0
+        self.posted = 0
+        self.failed = 0
+        self.retried = 0
+        self.lag_total = 0.0
+        self.lag_max = 0.0
+        self.last_batch_at: Optional[datetime] = None
+
+    def record(self, posted: int, failed: int, retried: int, lags: List[float]) -> None:
+        with self._lock:
+            self.batches += 1
+            self.posted += posted
+            self.failed += failed
+            self.retried += retried
+            self.lag_total += sum(lags)
+            self.lag_max = max([self.lag_max] + lags)
+            self.last_batch_at = datetime.utcnow()
+
+    def to_dict(self) -> dict:
+        with self._lock:
+            processed = self.posted + self.failed
+            return {
+                'batches': self.batches,
+                'posted': self.posted,
+                'failed': self.failed,
+                'retried': self.retried,
+                'avg_lag_seconds': (self.lag_total / processed) if processed else 0.0,
+                'max_lag_seconds': self.lag_max,
+                'last_batch_at': self.last_batch_at.isoformat() if self.last_batch_at else None
+            }
+
+
+writer_stats = _WriterStats()
+
+
+class PostingQueue:
+    """Durable posting queue on the posting_queue table"""
+
+    @staticmethod
+    def enqueue(tenant_id: str, posting_type: str, data: Dict[str, Any], posted_by: str) -> Dict[str, Any]:
+        """
+        Validate a posting and queue it for the background writer
+        Returns: {'success': bool, 'posting_id': str, 'status': str, 'queued': bool, 'message': str}
+        """
+        if posting_type not in QUEUE_POSTING_TYPES:
+            return {'success': False, 'message': f"type must be one of {', '.join(QUEUE_POSTING_TYPES)}"}
+        if not data.get('posting_id'):
+            return {'success': False, 'message': 'posting_id is required'}
+        try:
+            posting_id = uuid.UUID(str(data['posting_id']))
+        except ValueError:
+            return {'success': False, 'message': 'posting_id must be a UUID'}
+
+        # Idempotency - already journaled or already queued
+        if ProductionJournal.query.filter_by(tenant_id=tenant_id, posting_id=posting_id).first():
+            return {
+                'success': True,
+                'posting_id': str(posting_id),
+                'status': 'Posted',
+                'queued': False,
+                'message': 'Posting already exists (idempotent)',
+                'already_posted': True
+            }
+        existing = PostingQueueEntry.query.filter_by(tenant_id=tenant_id, posting_id=posting_id).first()
+        if existing:
+            return PostingQueue._already_queued(existing)
+
+        # Validate now, so clients get errors synchronously
+        if posting_type == 'capacity':
+            is_valid, error_msg = PostingService.validate_capacity(tenant_id, data)
+            errors = None
+        else:
+            validator = PostingValidator(tenant_id)
+            if posting_type == 'consumption':
+                errors = validator.validate_consumption(data)
+            else:
+                errors = validator.validate_output(data)
+            is_valid, error_msg = not errors, PostingValidator.summarize(errors)
+        if not is_valid:
+            result = {'success': False, 'message': error_msg}
+            if errors:
+                result['errors'] = errors
+            return result
+
+        try:
+            entry = PostingQueueEntry(
+                posting_id=posting_id,
+                tenant_id=tenant_id,
+                posting_type=posting_type,
+                payload={**data, 'posting_id': str(posting_id)},
+                posted_by=posted_by,
+                status='Queued',
+                attempts=0,
+                queued_at=datetime.utcnow()
+            )
+            db.session.add(entry)
+            db.session.commit()
+        except IntegrityError:
+            db.session.rollback()
+            # Race condition - the same posting_id was queued concurrently
+            existing = PostingQueueEntry.query.filter_by(tenant_id=tenant_id, posting_id=posting_id).first()
+            if existing:
+                return PostingQueue._already_queued(existing)
+            raise
+
+        return {
+            'success': True,
+            'posting_id': str(posting_id),
+            'status': 'Queued',
+            'queued': True,
+            'message': 'Posting queued',
+            'already_posted': False
+        }
+
+    @staticmethod
+    def status(tenant_id: str, posting_id: str) -> Optional[Dict[str, Any]]:
+        """Queue status of a posting (journaled postings without a queue row report Posted); None if unknown"""
+        try:
+            posting_id = uuid.UUID(str(posting_id))
+        except ValueError:
+            return None
+
+        entry = PostingQueueEntry.query.filter_by(tenant_id=tenant_id, posting_id=posting_id).first()
+        if entry:
+            return entry.to_dict()
+
+        journal = ProductionJournal.query.filter_by(tenant_id=tenant_id, posting_id=posting_id).first()
+        if journal:
+            return {
+                'posting_id': str(journal.posting_id),
+                'tenant_id': journal.tenant_id,
+                'posting_type': (journal.journal_type or '').lower(),
+                'status': 'Posted',
+                'processed_at': journal.posting_date.isoformat() if journal.posting_date else None
+            }
+        return None
+
+    @staticmethod
+    def metrics(tenant_id: Optional[str]) -> Dict[str, Any]:
+        """
+        Queue depth per status and age of the oldest queued posting of a tenant
+        (None = whole queue, for the writer process - never from a request)
+        """
+        depth_query = db.session.query(PostingQueueEntry.status, func.count(PostingQueueEntry.id))
+        oldest_query = db.session.query(func.min(PostingQueueEntry.queued_at)).filter(
+            PostingQueueEntry.status.in_(('Queued', 'Processing'))
+        )
+        if tenant_id is not None:
+            depth_query = depth_query.filter(PostingQueueEntry.tenant_id == tenant_id)
+            oldest_query = oldest_query.filter(PostingQueueEntry.tenant_id == tenant_id)
+
+        depth = {state: 0 for state in ('Queued', 'Processing', 'Posted', 'Failed')}
+        for state, count in depth_query.group_by(PostingQueueEntry.status).all():
+            depth[state] = count
+
+        oldest = oldest_query.scalar()
+
+        return {
+            'depth': depth,
+            'pending': depth['Queued'] + depth['Processing'],
+            'lag_seconds': (datetime.utcnow() - oldest).total_seconds() if oldest else 0.0,
+            'oldest_queued_at': oldest.isoformat() if oldest else None
+        }
+
+    @staticmethod
+    def claim(batch_size: int = DEFAULT_BATCH_SIZE) -> List[PostingQueueEntry]:
+        """Mark up to batch_size queued (or stale Processing) rows as Processing, oldest first"""
+        now = datetime.utcnow()
+        stale = now - timedelta(seconds=CLAIM_TIMEOUT)
+        try:
+            entries = PostingQueueEntry.query.filter(or_(
+                PostingQueueEntry.status == 'Queued',
+                and_(PostingQueueEntry.status == 'Processing', PostingQueueEntry.started_at < stale)
+            )).order_by(
+                PostingQueueEntry.queued_at
+            ).limit(batch_size).with_for_update(skip_locked=True).all()
+
+            for entry in entries:
+                entry.status = 'Processing'
+                entry.started_at = now
+                entry.attempts = (entry.attempts or 0) + 1
+            db.session.commit()
+            return entries
+        except Exception:
+            db.session.rollback()
+            raise
+
+    @staticmethod
+    def process_batch(batch_size: int = DEFAULT_BATCH_SIZE) -> int:
+        """
+        Claim and post one batch
+        Returns: number of rows claimed (0 = queue empty)
+        """
+        entries = PostingQueue.claim(batch_size)
+        if not entries:
+            return 0
+
+        # posting_id -> (status, message) from the posting paths
+        outcomes: Dict[Any, tuple] = {}
+
+        # Consumption/output: one post_batch per tenant and user
+        groups: Dict[tuple, List[PostingQueueEntry]] = {}
+        for entry in entries:
+            if entry.posting_type == 'capacity':
+                result = PostingService.post_capacity(entry.tenant_id, dict(entry.payload), entry.posted_by)
+                if result['success']:
+                    state = 'posted'
+                else:
+                    state = 'invalid' if result.get('invalid') else 'failed'
+                outcomes[entry.posting_id] = (state, result['message'])
+            else:
+                groups.setdefault((entry.tenant_id, entry.posted_by), []).append(entry)
+
+        for (tenant_id, posted_by), group in groups.items():
+            result = PostingService.post_batch(
+                tenant_id,
+                [{**entry.payload, 'type': entry.posting_type} for entry in group],
+                posted_by,
+                chunk_size=len(group)
+            )
+            if 'results' not in result:
+                for entry in group:
+                    outcomes[entry.posting_id] = ('failed', result['message'])
+                continue
+            for entry, posting in zip(group, result['results']):
+                outcomes[entry.posting_id] = (posting['status'], posting['message'])
+
+        # Record the outcomes on the queue rows
+        now = datetime.utcnow()
+        posted = failed = retried = 0
+        lags = []
+        for entry in entries:
+            state, message = outcomes.get(entry.posting_id, ('failed', 'Not processed'))
+            entry.message = message
+            if state in ('posted', 'already_posted'):
+                entry.status = 'Posted'
+                posted += 1
+            elif state == 'invalid' or entry.attempts >= MAX_ATTEMPTS:
+                # Invalid now (e.g. order deleted after queueing) or out of retries
+                entry.status = 'Failed'
+                failed += 1
+            else:
+                entry.status = 'Queued'
+                retried += 1
+                continue
+            entry.processed_at = now
+            if entry.queued_at:
+                lags.append((now - entry.queued_at).total_seconds())
+        try:
+            db.session.commit()
+        except Exception:
+            db.session.rollback()
+            raise
+
+        writer_stats.record(posted, failed, retried, lags)
+        return len(entries)
+
+    @staticmethod
+    def _already_queued(entry: PostingQueueEntry) -> Dict[str, Any]:
+        return {
+            'success': True,
+            'posting_id': str(entry.posting_id),
+            'status': entry.status,
+            'queued': entry.status in ('Queued', 'Processing'),
+            'message': 'Posting already queued (idempotent)',
+            'already_posted': entry.status == 'Posted'
+        }
+
+
+class PostingQueueWorker:
+    """Background threads draining the posting queue"""
+
+    def __init__(
+        self,
+        app,
+        workers: int = 1,
+        batch_size: int = DEFAULT_BATCH_SIZE,
+        poll_interval: float = POLL_INTERVAL
+    ):
+        self.app = app
+        self.workers = max(1, workers)
+        self.batch_size = batch_size
+        self.poll_interval = poll_interval
+        self._stop = threading.Event()
+        self._threads: List[threading.Thread] = []
+
+    def start(self) -> None:
+        """Start the worker threads (daemon threads, one app context each)"""
+        self._stop.clear()
+        for n in range(self.workers):
+            thread = threading.Thread(target=self._run, name=f"posting-queue-{n}", daemon=True)
+            thread.start()
+            self._threads.append(thread)
+
+    def stop(self, timeout: Optional[float] = None) -> None:
+        """Signal the workers to stop and wait for them to finish their batch"""
+        self._stop.set()
+        for thread in self._threads:
+            thread.join(timeout)
+        self._threads = []
+
+    def run_until_empty(self) -> int:
+        """Drain the queue in the calling thread; returns rows processed"""
+        processed = 0
+        with self.app.app_context():
+            while True:
+                claimed = PostingQueue.process_batch(self.batch_size)
+                if not claimed:
+                    return processed
+                processed += claimed
+
+    def _run(self) -> None:
+        while not self._stop.is_set():
+            claimed = 0
+            try:
+                with self.app.app_context():
+                    claimed = PostingQueue.process_batch(self.batch_size)
+            except Exception:
+                logger.exception("Posting queue: batch failed")
+                time.sleep(self.poll_interval)
+            if not claimed:
+                self._stop.wait(self.poll_interval)
+
+
+def start_posting_workers(app, workers: int = DEFAULT_WORKERS) -> Optional[PostingQueueWorker]:
+    """Start the background writer if POSTING_QUEUE_WORKERS > 0; returns it (None if disabled)"""
+    if workers <= 0:
+        return None
+    worker = PostingQueueWorker(app, workers=workers)
+    worker.start()
+    app.logger.info("✔ posting queue: %s worker(s) started", workers)
+    return worker
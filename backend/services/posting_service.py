@@ -1,58 +1,42 @@
 """
 Production Posting Service - Handles consumption/output/capacity postings with idempotency
 """
+import os
+import uuid
 from datetime import datetime
-from typing import Dict, Any, List
+from typing import Dict, Any, List, Optional
+from sqlalchemy import func
 from config.db import db
 from models.item_ledger_entry import ItemLedgerEntry
 from models.capacity_ledger_entry import CapacityLedgerEntry
 from models.production_journal import ProductionJournal
-from models.production_order import ProductionOrder
 from models.work_center import WorkCenter
-from models.service import Service  # Items are in Service model
+from services.availability_service import AvailabilityService
+from services.capacity_rollup_service import CapacityRollupService
+from services.item_balance_service import ItemBalanceService
+from services.posting_validator import PostingValidator
 from sqlalchemy.exc import IntegrityError
 
+# Postings committed per transaction by post_batch()
+DEFAULT_BATCH_CHUNK_SIZE = int(os.getenv('POSTING_BATCH_CHUNK_SIZE', '500'))
+
+# Upper bound for postings in one batch
+MAX_BATCH_POSTINGS = 5000
+
+# Posting types accepted by post_batch()
+BATCH_POSTING_TYPES = ('consumption', 'output')
+
 class PostingService:
     """Service for posting production journals with idempotency"""
     
     @staticmethod
     def validate_consumption(tenant_id: str, data: Dict[str, Any]) -> tuple[bool, str]:
         """
-        Validate consumption posting
+        Validate consumption posting (every line, see PostingValidator)
         Returns: (is_valid, error_message)
         """
-        # Check required fields
-        if not data.get('posting_id'):
-            return False, "posting_id is required"
-        if not data.get('production_order_no'):
-            return False, "production_order_no is required"
-        if not data.get('items') or len(data['items']) == 0:
-            return False, "At least one item is required"
-        
-        # Check production order exists
-        order = ProductionOrder.query.filter_by(
-            tenant_id=tenant_id,
-            order_no=data['production_order_no']
-        ).first()
-        if not order:
-            return False, f"Production order {data['production_order_no']} not found"
-        
-        # Validate each item
-        for item in data['items']:
-            if not item.get('item_no'):
-                return False, "item_no is required for each item"
-            if not item.get('quantity') or item['quantity'] <= 0:
-                return False, "quantity must be > 0 for each item"
-            
-            # Check item exists
-            item_obj = Service.query.filter_by(
-                tenant_id=tenant_id,
-                item_no=item['item_no']
-            ).first()
-            if not item_obj:
-                return False, f"Item {item['item_no']} not found"
-        
-        return True, ""
+        errors = PostingValidator(tenant_id).validate_consumption(data)
+        return not errors, PostingValidator.summarize(errors)
     
     @staticmethod
     def post_consumption(tenant_id: str, data: Dict[str, Any], posted_by: str) -> Dict[str, Any]:
@@ -81,52 +65,34 @@ class PostingService:
             }
         
         # Validate before posting
-        is_valid, error_msg = PostingService.validate_consumption(tenant_id, data)
-        if not is_valid:
-            return {'success': False, 'message': error_msg}
+        errors = PostingValidator(tenant_id).validate_consumption(data)
+        if errors:
+            return {'success': False, 'message': PostingValidator.summarize(errors), 'errors': errors}
         
         try:
             # Create journal header
             journal = ProductionJournal(
-                posting_id=data['posting_id'],
-                tenant_id=tenant_id,
-                journal_type='Consumption',
-                production_order_no=data['production_order_no'],
-                posting_date=datetime.utcnow(),
-                posted_by=posted_by,
-                notes=data.get('notes'),
-                created_by=posted_by
+                **PostingService._journal_row(tenant_id, data, 'Consumption', posted_by)
             )
             db.session.add(journal)
             
             # Create item ledger entries
-            entries_created = 0
-            for item in data['items']:
-                entry = ItemLedgerEntry(
-                    posting_id=data['posting_id'],
-                    tenant_id=tenant_id,
-                    item_no=item['item_no'],
-                    description=item.get('description'),
-                    quantity=-abs(item['quantity']),  # Negative for consumption
-                    uom_code=item.get('uom_code', 'UN'),
-                    entry_type='Consumption',
-                    source_type='ProductionOrder',
-                    production_order_no=data['production_order_no'],
-                    work_center_code=data.get('work_center_code'),
-                    operation_no=data.get('operation_no'),
-                    posting_date=datetime.utcnow(),
-                    posted_by=posted_by,
-                    created_by=posted_by
-                )
+            entries = []
+            for row in PostingService._consumption_rows(tenant_id, data, posted_by):
+                entry = ItemLedgerEntry(**row)
                 db.session.add(entry)
-                entries_created += 1
+                entries.append(entry)
+            
+            # Roll the balances forward in the same transaction
+            ItemBalanceService.apply_entries(tenant_id, entries)
             
             db.session.commit()
+            AvailabilityService.apply_postings(tenant_id, entries)
             
             return {
                 'success': True,
                 'posting_id': str(journal.posting_id),
-                'entries_created': entries_created,
+                'entries_created': len(entries),
                 'message': 'Consumption posted successfully',
                 'already_posted': False
             }
@@ -147,36 +113,11 @@ class PostingService:
     @staticmethod
     def validate_output(tenant_id: str, data: Dict[str, Any]) -> tuple[bool, str]:
         """
-        Validate output posting
+        Validate output posting (see PostingValidator)
         Returns: (is_valid, error_message)
         """
-        # Check required fields
-        if not data.get('posting_id'):
-            return False, "posting_id is required"
-        if not data.get('production_order_no'):
-            return False, "production_order_no is required"
-        if not data.get('item_no'):
-            return False, "item_no is required"
-        if not data.get('quantity') or data['quantity'] <= 0:
-            return False, "quantity must be > 0"
-        
-        # Check production order exists
-        order = ProductionOrder.query.filter_by(
-            tenant_id=tenant_id,
-            order_no=data['production_order_no']
-        ).first()
-        if not order:
-            return False, f"Production order {data['production_order_no']} not found"
-        
-        # Check item exists and is manufactured
-        item = Service.query.filter_by(
-            tenant_id=tenant_id,
-            item_no=data['item_no']
-        ).first()
-        if not item:
-            return False, f"Item {data['item_no']} not found"
-        
-        return True, ""
+        errors = PostingValidator(tenant_id).validate_output(data)
+        return not errors, PostingValidator.summarize(errors)
     
     @staticmethod
     def post_output(tenant_id: str, data: Dict[str, Any], posted_by: str) -> Dict[str, Any]:
@@ -199,44 +140,26 @@ class PostingService:
             }
         
         # Validate
-        is_valid, error_msg = PostingService.validate_output(tenant_id, data)
-        if not is_valid:
-            return {'success': False, 'message': error_msg}
+        errors = PostingValidator(tenant_id).validate_output(data)
+        if errors:
+            return {'success': False, 'message': PostingValidator.summarize(errors), 'errors': errors}
         
         try:
             # Create journal header
             journal = ProductionJournal(
-                posting_id=data['posting_id'],
-                tenant_id=tenant_id,
-                journal_type='Output',
-                production_order_no=data['production_order_no'],
-                posting_date=datetime.utcnow(),
-                posted_by=posted_by,
-                notes=data.get('notes'),
-                created_by=posted_by
+                **PostingService._journal_row(tenant_id, data, 'Output', posted_by)
             )
             db.session.add(journal)
             
             # Create item ledger entry
-            entry = ItemLedgerEntry(
-                posting_id=data['posting_id'],
-                tenant_id=tenant_id,
-                item_no=data['item_no'],
-                description=data.get('description'),
-                quantity=abs(data['quantity']),  # Positive for output
-                uom_code=data.get('uom_code', 'UN'),
-                entry_type='Output',
-                source_type='ProductionOrder',
-                production_order_no=data['production_order_no'],
-                work_center_code=data.get('work_center_code'),
-                operation_no=data.get('operation_no'),
-                posting_date=datetime.utcnow(),
-                posted_by=posted_by,
-                created_by=posted_by
-            )
+            entry = ItemLedgerEntry(**PostingService._output_row(tenant_id, data, posted_by))
             db.session.add(entry)
             
+            # Roll the balance forward in the same transaction
+            ItemBalanceService.apply_entries(tenant_id, [entry])
+            
             db.session.commit()
+            AvailabilityService.apply_postings(tenant_id, [entry])
             
             return {
                 'success': True,
@@ -257,6 +180,257 @@ class PostingService:
             db.session.rollback()
             return {'success': False, 'message': f'Error posting output: {str(e)}'}
     
+    @staticmethod
+    def post_batch(
+        tenant_id: str,
+        postings: List[Dict[str, Any]],
+        posted_by: str,
+        chunk_size: Optional[int] = None
+    ) -> Dict[str, Any]:
+        """
+        Post many consumption/output postings (any mix of production orders).
+        
+        Each posting is a consumption or output payload plus
+        "type": "consumption" | "output". Instead of one round trip set per
+        posting, the batch:
+        - checks idempotency for every posting_id with one query
+        - validates orders and items with one IN query each (PostingValidator)
+        - bulk inserts journals and ledger entries, committing every
+          chunk_size postings (one transaction per chunk)
+        
+        posting_id rules are the single-posting ones: a posting_id that is
+        already posted is reported as already_posted and not written again.
+        A posting_id repeated within the batch is written once, by its first
+        occurrence; the repeats take that outcome once it is known
+        (already_posted if it was posted, otherwise its status) and are
+        invalid when they repeat it with another type. If a chunk hits the unique
+        posting_id constraint (concurrent post), its postings are retried one
+        by one through post_consumption/post_output.
+        
+        Returns: {'success': bool, 'results': [{index, posting_id, type, status,
+                  message, entries_created}], 'summary': {status: count}}
+                  status is one of posted, already_posted, invalid, failed
+        """
+        if not isinstance(postings, list) or not postings:
+            return {'success': False, 'message': 'postings must be a non-empty list'}
+        if len(postings) > MAX_BATCH_POSTINGS:
+            return {'success': False, 'message': f'At most {MAX_BATCH_POSTINGS} postings per batch'}
+        chunk_size = max(1, min(int(chunk_size or DEFAULT_BATCH_CHUNK_SIZE), MAX_BATCH_POSTINGS))
+        
+        results: List[Optional[Dict[str, Any]]] = [None] * len(postings)
+        
+        def status(index, posting_id, posting_type, state, message, entries_created=0, errors=None):
+            results[index] = {
+                'index': index,
+                'posting_id': str(posting_id) if posting_id else None,
+                'type': posting_type,
+                'status': state,
+                'message': message,
+                'entries_created': entries_created
+            }
+            if errors:
+                results[index]['errors'] = errors
+        
+        # Shape checks and duplicates within the batch
+        pending = []  # (index, type, posting_id, data)
+        seen = {}  # posting_id -> index of its first occurrence
+        duplicates = []  # (index, type, posting_id, first index)
+        for index, data in enumerate(postings):
+            if not isinstance(data, dict):
+                status(index, None, None, 'invalid', 'Posting must be an object')
+                continue
+            posting_type = str(data.get('type') or '').lower()
+            if posting_type not in BATCH_POSTING_TYPES:
+                status(index, data.get('posting_id'), posting_type or None, 'invalid',
+                       f"type must be one of {', '.join(BATCH_POSTING_TYPES)}")
+                continue
+            if not data.get('posting_id'):
+                status(index, None, posting_type, 'invalid', 'posting_id is required')
+                continue
+            try:
+                posting_id = uuid.UUID(str(data['posting_id']))
+            except ValueError:
+                status(index, data['posting_id'], posting_type, 'invalid', 'posting_id must be a UUID')
+                continue
+            if posting_id in seen:
+                # Resolved once the first occurrence has its outcome
+                duplicates.append((index, posting_type, posting_id, seen[posting_id]))
+                continue
+            seen[posting_id] = index
+            pending.append((index, posting_type, posting_id, data))
+        
+        # Idempotency: one lookup for every posting_id
+        posted = set()
+        if pending:
+            posted = {
+                row[0] for row in db.session.query(ProductionJournal.posting_id).filter(
+                    ProductionJournal.tenant_id == tenant_id,
+                    ProductionJournal.posting_id.in_([p[2] for p in pending])
+                ).all()
+            }
+        if posted:
+            entry_counts = dict(db.session.query(
+                ItemLedgerEntry.posting_id,
+                func.count(ItemLedgerEntry.id)
+            ).filter(
+                ItemLedgerEntry.tenant_id == tenant_id,
+                ItemLedgerEntry.posting_id.in_(posted)
+            ).group_by(ItemLedgerEntry.posting_id).all())
+            for index, posting_type, posting_id, _ in pending:
+                if posting_id in posted:
+                    status(index, posting_id, posting_type, 'already_posted',
+                           'Posting already exists (idempotent)', entry_counts.get(posting_id, 0))
+            pending = [p for p in pending if p[2] not in posted]
+        
+        # Set-based validation
+        validator = PostingValidator(tenant_id)
+        validator.load(p[3] for p in pending)
+        valid = []
+        for index, posting_type, posting_id, data in pending:
+            if posting_type == 'consumption':
+                errors = validator.validate_consumption(data)
+            else:
+                errors = validator.validate_output(data)
+            if errors:
+                status(index, posting_id, posting_type, 'invalid',
+                       PostingValidator.summarize(errors), errors=errors)
+            else:
+                valid.append((index, posting_type, posting_id, data))
+        
+        # Bulk insert, one transaction per chunk
+        for start in range(0, len(valid), chunk_size):
+            chunk = valid[start:start + chunk_size]
+            journal_rows = []
+            entry_rows = []
+            counts = []
+            for index, posting_type, posting_id, data in chunk:
+                data = {**data, 'posting_id': posting_id}
+                journal_rows.append(PostingService._journal_row(
+                    tenant_id, data, posting_type.capitalize(), posted_by
+                ))
+                if posting_type == 'consumption':
+                    rows = PostingService._consumption_rows(tenant_id, data, posted_by)
+                else:
+                    rows = [PostingService._output_row(tenant_id, data, posted_by)]
+                entry_rows.extend(rows)
+                counts.append(len(rows))
+            movements = [(row['item_no'], row['location_code'], row['quantity']) for row in entry_rows]
+            
+            try:
+                db.session.bulk_insert_mappings(ProductionJournal, journal_rows)
+                db.session.bulk_insert_mappings(ItemLedgerEntry, entry_rows)
+                ItemBalanceService.apply_movements(tenant_id, movements)
+                db.session.commit()
+            except IntegrityError:
+                db.session.rollback()
+                # A posting_id was posted meanwhile - post this chunk one by one
+                for index, posting_type, posting_id, data in chunk:
+                    data = {**data, 'posting_id': posting_id}
+                    if posting_type == 'consumption':
+                        result = PostingService.post_consumption(tenant_id, data, posted_by)
+                    else:
+                        result = PostingService.post_output(tenant_id, data, posted_by)
+                    if not result['success']:
+                        status(index, posting_id, posting_type, 'failed', result['message'])
+                    else:
+                        status(index, posting_id, posting_type,
+                               'already_posted' if result.get('already_posted') else 'posted',
+                               result['message'], result.get('entries_created', 1))
+                continue
+            except Exception as e:
+                db.session.rollback()
+                for index, posting_type, posting_id, _ in chunk:
+                    status(index, posting_id, posting_type, 'failed', f'Error posting batch: {str(e)}')
+                continue
+            
+            AvailabilityService.apply_movements(tenant_id, movements)
+            for (index, posting_type, posting_id, _), count in zip(chunk, counts):
+                status(index, posting_id, posting_type, 'posted',
+                       f'{posting_type.capitalize()} posted successfully', count)
+        
+        # Repeats of a posting_id within the batch follow its first occurrence
+        for index, posting_type, posting_id, first in duplicates:
+            original = results[first]
+            if original['type'] != posting_type:
+                status(index, posting_id, posting_type, 'invalid',
+                       f"Duplicate posting_id in batch with another type ({original['type']})")
+            elif original['status'] in ('posted', 'already_posted'):
+                status(index, posting_id, posting_type, 'already_posted',
+                       'Duplicate posting_id in batch (idempotent)')
+            else:
+                status(index, posting_id, posting_type, original['status'],
+                       f"Duplicate posting_id in batch: {original['message']}")
+        
+        summary = {state: 0 for state in ('posted', 'already_posted', 'invalid', 'failed')}
+        for result in results:
+            summary[result['status']] += 1
+        summary['total'] = len(results)
+        
+        return {
+            'success': summary['invalid'] == 0 and summary['failed'] == 0,
+            'results': results,
+            'summary': summary
+        }
+    
+    @staticmethod
+    def _journal_row(tenant_id: str, data: Dict[str, Any], journal_type: str, posted_by: str) -> Dict[str, Any]:
+        """ProductionJournal column values for a posting"""
+        return {
+            'posting_id': data['posting_id'],
+            'tenant_id': tenant_id,
+            'journal_type': journal_type,
+            'production_order_no': data['production_order_no'],
+            'posting_date': datetime.utcnow(),
+            'posted_by': posted_by,
+            'notes': data.get('notes'),
+            'created_by': posted_by
+        }
+    
+    @staticmethod
+    def _consumption_rows(tenant_id: str, data: Dict[str, Any], posted_by: str) -> List[Dict[str, Any]]:
+        """ItemLedgerEntry column values for each consumption line"""
+        return [
+            {
+                'posting_id': data['posting_id'],
+                'tenant_id': tenant_id,
+                'item_no': item['item_no'],
+                'description': item.get('description'),
+                'quantity': -abs(item['quantity']),  # Negative for consumption
+                'uom_code': item.get('uom_code', 'UN'),
+                'entry_type': 'Consumption',
+                'source_type': 'ProductionOrder',
+                'production_order_no': data['production_order_no'],
+                'location_code': item.get('location_code', data.get('location_code')),
+                'work_center_code': data.get('work_center_code'),
+                'operation_no': data.get('operation_no'),
+                'posting_date': datetime.utcnow(),
+                'posted_by': posted_by,
+                'created_by': posted_by
+            }
+            for item in data['items']
+        ]
+    
+    @staticmethod
+    def _output_row(tenant_id: str, data: Dict[str, Any], posted_by: str) -> Dict[str, Any]:
+        """ItemLedgerEntry column values for an output posting"""
+        return {
+            'posting_id': data['posting_id'],
+            'tenant_id': tenant_id,
+            'item_no': data['item_no'],
+            'description': data.get('description'),
+            'quantity': abs(data['quantity']),  # Positive for output
+            'uom_code': data.get('uom_code', 'UN'),
+            'entry_type': 'Output',
+            'source_type': 'ProductionOrder',
+            'production_order_no': data['production_order_no'],
+            'location_code': data.get('location_code'),
+            'work_center_code': data.get('work_center_code'),
+            'operation_no': data.get('operation_no'),
+            'posting_date': datetime.utcnow(),
+            'posted_by': posted_by,
+            'created_by': posted_by
+        }
+    
     @staticmethod
     def validate_capacity(tenant_id: str, data: Dict[str, Any]) -> tuple[bool, str]:
         """
@@ -296,6 +470,7 @@ class PostingService:
         """
         Post capacity usage
         Returns: {'success': bool, 'posting_id': str, 'message': str}
+                 ('invalid': True when the posting failed validation)
         """
         # Check idempotency
         existing_journal = ProductionJournal.query.filter_by(
@@ -314,7 +489,7 @@ class PostingService:
         # Validate
         is_valid, error_msg = PostingService.validate_capacity(tenant_id, data)
         if not is_valid:
-            return {'success': False, 'message': error_msg}
+            return {'success': False, 'message': error_msg, 'invalid': True}
         
         try:
             # Create journal header
@@ -353,6 +528,9 @@ class PostingService:
             )
             db.session.add(entry)
             
+            # Roll the daily capacity totals forward in the same transaction
+            CapacityRollupService.apply_entries(tenant_id, [entry])
+            
             db.session.commit()
             
             return {
@@ -0,0 +1,142 @@
+"""
+Posting Validator - Set-based validation for consumption/output postings
+
+Loads the referenced production orders and items with one IN query each
+(instead of one query per line) and reports every problem of a posting,
+not just the first, so operators can fix a journal in one pass:
+
+    validator = PostingValidator(tenant_id)
+    errors = validator.validate_consumption(data)
+    # [{'line': 3, 'field': 'item_no', 'item_no': 'RM-9', 'message': 'Item RM-9 not found'}, ...]
+
+Orders and items are cached on the validator, so a batch can be loaded
+once (load()) and then validated posting by posting without further
+queries.
+"""
+from typing import Any, Dict, Iterable, List, Optional
+from config.db import db
+from models.production_order import ProductionOrder
+from models.service import Service  # Items are in Service model
+
+
+class PostingValidator:
+    """Validates postings against orders and items loaded in bulk"""
+
+    def __init__(self, tenant_id: str):
+        self.tenant_id = tenant_id
+        self.orders = set()   # existing order numbers
+        self.items = set()    # existing item numbers
+        self._checked_orders = set()
+        self._checked_items = set()
+
+    def load(self, postings: Iterable[Dict[str, Any]]) -> None:
+        """Load every order and item referenced by the postings (one query each)"""
+        order_nos = set()
+        item_nos = set()
+        for data in postings:
+            if not isinstance(data, dict):
+                continue
+            if data.get('production_order_no'):
+                order_nos.add(data['production_order_no'])
+            if data.get('item_no'):
+                item_nos.add(data['item_no'])
+            items = data.get('items')
+            if isinstance(items, list):
+                for item in items:
+                    if isinstance(item, dict) and item.get('item_no'):
+                        item_nos.add(item['item_no'])
+
+        order_nos -= self._checked_orders
+        if order_nos:
+            self.orders.update(
+                row[0] for row in db.session.query(ProductionOrder.order_no).filter(
+                    ProductionOrder.tenant_id == self.tenant_id,
+                    ProductionOrder.order_no.in_(order_nos)
+                ).all()
+            )
+            self._checked_orders |= order_nos
+
+        item_nos -= self._checked_items
+        if item_nos:
+            self.items.update(
+                row[0] for row in db.session.query(Service.item_no).filter(
+                    Service.tenant_id == self.tenant_id,
+                    Service.item_no.in_(item_nos)
+                ).all()
+            )
+            self._checked_items |= item_nos
+
+    def validate_consumption(self, data: Dict[str, Any]) -> List[Dict[str, Any]]:
+        """
+        Every problem of a consumption posting
+        Returns: list of errors ({line, field, item_no, message}; line is 1-based, None for the header)
+        """
+        self.load([data])
+        errors = self._validate_header(data)
+
+        items = data.get('items')
+        if not isinstance(items, list) or len(items) == 0:
+            errors.append(self._error(None, 'items', "At least one item is required"))
+            return errors
+
+        for line, item in enumerate(items, start=1):
+            if not isinstance(item, dict):
+                errors.append(self._error(line, 'items', "Each item must be an object"))
+                continue
+            if not item.get('item_no'):
+                errors.append(self._error(line, 'item_no', "item_no is required for each item"))
+            elif item['item_no'] not in self.items:
+                errors.append(self._error(
+                    line, 'item_no', f"Item {item['item_no']} not found", item['item_no']
+                ))
+            if not self._positive(item.get('quantity')):
+                errors.append(self._error(
+                    line, 'quantity', "quantity must be > 0 for each item", item.get('item_no')
+                ))
+
+        return errors
+
+    def validate_output(self, data: Dict[str, Any]) -> List[Dict[str, Any]]:
+        """
+        Every problem of an output posting
+        Returns: list of errors ({line: None, field, item_no, message})
+        """
+        self.load([data])
+        errors = self._validate_header(data)
+
+        if not data.get('item_no'):
+            errors.append(self._error(None, 'item_no', "item_no is required"))
+        elif data['item_no'] not in self.items:
+            errors.append(self._error(None, 'item_no', f"Item {data['item_no']} not found", data['item_no']))
+        if not self._positive(data.get('quantity')):
+            errors.append(self._error(None, 'quantity', "quantity must be > 0"))
+
+        return errors
+
+    @staticmethod
+    def summarize(errors: List[Dict[str, Any]]) -> str:
+        """One message for all errors ("Line 2: Item RM-9 not found; ...")"""
+        return "; ".join(
+            f"Line {e['line']}: {e['message']}" if e['line'] else e['message']
+            for e in errors
+        )
+
+    def _validate_header(self, data: Dict[str, Any]) -> List[Dict[str, Any]]:
+        errors = []
+        if not data.get('posting_id'):
+            errors.append(self._error(None, 'posting_id', "posting_id is required"))
+        if not data.get('production_order_no'):
+            errors.append(self._error(None, 'production_order_no', "production_order_no is required"))
+        elif data['production_order_no'] not in self.orders:
+            errors.append(self._error(
+                None, 'production_order_no', f"Production order {data['production_order_no']} not found"
+            ))
+        return errors
+
+    @staticmethod
+    def _positive(value: Any) -> bool:
+        return isinstance(value, (int, float)) and not isinstance(value, bool) and value > 0
+
+    @staticmethod
+    def _error(line: Optional[int], field: str, message: str, item_no: Optional[str] = None) -> Dict[str, Any]:
+        return {'line': line, 'field': field, 'item_no': item_no, 'message': message}
@@ -15,6 +15,32 @@ Algorithm: Depth-First Search (DFS) with backtracking
 - Tracks visited nodes to prevent infinite loops
 - Uses recursion stack to detect back edges (cycles)
 - Accumulates quantities as it traverses
+- Iterative (explicit stack), so depth is not bounded by Python's recursion
+  limit; traversal state is per call, so a service instance can be shared
+  between threads
+
+Data access modes:
+- "dfs": loads each BOM/Item lazily while traversing (one round trip per lookup)
+- "level": prefetches the structure breadth-first before traversing, with one
+  `$in` query for BOMs and one for Items per BOM level. The traversal itself is
+  the same, so the result is identical to "dfs".
+- "cached": reads the tenant's certified BOM graph from the in-memory cache
+  (services.production.bom_graph); once the graph is warm the only query is
+  the indexed version lookup of the root BOM, which reloads a graph that is
+  behind the database.
+- "memo": consolidated-only explosion over the cached graph. Each
+  sub-assembly's flattened requirements per 1 unit are computed once and
+  scaled by its parents, so the cost grows with the number of distinct BOM
+  nodes instead of the number of paths. The per-unit vectors are kept on
+  the cached graph and reused across requests until it is invalidated.
+  `components` is left empty; `consolidated_components`, messages and
+  max_level match "dfs" (totals up to floating-point rounding).
+
+Consolidated requirements for several items at once (planning) are computed
+by consolidated_requirements(), a single pass over the cached graph in
+low-level-code order (services.production.low_level_code), or with
+engine="matrix" as sparse matrix-vector products in NumPy
+(services.production.bom_matrix).
 
 Usage:
     from services.production.bom_explosion import BOMExplosionService
@@ -26,18 +52,36 @@ Usage:
         level=0,
         check_availability=True
     )
+    
+    # Level-by-level prefetch (few round trips on deep BOMs)
+    result = explode_bom(tenant_id, "FG-CHAIR-001", 10, mode="level")
+    print(result.query_count)
+    
+    # Components as they are found (constant memory for the component list)
+    stream = stream_bom(tenant_id, "FG-CHAIR-001", 10)
+    for component in stream:
+        ...
+    summary = stream.result()
 """
 
-from typing import Dict, List, Optional, Set, Tuple
-from dataclasses import dataclass, field
+import logging
+from typing import Dict, Iterator, List, Optional, Set, Tuple
+from dataclasses import dataclass, field, replace
 from models.production import BOM, Item
+from .bom_graph import BOMGraph, bom_graph_cache
+from .low_level_code import low_level_order
 
+logger = logging.getLogger(__name__)
 
-@dataclass
+
+@dataclass(slots=True)
 class ExplosionComponent:
     """
     Represents a component in the explosion result.
     Consolidates quantities from multiple BOM levels.
+    
+    Slotted (no per-instance __dict__): large explosions create one instance
+    per BOM line.
     """
     item_no: str
     description: str
@@ -81,45 +125,190 @@ class ExplosionResult:
     max_level: int = 0
     has_cycles: bool = False
     cycles_detected: List[str] = field(default_factory=list)
+    query_count: int = 0  # Database round trips used to build this result
+    availability: Optional[Dict[str, dict]] = None  # item_no -> stock check (check_availability=True)
     
-    def to_dict(self) -> dict:
-        """Convert to JSON-serializable dict"""
-        return {
+    def to_dict(self, include_components: bool = True) -> dict:
+        """
+        Convert to JSON-serializable dict.
+        
+        Args:
+            include_components: False leaves out components and
+                consolidated_components (summary only)
+        """
+        data = {
             "item_no": self.item_no,
             "description": self.description,
             "quantity": self.quantity,
             "status": self.status,
             "messages": self.messages,
-            "components": [c.to_dict() for c in self.components],
-            "consolidated_components": {
+        }
+        if include_components:
+            data["components"] = [c.to_dict() for c in self.components]
+            data["consolidated_components"] = {
                 k: v.to_dict() for k, v in self.consolidated_components.items()
-            },
+            }
+        data.update({
             "max_level": self.max_level,
             "has_cycles": self.has_cycles,
             "cycles_detected": self.cycles_detected,
-        }
+            "query_count": self.query_count,
+        })
+        if self.availability is not None:
+            data["availability"] = self.availability
+        return data
+
+
+@dataclass(slots=True)
+class UnitRequirement:
+    """
+    Flattened requirement of one component per 1 unit of a sub-assembly.
+    
+    The explosion applies the accumulated parent scrap multiplier once per
+    level below the exploded item, so the requirement is kept as
+    coefficients by depth: exploding the sub-assembly with quantity q and
+    parent scrap multiplier m needs q * sum(c[d] * m**d) of the component.
+    """
+    template: ExplosionComponent  # First occurrence (level relative to the sub-assembly)
+    coefficients: List[float]
+    source_boms: List[str]
+
+
+@dataclass
+class UnitRequirements:
+    """All flattened requirements of one sub-assembly, in DFS first-occurrence order"""
+    components: Dict[str, UnitRequirement]
+    messages: List[str]
+    max_level: int
+
+
+# Supported explosion modes (see module docstring)
+EXPLOSION_MODES = ("dfs", "level", "cached", "memo")
+
+# Item types whose certified BOM is exploded further
+MANUFACTURED_TYPES = ("manufactured", "both")
+
+# Engines for consolidated_requirements()
+REQUIREMENT_ENGINES = ("level", "matrix")
+
+
+class _ExplosionState:
+    """
+    Mutable state of one explosion call.
+    
+    Created per call and never shared, so one BOMExplosionService (and the
+    cached graph behind it) can serve concurrent explosions from a thread
+    pool.
+    """
+    
+    def __init__(self, tenant_id: str, graph: Optional[BOMGraph]):
+        self.tenant_id = tenant_id
+        self.graph = graph
+        self.query_count: int = 0
+        # Per-explosion lookups (None = looked up, not found)
+        self.boms: Dict[str, Optional[BOM]] = {}
+        self.items: Dict[str, Optional[Item]] = {}
+        self.visited: Set[str] = set()
+        self.recursion_stack: Set[str] = set()
+        self.components: List[ExplosionComponent] = []
+        self.consolidated: Dict[str, ExplosionComponent] = {}
+        self.messages: List[str] = []
+        self.cycles: List[str] = []
+        self.max_level: int = 0
+    
+    def bom(self, item_no: str) -> Optional[BOM]:
+        """Certified BOM for an item (looked up once per explosion)"""
+        if self.graph is not None:
+            return self.graph.bom(item_no)
+        if item_no not in self.boms:
+            self.query_count += 1
+            self.boms[item_no] = BOM.objects(
+                tenant_id=self.tenant_id,
+                item_no=item_no,
+                status="Certified"
+            ).first()
+        return self.boms[item_no]
+    
+    def item(self, item_no: str) -> Optional[Item]:
+        """Item master record (looked up once per explosion)"""
+        if self.graph is not None:
+            return self.graph.item(item_no)
+        if item_no not in self.items:
+            self.query_count += 1
+            self.items[item_no] = Item.objects(tenant_id=self.tenant_id, item_no=item_no).first()
+        return self.items[item_no]
+    
+    def prefetch_levels(self, root_item_no: str) -> None:
+        """
+        Load every BOM and Item the explosion will touch, breadth-first.
+        
+        Each level costs one `$in` query for the certified BOMs of the level's
+        items and one `$in` query for the component Items of those BOMs.
+        Only manufactured components are carried to the next level, which is
+        exactly the set of items the DFS would look up a BOM for.
+        """
+        frontier = [root_item_no]
+        pending_items = {root_item_no}
+        
+        while frontier:
+            self.query_count += 1
+            # Default ordering (item_no, version_code) keeps the first match
+            # per item, same as BOM.objects(...).first()
+            for bom in BOM.objects(
+                tenant_id=self.tenant_id,
+                item_no__in=frontier,
+                status="Certified"
+            ):
+                self.boms.setdefault(bom.item_no, bom)
+            for item_no in frontier:
+                self.boms.setdefault(item_no, None)
+            
+            level_components = []
+            for item_no in frontier:
+                bom = self.boms[item_no]
+                if bom:
+                    level_components.extend(line.component_item_no for line in bom.lines)
+            
+            pending_items.update(c for c in level_components if c not in self.items)
+            if pending_items:
+                self.query_count += 1
+                for item in Item.objects(tenant_id=self.tenant_id, item_no__in=list(pending_items)):
+                    self.items[item.item_no] = item
+                for item_no in pending_items:
+                    self.items.setdefault(item_no, None)
+                pending_items = set()
+            
+            next_frontier = []
+            for component_no in dict.fromkeys(level_components):
+                component_item = self.items.get(component_no)
+                if (component_item and component_item.item_type in MANUFACTURED_TYPES
+                        and component_no not in self.boms):
+                    next_frontier.append(component_no)
+            frontier = next_frontier
 
 
 class BOMExplosionService:
     """
     BOM Explosion Service implementing DFS algorithm for multi-level explosion.
+    
+    The service only holds configuration; every call keeps its traversal
+    state in its own _ExplosionState, so one instance may be shared between
+    threads.
     """
     
-    def __init__(self, tenant_id: str):
+    def __init__(self, tenant_id: str, prefetch: bool = False, graph: Optional[BOMGraph] = None):
         """
         Initialize explosion service for a specific tenant.
         
         Args:
             tenant_id: Laboratory/tenant identifier
+            prefetch: Load the BOM structure level by level before traversing
+                      (one BOM query and one Item query per level)
+            graph: Cached BOM graph to read from instead of the database
         """
         self.tenant_id = tenant_id
-        self.visited: Set[str] = set()
-        self.recursion_stack: Set[str] = set()
-        self.components: List[ExplosionComponent] = []
-        self.consolidated: Dict[str, ExplosionComponent] = {}
-        self.messages: List[str] = []
-        self.cycles: List[str] = []
-        self.max_level: int = 0
+        self.prefetch = prefetch
+        self.graph = graph
     
     def explode(
         self,
@@ -130,78 +319,93 @@ class BOMExplosionService:
         check_availability: bool = False
     ) -> ExplosionResult:
         """
-        Explode a BOM recursively to get all required components.
+        Explode a BOM to get all required components.
         
-        Algorithm:
+        Algorithm (DFS with an explicit stack, no recursion):
         1. Find certified BOM for item
         2. For each line in BOM:
            a. Calculate quantity with scrap
            b. Check if component has its own BOM (sub-assembly)
-           c. If yes, recursively explode (DFS)
+           c. If yes, push it on the stack and continue with its lines (DFS)
            d. If no (or phantom), add to components list
         3. Consolidate components by item_no
-        4. Detect cycles using recursion stack
+        4. Detect cycles using recursion stack (items on the current path)
+        
+        Depth is only limited by memory, not by Python's recursion limit.
         
         Args:
             item_no: Item to explode
             quantity: Quantity to produce
-            level: Current BOM level (0=root)
+            level: BOM level of the item (0=root)
             parent_scrap_multiplier: Accumulated scrap from parent levels
-            check_availability: Whether to check inventory availability
+            check_availability: Check the consolidated requirements against
+                                on-hand stock (result.availability)
         
         Returns:
             ExplosionResult with all components and metadata
         """
-        # Initialize on first call (level 0)
-        if level == 0:
-            self.visited = set()
-            self.recursion_stack = set()
-            self.components = []
-            self.consolidated = {}
-            self.messages = []
-            self.cycles = []
-            self.max_level = 0
-        
-        # Cycle detection: Check if item is in recursion stack
-        if item_no in self.recursion_stack:
-            cycle_msg = f"Cycle detected: {item_no} appears in its own BOM tree"
-            self.messages.append(cycle_msg)
-            self.cycles.append(item_no)
-            return self._build_result(item_no, quantity, "warning")
-        
-        # Mark as visiting (push to recursion stack)
-        self.recursion_stack.add(item_no)
+        stream = self.stream(item_no, quantity, level, parent_scrap_multiplier)
+        result = stream.result(components=list(stream))
+        if check_availability:
+            result.availability = self.check_availability(list(result.consolidated_components.values()))
+        return result
+    
+    def stream(
+        self,
+        item_no: str,
+        quantity: float,
+        level: int = 0,
+        parent_scrap_multiplier: float = 1.0
+    ) -> "ExplosionStream":
+        """
+        Explode a BOM lazily, yielding components while the traversal runs.
         
-        # Get certified BOM for this item
-        bom = BOM.objects(
-            tenant_id=self.tenant_id,
-            item_no=item_no,
-            status="Certified"
-        ).first()
+        Same traversal as explode(); nothing is read until the stream is
+        iterated.
         
-        if not bom:
-            # Leaf node (purchased item or no BOM defined)
-            if level > 0:  # Don't warn for root item
-                self.messages.append(f"No certified BOM found for {item_no} (leaf component)")
-            self.recursion_stack.remove(item_no)
-            return self._build_result(item_no, quantity, "success")
+        Example:
+            stream = service.stream("FG-CHAIR-001", 10)
+            for component in stream:
+                write(component.to_dict())
+            summary = stream.result()
+        """
+        return ExplosionStream(self, item_no, quantity, level, parent_scrap_multiplier)
+    
+    def _traverse(
+        self,
+        state: _ExplosionState,
+        item_no: str,
+        quantity: float,
+        level: int,
+        parent_scrap_multiplier: float
+    ) -> Iterator[ExplosionComponent]:
+        """DFS over the BOM (explicit stack), yielding one component per BOM line"""
+        if self.prefetch and self.graph is None:
+            state.prefetch_levels(item_no)
         
-        # Get item details
-        item = Item.objects(tenant_id=self.tenant_id, item_no=item_no).first()
-        item_type = item.item_type if item else "unknown"
+        stack = []
+        frame = self._enter(state, item_no, quantity, level, parent_scrap_multiplier)
+        if frame:
+            stack.append(frame)
         
-        # Explode each line in the BOM
-        for line in bom.lines:
+        while stack:
+            parent_no, lines, parent_level, parent_qty, parent_multiplier, parent_sources = stack[-1]
+            line = next(lines, None)
+            
+            if line is None:
+                # Mark as visited (pop from recursion stack)
+                stack.pop()
+                state.recursion_stack.remove(parent_no)
+                state.visited.add(parent_no)
+                continue
+            
             # Calculate quantity with scrap
             # Formula: component_qty = (qty_per * parent_qty) * (1 + scrap_pct/100) * parent_scrap_multiplier
             scrap_multiplier = 1.0 + (line.scrap_pct / 100.0)
-            component_qty = line.quantity_per * quantity * scrap_multiplier * parent_scrap_multiplier
+            component_qty = line.quantity_per * parent_qty * scrap_multiplier * parent_multiplier
             
             # Get component item details
-            component_item = Item.objects(
-                tenant_id=self.tenant_id,
-                item_no=line.component_item_no
-            ).first()
+            component_item = state.item(line.component_item_no)
             
             is_phantom = False
             if component_item:
@@ -209,7 +413,10 @@ class BOMExplosionService:
                 # For now, we'll use item_type logic
                 is_phantom = getattr(component_item, 'is_phantom', False)
             
-            # Create component entry
+            existing = state.consolidated.get(line.component_item_no)
+            
+            # Create component entry (rows share the read-only [parent_no]
+            # list of the frame)
             component = ExplosionComponent(
                 item_no=line.component_item_no,
                 description=line.description or (component_item.description if component_item else ""),
@@ -217,58 +424,346 @@ class BOMExplosionService:
                 quantity_per=line.quantity_per,
                 total_quantity=component_qty,
                 scrap_pct=line.scrap_pct,
-                level=level + 1,
+                level=parent_level + 1,
                 is_phantom=is_phantom,
                 position=line.position,
-                source_boms=[bom.item_no],
+                source_boms=parent_sources,
             )
             
-            # Add to components list
-            self.components.append(component)
-            
             # Update max level tracking
-            if component.level > self.max_level:
-                self.max_level = component.level
+            if component.level > state.max_level:
+                state.max_level = component.level
             
             # Consolidate (aggregate same components)
-            if component.item_no in self.consolidated:
-                existing = self.consolidated[component.item_no]
+            if existing:
                 existing.total_quantity += component.total_quantity
-                if bom.item_no not in existing.source_boms:
-                    existing.source_boms.append(bom.item_no)
+                if parent_no not in existing.source_boms:
+                    existing.source_boms.append(parent_no)
             else:
-                self.consolidated[component.item_no] = component
+                # Own copy: the row keeps its BOM line values, the entry accumulates
+                state.consolidated[component.item_no] = replace(component, source_boms=[parent_no])
             
-            # Recursive explosion if component is manufactured or phantom
-            if component_item and component_item.item_type in ["manufactured", "both"]:
-                # Recursively explode sub-assembly
-                self.explode(
-                    item_no=line.component_item_no,
-                    quantity=component_qty,
-                    level=level + 1,
-                    parent_scrap_multiplier=scrap_multiplier * parent_scrap_multiplier,
-                    check_availability=check_availability
+            # Descend into the sub-assembly if component is manufactured
+            if component_item and component_item.item_type in MANUFACTURED_TYPES:
+                frame = self._enter(
+                    state,
+                    line.component_item_no,
+                    component_qty,
+                    parent_level + 1,
+                    scrap_multiplier * parent_multiplier,
+                )
+                if frame:
+                    stack.append(frame)
+            
+            yield component
+    
+    @staticmethod
+    def _enter(
+        state: _ExplosionState,
+        item_no: str,
+        quantity: float,
+        level: int,
+        parent_scrap_multiplier: float
+    ) -> Optional[tuple]:
+        """
+        Start exploding an item.
+        
+        Returns:
+            Stack frame (item_no, line iterator, level, quantity, scrap
+            multiplier, shared source_boms list), or None for a cycle or a leaf
+        """
+        # Cycle detection: Check if item is in recursion stack
+        if item_no in state.recursion_stack:
+            state.messages.append(f"Cycle detected: {item_no} appears in its own BOM tree")
+            state.cycles.append(item_no)
+            return None
+        
+        # Get certified BOM for this item
+        bom = state.bom(item_no)
+        
+        if not bom:
+            # Leaf node (purchased item or no BOM defined)
+            if level > 0:  # Don't warn for root item
+                state.messages.append(f"No certified BOM found for {item_no} (leaf component)")
+            return None
+        
+        # Mark as visiting (push to recursion stack)
+        state.recursion_stack.add(item_no)
+        return (item_no, iter(bom.lines), level, quantity, parent_scrap_multiplier, [item_no])
+    
+    def explode_memoized(self, item_no: str, quantity: float) -> ExplosionResult:
+        """
+        Consolidated explosion using per-unit requirement vectors.
+        
+        Requires a graph. Every sub-assembly is expanded once into its
+        UnitRequirements (memoized on the graph), and parents scale the
+        child's vector instead of walking its subtree again.
+        
+        Cycles make the result depend on the path, so structures with a
+        cycle fall back to the regular DFS explosion.
+        
+        Args:
+            item_no: Item to explode
+            quantity: Quantity to produce
+        
+        Returns:
+            ExplosionResult with consolidated components (components list empty)
+        """
+        if self.graph is None:
+            raise ValueError("Memoized explosion requires a BOM graph")
+        
+        if self._reaches_cycle(item_no):
+            return self.explode(item_no, quantity)
+        
+        state = _ExplosionState(self.tenant_id, self.graph)
+        
+        if self.graph.bom(item_no):
+            unit = self._unit_requirements(item_no)
+            for component_no, requirement in unit.components.items():
+                # Root is exploded with a parent scrap multiplier of 1.0
+                state.consolidated[component_no] = replace(
+                    requirement.template,
+                    total_quantity=quantity * sum(requirement.coefficients),
+                    source_boms=list(requirement.source_boms),
                 )
+            state.messages = list(unit.messages)
+            state.max_level = unit.max_level
+        
+        return self._build_result(state, item_no, quantity, "success")
+    
+    def consolidated_requirements(self, demands: Dict[str, float], engine: str = "level") -> Dict[str, float]:
+        """
+        Total component requirements for several items, in one pass by low-level code.
+        
+        Items are processed in ascending low-level code, so each item's
+        requirement is complete before it is pushed to its components. The
+        result equals summing the DFS consolidated totals of every demand.
+        
+        Because the DFS applies the accumulated parent scrap multiplier at
+        every level, each item carries moments W[j] = sum(q * m**j) over the
+        paths reaching it (q = path quantity, m = path scrap multiplier); a
+        line with qty_per and scrap s contributes qty_per * s**(j+1) * W[j+1]
+        to the component's W[j], and W[0] is the requirement.
+        
+        With engine="matrix" the same moments are propagated as sparse
+        matrix-vector products over the whole graph (services.production.
+        bom_matrix, needs NumPy), which is faster on large item masters.
+        
+        Args:
+            demands: item_no -> quantity to produce
+            engine: "level" (pure Python) or "matrix" (NumPy)
+        
+        Returns:
+            item_no -> total required quantity (demanded items themselves are
+            only included when another demand uses them as a component)
+        """
+        if self.graph is None:
+            raise ValueError("Level-order explosion requires a BOM graph")
+        if engine not in REQUIREMENT_ENGINES:
+            raise ValueError(f"Unknown requirement engine '{engine}'")
         
-        # Mark as visited (pop from recursion stack)
-        self.recursion_stack.remove(item_no)
-        self.visited.add(item_no)
+        codes = low_level_order(self.graph)
+        if codes is None:
+            # Cycle: no level order exists, use the DFS (which stops at the cycle)
+            totals: Dict[str, float] = {}
+            for item_no, quantity in demands.items():
+                result = self.explode(item_no, quantity)
+                for component_no, component in result.consolidated_components.items():
+                    totals[component_no] = totals.get(component_no, 0.0) + component.total_quantity
+            return totals
         
-        # Build result on root level
-        if level == 0:
-            return self._build_result(item_no, quantity, "success")
+        depth = max(codes.values(), default=0) + 1
+        if engine == "matrix":
+            from .bom_matrix import RequirementMatrix
+            return RequirementMatrix.for_graph(self.graph, depth).requirements(demands)
         
-        return None  # Intermediate levels return None
+        moments: Dict[str, List[float]] = {}
+        levels: Dict[int, List[str]] = {}
+        
+        def push(item_no: str, vector: List[float]) -> None:
+            """Add an item's requirement moments to its BOM components"""
+            for line in self.graph.bom(item_no).lines:
+                scrap_multiplier = 1.0 + (line.scrap_pct / 100.0)
+                component_no = line.component_item_no
+                child = moments.get(component_no)
+                if child is None:
+                    child = moments[component_no] = [0.0] * depth
+                    levels.setdefault(codes[component_no], []).append(component_no)
+                factor = line.quantity_per
+                for j in range(depth - 1):
+                    factor *= scrap_multiplier
+                    child[j] += factor * vector[j + 1]
+        
+        # explode() always expands the root's BOM (q = quantity, m = 1);
+        # below the root only manufactured items are expanded
+        for item_no, quantity in demands.items():
+            if self.graph.bom(item_no):
+                push(item_no, [quantity] * depth)
+        
+        for level in range(depth):
+            for item_no in levels.get(level, ()):
+                if self._explodes(item_no) and self.graph.bom(item_no):
+                    push(item_no, moments[item_no])
+        
+        return {item_no: vector[0] for item_no, vector in moments.items()}
+    
+    def _explodes(self, component_no: str) -> bool:
+        """Whether explode() recurses into a component"""
+        component_item = self.graph.item(component_no)
+        return bool(component_item and component_item.item_type in MANUFACTURED_TYPES)
+    
+    def _reaches_cycle(self, item_no: str) -> bool:
+        """Detect a back edge reachable from item_no (iterative 3-colour DFS)"""
+        done: Set[str] = set()
+        on_path: Set[str] = {item_no}
+        stack = [(item_no, iter(self._child_items(item_no)))]
+        while stack:
+            node, children = stack[-1]
+            child = next(children, None)
+            if child is None:
+                stack.pop()
+                on_path.discard(node)
+                done.add(node)
+            elif child in on_path:
+                return True
+            elif child not in done:
+                on_path.add(child)
+                stack.append((child, iter(self._child_items(child))))
+        return False
+    
+    def _child_items(self, item_no: str) -> List[str]:
+        """Components of item_no's certified BOM that are exploded further"""
+        bom = self.graph.bom(item_no)
+        if not bom:
+            return []
+        return [line.component_item_no for line in bom.lines if self._explodes(line.component_item_no)]
     
-    def _build_result(self, item_no: str, quantity: float, status: str) -> ExplosionResult:
+    def _unit_requirements(self, item_no: str) -> UnitRequirements:
+        """
+        Flattened requirements per 1 unit of item_no (memoized on the graph).
+        
+        Sub-assemblies are built children first (iterative post-order), so
+        every parent only scales vectors that are already memoized. Must
+        only be called on acyclic structures.
+        """
+        memo = self.graph.unit_requirements
+        if item_no in memo:
+            return memo[item_no]
+        
+        stack = [(item_no, iter(self._child_items(item_no)))]
+        pending: Set[str] = {item_no}
+        while stack:
+            node, children = stack[-1]
+            child = next(children, None)
+            if child is None:
+                stack.pop()
+                memo[node] = self._build_unit_requirements(node)
+            elif child not in memo and child not in pending:
+                pending.add(child)
+                stack.append((child, iter(self._child_items(child))))
+        return memo[item_no]
+    
+    def _build_unit_requirements(self, item_no: str) -> UnitRequirements:
+        """Per-unit requirements of one item from its lines and its children's memoized vectors"""
+        bom = self.graph.bom(item_no)
+        if not bom:
+            return UnitRequirements(
+                components={},
+                messages=[f"No certified BOM found for {item_no} (leaf component)"],
+                max_level=0,
+            )
+        
+        components: Dict[str, UnitRequirement] = {}
+        messages: List[str] = []
+        max_level = 0
+        
+        for line in bom.lines:
+            scrap_multiplier = 1.0 + (line.scrap_pct / 100.0)
+            component_item = self.graph.item(line.component_item_no)
+            is_phantom = getattr(component_item, 'is_phantom', False) if component_item else False
+            
+            # The line itself: qty_per * q * scrap * m
+            self._merge_requirement(
+                components,
+                line.component_item_no,
+                ExplosionComponent(
+                    item_no=line.component_item_no,
+                    description=line.description or (component_item.description if component_item else ""),
+                    uom_code=line.uom_code,
+                    quantity_per=line.quantity_per,
+                    total_quantity=0.0,
+                    scrap_pct=line.scrap_pct,
+                    level=1,
+                    is_phantom=is_phantom,
+                    position=line.position,
+                ),
+                [0.0, line.quantity_per * scrap_multiplier],
+                [bom.item_no],
+            )
+            max_level = max(max_level, 1)
+            
+            if not self._explodes(line.component_item_no):
+                continue
+            
+            # The sub-assembly is exploded with q' = qty_per * q * scrap * m and
+            # m' = scrap * m, so its depth-d coefficient moves to depth d + 1
+            # scaled by qty_per * scrap ** (d + 1)
+            child = self.graph.unit_requirements[line.component_item_no]
+            for component_no, requirement in child.components.items():
+                factor = line.quantity_per
+                shifted = [0.0]
+                for coefficient in requirement.coefficients:
+                    factor *= scrap_multiplier
+                    shifted.append(coefficient * factor)
+                self._merge_requirement(
+                    components,
+                    component_no,
+                    replace(requirement.template, level=requirement.template.level + 1),
+                    shifted,
+                    requirement.source_boms,
+                )
+            messages.extend(child.messages)
+            if child.components:
+                max_level = max(max_level, child.max_level + 1)
+        
+        return UnitRequirements(components=components, messages=messages, max_level=max_level)
+    
+    @staticmethod
+    def _merge_requirement(
+        components: Dict[str, UnitRequirement],
+        component_no: str,
+        template: ExplosionComponent,
+        coefficients: List[float],
+        source_boms: List[str]
+    ) -> None:
+        """Add coefficients/sources for a component, keeping the first occurrence's template"""
+        existing = components.get(component_no)
+        if existing is None:
+            components[component_no] = UnitRequirement(
+                template=template,
+                coefficients=list(coefficients),
+                source_boms=list(source_boms),
+            )
+            return
+        
+        if len(existing.coefficients) < len(coefficients):
+            existing.coefficients.extend([0.0] * (len(coefficients) - len(existing.coefficients)))
+        for depth, coefficient in enumerate(coefficients):
+            existing.coefficients[depth] += coefficient
+        for source in source_boms:
+            if source not in existing.source_boms:
+                existing.source_boms.append(source)
+    
+    @staticmethod
+    def _build_result(state: _ExplosionState, item_no: str, quantity: float, status: str) -> ExplosionResult:
         """Build final explosion result"""
         # Get root item details
-        item = Item.objects(tenant_id=self.tenant_id, item_no=item_no).first()
+        item = state.item(item_no)
         description = item.description if item else item_no
         
         # Determine final status
         final_status = status
-        if self.cycles:
+        if state.cycles:
             final_status = "warning"
         
         return ExplosionResult(
@@ -276,70 +771,135 @@ class BOMExplosionService:
             description=description,
             quantity=quantity,
             status=final_status,
-            messages=self.messages,
-            components=self.components,
-            consolidated_components=self.consolidated,
-            max_level=self.max_level,
-            has_cycles=len(self.cycles) > 0,
-            cycles_detected=self.cycles,
+            messages=state.messages,
+            components=state.components,
+            consolidated_components=state.consolidated,
+            max_level=state.max_level,
+            has_cycles=len(state.cycles) > 0,
+            cycles_detected=state.cycles,
+            query_count=state.query_count,
         )
     
-    def check_availability(self, components: List[ExplosionComponent]) -> Dict[str, dict]:
+    def check_availability(
+        self,
+        components: List[ExplosionComponent],
+        location_code: Optional[str] = None
+    ) -> Dict[str, dict]:
         """
         Check inventory availability for components.
         
+        On-hand stock comes from the item ledger (AvailabilityService: one
+        grouped aggregate for the items not in its running-balance cache);
+        safety stock from one Item query for all components.
+        
         Args:
-            components: List of components to check
+            components: List of components to check (quantities of the same
+                        item are added up)
+            location_code: Only count stock at this location (None = all)
         
         Returns:
-            Dict mapping item_no to availability info
+            Dict mapping item_no to availability info ("available": None
+            when the item ledger is not available)
         """
-        availability = {}
-        
+        requirements: Dict[str, float] = {}
         for component in components:
-            item = Item.objects(
+            requirements[component.item_no] = requirements.get(component.item_no, 0.0) + component.total_quantity
+        
+        items = {
+            item.item_no: item
+            for item in Item.objects(
                 tenant_id=self.tenant_id,
-                item_no=component.item_no
-            ).first()
-            
-            if not item:
-                availability[component.item_no] = {
+                item_no__in=list(requirements)
+            ).only("item_no", "safety_stock_qty")
+        }
+        
+        try:
+            # The ledger lives in the optional SQL database; keep it off the
+            # import path of the Mongo-only explosion
+            from services.availability_service import AvailabilityService
+        except ImportError as e:
+            logger.warning("BOM explosion: item ledger not available, availability unknown: %s", e)
+            availability = {
+                item_no: {
+                    "available": None,
+                    "reason": "Availability unknown (item ledger not available)",
+                    "on_hand": None,
+                    "safety_stock": items[item_no].safety_stock_qty or 0,
+                    "required": required,
+                    "shortage": None,
+                }
+                for item_no, required in requirements.items() if item_no in items
+            }
+        else:
+            availability = AvailabilityService.check_availability(
+                self.tenant_id,
+                {item_no: qty for item_no, qty in requirements.items() if item_no in items},
+                safety_stock={item_no: item.safety_stock_qty or 0 for item_no, item in items.items()},
+                location_code=location_code,
+            )
+        
+        for item_no, required in requirements.items():
+            if item_no not in items:
+                availability[item_no] = {
                     "available": False,
                     "reason": "Item not found",
                     "on_hand": 0,
-                    "required": component.total_quantity,
-                    "shortage": component.total_quantity,
+                    "required": required,
+                    "shortage": required,
                 }
-                continue
-            
-            # In a real system, we'd query inventory here
-            # For now, we'll use safety stock as a proxy
-            on_hand = getattr(item, 'inventory_quantity', 0)  # Future field
-            safety_stock = getattr(item, 'safety_stock_qty', 0)
-            
-            required = component.total_quantity
-            available_qty = max(0, on_hand - safety_stock)
-            shortage = max(0, required - available_qty)
-            
-            availability[component.item_no] = {
-                "available": shortage == 0,
-                "reason": "Sufficient stock" if shortage == 0 else "Insufficient stock",
-                "on_hand": on_hand,
-                "safety_stock": safety_stock,
-                "available_qty": available_qty,
-                "required": required,
-                "shortage": shortage,
-            }
         
         return availability
 
 
+class ExplosionStream:
+    """
+    Components of one explosion, produced while the traversal runs.
+    
+    Iterate once. Components come in DFS order (the order of
+    ExplosionResult.components) and are not kept by the stream, so memory
+    is bounded by the consolidation map rather than the number of BOM
+    lines. Components are final when yielded (consolidation accumulates
+    into separate entries), so streamed rows equal ExplosionResult.components.
+    
+    After iteration, result() returns the consolidated components,
+    messages, cycles and max level.
+    """
+    
+    def __init__(
+        self,
+        service: BOMExplosionService,
+        item_no: str,
+        quantity: float,
+        level: int = 0,
+        parent_scrap_multiplier: float = 1.0
+    ):
+        self.item_no = item_no
+        self.quantity = quantity
+        self.state = _ExplosionState(service.tenant_id, service.graph)
+        self._components = service._traverse(self.state, item_no, quantity, level, parent_scrap_multiplier)
+    
+    def __iter__(self) -> Iterator[ExplosionComponent]:
+        return self._components
+    
+    def result(self, components: Optional[List[ExplosionComponent]] = None) -> ExplosionResult:
+        """
+        Explosion result once the stream is exhausted.
+        
+        Args:
+            components: Components collected by the caller (left empty if None)
+        """
+        if components is not None:
+            self.state.components = components
+        return BOMExplosionService._build_result(self.state, self.item_no, self.quantity, "success")
+
+
 # Convenience function for direct use
 def explode_bom(
     tenant_id: str,
     item_no: str,
     quantity: float,
-    check_availability: bool = False
+    check_availability: bool = False,
+    mode: str = "dfs"
 ) -> ExplosionResult:
     """
     Convenience function to explode a BOM.
@@ -349,6 +909,7 @@ def explode_bom(
         item_no: Item to explode
         quantity: Quantity to produce
         check_availability: Whether to check inventory availability
+        mode: Data access mode, one of EXPLOSION_MODES
     
     Returns:
         ExplosionResult with all components
@@ -359,5 +920,105 @@ def explode_bom(
         for comp in result.components:
             print(f"  {comp.item_no}: {comp.total_quantity}")
     """
-    service = BOMExplosionService(tenant_id)
+    if mode not in EXPLOSION_MODES:
+        raise ValueError(f"Unknown explosion mode '{mode}'")
+    
+    if mode in ("cached", "memo"):
+        graph, loaded = bom_graph_cache.fetch_current(tenant_id, item_no)
+        service = BOMExplosionService(tenant_id, graph=graph)
+        if mode == "memo":
+            result = service.explode_memoized(item_no, quantity)
+            if check_availability:
+                result.availability = service.check_availability(list(result.consolidated_components.values()))
+        else:
+            result = service.explode(item_no, quantity, check_availability=check_availability)
+        # Version lookup of the root BOM, plus the graph load
+        result.query_count = 1 + (graph.query_count if loaded else 0)
+        return result
+    
+    service = BOMExplosionService(tenant_id, prefetch=(mode == "level"))
     return service.explode(item_no, quantity, check_availability=check_availability)
+
+
+def stream_bom(
+    tenant_id: str,
+    item_no: str,
+    quantity: float,
+    mode: str = "cached"
+) -> ExplosionStream:
+    """
+    Convenience function to explode a BOM as a stream of components.
+    
+    Args:
+        tenant_id: Laboratory/tenant identifier
+        item_no: Item to explode
+        quantity: Quantity to produce
+        mode: "dfs", "level" or "cached" ("memo" has no component list)
+    
+    Example:
+        stream = stream_bom("lab123", "FG-CHAIR-001", 10)
+        for comp in stream:
+            print(f"  {comp.item_no}: {comp.total_quantity}")
+        print(stream.result().max_level)
+    """
+    if mode not in EXPLOSION_MODES or mode == "memo":
+        raise ValueError(f"Unsupported streaming mode '{mode}'")
+    
+    if mode == "cached":
+        graph, loaded = bom_graph_cache.fetch_current(tenant_id, item_no)
+        stream = BOMExplosionService(tenant_id, graph=graph).stream(item_no, quantity)
+        stream.state.query_count = 1 + (graph.query_count if loaded else 0)
+        return stream
+    
+    service = BOMExplosionService(tenant_id, prefetch=(mode == "level"))
+    return service.stream(item_no, quantity)
+
+
+def explode_batch(
+    service: BOMExplosionService,
+    orders: List[Tuple[str, float]],
+    mode: str = "memo"
+) -> Iterator[ExplosionResult]:
+    """
+    Explode several orders over one shared BOM graph.
+    
+    Results are yielded as each order finishes, so callers can stream them.
+    In "memo" mode sub-assembly vectors computed for one order are reused
+    by the following ones.
+    
+    Args:
+        service: Explosion service bound to a BOM graph
+        orders: (item_no, quantity) pairs
+        mode: "memo" (consolidated only) or "cached" (full component list)
+    """
+    if mode not in ("memo", "cached"):
+        raise ValueError(f"Unsupported batch explosion mode '{mode}'")
+    
+    for item_no, quantity in orders:
+        if mode == "memo":
+            yield service.explode_memoized(item_no, quantity)
+        else:
+            yield service.explode(item_no, quantity)
+
+
+def explode_requirements(
+    tenant_id: str,
+    demands: Dict[str, float],
+    engine: str = "level"
+) -> Dict[str, float]:
+    """
+    Consolidated component requirements for several items (one level-order pass).
+    
+    Args:
+        tenant_id: Laboratory/tenant identifier
+        demands: item_no -> quantity to produce
+        engine: One of REQUIREMENT_ENGINES
+    
+    Returns:
+        item_no -> total required quantity
+    
+    Example:
+        totals = explode_requirements("lab123", {"FG-CROWN-001": 20, "FG-BRIDGE-002": 5})
+    """
+    service = BOMExplosionService(tenant_id, graph=bom_graph_cache.get(tenant_id))
+    return service.consolidated_requirements(demands, engine=engine)
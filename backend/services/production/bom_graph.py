@@ -0,0 +1,345 @@
+# backend/services/production/bom_graph.py
+"""
+BOM Graph Cache - Tenant-scoped in-memory snapshot of certified BOMs
+
+The graph holds, per tenant:
+- item_no -> certified BOM node (version + lines)
+- item_no -> item node (description, item_type, phantom flag, low-level code)
+
+It is loaded with two queries (all certified BOMs, all Items) and then
+served from memory, so repeat explosions of the same structures need no
+database access.
+
+Invalidation:
+- Every tenant has a version counter. Routes that change BOMs or Items
+  (create/update/certify/close/delete) call invalidate_bom_graph(), which
+  bumps the counter; a cached graph built for an older version is rebuilt
+  on next use.
+- Counters live in process memory. To bound staleness across workers, a
+  graph is also rebuilt once it is older than BOM_GRAPH_CACHE_TTL seconds
+  (default 60, 0 disables the age check).
+- fetch_current() additionally checks the root item's certified BOM
+  version with one indexed lookup and rebuilds a graph that is behind it
+  (a BOM certified in another process); explosions and order creation
+  use it. fetch_current_many() does the same for a batch's roots with one
+  $in query.
+
+Usage:
+    from services.production.bom_graph import bom_graph_cache, invalidate_bom_graph
+
+    graph = bom_graph_cache.get(tenant_id)
+    node = graph.bom("FG-CHAIR-001")
+    for line, per_unit, level, path in graph.unit_lines("FG-CHAIR-001", graph.is_phantom):
+        ...
+
+    invalidate_bom_graph(tenant_id)  # after certifying a BOM
+"""
+
+import os
+import sys
+import threading
+import time
+from typing import Callable, Dict, Iterable, Iterator, NamedTuple, Optional, Tuple
+
+from models.production import BOM, Item
+
+
+def _intern(value: Optional[str]) -> Optional[str]:
+    """Intern item numbers/UoM codes so the many lines and explosion rows
+    referring to the same item share one string"""
+    return sys.intern(value) if isinstance(value, str) else value
+
+
+class GraphLine(NamedTuple):
+    """BOM line fields used by explosion and order creation"""
+    line_no: int
+    component_item_no: str
+    description: Optional[str]
+    quantity_per: float
+    uom_code: Optional[str]
+    scrap_pct: float
+    position: Optional[str]
+
+
+class GraphNode(NamedTuple):
+    """Certified BOM of one item"""
+    item_no: str
+    version_code: str
+    is_phantom: bool
+    lines: Tuple[GraphLine, ...]
+
+
+class GraphItem(NamedTuple):
+    """Item master fields used by explosion"""
+    item_no: str
+    description: str
+    item_type: str
+    phantom_bom: bool
+    low_level_code: Optional[int] = None
+
+
+class BOMGraph:
+    """
+    Immutable snapshot of a tenant's certified BOM structure.
+
+    Safe to share between requests and threads: nodes are tuples and the
+    node/item dictionaries are never modified after loading.
+    """
+
+    def __init__(
+        self,
+        tenant_id: str,
+        version: int,
+        nodes: Dict[str, GraphNode],
+        items: Dict[str, GraphItem],
+        query_count: int = 0
+    ):
+        self.tenant_id = tenant_id
+        self.version = version
+        self.nodes = nodes
+        self.items = items
+        self.query_count = query_count
+        self.built_at = time.monotonic()
+        # Per-unit sub-assembly requirements, filled lazily by the memoized
+        # explosion (services.production.bom_explosion); valid for the
+        # lifetime of this snapshot
+        self.unit_requirements: Dict[str, object] = {}
+        # Sparse requirement matrix (services.production.bom_matrix), built
+        # on first use
+        self.requirement_matrix = None
+
+    def bom(self, item_no: str) -> Optional[GraphNode]:
+        """Certified BOM for an item, or None for leaf items"""
+        return self.nodes.get(item_no)
+
+    def item(self, item_no: str) -> Optional[GraphItem]:
+        """Item record, or None if the item does not exist"""
+        return self.items.get(item_no)
+
+    def is_phantom(self, item_no: str) -> bool:
+        """Certified BOM that is phantom (on the BOM or the item)"""
+        item = self.items.get(item_no)
+        node = self.nodes.get(item_no)
+        return bool(node and (node.is_phantom or (item and item.phantom_bom)))
+
+    def unit_lines(
+        self, item_no: str, descend: Callable[[str], bool]
+    ) -> Iterator[Tuple[GraphLine, float, int, Tuple[str, ...]]]:
+        """
+        Expand one unit of an item's BOM (iterative DFS, lines in BOM order).
+
+        Components for which descend() is true (and that have a BOM) are
+        passed through to their own lines; every other line is yielded once
+        per occurrence as (line, quantity per unit of item_no, level, path).
+        The quantity applies one scrap factor per BOM line, multiplied
+        through the passed-through BOMs. Shared by MRP
+        (services.production.mrp) and multi-level order creation
+        (services.production.order_explosion).
+
+        Raises:
+            ValueError: a cycle through passed-through BOMs
+        """
+        node = self.nodes.get(item_no)
+        if node is None:
+            return
+        # (lines, quantity of the BOM per unit of item_no, level, items on the path)
+        stack = [(iter(node.lines), 1.0, 1, (item_no,))]
+        while stack:
+            lines, parent_quantity, level, path = stack[-1]
+            line = next(lines, None)
+            if line is None:
+                stack.pop()
+                continue
+            quantity = parent_quantity * line.quantity_per * (1.0 + (line.scrap_pct or 0.0) / 100.0)
+            component = self.nodes.get(line.component_item_no)
+            if component is not None and descend(line.component_item_no):
+                if line.component_item_no in path:
+                    raise ValueError(
+                        f"BOM structure has a cycle: {' -> '.join(path + (line.component_item_no,))}"
+                    )
+                stack.append((iter(component.lines), quantity, level + 1, path + (line.component_item_no,)))
+                continue
+            yield line, quantity, level, path
+
+    @classmethod
+    def load(cls, tenant_id: str, version: int = 0) -> "BOMGraph":
+        """Load all certified BOMs and Items of a tenant (two queries)"""
+        nodes: Dict[str, GraphNode] = {}
+        # Default ordering (item_no, version_code) keeps the same version
+        # BOM.objects(...).first() would return if several are certified
+        for bom in BOM.objects(tenant_id=tenant_id, status="Certified").only(
+            "item_no", "version_code", "is_phantom", "lines"
+        ):
+            if bom.item_no in nodes:
+                continue
+            nodes[bom.item_no] = GraphNode(
+                item_no=_intern(bom.item_no),
+                version_code=bom.version_code,
+                is_phantom=bool(bom.is_phantom),
+                lines=tuple(
+                    GraphLine(
+                        line_no=line.line_no,
+                        component_item_no=_intern(line.component_item_no),
+                        description=line.description,
+                        quantity_per=line.quantity_per,
+                        uom_code=_intern(line.uom_code),
+                        scrap_pct=line.scrap_pct,
+                        position=line.position,
+                    )
+                    for line in bom.lines
+                ),
+            )
+
+        items: Dict[str, GraphItem] = {}
+        for item in Item.objects(tenant_id=tenant_id).only(
+            "item_no", "description", "item_type", "phantom_bom", "low_level_code"
+        ):
+            items[item.item_no] = GraphItem(
+                item_no=_intern(item.item_no),
+                description=item.description,
+                item_type=item.item_type,
+                phantom_bom=bool(item.phantom_bom),
+                low_level_code=item.low_level_code,
+            )
+
+        return cls(tenant_id, version, nodes, items, query_count=2)
+
+
+class BOMGraphCache:
+    """
+    Per-tenant BOMGraph cache with version-counter invalidation.
+
+    Counters:
+    - hits: graph served from memory
+    - misses: graph (re)loaded from the database
+    - invalidations: invalidate() calls
+    """
+
+    def __init__(self, max_age_seconds: float = 60.0):
+        self.max_age_seconds = max_age_seconds
+        self._lock = threading.Lock()
+        self._versions: Dict[str, int] = {}
+        self._graphs: Dict[str, BOMGraph] = {}
+        self.hits = 0
+        self.misses = 0
+        self.invalidations = 0
+
+    def version(self, tenant_id: str) -> int:
+        """Current version counter of a tenant"""
+        return self._versions.get(tenant_id, 0)
+
+    def fetch(self, tenant_id: str) -> Tuple[BOMGraph, bool]:
+        """
+        Get the tenant graph.
+
+        Returns:
+            (graph, loaded) - loaded is True when the database was queried
+        """
+        with self._lock:
+            version = self._versions.get(tenant_id, 0)
+            graph = self._graphs.get(tenant_id)
+            if graph is not None and graph.version == version and not self._expired(graph):
+                self.hits += 1
+                return graph, False
+            self.misses += 1
+
+        # Load outside the lock so one slow tenant doesn't block the others
+        graph = BOMGraph.load(tenant_id, version)
+
+        with self._lock:
+            # Keep it only if nothing was invalidated while loading
+            if self._versions.get(tenant_id, 0) == version:
+                self._graphs[tenant_id] = graph
+        return graph, True
+
+    def get(self, tenant_id: str) -> BOMGraph:
+        """Get the tenant graph (loading it if needed)"""
+        return self.fetch(tenant_id)[0]
+
+    def fetch_current(self, tenant_id: str, item_no: str) -> Tuple[BOMGraph, bool]:
+        """
+        fetch(), rebuilt if its certified BOM of item_no is not the database's.
+
+        Reads the certified version_code of item_no (one indexed lookup) and
+        reloads the graph when its node for item_no is missing or at another
+        version.
+
+        Returns:
+            (graph, loaded) - loaded is True when the graph was (re)loaded
+        """
+        return self.fetch_current_many(tenant_id, [item_no])
+
+    def fetch_current_many(self, tenant_id: str, item_nos: Iterable[str]) -> Tuple[BOMGraph, bool]:
+        """fetch_current() for several roots (one $in query on their certified BOMs)"""
+        item_nos = sorted(set(item_nos))
+        certified = {
+            bom.item_no: bom.version_code
+            for bom in BOM.objects(tenant_id=tenant_id, item_no__in=item_nos, status="Certified").only(
+                "item_no", "version_code"
+            )
+        }
+        graph, loaded = self.fetch(tenant_id)
+        if loaded:
+            return graph, loaded
+        for item_no in item_nos:
+            node = graph.bom(item_no)
+            if (node.version_code if node else None) != certified.get(item_no):
+                self.invalidate(tenant_id)
+                return self.fetch(tenant_id)
+        return graph, loaded
+
+    def invalidate(self, tenant_id: str) -> int:
+        """Bump the tenant version counter and drop its graph"""
+        with self._lock:
+            version = self._versions.get(tenant_id, 0) + 1
+            self._versions[tenant_id] = version
+            self._graphs.pop(tenant_id, None)
+            self.invalidations += 1
+            return version
+
+    def clear(self) -> None:
+        """Drop every cached graph (counters are kept)"""
+        with self._lock:
+            for tenant_id in list(self._graphs):
+                self._versions[tenant_id] = self._versions.get(tenant_id, 0) + 1
+            self._graphs.clear()
+
+    def stats(self, tenant_id: Optional[str] = None) -> dict:
+        """Hit/miss counters, optionally with one tenant's cache state"""
+        with self._lock:
+            lookups = self.hits + self.misses
+            stats = {
+                "hits": self.hits,
+                "misses": self.misses,
+                "invalidations": self.invalidations,
+                "hit_ratio": (self.hits / lookups) if lookups else 0.0,
+                "cached_tenants": len(self._graphs),
+                "max_age_seconds": self.max_age_seconds,
+            }
+            if tenant_id is not None:
+                graph = self._graphs.get(tenant_id)
+                stats["tenant"] = {
+                    "tenant_id": tenant_id,
+                    "version": self._versions.get(tenant_id, 0),
+                    "cached": graph is not None,
+                    "boms": len(graph.nodes) if graph else 0,
+                    "items": len(graph.items) if graph else 0,
+                    "age_seconds": (time.monotonic() - graph.built_at) if graph else None,
+                }
+            return stats
+
+    def _expired(self, graph: BOMGraph) -> bool:
+        if not self.max_age_seconds:
+            return False
+        return time.monotonic() - graph.built_at > self.max_age_seconds
+
+
+# Process-wide cache instance
+bom_graph_cache = BOMGraphCache(
+    max_age_seconds=float(os.getenv("BOM_GRAPH_CACHE_TTL", "60"))
+)
+
+
+def invalidate_bom_graph(tenant_id: str) -> int:
+    """Invalidate the cached BOM graph of a tenant. Returns the new version."""
+    return bom_graph_cache.invalidate(str(tenant_id))
@@ -0,0 +1,473 @@
+# backend/services/production/capacity_calendar.py
+"""
+Capacity Calendar - Precomputed capacity buckets of work center calendars
+
+A CapacityTimeline turns one WorkCenterCalendar into flat arrays over a
+date range (by default CALENDAR_LOOKBACK_DAYS back to CALENDAR_HORIZON_DAYS
+ahead of today):
+
+- day_minutes[d]: working minutes of day d (overlapping shifts counted once,
+  minutes already covered by the previous day's night shift left out)
+- shift_minutes[code][d]: minutes of one shift on day d (same carry-over rule)
+- day_cum[d]: working minutes before day d (prefix sums)
+- win_start/win_end/win_cum: every working window in time order, with the
+  working minutes before it
+
+so "capacity of a day / a shift / a date range" is an index operation
+(O(1)) and "where does N working minutes after t end" is one bisect
+(O(log windows)) instead of a walk over days. Minutes are counted from
+midnight of start_date; a shift belongs to the day it starts on.
+
+Caching:
+- Timelines are cached per (tenant, calendar code) in the BOMGraphCache
+  style: a per-tenant version counter bumped by invalidate_calendar()
+  (routes changing calendars call it) and a max age
+  (CALENDAR_TIMELINE_CACHE_TTL seconds, default 60).
+- A stale timeline is not thrown away: the calendar is reloaded and, if
+  its shifts are unchanged, only the days whose holidays or exceptions
+  changed are recomputed (the window list is re-flattened from the first
+  changed day on). Changed shifts or a new start date rebuild it.
+- Timelines are immutable once cached; an update produces a new one.
+
+Usage:
+    from services.production.capacity_calendar import calendar_timeline_cache
+
+    timeline = calendar_timeline_cache.get(tenant_id, "2-SHIFT")
+    timeline.minutes_on(date(2025, 3, 3))
+    timeline.add(timeline.next_start(t), 600.0)
+"""
+
+import os
+import threading
+import time
+from array import array
+from bisect import bisect_left, bisect_right
+from datetime import date, datetime, timedelta
+from typing import Dict, FrozenSet, Iterable, List, NamedTuple, Optional, Tuple
+
+MINUTES_PER_DAY = 1440.0
+
+INF = float("inf")
+
+# Cached timeline range around today
+CALENDAR_LOOKBACK_DAYS = int(os.getenv("CALENDAR_LOOKBACK_DAYS", "60"))
+CALENDAR_HORIZON_DAYS = int(os.getenv("CALENDAR_HORIZON_DAYS", "730"))
+
+
+class ShiftRule(NamedTuple):
+    """Shift of a calendar (minutes after midnight of its start day)"""
+    code: str
+    start: float
+    end: float
+    weekdays: FrozenSet[int]
+
+
+class CalendarRules(NamedTuple):
+    """Snapshot of a WorkCenterCalendar used to compute buckets"""
+    code: str
+    shifts: Tuple[ShiftRule, ...]
+    holidays: FrozenSet[date]
+    exceptions: Dict[date, Tuple[Tuple[Optional[str], bool], ...]]
+
+    @classmethod
+    def from_document(cls, calendar) -> "CalendarRules":
+        exceptions: Dict[date, list] = {}
+        for exception in calendar.exceptions:
+            exceptions.setdefault(exception.date, []).append((exception.shift_code or None, bool(exception.working)))
+        return cls(
+            code=calendar.code,
+            shifts=tuple(
+                ShiftRule(shift.code, *map(float, shift.window()), frozenset(shift.weekdays or ()))
+                for shift in calendar.shifts
+            ),
+            holidays=frozenset(holiday.date for holiday in calendar.holidays),
+            exceptions={day: tuple(changes) for day, changes in exceptions.items()},
+        )
+
+    @classmethod
+    def load_many(cls, tenant_id: str, codes: Iterable[str]) -> Dict[str, "CalendarRules"]:
+        """Rules of several calendars (one query); unknown codes are left out"""
+        from models.production import WorkCenterCalendar
+
+        codes = list(codes)
+        if not codes:
+            return {}
+        return {
+            calendar.code: cls.from_document(calendar)
+            for calendar in WorkCenterCalendar.objects(tenant_id=tenant_id, code__in=codes).only(
+                "code", "shifts", "holidays", "exceptions"
+            )
+        }
+
+    def shifts_on(self, day: date) -> List[ShiftRule]:
+        """Shifts running on a date (weekdays, then holidays, then exceptions in order)"""
+        weekday = day.weekday()
+        active = {shift.code for shift in self.shifts if weekday in shift.weekdays}
+        if day in self.holidays:
+            active = set()
+        for shift_code, working in self.exceptions.get(day, ()):
+            target = {shift_code} if shift_code else {shift.code for shift in self.shifts}
+            active = active | target if working else active - target
+        return [shift for shift in self.shifts if shift.code in active]
+
+    def changed_days(self, other: "CalendarRules") -> List[date]:
+        """Dates whose holidays or exceptions differ (shifts assumed equal)"""
+        days = set(self.holidays ^ other.holidays)
+        for day in self.exceptions.keys() | other.exceptions.keys():
+            if self.exceptions.get(day) != other.exceptions.get(day):
+                days.add(day)
+        return sorted(days)
+
+
+class CapacityTimeline:
+    """
+    Array-backed capacity buckets of one calendar over [start_date, start_date + days).
+
+    Time arguments are minutes from midnight of start_date. Searches past
+    the end of the range return INF (before its start: -INF), so callers
+    can report work beyond the calendar horizon.
+    """
+
+    def __init__(self, rules: CalendarRules, start_date: date, days: int, version: int = 0):
+        self.rules = rules
+        self.code = rules.code
+        self.start_date = start_date
+        self.days = days
+        self.version = version
+        self.built_at = time.monotonic()
+        self.day_minutes = array("d", [0.0]) * days
+        self.day_cum = array("d", [0.0]) * (days + 1)
+        self.shift_minutes: Dict[str, array] = {
+            shift.code: array("d", [0.0]) * days for shift in rules.shifts
+        }
+        # Merged (start, end) windows of each day, then the flattened list
+        self._day_windows: List[Tuple[Tuple[float, float], ...]] = [()] * days
+        self._day_first = array("l", [0]) * days
+        self.win_start = array("d")
+        self.win_end = array("d")
+        self.win_cum = array("d")
+        self._cum_end = array("d")
+
+        for d in range(days):
+            self._compute_day(d)
+        self._flatten(0)
+
+    # ---- O(1) bucket lookups --------------------------------------------
+
+    def index(self, day: date) -> int:
+        """Day index of a date (IndexError outside the range)"""
+        d = (day - self.start_date).days
+        if not 0 <= d < self.days:
+            raise IndexError(f"{day} is outside the calendar range")
+        return d
+
+    def covers(self, from_day: date, to_day: date) -> bool:
+        """Whether [from_day, to_day] lies inside the range"""
+        return self.start_date <= from_day and (to_day - self.start_date).days < self.days
+
+    def minutes_on(self, day: date) -> float:
+        """Working minutes of a date"""
+        return self.day_minutes[self.index(day)]
+
+    def shift_minutes_on(self, shift_code: str, day: date) -> float:
+        """Minutes one shift works on a date"""
+        return self.shift_minutes[shift_code][self.index(day)]
+
+    def minutes_between(self, from_day: date, to_day: date) -> float:
+        """Working minutes of the inclusive date range"""
+        return self.day_cum[self.index(to_day) + 1] - self.day_cum[self.index(from_day)]
+
+    @property
+    def total_minutes(self) -> float:
+        return self.day_cum[self.days]
+
+    # ---- Time arithmetic (scheduler) ------------------------------------
+
+    def next_start(self, t: float) -> float:
+        """Earliest working time at or after t"""
+        i = bisect_right(self.win_end, t)
+        if i == len(self.win_end):
+            return INF
+        return max(t, self.win_start[i])
+
+    def add(self, t: float, minutes: float) -> float:
+        """End of `minutes` of working time started at t (t is a working time)"""
+        if minutes <= 0 or t == INF or t == -INF:
+            return t
+        i = bisect_right(self.win_end, t)
+        if i == len(self.win_end):
+            return INF
+        target = self.win_cum[i] + max(t - self.win_start[i], 0.0) + minutes
+        j = bisect_left(self._cum_end, target, i)
+        if j == len(self._cum_end):
+            return INF
+        return self.win_start[j] + target - self.win_cum[j]
+
+    def latest_end(self, t: float) -> float:
+        """Latest working time at or before t (an end of work)"""
+        i = bisect_left(self.win_start, t) - 1
+        if i < 0:
+            return -INF
+        return min(t, self.win_end[i])
+
+    def subtract(self, t: float, minutes: float) -> float:
+        """Start of `minutes` of working time that ends at t (t is a working end)"""
+        if minutes <= 0 or t == INF or t == -INF:
+            return t
+        i = bisect_left(self.win_start, t) - 1
+        if i < 0:
+            return -INF
+        target = self.win_cum[i] + min(t, self.win_end[i]) - self.win_start[i] - minutes
+        if target < 0:
+            return -INF
+        j = bisect_right(self.win_cum, target, 0, i + 1) - 1
+        return self.win_start[j] + target - self.win_cum[j]
+
+    # ---- Incremental regeneration ---------------------------------------
+
+    def updated(self, rules: CalendarRules, version: int) -> "CapacityTimeline":
+        """
+        Copy with new holidays/exceptions applied (shifts must be unchanged).
+
+        Only the changed days are recomputed; the window list and prefix
+        sums are rebuilt from the first changed day on.
+        """
+        clone = object.__new__(CapacityTimeline)
+        clone.rules = rules
+        clone.code = rules.code
+        clone.start_date = self.start_date
+        clone.days = self.days
+        clone.version = version
+        clone.built_at = time.monotonic()
+        clone.day_minutes = array("d", self.day_minutes)
+        clone.day_cum = array("d", self.day_cum)
+        clone.shift_minutes = {code: array("d", values) for code, values in self.shift_minutes.items()}
+        clone._day_windows = list(self._day_windows)
+        clone._day_first = array("l", self._day_first)
+        clone.win_start = array("d", self.win_start)
+        clone.win_end = array("d", self.win_end)
+        clone.win_cum = array("d", self.win_cum)
+        clone._cum_end = array("d", self._cum_end)
+
+        # The day after a changed day is recomputed too (its night-shift carry-over may differ)
+        changed = sorted({
+            d + step for d in ((day - self.start_date).days for day in rules.changed_days(self.rules))
+            for step in (0, 1)
+            if 0 <= d + step < self.days
+        })
+        for d in changed:
+            clone._compute_day(d)
+        if changed:
+            clone._flatten(min(changed))
+        return clone
+
+    def _compute_day(self, d: int) -> None:
+        """Windows and buckets of day d (day d - 1 must be computed)"""
+        base = d * MINUTES_PER_DAY
+        day = self.start_date + timedelta(days=d)
+        # A night shift running into this day's first shift is not counted twice
+        carry = self._day_windows[d - 1][-1][1] if d and self._day_windows[d - 1] else -INF
+        for values in self.shift_minutes.values():
+            values[d] = 0.0
+        intervals = []
+        for shift in self.rules.shifts_on(day):
+            start = max(base + shift.start, carry)
+            end = base + shift.end
+            if end <= start:
+                continue
+            self.shift_minutes[shift.code][d] += end - start
+            intervals.append((start, end))
+        intervals.sort()
+        merged: List[List[float]] = []
+        for start, end in intervals:
+            if merged and start <= merged[-1][1]:
+                merged[-1][1] = max(merged[-1][1], end)
+            else:
+                merged.append([start, end])
+        self._day_windows[d] = tuple((start, end) for start, end in merged)
+        self.day_minutes[d] = sum(end - start for start, end in merged)
+
+    def _flatten(self, first: int) -> None:
+        """Rebuild the window list and prefix sums from day `first` on"""
+        cut = self._day_first[first]
+        del self.win_start[cut:]
+        del self.win_end[cut:]
+        del self.win_cum[cut:]
+        del self._cum_end[cut:]
+        worked = self._cum_end[-1] if cut else 0.0
+        for d in range(first, self.days):
+            self._day_first[d] = len(self.win_start)
+            self.day_cum[d + 1] = self.day_cum[d] + self.day_minutes[d]
+            for start, end in self._day_windows[d]:
+                self.win_start.append(start)
+                self.win_end.append(end)
+                self.win_cum.append(worked)
+                worked += end - start
+                self._cum_end.append(worked)
+
+    def to_dict(self, from_day: date, to_day: date) -> dict:
+        """Day buckets of an inclusive date range"""
+        rows = []
+        for d in range(self.index(from_day), self.index(to_day) + 1):
+            rows.append({
+                "date": (self.start_date + timedelta(days=d)).isoformat(),
+                "minutes": self.day_minutes[d],
+                "shifts": {code: values[d] for code, values in self.shift_minutes.items() if values[d]},
+            })
+        return {
+            "calendar_code": self.code,
+            "from_date": from_day.isoformat(),
+            "to_date": to_day.isoformat(),
+            "total_minutes": self.minutes_between(from_day, to_day),
+            "days": rows,
+        }
+
+
+class CalendarTimelineCache:
+    """
+    Per-(tenant, calendar) CapacityTimeline cache with version-counter invalidation.
+
+    Counters:
+    - hits: timeline served from memory
+    - misses: calendar reloaded from the database
+    - incremental: timelines updated day by day
+    - rebuilds: timelines built from scratch
+    - invalidations: invalidate() calls
+    """
+
+    def __init__(self, max_age_seconds: float = 60.0,
+                 lookback_days: int = CALENDAR_LOOKBACK_DAYS, horizon_days: int = CALENDAR_HORIZON_DAYS):
+        self.max_age_seconds = max_age_seconds
+        self.lookback_days = lookback_days
+        self.horizon_days = horizon_days
+        self._lock = threading.Lock()
+        self._versions: Dict[str, int] = {}
+        self._timelines: Dict[Tuple[str, str], CapacityTimeline] = {}
+        self.hits = 0
+        self.misses = 0
+        self.incremental = 0
+        self.rebuilds = 0
+        self.invalidations = 0
+
+    def get(self, tenant_id: str, calendar_code: str) -> Optional[CapacityTimeline]:
+        """Timeline of a calendar, or None if the calendar does not exist"""
+        return self.get_many(tenant_id, [calendar_code]).get(calendar_code)
+
+    def get_many(self, tenant_id: str, calendar_codes: Iterable[str]) -> Dict[str, CapacityTimeline]:
+        """Timelines of several calendars (stale ones reloaded with one query)"""
+        start_date = datetime.utcnow().date() - timedelta(days=self.lookback_days)
+        result: Dict[str, CapacityTimeline] = {}
+        stale: Dict[str, Optional[CapacityTimeline]] = {}
+        with self._lock:
+            version = self._versions.get(tenant_id, 0)
+            for code in set(calendar_codes):
+                timeline = self._timelines.get((tenant_id, code))
+                if (timeline is not None and timeline.version == version
+                        and timeline.start_date == start_date and not self._expired(timeline)):
+                    self.hits += 1
+                    result[code] = timeline
+                else:
+                    self.misses += 1
+                    stale[code] = timeline
+        if not stale:
+            return result
+
+        # Load outside the lock so one slow tenant doesn't block the others
+        rules = CalendarRules.load_many(tenant_id, stale)
+        built: Dict[str, CapacityTimeline] = {}
+        incremental = rebuilds = 0
+        for code, previous in stale.items():
+            if code not in rules:
+                continue
+            if previous is not None and previous.start_date == start_date and previous.rules.shifts == rules[code].shifts:
+                built[code] = previous.updated(rules[code], version)
+                incremental += 1
+            else:
+                built[code] = CapacityTimeline(
+                    rules[code], start_date, self.lookback_days + self.horizon_days + 1, version
+                )
+                rebuilds += 1
+
+        with self._lock:
+            self.incremental += incremental
+            self.rebuilds += rebuilds
+            # Keep them only if nothing was invalidated while loading
+            if self._versions.get(tenant_id, 0) == version:
+                for code in stale:
+                    if code in built:
+                        self._timelines[(tenant_id, code)] = built[code]
+                    else:
+                        self._timelines.pop((tenant_id, code), None)
+        result.update(built)
+        return result
+
+    def covering(self, tenant_id: str, calendar_codes: Iterable[str],
+                 from_day: date, to_day: date) -> Dict[str, CapacityTimeline]:
+        """
+        Timelines covering [from_day, to_day]: the cached ones, or (for ranges
+        outside the cached window) uncached ones built for just that range.
+        """
+        timelines = self.get_many(tenant_id, calendar_codes)
+        days = (to_day - from_day).days + 1
+        for code, timeline in timelines.items():
+            if not timeline.covers(from_day, to_day):
+                timelines[code] = CapacityTimeline(timeline.rules, from_day, days, timeline.version)
+        return timelines
+
+    def invalidate(self, tenant_id: str) -> int:
+        """
+        Bump the tenant version counter.
+
+        Cached timelines are kept so the next lookup can update them
+        incrementally instead of rebuilding.
+        """
+        with self._lock:
+            version = self._versions.get(tenant_id, 0) + 1
+            self._versions[tenant_id] = version
+            self.invalidations += 1
+            return version
+
+    def clear(self) -> None:
+        """Drop every cached timeline (counters are kept)"""
+        with self._lock:
+            for tenant_id, _ in self._timelines:
+                self._versions[tenant_id] = self._versions.get(tenant_id, 0) + 1
+            self._timelines.clear()
+
+    def stats(self, tenant_id: Optional[str] = None) -> dict:
+        """Hit/miss counters, optionally with one tenant's cache state"""
+        with self._lock:
+            lookups = self.hits + self.misses
+            stats = {
+                "hits": self.hits,
+                "misses": self.misses,
+                "incremental": self.incremental,
+                "rebuilds": self.rebuilds,
+                "invalidations": self.invalidations,
+                "hit_ratio": (self.hits / lookups) if lookups else 0.0,
+                "cached_timelines": len(self._timelines),
+                "max_age_seconds": self.max_age_seconds,
+            }
+            if tenant_id is not None:
+                stats["tenant"] = {
+                    "tenant_id": tenant_id,
+                    "version": self._versions.get(tenant_id, 0),
+                    "calendars": sorted(code for tid, code in self._timelines if tid == tenant_id),
+                }
+            return stats
+
+    def _expired(self, timeline: CapacityTimeline) -> bool:
+        if not self.max_age_seconds:
+            return False
+        return time.monotonic() - timeline.built_at > self.max_age_seconds
+
+
+# Process-wide cache instance
+calendar_timeline_cache = CalendarTimelineCache(
+    max_age_seconds=float(os.getenv("CALENDAR_TIMELINE_CACHE_TTL", "60"))
+)
+
+
+def invalidate_calendar(tenant_id: str) -> int:
+    """Invalidate the cached calendar timelines of a tenant. Returns the new version."""
+    return calendar_timeline_cache.invalidate(str(tenant_id))
@@ -0,0 +1,191 @@
+# backend/services/production/low_level_code.py
+"""
+Low-Level Code (LLC) Service
+
+The low-level code of an item is the lowest BOM level it appears on across
+all certified BOMs of the tenant (0 = not used as a component). Processing
+items in ascending LLC order guarantees every parent is handled before its
+components, which lets MRP netting and consolidated explosion run in a
+single pass.
+
+Algorithm: topological sort (Kahn) over certified BOM lines
+- Edges: BOM item -> component item (every line of every certified BOM)
+- LLC(component) = max(LLC(parent) + 1) over all parents
+- Items left unprocessed are part of (or below) a BOM cycle; they keep
+  their stored code and are reported
+
+Storage:
+- Codes are stored on Item.low_level_code
+- A recalculation runs over the cached BOM graph in memory and only writes
+  the items whose code changed (one bulk_write)
+- BOM certify/close schedule a recalculation on a background thread
+
+Usage:
+    from services.production.low_level_code import (
+        recalculate_low_level_codes, schedule_low_level_code_update
+    )
+
+    summary = recalculate_low_level_codes(tenant_id)
+    schedule_low_level_code_update(tenant_id)  # fire-and-forget
+"""
+
+import logging
+import threading
+from collections import defaultdict, deque
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+from typing import Dict, List, Optional, Set, Tuple
+
+from bson import ObjectId
+from pymongo import UpdateOne
+
+from models.production import Item
+from .bom_graph import BOMGraph, bom_graph_cache, invalidate_bom_graph
+
+logger = logging.getLogger(__name__)
+
+
+def compute_low_level_codes(graph: BOMGraph) -> Tuple[Dict[str, int], List[str]]:
+    """
+    Compute low-level codes for every item of a BOM graph.
+
+    Args:
+        graph: Tenant BOM graph
+
+    Returns:
+        (codes, cyclic) - codes maps item_no to its LLC; cyclic lists the
+        items that could not be ordered because of a BOM cycle
+    """
+    children: Dict[str, Set[str]] = {}
+    indegree: Dict[str, int] = defaultdict(int)
+
+    for item_no, node in graph.nodes.items():
+        components = {line.component_item_no for line in node.lines}
+        children[item_no] = components
+        for component_no in components:
+            indegree[component_no] += 1
+
+    all_items = set(graph.items) | set(graph.nodes) | set(indegree)
+    codes: Dict[str, int] = {item_no: 0 for item_no in all_items}
+
+    queue = deque(item_no for item_no in all_items if indegree[item_no] == 0)
+    ordered = 0
+    while queue:
+        item_no = queue.popleft()
+        ordered += 1
+        child_code = codes[item_no] + 1
+        for component_no in children.get(item_no, ()):
+            if codes[component_no] < child_code:
+                codes[component_no] = child_code
+            indegree[component_no] -= 1
+            if indegree[component_no] == 0:
+                queue.append(component_no)
+
+    if ordered == len(all_items):
+        return codes, []
+
+    cyclic = sorted(item_no for item_no in all_items if indegree[item_no] > 0)
+    for item_no in cyclic:
+        del codes[item_no]
+    return codes, cyclic
+
+
+def low_level_order(graph: BOMGraph) -> Optional[Dict[str, int]]:
+    """
+    Low-level codes to process a graph in level order.
+
+    Uses the codes stored on the items when they are complete and consistent
+    with the graph (every component below its parents); otherwise computes
+    them in memory. Returns None when the graph has a cycle.
+    """
+    stored = {item_no: item.low_level_code for item_no, item in graph.items.items()}
+    consistent = all(code is not None for code in stored.values())
+    if consistent:
+        for item_no, node in graph.nodes.items():
+            parent_code = stored.get(item_no)
+            for line in node.lines:
+                child_code = stored.get(line.component_item_no)
+                if parent_code is None or child_code is None or child_code <= parent_code:
+                    consistent = False
+                    break
+            if not consistent:
+                break
+    if consistent:
+        return stored
+
+    codes, cyclic = compute_low_level_codes(graph)
+    return None if cyclic else codes
+
+
+def recalculate_low_level_codes(tenant_id: str) -> dict:
+    """
+    Recalculate and store the low-level codes of a tenant.
+
+    Only items whose code changed are written. The BOM graph cache is
+    invalidated afterwards so explosions see the new codes.
+
+    Returns:
+        Summary dict: items, changed, max_level, cyclic
+    """
+    tenant_id = str(tenant_id)
+    graph = bom_graph_cache.get(tenant_id)
+    codes, cyclic = compute_low_level_codes(graph)
+
+    now = datetime.utcnow()
+    updates = []
+    for item_no, item in graph.items.items():
+        code = codes.get(item_no)
+        if code is None or code == item.low_level_code:
+            continue
+        updates.append(UpdateOne(
+            {"tenant_id": ObjectId(tenant_id), "item_no": item_no},
+            {"$set": {"low_level_code": code, "low_level_code_updated_at": now}},
+        ))
+
+    if updates:
+        Item._get_collection().bulk_write(updates, ordered=False)
+        invalidate_bom_graph(tenant_id)
+
+    if cyclic:
+        logger.warning("LLC: BOM cycle for tenant %s, items not ordered: %s", tenant_id, ", ".join(cyclic))
+
+    return {
+        "tenant_id": tenant_id,
+        "items": len(graph.items),
+        "changed": len(updates),
+        "max_level": max(codes.values(), default=0),
+        "cyclic": cyclic,
+    }
+
+
+# Background recalculation (one worker; requests for the same tenant coalesce)
+_executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="llc")
+_pending: Set[str] = set()
+_pending_lock = threading.Lock()
+
+
+def schedule_low_level_code_update(tenant_id: str) -> bool:
+    """
+    Queue a background LLC recalculation for a tenant.
+
+    Returns:
+        False if one is already queued for the tenant (it will see the
+        latest BOMs when it runs), True otherwise
+    """
+    tenant_id = str(tenant_id)
+    with _pending_lock:
+        if tenant_id in _pending:
+            return False
+        _pending.add(tenant_id)
+    _executor.submit(_run_scheduled_update, tenant_id)
+    return True
+
+
+def _run_scheduled_update(tenant_id: str) -> None:
+    with _pending_lock:
+        _pending.discard(tenant_id)
+    try:
+        summary = recalculate_low_level_codes(tenant_id)
+        logger.info("LLC: tenant %s recalculated, %s item(s) changed", tenant_id, summary["changed"])
+    except Exception:
+        logger.exception("LLC: recalculation failed for tenant %s", tenant_id)
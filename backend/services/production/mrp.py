@@ -0,0 +1,534 @@
+# backend/services/production/mrp.py
+"""
+MRP Service - Material requirements planning run (regenerative / net change)
+
+Gross requirements per item:
+- lines of open sales Orders (not invoiced or closed) that name an item_no
+  (qty - shipped_qty, on the line's shipment_date or the order date; the
+  sales routes keep these fields on item lines)
+- component lines of open ProductionOrders (Planned, Firm Planned,
+  Released; expected - consumed, on the order start date)
+- dependent demand of the planned production suggestions of its parents
+  (quantity_per incl. scrap, on the parent's start date; phantom BOMs are
+  passed through to their components)
+
+Scheduled receipts: remaining quantity of the item's own open production
+orders on their due dates. On-hand comes from the item balances
+(services.availability_service). The item ledger lives in the optional SQL
+database: when it is not available, planning runs from zero on-hand
+(noted in PlanningRun.message) and net change skips ledger postings.
+
+Netting walks the projected available balance through the requirements
+and receipts, bucketed per day. Whenever it drops below Item.safety_stock_qty,
+or to/below reorder_point, a replenishment is suggested: enough to get
+back to safety stock (and above the reorder point), rounded up to
+multiples of reorder_quantity when one is set. Items with a certified BOM
+(manufactured/both) get planned production, all others purchases, due
+on the requirement date and starting lead_time_days earlier.
+
+Items are processed by ascending low-level code
+(services.production.low_level_code), so every parent's planned orders are
+final before its components are netted.
+
+Every requirement carries the pegging node id of what causes it (sales
+line, production order, parent planned order - services.production.pegging)
+and is pegged to the supplies covering it as the item is netted; the run
+stores the pegs (PeggingEntry) next to the suggestions.
+
+Modes:
+- regenerative: every item is replanned and all suggestions replaced
+- net_change: only items touched since the last completed run are
+  replanned - items of production orders, sales orders, items and BOMs
+  changed since then and items with ledger postings since then - plus
+  every item below them in the BOM structure. Dependent demand from
+  parents that are not replanned is taken from their stored suggestions.
+  Deleted orders are only picked up by the next regenerative run.
+
+Runs are serialized per tenant: the Running PlanningRun is the lock
+(unique partial index), a second run fails with MRPRunInProgress, and a
+run still Running after MRP_RUN_TIMEOUT (its process died) is marked
+Failed so the tenant can plan again.
+
+Usage:
+    from services.production.mrp import run_mrp
+
+    summary = run_mrp(tenant_id, mode="net_change", user_email=user)
+"""
+
+import logging
+import math
+import time
+from collections import defaultdict
+from dataclasses import dataclass
+from datetime import date, datetime, timedelta
+from typing import Dict, Iterable, List, Optional, Set, Tuple
+
+from .bom_explosion import MANUFACTURED_TYPES
+from .bom_graph import BOMGraph, bom_graph_cache
+from .low_level_code import low_level_order
+from .pegging import Peg, peg_item, pegging_cache, planned_order_id, production_order_id, sales_line_id
+
+logger = logging.getLogger(__name__)
+
+MRP_MODES = ("net_change", "regenerative")
+
+OPEN_ORDER_STATUSES = ("Planned", "Firm Planned", "Released")
+
+# Sales orders in these statuses are no longer demand
+CLOSED_SALES_STATUSES = ("invoiced", "closed")
+
+# A run still Running after this long is taken as dead
+MRP_RUN_TIMEOUT = timedelta(hours=1)
+
+# Quantities below this are rounding noise
+EPSILON = 1e-9
+
+# (date, quantity, pegging node id): requirements negative, receipts positive
+Event = Tuple[date, float, str]
+
+
+class MRPRunInProgress(Exception):
+    """Another planning run of the tenant is still running"""
+
+
+@dataclass(slots=True)
+class PlanningParameters:
+    """Item master fields used by netting"""
+    item_no: str
+    description: Optional[str] = None
+    uom_code: Optional[str] = None
+    lead_time_days: int = 0
+    safety_stock: float = 0.0
+    reorder_point: Optional[float] = None
+    reorder_quantity: Optional[float] = None
+    supplier_id: Optional[str] = None
+
+
+@dataclass(slots=True)
+class PlannedOrder:
+    """A planned production order or purchase"""
+    item_no: str
+    suggestion_type: str              # "Production" | "Purchase"
+    quantity: float
+    due_date: date
+    start_date: date
+    reason: str = "Demand"
+    late: bool = False
+
+    @property
+    def ref(self) -> str:
+        """Pegging node id"""
+        return planned_order_id(self.item_no, self.due_date)
+
+
+class MRPEngine:
+    """
+    Netting over a BOM graph, in low-level-code order (no database access).
+
+    Raises:
+        ValueError: the BOM graph has a cycle
+    """
+
+    def __init__(self, graph: BOMGraph, today: Optional[date] = None):
+        self.graph = graph
+        self.today = today or datetime.utcnow().date()
+        codes = low_level_order(graph)
+        if codes is None:
+            raise ValueError("BOM structure has a cycle; recalculate low-level codes and fix the BOMs")
+        self.codes = codes
+        self._components: Dict[str, Tuple[Tuple[str, float], ...]] = {}
+        self.pegs: List[Peg] = []
+
+    def is_production(self, item_no: str) -> bool:
+        """Planned as production (certified BOM on a manufactured item) or purchase"""
+        item = self.graph.item(item_no)
+        return bool(item and item.item_type in MANUFACTURED_TYPES and self.graph.bom(item_no))
+
+    def is_phantom(self, item_no: str) -> bool:
+        return self.graph.is_phantom(item_no)
+
+    def components(self, item_no: str) -> Tuple[Tuple[str, float], ...]:
+        """(component, quantity per unit incl. scrap) of an item's BOM, phantoms passed through"""
+        cached = self._components.get(item_no)
+        if cached is not None:
+            return cached
+        totals: Dict[str, float] = {}
+        for line, per, _, _ in self.graph.unit_lines(item_no, self.graph.is_phantom):
+            totals[line.component_item_no] = totals.get(line.component_item_no, 0.0) + per
+        result = self._components[item_no] = tuple(totals.items())
+        return result
+
+    def descendants(self, item_nos: Iterable[str]) -> Set[str]:
+        """Items plus everything below them in the BOM structure"""
+        result = set(item_nos)
+        stack = list(result)
+        while stack:
+            for component_no, _ in self.components(stack.pop()):
+                if component_no not in result:
+                    result.add(component_no)
+                    stack.append(component_no)
+        return result
+
+    def parents(self, item_nos: Set[str]) -> Set[str]:
+        """Items whose (phantom-flattened) BOM uses one of item_nos"""
+        return {
+            item_no for item_no in self.graph.nodes
+            if not self.is_phantom(item_no)
+            and any(component_no in item_nos for component_no, _ in self.components(item_no))
+        }
+
+    def plan(
+        self,
+        item_nos: Iterable[str],
+        parameters: Dict[str, PlanningParameters],
+        on_hand: Dict[str, float],
+        events: Dict[str, List[Event]],
+    ) -> Dict[str, List[PlannedOrder]]:
+        """
+        Net the items in low-level-code order.
+
+        events holds independent requirements and scheduled receipts (and
+        dependent demand from parents that are not planned here); dependent
+        demand of the planned production orders is added as items are netted.
+        Phantom items and items without parameters are not planned.
+
+        The pegs of the planned items are left in self.pegs.
+        """
+        events = defaultdict(list, {item_no: list(item_events) for item_no, item_events in events.items()})
+        levels: Dict[int, List[str]] = defaultdict(list)
+        for item_no in set(item_nos):
+            levels[self.codes.get(item_no, 0)].append(item_no)
+
+        planned: Dict[str, List[PlannedOrder]] = {}
+        self.pegs = []
+        for level in sorted(levels):
+            for item_no in sorted(levels[level]):
+                params = parameters.get(item_no)
+                if params is None or self.is_phantom(item_no):
+                    continue
+                item_events = events.get(item_no, ())
+                orders = self.net(params, on_hand.get(item_no, 0.0), item_events)
+                refs = [order.ref for order in orders]
+                self.pegs.extend(peg_item(
+                    item_no, self.today, on_hand.get(item_no, 0.0), item_events,
+                    [(order.due_date, order.quantity, ref) for order, ref in zip(orders, refs)],
+                    params.safety_stock or 0.0,
+                ))
+                if not orders:
+                    continue
+                planned[item_no] = orders
+                if orders[0].suggestion_type == "Production":
+                    for component_no, per in self.components(item_no):
+                        events[component_no].extend(
+                            (order.start_date, -order.quantity * per, ref) for order, ref in zip(orders, refs)
+                        )
+        return planned
+
+    def net(self, params: PlanningParameters, on_hand: float, events: Iterable[Event]) -> List[PlannedOrder]:
+        """Projected available balance walk for one item (at most one order per day)"""
+        today = self.today
+        safety = params.safety_stock or 0.0
+        reorder_point = params.reorder_point
+        lot = params.reorder_quantity or 0.0
+        suggestion_type = "Production" if self.is_production(params.item_no) else "Purchase"
+
+        # Daily buckets; past-due requirements/receipts count today
+        buckets: Dict[date, float] = {today: 0.0}
+        for day, quantity, _ in events:
+            day = max(day, today)
+            buckets[day] = buckets.get(day, 0.0) + quantity
+        orders: List[PlannedOrder] = []
+        balance = on_hand
+        for day, quantity in sorted(buckets.items()):
+            balance += quantity
+            shortage = safety - balance
+            reason = "Demand" if quantity < 0 else "Safety stock"
+            reorder = reorder_point is not None and balance <= reorder_point + EPSILON
+            if reorder:
+                if reorder_point - balance > shortage:
+                    shortage = reorder_point - balance
+                    if balance >= safety - EPSILON:
+                        reason = "Reorder point"
+            if shortage <= EPSILON and not (reorder and lot):
+                continue
+            if lot:
+                order_quantity = lot * max(1, math.ceil((shortage + EPSILON) / lot))
+            else:
+                order_quantity = shortage
+            if order_quantity <= EPSILON:
+                continue
+            start = day - timedelta(days=params.lead_time_days or 0)
+            orders.append(PlannedOrder(
+                item_no=params.item_no,
+                suggestion_type=suggestion_type,
+                quantity=order_quantity,
+                due_date=day,
+                start_date=max(start, today),
+                reason=reason,
+                late=start < today,
+            ))
+            balance += order_quantity
+        return orders
+
+
+# ========================================
+# Planning run (load / persist)
+# ========================================
+
+def run_mrp(tenant_id: str, mode: str = "net_change", user_email: Optional[str] = None,
+            today: Optional[date] = None) -> dict:
+    """
+    Run MRP for a tenant and replace the suggestions and pegs of the replanned items.
+
+    Net change falls back to regenerative when there is no completed run yet.
+
+    Returns:
+        The PlanningRun as dict (items_planned, suggestions, duration_ms, ...)
+
+    Raises:
+        ValueError: unknown mode or a BOM cycle
+        MRPRunInProgress: another run of the tenant is running
+    """
+    from mongoengine.errors import NotUniqueError
+    from models.production import PeggingEntry, PlanningRun, PlanningSuggestion
+
+    if mode not in MRP_MODES:
+        raise ValueError(f"mode must be one of {', '.join(MRP_MODES)}")
+
+    tenant_id = str(tenant_id)
+    started = time.perf_counter()
+
+    # Take the tenant's planning lock before loading anything
+    now = datetime.utcnow()
+    PlanningRun.objects(tenant_id=tenant_id, status="Running", started_at__lt=now - MRP_RUN_TIMEOUT).update(
+        set__status="Failed", set__finished_at=now, set__message="Expired: still running after the run timeout"
+    )
+    run = PlanningRun(tenant_id=tenant_id, mode=mode, started_by=user_email, started_at=now)
+    try:
+        run.save()
+    except NotUniqueError:
+        raise MRPRunInProgress("Another planning run is in progress for this tenant")
+
+    try:
+        last = PlanningRun.objects(tenant_id=tenant_id, status="Completed").only("started_at").first()
+        if last is None:
+            run.mode = mode = "regenerative"
+        if mode == "net_change":
+            run.changes_since = last.started_at
+
+        graph = bom_graph_cache.get(tenant_id)
+        engine = MRPEngine(graph, today)
+
+        if mode == "net_change":
+            replan = engine.descendants(_touched_items(tenant_id, run.changes_since))
+        else:
+            replan = set(graph.items)
+        unknown = sorted(item_no for item_no in replan if graph.item(item_no) is None)
+        replan -= set(unknown)
+
+        parameters = _load_parameters(tenant_id, replan if mode == "net_change" else None)
+        events = _load_events(tenant_id, replan, mode == "net_change")
+        if mode == "net_change":
+            # Dependent demand from parents that keep their suggestions
+            outside = engine.parents(replan) - replan
+            if outside:
+                for suggestion in PlanningSuggestion.objects(
+                    tenant_id=tenant_id, suggestion_type="Production", item_no__in=list(outside)
+                ).only("item_no", "quantity", "start_date", "due_date"):
+                    ref = planned_order_id(suggestion.item_no, _as_date(suggestion.due_date) or engine.today)
+                    for component_no, per in engine.components(suggestion.item_no):
+                        if component_no in replan:
+                            events[component_no].append(
+                                (_as_date(suggestion.start_date) or engine.today, -suggestion.quantity * per, ref)
+                            )
+        on_hand = _load_on_hand(tenant_id, [item_no for item_no in replan if item_no in parameters])
+        if on_hand is None:
+            run.message = "Item ledger not available; planned with zero on-hand"
+            on_hand = {}
+
+        planned = engine.plan(replan, parameters, on_hand, events)
+
+        now = datetime.utcnow()
+        documents = []
+        for item_no, orders in planned.items():
+            params = parameters[item_no]
+            for order in orders:
+                documents.append(PlanningSuggestion(
+                    tenant_id=tenant_id,
+                    run_id=str(run.id),
+                    item_no=item_no,
+                    description=params.description,
+                    suggestion_type=order.suggestion_type,
+                    quantity=order.quantity,
+                    uom_code=params.uom_code,
+                    due_date=order.due_date,
+                    start_date=order.start_date,
+                    late=order.late,
+                    reason=order.reason,
+                    low_level_code=engine.codes.get(item_no, 0),
+                    supplier_id=params.supplier_id if order.suggestion_type == "Purchase" else None,
+                    created_at=now,
+                ))
+
+        pegs = [
+            PeggingEntry(
+                tenant_id=tenant_id,
+                run_id=str(run.id),
+                item_no=peg.item_no,
+                demand_id=peg.demand_id,
+                supply_id=peg.supply_id,
+                quantity=peg.quantity,
+                created_at=now,
+            )
+            for peg in engine.pegs
+        ]
+
+        for model, new in ((PlanningSuggestion, documents), (PeggingEntry, pegs)):
+            stale = model.objects(tenant_id=tenant_id)
+            if mode == "net_change":
+                stale = stale.filter(item_no__in=list(replan))
+            stale.delete()
+            if new:
+                model.objects.insert(new, load_bulk=False)
+        pegging_cache.invalidate(tenant_id)
+
+        run.status = "Completed"
+        run.items_planned = len(replan)
+        run.suggestions = len(documents)
+        run.production_suggestions = sum(1 for doc in documents if doc.suggestion_type == "Production")
+        run.purchase_suggestions = len(documents) - run.production_suggestions
+        run.pegs = len(pegs)
+        run.unknown_items = unknown[:100]
+    except Exception as e:
+        run.status = "Failed"
+        run.message = str(e)[:1000]
+        raise
+    finally:
+        run.finished_at = datetime.utcnow()
+        run.duration_ms = (time.perf_counter() - started) * 1000.0
+        run.save()
+
+    return run.to_dict()
+
+
+def _touched_items(tenant_id: str, since: datetime) -> Set[str]:
+    """Items whose planning inputs changed after `since`"""
+    from models.order import Order
+    from models.production import BOM, Item, ProductionOrder
+
+    touched: Set[str] = set()
+    for po in ProductionOrder.objects(tenant_id=tenant_id, updated_at__gt=since).only("item_no", "lines"):
+        touched.add(po.item_no)
+        touched.update(line.component_item_no for line in po.lines)
+    for order in Order.objects(lab=tenant_id, updated_at__gt=since).only("lines"):
+        touched.update(line["item_no"] for line in order.lines or [] if line.get("item_no"))
+    touched.update(item.item_no for item in Item.objects(tenant_id=tenant_id, updated_at__gt=since).only("item_no"))
+    touched.update(bom.item_no for bom in BOM.objects(tenant_id=tenant_id, updated_at__gt=since).only("item_no"))
+
+    try:
+        from models.item_ledger_entry import ItemLedgerEntry
+        from config.db import db
+    except ImportError as e:
+        logger.warning("MRP: item ledger not available, ledger postings not checked: %s", e)
+        return touched
+    touched.update(
+        row[0] for row in db.session.query(ItemLedgerEntry.item_no).filter(
+            ItemLedgerEntry.tenant_id == tenant_id,
+            ItemLedgerEntry.posting_date > since
+        ).distinct()
+    )
+    return touched
+
+
+def _load_parameters(tenant_id: str, item_nos: Optional[Set[str]]) -> Dict[str, PlanningParameters]:
+    """Planning parameters of active items (None = every item)"""
+    from models.production import Item
+
+    items = Item.objects(tenant_id=tenant_id, status__ne="Blocked")
+    if item_nos is not None:
+        items = items.filter(item_no__in=list(item_nos))
+    return {
+        item.item_no: PlanningParameters(
+            item_no=item.item_no,
+            description=item.description,
+            uom_code=item.base_uom,
+            lead_time_days=item.lead_time_days or 0,
+            safety_stock=item.safety_stock_qty or 0.0,
+            reorder_point=item.reorder_point,
+            reorder_quantity=item.reorder_quantity,
+            supplier_id=item.default_supplier_id,
+        )
+        for item in items.only(
+            "item_no", "description", "base_uom", "lead_time_days", "safety_stock_qty",
+            "reorder_point", "reorder_quantity", "default_supplier_id"
+        )
+    }
+
+
+def _load_events(tenant_id: str, item_nos: Set[str], restrict: bool) -> Dict[str, List[Event]]:
+    """Requirements and scheduled receipts of items (one query for orders, one for sales)"""
+    from mongoengine.queryset.visitor import Q
+    from models.order import Order
+    from models.production import ProductionOrder
+
+    today = datetime.utcnow().date()
+    events: Dict[str, List[Event]] = defaultdict(list)
+
+    orders = ProductionOrder.objects(tenant_id=tenant_id, status__in=list(OPEN_ORDER_STATUSES))
+    if restrict:
+        wanted = list(item_nos)
+        orders = orders.filter(Q(item_no__in=wanted) | Q(lines__component_item_no__in=wanted))
+    for po in orders.only("order_no", "item_no", "remaining_quantity", "start_date", "due_date", "lines"):
+        due = _as_date(po.due_date) or today
+        ref = production_order_id(po.order_no)
+        if po.item_no in item_nos and (po.remaining_quantity or 0) > EPSILON:
+            events[po.item_no].append((due, po.remaining_quantity, ref))
+        start = _as_date(po.start_date) or due
+        for line in po.lines:
+            remaining = (line.expected_quantity or 0) - (line.consumed_quantity or 0)
+            if line.component_item_no in item_nos and remaining > EPSILON:
+                events[line.component_item_no].append((start, -remaining, ref))
+
+    sales = Order.objects(lab=tenant_id, status__nin=list(CLOSED_SALES_STATUSES))
+    if restrict:
+        sales = sales.filter(__raw__={"lines.item_no": {"$in": list(item_nos)}})
+    else:
+        sales = sales.filter(__raw__={"lines.item_no": {"$exists": True}})
+    for order in sales.only("number", "date", "lines"):
+        order_ref = order.number or str(order.id)
+        for index, line in enumerate(order.lines or []):
+            item_no = line.get("item_no")
+            if item_no not in item_nos:
+                continue
+            remaining = float(line.get("qty") or 0) - float(line.get("shipped_qty") or 0)
+            if remaining > EPSILON:
+                events[item_no].append((_as_date(line.get("shipment_date")) or _as_date(order.date) or today,
+                                        -remaining, sales_line_id(order_ref, index)))
+    return events
+
+
+def _load_on_hand(tenant_id: str, item_nos: List[str]) -> Optional[Dict[str, float]]:
+    """On-hand over all locations (None if the item ledger is not available)"""
+    try:
+        from services.availability_service import AvailabilityService
+    except ImportError as e:
+        logger.warning("MRP: item ledger not available, on-hand taken as zero: %s", e)
+        return None
+
+    if not item_nos:
+        return {}
+    balances = AvailabilityService.get_balances(tenant_id, item_nos)
+    return {item_no: sum(locations.values()) for item_no, locations in balances.items()}
+
+
+def _as_date(value) -> Optional[date]:
+    if value is None or value == "":
+        return None
+    if isinstance(value, datetime):
+        return value.date()
+    if isinstance(value, date):
+        return value
+    try:
+        return date.fromisoformat(str(value)[:10])
+    except ValueError:
+        return None
@@ -0,0 +1,329 @@
+# backend/services/production/order_explosion.py
+"""
+Multi-level Production Order Explosion
+
+Order creation explodes one BOM level (services.production.order_release.
+explode_bom). The multi-level modes explode the tenant's cached BOM graph
+(no queries) into a tree of orders, so nested sub-assemblies are included:
+
+- "multi_level": every manufactured sub-assembly with a certified BOM gets
+  its own child production order (one per item, quantities of all its
+  occurrences summed); it appears as a component line of the order(s)
+  consuming it. Phantom sub-assemblies are flattened into their parent.
+- "flatten": all sub-assemblies are treated as phantoms - one order whose
+  lines are the leaf components of the whole structure.
+
+Each order is exploded from its own BOM and quantity with
+BOMGraph.unit_lines(), the per-unit expansion MRP nets with: one scrap
+factor per BOM line, multiplied through the phantoms flattened into the
+order. A child order for 16 SUB has the lines of a standalone order for
+16 SUB, and a flattened order the leaf totals of the multi-level tree.
+Per-unit lines of every item are computed once and scaled by the order
+quantity; quantities are pushed down the order tree parents first.
+
+Lines of direct BOM components keep the BOM line number (line_no and
+bom_line_no, as a single-level order); components reached through a
+flattened BOM are numbered on from the highest BOM line number in steps
+of 10.
+
+Child orders are numbered <order_no>-01, -02, ... (parents first), carry
+parent_order_no = the top-level order and are due when the first order
+consuming them starts (start = due - item lead time). All orders of the
+tree are written with one bulk insert, after one query checks that none of
+their numbers is taken; if an insert still collides, the orders already
+written are deleted again.
+
+Usage:
+    from services.production.order_explosion import create_multilevel_orders
+
+    orders = create_multilevel_orders(tenant_id, root_order, mode="multi_level")
+"""
+
+from dataclasses import dataclass, field, replace
+from datetime import datetime, timedelta
+from typing import Dict, List, Optional, Set
+
+from .bom_explosion import ExplosionComponent, MANUFACTURED_TYPES
+from .bom_graph import BOMGraph, bom_graph_cache
+from .order_release import explode_routing
+
+MULTI_LEVEL_MODES = ("multi_level", "flatten")
+
+# "single" = one BOM level, no child orders (order_release.explode_bom)
+ORDER_EXPLOSION_MODES = ("single",) + MULTI_LEVEL_MODES
+
+
+@dataclass(slots=True)
+class OrderDraft:
+    """One order of the exploded tree (lines keyed by component, in first-occurrence order)"""
+    item_no: str
+    quantity: float = 0.0
+    level: int = 0                              # Depth in the order tree (0 = top-level order)
+    parents: Set[str] = field(default_factory=set)
+    lines: Dict[str, ExplosionComponent] = field(default_factory=dict)
+    bom_line_nos: Dict[str, int] = field(default_factory=dict)
+    max_bom_line_no: int = 0
+
+
+@dataclass(slots=True)
+class _UnitOrder:
+    """Lines and child orders of one unit of an item"""
+    lines: Dict[str, ExplosionComponent] = field(default_factory=dict)
+    children: Dict[str, float] = field(default_factory=dict)
+    # Component -> BOM line number of its first direct line
+    bom_line_nos: Dict[str, int] = field(default_factory=dict)
+    # Highest line number of the item's BOM (passed-through phantom lines included)
+    max_bom_line_no: int = 0
+
+
+def _explodes(graph: BOMGraph, item_no: str) -> bool:
+    item = graph.item(item_no)
+    return bool(item and item.item_type in MANUFACTURED_TYPES and graph.bom(item_no))
+
+
+def _unit_order(graph: BOMGraph, item_no: str, mode: str) -> _UnitOrder:
+    """
+    Explode one unit of an item's BOM down to its order boundaries.
+
+    Phantom sub-assemblies (every sub-assembly with "flatten") are passed
+    through by BOMGraph.unit_lines(); other sub-assemblies become child
+    orders and are not descended.
+
+    Raises:
+        ValueError: a cycle through flattened sub-assemblies
+    """
+    def descend(component_no: str) -> bool:
+        return _explodes(graph, component_no) and (mode == "flatten" or graph.is_phantom(component_no))
+
+    unit = _UnitOrder()
+    unit.max_bom_line_no = max((line.line_no or 0 for line in graph.bom(item_no).lines), default=0)
+    for line, quantity, level, _ in graph.unit_lines(item_no, descend):
+        component_no = line.component_item_no
+        if level == 1:
+            unit.bom_line_nos.setdefault(component_no, line.line_no)
+        row = unit.lines.get(component_no)
+        if row is None:
+            item = graph.item(component_no)
+            unit.lines[component_no] = ExplosionComponent(
+                item_no=component_no,
+                description=line.description or (item.description if item else ""),
+                uom_code=line.uom_code,
+                # BOM value for a direct line (as explode_bom), else per unit of the order
+                quantity_per=line.quantity_per if level == 1 else quantity,
+                total_quantity=quantity,
+                scrap_pct=line.scrap_pct,
+                level=level,
+                position=line.position,
+            )
+        else:
+            row.total_quantity += quantity
+            row.quantity_per = row.total_quantity
+        if _explodes(graph, component_no):
+            unit.children[component_no] = unit.children.get(component_no, 0.0) + quantity
+    return unit
+
+
+def explode_order_tree(graph: BOMGraph, item_no: str, quantity: float, mode: str) -> List[OrderDraft]:
+    """
+    Split the explosion of item_no into orders (no database access).
+
+    Returns:
+        Drafts, top-level order first, then child orders by level
+
+    Raises:
+        ValueError: unknown mode or a cycle in the BOM structure
+    """
+    if mode not in MULTI_LEVEL_MODES:
+        raise ValueError(f"mode must be one of: {', '.join(MULTI_LEVEL_MODES)}")
+
+    # Per-unit explosion of every order item, in discovery order
+    units: Dict[str, _UnitOrder] = {}
+    pending = [item_no]
+    while pending:
+        current = pending.pop(0)
+        if current in units:
+            continue
+        units[current] = _unit_order(graph, current, mode)
+        pending.extend(child for child in units[current].children if child not in units)
+
+    # Parents first (Kahn); an order item left over lies on a cycle
+    consumers = {current: 0 for current in units}
+    for unit in units.values():
+        for child in unit.children:
+            consumers[child] += 1
+    if consumers[item_no]:
+        raise ValueError(f"BOM structure has a cycle: {item_no}")
+    drafts: Dict[str, OrderDraft] = {current: OrderDraft(item_no=current) for current in units}
+    drafts[item_no].quantity = quantity
+    ready = [item_no]
+    ordered: List[OrderDraft] = []
+    while ready:
+        draft = drafts[ready.pop(0)]
+        ordered.append(draft)
+        unit = units[draft.item_no]
+        draft.bom_line_nos = unit.bom_line_nos
+        draft.max_bom_line_no = unit.max_bom_line_no
+        for component_no, row in unit.lines.items():
+            draft.lines[component_no] = replace(row, total_quantity=row.total_quantity * draft.quantity)
+        for child_no, per in unit.children.items():
+            child = drafts[child_no]
+            child.quantity += per * draft.quantity
+            child.level = max(child.level, draft.level + 1)
+            child.parents.add(draft.item_no)
+            consumers[child_no] -= 1
+            if not consumers[child_no]:
+                ready.append(child_no)
+    if len(ordered) < len(drafts):
+        cyclic = sorted(current for current in drafts if consumers[current])
+        raise ValueError(f"BOM structure has a cycle: {', '.join(cyclic)}")
+
+    root = drafts[item_no]
+    children = sorted((draft for draft in drafts.values() if draft is not root), key=lambda draft: draft.level)
+    return [root] + children
+
+
+def _line_numbers(draft: OrderDraft) -> Dict[str, int]:
+    """
+    Order line number per component: the BOM line number of direct lines,
+    then steps of 10 after the BOM's highest line number (so a component
+    of a passed-through phantom never reuses the phantom's line number)
+    """
+    line_nos = dict(draft.bom_line_nos)
+    next_no = (max(draft.max_bom_line_no, *line_nos.values(), 0) // 10 + 1) * 10
+    for component_no in draft.lines:
+        if component_no not in line_nos:
+            line_nos[component_no] = next_no
+            next_no += 10
+    return line_nos
+
+
+def create_multilevel_orders(tenant_id: str, root, mode: str = "multi_level",
+                             graph: Optional[BOMGraph] = None) -> list:
+    """
+    Explode a new (unsaved) production order over several levels and insert
+    it with its child orders.
+
+    Args:
+        tenant_id: Laboratory/tenant identifier
+        root: ProductionOrder with order_no, item_no, quantity, dates,
+              location, status and audit fields set; lines are filled here
+        mode: "multi_level" or "flatten"
+        graph: BOM graph snapshot (default: the tenant's cached graph,
+               reloaded if its top-level BOM is behind the database)
+
+    Returns:
+        Inserted ProductionOrders, top-level order first
+
+    Raises:
+        ValueError: unknown mode, no certified BOM or a BOM cycle
+        NotUniqueError: an order number of the tree already exists (nothing
+            is inserted)
+    """
+    from mongoengine.errors import NotUniqueError
+    from pymongo.errors import BulkWriteError
+    from models.production import Item, ProductionOrder, ProductionOrderLine, Routing
+
+    tenant_id = str(tenant_id)
+    graph = graph or bom_graph_cache.fetch_current(tenant_id, root.item_no)[0]
+    bom = graph.bom(root.item_no)
+    if bom is None:
+        raise ValueError(f"No certified BOM found for item {root.item_no}")
+
+    drafts = explode_order_tree(graph, root.item_no, root.quantity, mode)
+    item_nos = [draft.item_no for draft in drafts]
+    items = {
+        item.item_no: item
+        for item in Item.objects(tenant_id=tenant_id, item_no__in=item_nos).only(
+            "item_no", "description", "base_uom", "unit_cost", "lead_time_days"
+        )
+    }
+    routings: Dict[str, object] = {}
+    for routing in Routing.objects(tenant_id=tenant_id, item_no__in=item_nos, status="Certified").only(
+        "item_no", "version_code", "operations"
+    ):
+        routings.setdefault(routing.item_no, routing)
+
+    orders: Dict[str, object] = {}
+    for index, draft in enumerate(drafts):
+        if index == 0:
+            po = root
+        else:
+            item = items.get(draft.item_no)
+            node = graph.bom(draft.item_no)
+            # Due when the first consuming order starts
+            starts = [orders[parent].start_date or orders[parent].due_date for parent in draft.parents]
+            starts = [start for start in starts if start]
+            due = min(starts) if starts else root.due_date
+            lead_time = (item.lead_time_days if item else 0) or 0
+            po = ProductionOrder(
+                tenant_id=tenant_id,
+                order_no=f"{root.order_no}-{index:02d}",
+                description=f"Production Order for {item.description if item else draft.item_no}",
+                item_no=draft.item_no,
+                quantity=draft.quantity,
+                finished_quantity=0.0,
+                uom_code=item.base_uom if item else None,
+                location_code=root.location_code,
+                status=root.status,
+                priority=root.priority,
+                due_date=due,
+                start_date=(due - timedelta(days=lead_time)) if due else None,
+                bom_no=node.item_no,
+                bom_version_code=node.version_code,
+                unit_cost=(item.unit_cost if item else 0.0) or 0.0,
+                parent_order_no=root.order_no,
+                created_by=root.created_by,
+                updated_by=root.updated_by,
+            )
+
+        po.bom_no = po.bom_no or bom.item_no
+        po.bom_version_code = po.bom_version_code or bom.version_code
+        line_nos = _line_numbers(draft)
+        po.lines = [
+            ProductionOrderLine(
+                line_no=line_nos[line.item_no],
+                bom_line_no=draft.bom_line_nos.get(line.item_no),
+                component_item_no=line.item_no,
+                description=line.description,
+                quantity_per=line.quantity_per,
+                expected_quantity=line.total_quantity,
+                consumed_quantity=0.0,
+                remaining_quantity=line.total_quantity,
+                uom_code=line.uom_code,
+                location_code=po.location_code,
+                position=line.position,
+            )
+            for line in sorted(draft.lines.values(), key=lambda line: line_nos[line.item_no])
+        ]
+        routing = routings.get(draft.item_no)
+        if routing is not None:
+            po.routing_no = routing.item_no
+            po.routing_version_code = routing.version_code
+            po.routing_lines = explode_routing(routing, po.quantity)
+
+        # insert() bypasses save(), which maintains these
+        po.remaining_quantity = po.quantity - (po.finished_quantity or 0.0) - (po.scrap_quantity or 0.0)
+        po.updated_at = datetime.utcnow()
+        po.validate()
+        orders[draft.item_no] = po
+
+    documents = list(orders.values())
+    numbers = [po.order_no for po in documents]
+    taken = sorted(ProductionOrder.objects(tenant_id=tenant_id, order_no__in=numbers).scalar("order_no"))
+    if taken:
+        raise NotUniqueError(f"Production Order(s) already exist: {', '.join(taken)}")
+
+    # The tree is inserted whole or not at all: an order number taken
+    # meanwhile removes the orders this insert already wrote
+    raw = [po.to_mongo() for po in documents]
+    collection = ProductionOrder._get_collection()
+    try:
+        collection.insert_many(raw, ordered=True)
+    except BulkWriteError as e:
+        written = [row["_id"] for row in raw[:e.details.get("nInserted", 0)]]
+        if written:
+            collection.delete_many({"_id": {"$in": written}})
+        raise NotUniqueError(f"Production Order numbers of {root.order_no} already exist") from e
+    for po, row in zip(documents, raw):
+        po.id = row["_id"]
+    return documents
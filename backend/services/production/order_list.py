@@ -0,0 +1,178 @@
+# backend/services/production/order_list.py
+"""
+Production Order List - One aggregation for page, total and dashboard counts
+
+    $match  tenant_id [, status, item_no, due date range, prefix search]
+    $sort   due_date DESC, order_no ASC
+    $facet
+        items:       [keyset $match] [$skip] $limit page_size + 1
+        total:       $count
+        by_status:   $group status
+        by_due_week: $group ISO year/week of due_date
+
+$match and $sort run before $facet, so they use the
+(tenant_id, -due_date, order_no) index; the facets only see the matched
+documents. Counts are over the filtered orders (a status filter narrows
+by_status to that status).
+
+Pages are continued with an opaque cursor on (due_date, order_no) instead
+of an offset (same idea as services.ledger_query), so orders inserted
+before the cursor do not shift the next page. Every page is still one
+round trip whose facets run over all matched orders: a page costs
+O(matched orders), not O(page size) - the price of returning total and
+counts with each page. Orders without due date sort last.
+
+Search (q) is an anchored, case-sensitive prefix match on order_no or
+item_no: /^PO-2025/ can use the order_no / item_no indexes, an unanchored
+or case-insensitive regex has to scan every order of the tenant.
+"""
+import base64
+import json
+import re
+from datetime import date, datetime
+from typing import Any, Mapping, Optional, Tuple
+
+DEFAULT_PAGE_SIZE = 50
+MAX_PAGE_SIZE = 100
+
+
+def production_order_page(
+    tenant_id: str,
+    args: Mapping[str, Any],
+    size: int = DEFAULT_PAGE_SIZE,
+    cursor: Optional[str] = None,
+    page: int = 1
+) -> dict:
+    """
+    One page of production orders with total and faceted counts (one query).
+
+    Args:
+        tenant_id: Laboratory/tenant identifier
+        args: Filters - q, status, item_no, due_date_from, due_date_to (ISO)
+        size: Page size
+        cursor: next_cursor of the previous page (None = first page)
+        page: Legacy page number, used only without cursor (prefer the cursor)
+
+    Returns:
+        {total, page_size, items, next_cursor, counts: {by_status, by_due_week}}
+
+    Raises:
+        ValueError: Malformed cursor
+    """
+    from models.production import ProductionOrder
+
+    match = _match(str(tenant_id), args)
+    items = []
+    if cursor:
+        due_date, order_no = decode_cursor(cursor)
+        items.append({"$match": _after(due_date, order_no)})
+    elif page > 1:
+        items.append({"$skip": (page - 1) * size})
+    # One extra row tells whether there is a next page
+    items.append({"$limit": size + 1})
+
+    pipeline = [
+        {"$match": match},
+        {"$sort": {"due_date": -1, "order_no": 1}},
+        {"$facet": {
+            "items": items,
+            "total": [{"$count": "count"}],
+            "by_status": [{"$group": {"_id": "$status", "count": {"$sum": 1}}}],
+            "by_due_week": [{"$group": {
+                "_id": {"year": {"$isoWeekYear": "$due_date"}, "week": {"$isoWeek": "$due_date"}},
+                "count": {"$sum": 1},
+            }}],
+        }},
+    ]
+    facets = next(iter(ProductionOrder._get_collection().aggregate(pipeline)), {})
+
+    rows = facets.get("items", [])
+    next_cursor = None
+    if len(rows) > size:
+        rows = rows[:size]
+        next_cursor = encode_cursor(rows[-1].get("due_date"), rows[-1]["order_no"])
+
+    total = facets.get("total") or [{"count": 0}]
+    weeks = sorted(
+        (
+            (f"{group['_id']['year']}-W{group['_id']['week']:02d}" if group["_id"].get("week") else None,
+             group["count"])
+            for group in facets.get("by_due_week", [])
+        ),
+        key=lambda week: (week[0] is None, week[0] or ""),
+    )
+    return {
+        "total": total[0]["count"],
+        "page_size": size,
+        "items": [ProductionOrder._from_son(row).to_dict() for row in rows],
+        "next_cursor": next_cursor,
+        "counts": {
+            "by_status": {group["_id"]: group["count"] for group in facets.get("by_status", [])},
+            "by_due_week": [{"week": week, "count": count} for week, count in weeks],
+        },
+    }
+
+
+def encode_cursor(due_date: Optional[datetime], order_no: str) -> str:
+    """Opaque cursor for the order after which the next page starts"""
+    raw = json.dumps([due_date.isoformat() if due_date else None, order_no], separators=(',', ':'))
+    return base64.urlsafe_b64encode(raw.encode()).decode().rstrip('=')
+
+
+def decode_cursor(cursor: str) -> Tuple[Optional[datetime], str]:
+    """(due_date, order_no) of a cursor; ValueError if it is not one of ours"""
+    try:
+        raw = base64.urlsafe_b64decode(cursor + '=' * (-len(cursor) % 4))
+        due_date, order_no = json.loads(raw)
+        if not isinstance(order_no, str):
+            raise TypeError("order_no")
+        return (datetime.fromisoformat(due_date) if due_date else None), order_no
+    except (ValueError, TypeError) as e:
+        raise ValueError('Invalid cursor') from e
+
+
+def _after(due_date: Optional[datetime], order_no: str) -> dict:
+    """Orders after (due_date, order_no) in due_date DESC (nulls last), order_no ASC order"""
+    if due_date is None:
+        return {"due_date": None, "order_no": {"$gt": order_no}}
+    return {"$or": [
+        {"due_date": {"$lt": due_date}},
+        {"due_date": due_date, "order_no": {"$gt": order_no}},
+        {"due_date": None},
+    ]}
+
+
+def _match(tenant_id: str, args: Mapping[str, Any]) -> dict:
+    """$match of the list filters (invalid dates are ignored, as before)"""
+    match = {"tenant_id": tenant_id}
+
+    q = (args.get("q", "") or "").strip()
+    if q:
+        prefix = {"$regex": f"^{re.escape(q)}"}
+        match["$or"] = [{"order_no": prefix}, {"item_no": prefix}]
+
+    if args.get("status"):
+        match["status"] = args["status"]
+
+    if args.get("item_no"):
+        match["item_no"] = args["item_no"]
+
+    due = {}
+    for key, operator in (("due_date_from", "$gte"), ("due_date_to", "$lte")):
+        value = _as_datetime(args.get(key))
+        if value is not None:
+            due[operator] = value
+    if due:
+        match["due_date"] = due
+
+    return match
+
+
+def _as_datetime(value) -> Optional[datetime]:
+    """Date filter as stored (DateField values are midnight datetimes)"""
+    if not value:
+        return None
+    try:
+        return datetime.combine(date.fromisoformat(str(value)[:10]), datetime.min.time())
+    except ValueError:
+        return None
@@ -0,0 +1,318 @@
+# backend/services/production/order_release.py
+"""
+Production Order Explosion & Batch Release
+
+- explode_bom / explode_routing: BOM and Routing explosion into production
+  order lines (used by order creation and release)
+- release_production_orders: release many Planned / Firm Planned orders at
+  once
+
+Batch release loads the orders (one query), takes one snapshot of the
+tenant's certified BOMs (a freshly loaded BOM graph, not the cached one)
+and of the certified routings of the ordered items (one query), then
+checks and explodes the orders concurrently in a bounded thread pool. Workers only read the
+shared snapshot and build embedded lines - no database access. All status
+changes and exploded lines are written with one unordered bulk_write. Each
+update is conditional on the order's status and updated_at as loaded, so
+an order changed since (e.g. lines or quantity edited while Planned) is
+not touched, and sets the batch's release_token. When fewer updates
+matched than were sent, one query for the orders carrying the token tells
+the released orders from the conflicts.
+
+An order is releasable on the same terms as a single release (status
+Planned or Firm Planned). Orders that already have component / routing
+lines keep them; empty ones are exploded from the snapshot when the item
+has a certified BOM / routing, and released without lines otherwise.
+
+Configuration:
+- RELEASE_BATCH_WORKERS: thread pool size (default 4)
+"""
+
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass, field
+from datetime import date, datetime
+from typing import Dict, Iterable, List, Optional
+
+from models.production import ProductionOrderLine, ProductionOrderRouting
+
+from .bom_graph import BOMGraph
+
+RELEASABLE_STATUSES = ("Planned", "Firm Planned")
+
+# Largest number of orders one batch may release
+MAX_RELEASE_BATCH = 1000
+
+RELEASE_BATCH_WORKERS = int(os.getenv("RELEASE_BATCH_WORKERS", "4"))
+
+
+def explode_bom(bom, quantity: float, location_code: str) -> list:
+    """
+    Explode BOM into production order lines.
+
+    Args:
+        bom: BOM to explode (document or cached BOM graph node)
+        quantity: Order quantity
+        location_code: Default location for components
+
+    Returns:
+        List of ProductionOrderLine objects
+    """
+    lines = []
+
+    for bom_line in bom.lines:
+        # Calculate expected quantity considering scrap
+        scrap_multiplier = 1.0 + (bom_line.scrap_pct / 100.0)
+        expected_qty = bom_line.quantity_per * quantity * scrap_multiplier
+
+        po_line = ProductionOrderLine(
+            line_no=bom_line.line_no,
+            component_item_no=bom_line.component_item_no,
+            description=bom_line.description,
+            quantity_per=bom_line.quantity_per,
+            expected_quantity=expected_qty,
+            consumed_quantity=0.0,
+            remaining_quantity=expected_qty,
+            uom_code=bom_line.uom_code,
+            location_code=location_code,
+            bom_line_no=bom_line.line_no,
+            position=bom_line.position
+        )
+        lines.append(po_line)
+
+    return lines
+
+
+def explode_routing(routing, quantity: float) -> list:
+    """
+    Explode Routing into production order routing lines.
+
+    Args:
+        routing: Routing to explode
+        quantity: Order quantity
+
+    Returns:
+        List of ProductionOrderRouting objects
+    """
+    routing_lines = []
+
+    for operation in routing.operations:
+        # Calculate expected capacity need
+        setup_time = operation.setup_time or 0.0
+        run_time_per_unit = (operation.run_time or 0.0) / operation.concurrent_capacities
+        total_run_time = run_time_per_unit * quantity
+        expected_capacity = setup_time + total_run_time
+
+        po_routing = ProductionOrderRouting(
+            operation_no=operation.operation_no,
+            work_center_code=operation.work_center_code,
+            machine_center_code=operation.machine_center_code,
+            description=operation.description,
+            setup_time=setup_time,
+            run_time=total_run_time,
+            expected_capacity_need=expected_capacity,
+            actual_setup_time=0.0,
+            actual_run_time=0.0,
+            remaining_time=expected_capacity,
+            wait_time=operation.wait_time or 0.0,
+            move_time=operation.move_time or 0.0,
+            send_ahead_quantity=operation.send_ahead_quantity or 0.0,
+            routing_operation_no=operation.operation_no,
+            status="Planned"
+        )
+        routing_lines.append(po_routing)
+
+    return routing_lines
+
+
+# ========================================
+# Batch release
+# ========================================
+
+@dataclass(slots=True)
+class ReleaseResult:
+    """Outcome of one order in a batch"""
+    id: str
+    order_no: Optional[str]
+    status: str = "Released"          # Released | Failed | Conflict
+    error: Optional[str] = None
+    exploded_lines: int = 0
+    exploded_routing_lines: int = 0
+    fields: Dict[str, object] = field(default_factory=dict)
+
+    def to_dict(self) -> dict:
+        return {
+            "id": self.id,
+            "order_no": self.order_no,
+            "status": self.status,
+            "error": self.error,
+            "exploded_lines": self.exploded_lines,
+            "exploded_routing_lines": self.exploded_routing_lines,
+        }
+
+
+def prepare_release(po, graph: BOMGraph, routings: Dict[str, object]) -> ReleaseResult:
+    """
+    Check one order's status and explode what is missing (no database access).
+
+    Returns:
+        ReleaseResult; for a releasable order, fields holds the $set of the
+        update (lines and routing lines only when they were exploded)
+    """
+    result = ReleaseResult(id=str(po.id), order_no=po.order_no)
+
+    def fail(message: str) -> ReleaseResult:
+        result.status = "Failed"
+        result.error = message
+        return result
+
+    # Same rule as ProductionOrder.release()
+    if po.status not in RELEASABLE_STATUSES:
+        return fail(f"Cannot release {po.status} Production Order. Must be Planned or Firm Planned.")
+
+    bom = graph.bom(po.item_no)
+    if not po.lines and bom is not None:
+        lines = explode_bom(bom, po.quantity, po.location_code)
+        result.fields["lines"] = [line.to_mongo() for line in lines]
+        result.fields["bom_no"] = bom.item_no
+        result.fields["bom_version_code"] = bom.version_code
+        result.exploded_lines = len(lines)
+
+    routing = routings.get(po.item_no)
+    if not po.routing_lines and routing is not None:
+        routing_lines = explode_routing(routing, po.quantity)
+        result.fields["routing_lines"] = [line.to_mongo() for line in routing_lines]
+        result.fields["routing_no"] = routing.item_no
+        result.fields["routing_version_code"] = routing.version_code
+        result.exploded_routing_lines = len(routing_lines)
+    return result
+
+
+def release_production_orders(
+    tenant_id: str,
+    order_ids: Optional[Iterable[str]] = None,
+    status: Optional[str] = None,
+    due_date_from: Optional[date] = None,
+    due_date_to: Optional[date] = None,
+    user_email: Optional[str] = None,
+    max_workers: Optional[int] = None,
+) -> dict:
+    """
+    Release a batch of production orders.
+
+    Args:
+        tenant_id: Laboratory/tenant identifier
+        order_ids: Orders to release; without ids, every releasable order
+            matching status / due date range
+        status: Planned or Firm Planned (filter only; default both)
+        due_date_from, due_date_to: Due date range (filter only, inclusive)
+        user_email: released_by / updated_by
+        max_workers: Thread pool size (default RELEASE_BATCH_WORKERS)
+
+    Returns:
+        {requested, released, failed, conflicts, elapsed_ms, results: [...]}
+
+    Raises:
+        ValueError: invalid status filter or more than MAX_RELEASE_BATCH orders
+    """
+    from bson import ObjectId
+    from pymongo import UpdateOne
+    from models.production import ProductionOrder, Routing
+
+    started = time.perf_counter()
+    tenant_id = str(tenant_id)
+
+    orders = ProductionOrder.objects(tenant_id=tenant_id)
+    results: List[ReleaseResult] = []
+    if order_ids is not None:
+        order_ids = list(dict.fromkeys(str(order_id) for order_id in order_ids))
+        valid = [order_id for order_id in order_ids if ObjectId.is_valid(order_id)]
+        orders = orders.filter(id__in=valid)
+    else:
+        if status is not None and status not in RELEASABLE_STATUSES:
+            raise ValueError(f"status must be one of: {', '.join(RELEASABLE_STATUSES)}")
+        orders = orders.filter(status__in=[status] if status else list(RELEASABLE_STATUSES))
+        if due_date_from:
+            orders = orders.filter(due_date__gte=due_date_from)
+        if due_date_to:
+            orders = orders.filter(due_date__lte=due_date_to)
+
+    orders = list(orders.only(
+        "id", "order_no", "item_no", "quantity", "location_code", "status", "lines", "routing_lines", "updated_at"
+    ).limit(MAX_RELEASE_BATCH + 1))
+    if len(orders) > MAX_RELEASE_BATCH:
+        raise ValueError(f"More than {MAX_RELEASE_BATCH} orders selected; narrow the selection")
+
+    if order_ids is not None:
+        found = {str(po.id) for po in orders}
+        results.extend(
+            ReleaseResult(id=order_id, order_no=None, status="Failed", error="Production Order not found")
+            for order_id in order_ids if order_id not in found
+        )
+
+    # Shared read-only snapshot: certified BOMs and routings. Loaded fresh -
+    # the cached graph may predate a BOM certification and lines written
+    # here must not come from a stale BOM version.
+    graph = BOMGraph.load(tenant_id)
+    routings: Dict[str, object] = {}
+    item_nos = list({po.item_no for po in orders if not po.routing_lines})
+    if item_nos:
+        for routing in Routing.objects(tenant_id=tenant_id, item_no__in=item_nos, status="Certified").only(
+            "item_no", "version_code", "operations"
+        ):
+            routings.setdefault(routing.item_no, routing)
+
+    workers = max(1, min(max_workers or RELEASE_BATCH_WORKERS, len(orders) or 1))
+    with ThreadPoolExecutor(max_workers=workers, thread_name_prefix="release") as executor:
+        prepared = list(executor.map(lambda po: prepare_release(po, graph, routings), orders))
+
+    # One unordered bulk_write; each update is conditional on the order being
+    # unchanged since it was loaded and tags it with this batch's token
+    token = str(ObjectId())
+    now = datetime.utcnow()
+    updates = []
+    releasing: List[ReleaseResult] = []
+    for po, result in zip(orders, prepared):
+        if result.status != "Released":
+            continue
+        fields = dict(result.fields)
+        fields.update({
+            "status": "Released",
+            "released_date": now,
+            "released_by": user_email,
+            "release_token": token,
+            "updated_by": user_email,
+            "updated_at": now,
+        })
+        updates.append(UpdateOne(
+            {"_id": po.id, "tenant_id": tenant_id, "status": po.status, "updated_at": po.updated_at},
+            {"$set": fields},
+        ))
+        releasing.append(result)
+
+    if updates:
+        collection = ProductionOrder._get_collection()
+        outcome = collection.bulk_write(updates, ordered=False)
+        if outcome.matched_count < len(updates):
+            released = {
+                str(row["_id"]) for row in collection.find(
+                    {"_id": {"$in": [ObjectId(result.id) for result in releasing]}, "release_token": token},
+                    {"_id": 1},
+                )
+            }
+            for result in releasing:
+                if result.id not in released:
+                    result.status = "Conflict"
+                    result.error = "Production Order changed during release"
+
+    results = prepared + results
+    return {
+        "requested": len(results),
+        "released": sum(1 for result in results if result.status == "Released"),
+        "failed": sum(1 for result in results if result.status == "Failed"),
+        "conflicts": sum(1 for result in results if result.status == "Conflict"),
+        "workers": workers,
+        "elapsed_ms": (time.perf_counter() - started) * 1000.0,
+        "results": [result.to_dict() for result in results],
+    }
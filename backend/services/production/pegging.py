@@ -0,0 +1,431 @@
+# backend/services/production/pegging.py
+"""
+Pegging - Which demand drives which supply, across BOM levels
+
+MRP (services.production.mrp) pegs every requirement it nets to the
+supplies covering it, first come first served by date: on-hand stock,
+then scheduled receipts and planned orders. Nodes are plain ids shared by
+all levels:
+
+- "SO:<order>:<line>"   sales order line (demand)
+- "PO:<order_no>"       production order: supply of its item and demand
+                        for its component lines
+- "PLAN:<item>:<date>"  planned order: supply of its item and (production)
+                        demand for its components
+- "STOCK:<item>"        on-hand stock (supply)
+- "SAFETY:<item>"       safety stock (demand)
+
+Because an order's id is the same as a supply and as a demand, pegs chain
+from a purchased component up to the sales line that drives it:
+
+    SO:S-1:0 <- PLAN:FG:2025-03-11 <- PLAN:SUB:2025-03-09 <- PLAN:RM1:2025-03-07
+
+Pegs are stored per tenant (PeggingEntry, indexed by demand and supply)
+and served from an array-backed PeggingIndex: edges are held in flat
+arrays with CSR offsets by supply and by demand, so "what drives this
+requirement" (upstream) and "what covers this demand" (downstream) are
+walks over index ranges instead of fresh explosions. The index is cached
+per tenant in the BOMGraphCache style (version counter bumped by every
+MRP run, PEGGING_CACHE_TTL seconds max age, default 300).
+
+Usage:
+    from services.production.pegging import pegging_cache
+
+    index = pegging_cache.get(tenant_id)
+    index.upstream("PLAN:SUB-001:2025-03-09")   # drivers and affected orders
+    index.downstream("SO:S-1:0")                # supplies feeding a sales line
+"""
+
+import os
+import threading
+import time
+from array import array
+from collections import defaultdict
+from datetime import date
+from typing import Dict, Iterable, List, NamedTuple, Optional, Tuple
+
+# Quantities below this are rounding noise
+EPSILON = 1e-9
+
+
+class Peg(NamedTuple):
+    """quantity of item_no supplied by supply_id to demand_id"""
+    item_no: str
+    demand_id: str
+    supply_id: str
+    quantity: float
+
+
+def stock_id(item_no: str) -> str:
+    return f"STOCK:{item_no}"
+
+
+def safety_id(item_no: str) -> str:
+    return f"SAFETY:{item_no}"
+
+
+def production_order_id(order_no: str) -> str:
+    return f"PO:{order_no}"
+
+
+def planned_order_id(item_no: str, due_date: date) -> str:
+    return f"PLAN:{item_no}:{due_date.isoformat()}"
+
+
+def sales_line_id(order_ref: str, line_index: int) -> str:
+    return f"SO:{order_ref}:{line_index}"
+
+
+def peg_item(
+    item_no: str,
+    today: date,
+    on_hand: float,
+    events: Iterable[Tuple[date, float, str]],
+    planned: Iterable[Tuple[date, float, str]],
+    safety_stock: float = 0.0,
+) -> List[Peg]:
+    """
+    Peg one item's requirements to its supplies, first come first served.
+
+    Args:
+        events: (date, quantity, node id) - requirements negative, receipts positive
+        planned: (due date, quantity, node id) of the planned orders
+        safety_stock: pegged last, after every dated requirement
+
+    Returns:
+        Pegs, one per (demand, supply) pair; uncovered requirements are left out
+    """
+    supplies: List[Tuple[date, int, str, float]] = []
+    demands: List[Tuple[date, str, float]] = []
+    if on_hand > EPSILON:
+        supplies.append((date.min, 0, stock_id(item_no), on_hand))
+    for day, quantity, node in events:
+        day = max(day, today)
+        if quantity > EPSILON:
+            supplies.append((day, 1, node, quantity))
+        elif quantity < -EPSILON:
+            demands.append((day, node, -quantity))
+    for day, quantity, node in planned:
+        supplies.append((day, 2, node, quantity))
+    supplies.sort(key=lambda supply: (supply[0], supply[1]))
+    demands.sort(key=lambda demand: demand[0])
+    if safety_stock > EPSILON:
+        demands.append((date.max, safety_id(item_no), safety_stock))
+
+    pegged: Dict[Tuple[str, str], float] = {}
+    i = 0
+    left = supplies[0][3] if supplies else 0.0
+    for _, demand, need in demands:
+        while need > EPSILON and i < len(supplies):
+            take = min(need, left)
+            key = (demand, supplies[i][2])
+            pegged[key] = pegged.get(key, 0.0) + take
+            need -= take
+            left -= take
+            if left <= EPSILON:
+                i += 1
+                left = supplies[i][3] if i < len(supplies) else 0.0
+        if i >= len(supplies):
+            break
+    return [Peg(item_no, demand, supply, quantity) for (demand, supply), quantity in pegged.items()]
+
+
+class PeggingIndex:
+    """
+    Immutable array-backed pegging graph of a tenant.
+
+    Edge e: nodes[edge_demand[e]] consumes edge_quantity[e] of
+    nodes[edge_supply[e]] (an item_items[edge_item[e]] supply). Edges are
+    grouped by supply and by demand with CSR offsets, so the pegs of a node
+    are one slice in either direction.
+    """
+
+    def __init__(self, tenant_id: str, version: int, pegs: Iterable[Peg]):
+        self.tenant_id = tenant_id
+        self.version = version
+        self.built_at = time.monotonic()
+        self.nodes: List[str] = []
+        self._node: Dict[str, int] = {}
+        self.items: List[str] = []
+        item_index: Dict[str, int] = {}
+
+        demand = array("l")
+        supply = array("l")
+        quantity = array("d")
+        edge_item = array("l")
+        for peg in pegs:
+            demand.append(self._intern(peg.demand_id))
+            supply.append(self._intern(peg.supply_id))
+            quantity.append(peg.quantity)
+            if peg.item_no not in item_index:
+                item_index[peg.item_no] = len(self.items)
+                self.items.append(peg.item_no)
+            edge_item.append(item_index[peg.item_no])
+        self.edge_demand = demand
+        self.edge_supply = supply
+        self.edge_quantity = quantity
+        self.edge_item = edge_item
+
+        n = len(self.nodes)
+        self._by_supply_offsets, self._by_supply = self._csr(supply, n)
+        self._by_demand_offsets, self._by_demand = self._csr(demand, n)
+        # Pegged quantity per node as supply (consumed) - denominator for shares
+        self.consumed = array("d", [0.0]) * n
+        for e in range(len(quantity)):
+            self.consumed[supply[e]] += quantity[e]
+
+    def __len__(self) -> int:
+        return len(self.edge_quantity)
+
+    def _intern(self, node: str) -> int:
+        index = self._node.get(node)
+        if index is None:
+            index = self._node[node] = len(self.nodes)
+            self.nodes.append(node)
+        return index
+
+    @staticmethod
+    def _csr(keys: array, n: int) -> Tuple[array, array]:
+        """Offsets (n + 1) and edge ids grouped by key (counting sort)"""
+        offsets = array("l", [0]) * (n + 1)
+        for key in keys:
+            offsets[key + 1] += 1
+        for i in range(n):
+            offsets[i + 1] += offsets[i]
+        edges = array("l", [0]) * len(keys)
+        fill = array("l", offsets[:n])
+        for e, key in enumerate(keys):
+            edges[fill[key]] = e
+            fill[key] += 1
+        return offsets, edges
+
+    def _consumers(self, node: int) -> array:
+        """Edges where node is the supply"""
+        return self._by_supply[self._by_supply_offsets[node]:self._by_supply_offsets[node + 1]]
+
+    def _suppliers(self, node: int) -> array:
+        """Edges where node is the demand"""
+        return self._by_demand[self._by_demand_offsets[node]:self._by_demand_offsets[node + 1]]
+
+    def has(self, node_id: str) -> bool:
+        return node_id in self._node
+
+    def item_of(self, node_id: str) -> Optional[str]:
+        """Item a node supplies (or, for a pure demand, requires)"""
+        node = self._node.get(node_id)
+        if node is None:
+            return None
+        edges = self._consumers(node) or self._suppliers(node)
+        return self.items[self.edge_item[edges[0]]] if edges else None
+
+    def pegs(self, node_id: str) -> dict:
+        """Direct pegs of a node: {consumed_by: [...], supplied_by: [...]}"""
+        node = self._node.get(node_id)
+        if node is None:
+            return {"node": node_id, "consumed_by": [], "supplied_by": []}
+        return {
+            "node": node_id,
+            "item_no": self.item_of(node_id),
+            "consumed_by": [
+                {"demand": self.nodes[self.edge_demand[e]], "quantity": self.edge_quantity[e]}
+                for e in self._consumers(node)
+            ],
+            "supplied_by": [
+                {"supply": self.nodes[self.edge_supply[e]], "item_no": self.items[self.edge_item[e]],
+                 "quantity": self.edge_quantity[e]}
+                for e in self._suppliers(node)
+            ],
+        }
+
+    def _walk(self, node: int, upward: bool) -> Dict[int, Tuple[float, int]]:
+        """
+        Quantities reached from node, once per node (Kahn's order over the reached subgraph).
+
+        Upward follows consumers (edge supply -> demand), downward suppliers
+        (edge demand -> supply). Each reached node gets the sum of the
+        quantities of its incoming edges; it passes its share of that on
+        (quantity / consumed; the start node passes its pegs whole) after
+        all its predecessors were merged, so a node shared by several paths
+        is expanded once. Level is the shortest distance from node. Nodes
+        on a cycle (not produced by MRP) are left out.
+
+        Returns:
+            {node: (quantity, level)} without the start node
+        """
+        def edges(current: int) -> array:
+            if current != node and not self.consumed[current]:
+                return array("l")
+            return self._consumers(current) if upward else self._suppliers(current)
+
+        target = self.edge_demand if upward else self.edge_supply
+
+        # Reached subgraph and the number of reached edges into each node
+        incoming: Dict[int, int] = defaultdict(int)
+        seen = {node}
+        stack = [node]
+        while stack:
+            for e in edges(stack.pop()):
+                nxt = target[e]
+                incoming[nxt] += 1
+                if nxt not in seen:
+                    seen.add(nxt)
+                    stack.append(nxt)
+
+        totals: Dict[int, float] = defaultdict(float)
+        levels: Dict[int, int] = {node: 0}
+        ready = [node] if not incoming[node] else []
+        while ready:
+            current = ready.pop()
+            share = 1.0 if current == node else totals[current] / (self.consumed[current] or 1.0)
+            for e in edges(current):
+                nxt = target[e]
+                totals[nxt] += self.edge_quantity[e] * share
+                level = levels[current] + 1
+                if level < levels.get(nxt, level + 1):
+                    levels[nxt] = level
+                incoming[nxt] -= 1
+                if not incoming[nxt]:
+                    ready.append(nxt)
+        return {
+            reached: (quantity, levels[reached])
+            for reached, quantity in totals.items()
+            if reached != node and not incoming[reached]
+        }
+
+    def _rows(self, reached: Dict[int, Tuple[float, int]]) -> List[dict]:
+        return [
+            {
+                "node": self.nodes[current],
+                "item_no": self.item_of(self.nodes[current]),
+                "level": level,
+                "quantity": quantity,
+            }
+            for current, (quantity, level) in sorted(reached.items(), key=lambda entry: (entry[1][1], entry[0]))
+        ]
+
+    def upstream(self, node_id: str) -> List[dict]:
+        """
+        What drives a supply / what a shortage of it affects.
+
+        Walks consumers up the BOM levels, one row per node (level = its
+        shortest distance). Quantities are the node's own pegged quantity
+        (in its item's unit) shared out proportionally at every level and
+        summed over all paths. Rows with "top": True are the driving demands
+        (sales lines, safety stock, orders nothing else consumes).
+        """
+        node = self._node.get(node_id)
+        if node is None:
+            return []
+        rows = self._rows(self._walk(node, upward=True))
+        for row in rows:
+            row["top"] = not self.consumed[self._node[row["node"]]]
+        return rows
+
+    def drivers(self, node_id: str) -> List[dict]:
+        """Driving demands of a node"""
+        return [row for row in self.upstream(node_id) if row["top"]]
+
+    def downstream(self, node_id: str) -> List[dict]:
+        """
+        Supplies covering a demand at every BOM level.
+
+        Level 1 is the supplies pegged to the demand itself, level 2 the
+        supplies of their component requirements, and so on (one row per
+        supply, at its shortest distance); quantities are scaled to the
+        share of each order the demand consumes, summed over all paths.
+        """
+        node = self._node.get(node_id)
+        if node is None:
+            return []
+        return self._rows(self._walk(node, upward=False))
+
+    @classmethod
+    def load(cls, tenant_id: str, version: int = 0) -> "PeggingIndex":
+        """Load all stored pegs of a tenant (one query)"""
+        from models.production import PeggingEntry
+
+        rows = PeggingEntry.objects(tenant_id=tenant_id).only(
+            "item_no", "demand_id", "supply_id", "quantity"
+        ).as_pymongo()
+        return cls(tenant_id, version, (
+            Peg(row["item_no"], row["demand_id"], row["supply_id"], row["quantity"]) for row in rows
+        ))
+
+
+class PeggingCache:
+    """
+    Per-tenant PeggingIndex cache with version-counter invalidation.
+
+    Counters:
+    - hits: index served from memory
+    - misses: index (re)loaded from the database
+    - invalidations: invalidate() calls
+    """
+
+    def __init__(self, max_age_seconds: float = 300.0):
+        self.max_age_seconds = max_age_seconds
+        self._lock = threading.Lock()
+        self._versions: Dict[str, int] = {}
+        self._indexes: Dict[str, PeggingIndex] = {}
+        self.hits = 0
+        self.misses = 0
+        self.invalidations = 0
+
+    def get(self, tenant_id: str) -> PeggingIndex:
+        """Get the tenant index (loading it if needed)"""
+        with self._lock:
+            version = self._versions.get(tenant_id, 0)
+            index = self._indexes.get(tenant_id)
+            if index is not None and index.version == version and not self._expired(index):
+                self.hits += 1
+                return index
+            self.misses += 1
+
+        # Load outside the lock so one slow tenant doesn't block the others
+        index = PeggingIndex.load(tenant_id, version)
+
+        with self._lock:
+            # Keep it only if nothing was invalidated while loading
+            if self._versions.get(tenant_id, 0) == version:
+                self._indexes[tenant_id] = index
+        return index
+
+    def invalidate(self, tenant_id: str) -> int:
+        """Bump the tenant version counter and drop its index"""
+        with self._lock:
+            version = self._versions.get(tenant_id, 0) + 1
+            self._versions[tenant_id] = version
+            self._indexes.pop(tenant_id, None)
+            self.invalidations += 1
+            return version
+
+    def clear(self) -> None:
+        """Drop every cached index (counters are kept)"""
+        with self._lock:
+            for tenant_id in list(self._indexes):
+                self._versions[tenant_id] = self._versions.get(tenant_id, 0) + 1
+            self._indexes.clear()
+
+    def stats(self) -> dict:
+        """Hit/miss counters"""
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "invalidations": self.invalidations,
+                "hit_ratio": (self.hits / lookups) if lookups else 0.0,
+                "cached_tenants": len(self._indexes),
+                "max_age_seconds": self.max_age_seconds,
+            }
+
+    def _expired(self, index: PeggingIndex) -> bool:
+        if not self.max_age_seconds:
+            return False
+        return time.monotonic() - index.built_at > self.max_age_seconds
+
+
+# Process-wide cache instance
+pegging_cache = PeggingCache(
+    max_age_seconds=float(os.getenv("PEGGING_CACHE_TTL", "300"))
+)
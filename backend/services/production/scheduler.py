@@ -0,0 +1,478 @@
+# backend/services/production/scheduler.py
+"""
+Finite-Capacity Scheduler - Assigns start/end times to production order operations
+
+Operations of released production orders are dispatched onto their
+resources (the machine center if the operation names one, otherwise the
+work center) with a priority queue:
+
+Forward (from now / the order start date):
+- The heap holds the next unscheduled operation of every order, keyed by
+  its earliest possible start, then priority (higher first), due date and
+  order number
+- Popping an operation re-checks the start against its resource; if the
+  resource became busy meanwhile the operation is pushed back with the
+  later start (lazy re-keying), otherwise it is placed and the order's
+  next operation is pushed
+- Each resource runs one operation at a time at `efficiency_pct` (work
+  minutes = (setup + run) / efficiency), during the shifts of its calendar
+  (calendar_code) or, without one, `capacity` minutes per day
+
+Backward (from the due date): the mirror image; the last operation of
+each order is placed as late as possible before the due date, then its
+predecessors.
+
+Lead time elements (minutes):
+- work center queue_time and operation wait_time: before the operation starts
+- operation move_time: after it ends, before the next operation can start
+- send_ahead_quantity (forward only): the next operation can start once
+  that many units are done, and finishes no earlier than the send-ahead
+  lot after this one
+
+Time is kept as float minutes from the schedule origin. Resources with a
+calendar look working windows up in its precomputed CapacityTimeline
+(services.production.capacity_calendar, one bisect per lookup); the others
+work the window [0, capacity) of each 24h day (one shift starting at
+midnight UTC). Orders that don't fit before the calendar horizon are
+reported with an error. Scheduling is O(n log n) in the number of
+operations and touches no database; schedule_production_orders() loads
+and saves the orders around it.
+
+Usage:
+    from services.production.scheduler import schedule_production_orders
+
+    summary = schedule_production_orders(tenant_id, direction="forward")
+"""
+
+import heapq
+import math
+from dataclasses import dataclass
+from datetime import date, datetime, timedelta
+from typing import Dict, List, Optional
+
+from .capacity_calendar import CapacityTimeline, calendar_timeline_cache
+
+MINUTES_PER_DAY = 1440.0
+
+SCHEDULE_DIRECTIONS = ("forward", "backward")
+
+
+class Resource:
+    """
+    A work center or machine center: one operation at a time, working
+    either the windows of a calendar timeline or a flat daily window.
+
+    `shift` is the schedule origin in timeline minutes (the timeline counts
+    from its own start date).
+    """
+
+    __slots__ = ("code", "day_minutes", "efficiency", "queue_time", "timeline", "shift")
+
+    def __init__(self, code: str, capacity: float, efficiency_pct: float = 100.0, queue_time: float = 0.0,
+                 timeline: Optional[CapacityTimeline] = None, shift: float = 0.0):
+        self.code = code
+        self.day_minutes = min(max(capacity or 0.0, 0.0), MINUTES_PER_DAY)
+        self.efficiency = (efficiency_pct or 0.0) / 100.0
+        self.queue_time = queue_time or 0.0
+        self.timeline = timeline
+        self.shift = shift
+
+    @property
+    def available(self) -> bool:
+        if self.timeline is not None:
+            return self.day_minutes > 0 and self.timeline.total_minutes > 0 and self.efficiency > 0
+        return self.day_minutes > 0 and self.efficiency > 0
+
+    def work_minutes(self, minutes: float) -> float:
+        """Resource time needed for `minutes` of standard work"""
+        return minutes / self.efficiency
+
+    def next_start(self, t: float) -> float:
+        """Earliest working time at or after t"""
+        if self.timeline is not None:
+            return self.timeline.next_start(t + self.shift) - self.shift
+        day, offset = divmod(t, MINUTES_PER_DAY)
+        if offset >= self.day_minutes:
+            return (day + 1) * MINUTES_PER_DAY
+        return t
+
+    def add(self, t: float, minutes: float) -> float:
+        """End of `minutes` of resource time started at t (t is a working time)"""
+        if minutes <= 0 or math.isinf(t):
+            return t
+        if self.timeline is not None:
+            return self.timeline.add(t + self.shift, minutes) - self.shift
+        cap = self.day_minutes
+        day, offset = divmod(t, MINUTES_PER_DAY)
+        left = cap - offset
+        if minutes <= left:
+            return t + minutes
+        full, rest = divmod(minutes - left, cap)
+        if rest == 0:
+            return (day + full) * MINUTES_PER_DAY + cap
+        return (day + full + 1) * MINUTES_PER_DAY + rest
+
+    def latest_end(self, t: float) -> float:
+        """Latest working time at or before t (an end of work)"""
+        if self.timeline is not None:
+            return self.timeline.latest_end(t + self.shift) - self.shift
+        day, offset = divmod(t, MINUTES_PER_DAY)
+        if offset == 0:
+            return (day - 1) * MINUTES_PER_DAY + self.day_minutes
+        if offset > self.day_minutes:
+            return day * MINUTES_PER_DAY + self.day_minutes
+        return t
+
+    def subtract(self, t: float, minutes: float) -> float:
+        """Start of `minutes` of resource time that ends at t (t is a working end)"""
+        if minutes <= 0 or math.isinf(t):
+            return t
+        if self.timeline is not None:
+            return self.timeline.subtract(t + self.shift, minutes) - self.shift
+        cap = self.day_minutes
+        day, offset = divmod(t, MINUTES_PER_DAY)
+        if offset == 0:
+            day, offset = day - 1, cap
+        if minutes <= offset:
+            return day * MINUTES_PER_DAY + offset - minutes
+        full, rest = divmod(minutes - offset, cap)
+        if rest == 0:
+            return (day - full) * MINUTES_PER_DAY
+        return (day - full - 1) * MINUTES_PER_DAY + cap - rest
+
+
+@dataclass(slots=True)
+class Operation:
+    """One routing line to schedule (times in minutes)"""
+    operation_no: int
+    resource: str
+    setup_time: float
+    run_time: float                   # for the whole order quantity
+    quantity: float = 1.0
+    wait_time: float = 0.0
+    move_time: float = 0.0
+    send_ahead_quantity: float = 0.0
+    start: Optional[float] = None
+    end: Optional[float] = None
+
+
+@dataclass(slots=True)
+class Job:
+    """A production order: operations in routing sequence"""
+    order_no: str
+    operations: List[Operation]
+    priority: int = 0
+    release: float = 0.0              # forward: earliest start
+    due: Optional[float] = None       # end of the due date
+    start: Optional[float] = None
+    end: Optional[float] = None
+    late: bool = False
+    error: Optional[str] = None
+
+
+class FiniteScheduler:
+    """Priority-queue list scheduler over finite resources"""
+
+    def __init__(self, resources: Dict[str, Resource]):
+        self.resources = resources
+
+    def schedule(self, jobs: List[Job], direction: str = "forward") -> List[Job]:
+        """
+        Schedule jobs in place (sets Operation.start/end and Job.start/end/late/error).
+
+        Resources start empty: the schedule replaces any previous one.
+        """
+        if direction not in SCHEDULE_DIRECTIONS:
+            raise ValueError(f"direction must be one of {', '.join(SCHEDULE_DIRECTIONS)}")
+
+        schedulable = []
+        for job in jobs:
+            job.start = job.end = job.error = None
+            job.late = False
+            missing = next((op.resource for op in job.operations
+                            if op.resource not in self.resources
+                            or not self.resources[op.resource].available), None)
+            if missing:
+                job.error = f"Resource {missing} not found or without capacity"
+            elif direction == "backward" and job.due is None:
+                job.error = "due_date is required for backward scheduling"
+            elif job.operations:
+                schedulable.append(job)
+
+        if direction == "forward":
+            self._forward(schedulable)
+        else:
+            self._backward(schedulable)
+
+        for job in schedulable:
+            if any(math.isinf(op.start) or math.isinf(op.end) for op in job.operations):
+                for op in job.operations:
+                    op.start = op.end = None
+                job.error = "Beyond calendar horizon"
+                continue
+            job.start = job.operations[0].start
+            job.end = job.operations[-1].end
+            if direction == "forward":
+                job.late = job.due is not None and job.end > job.due
+            else:
+                job.late = job.start < job.release
+        return jobs
+
+    def _forward(self, jobs: List[Job]) -> None:
+        resources = self.resources
+        free: Dict[str, float] = {}
+        heap = []
+        for index, job in enumerate(jobs):
+            due = job.due if job.due is not None else float("inf")
+            # (earliest start, -priority, due, order_no, job, op index, ready, min end)
+            heap.append((job.release, -job.priority, due, job.order_no, index, 0, job.release, 0.0))
+        heapq.heapify(heap)
+
+        while heap:
+            key, neg_priority, due, order_no, index, op_index, ready, min_end = heapq.heappop(heap)
+            op = jobs[index].operations[op_index]
+            resource = resources[op.resource]
+
+            start = resource.next_start(max(ready + resource.queue_time + op.wait_time,
+                                            free.get(op.resource, 0.0)))
+            if start > key:
+                # Resource was taken meanwhile - compete again at the new time
+                heapq.heappush(heap, (start, neg_priority, due, order_no, index, op_index, ready, min_end))
+                continue
+
+            work = resource.work_minutes(op.setup_time + op.run_time)
+            end = resource.add(start, work)
+            if end < min_end:
+                # Send-ahead: can't finish before the predecessor's last lot arrives
+                start = resource.next_start(resource.subtract(resource.latest_end(min_end), work))
+                end = resource.add(start, work)
+            op.start, op.end = start, end
+            free[op.resource] = end
+
+            if op_index + 1 < len(jobs[index].operations):
+                nxt = jobs[index].operations[op_index + 1]
+                handoff = end + op.move_time
+                next_min_end = 0.0
+                if 0 < op.send_ahead_quantity < op.quantity:
+                    unit = op.run_time / op.quantity
+                    lot_done = resource.add(start, resource.work_minutes(op.setup_time + unit * op.send_ahead_quantity))
+                    handoff = lot_done + op.move_time
+                    nxt_resource = resources[nxt.resource]
+                    next_min_end = end + op.move_time + nxt_resource.work_minutes(
+                        nxt.run_time / nxt.quantity * op.send_ahead_quantity
+                    )
+                heapq.heappush(heap, (handoff, neg_priority, due, order_no, index, op_index + 1,
+                                      handoff, next_min_end))
+
+    def _backward(self, jobs: List[Job]) -> None:
+        resources = self.resources
+        busy_from: Dict[str, float] = {}
+        heap = []
+        for index, job in enumerate(jobs):
+            last = len(job.operations) - 1
+            # (-latest end, -priority, due, order_no, job, op index, latest end)
+            heap.append((-job.due, -job.priority, job.due, job.order_no, index, last, job.due))
+        heapq.heapify(heap)
+
+        while heap:
+            neg_key, neg_priority, due, order_no, index, op_index, latest = heapq.heappop(heap)
+            op = jobs[index].operations[op_index]
+            resource = resources[op.resource]
+
+            end = resource.latest_end(min(latest, busy_from.get(op.resource, float("inf"))))
+            if end < -neg_key:
+                heapq.heappush(heap, (-end, neg_priority, due, order_no, index, op_index, latest))
+                continue
+
+            start = resource.subtract(end, resource.work_minutes(op.setup_time + op.run_time))
+            op.start, op.end = start, end
+            busy_from[op.resource] = start
+
+            if op_index > 0:
+                prev = jobs[index].operations[op_index - 1]
+                prev_latest = start - resource.queue_time - op.wait_time - prev.move_time
+                heapq.heappush(heap, (-prev_latest, neg_priority, due, order_no, index, op_index - 1,
+                                      prev_latest))
+
+
+# ========================================
+# Production order adapter
+# ========================================
+
+def schedule_production_orders(
+    tenant_id: str,
+    direction: str = "forward",
+    order_nos: Optional[List[str]] = None,
+    origin: Optional[datetime] = None,
+    save: bool = True
+) -> dict:
+    """
+    Schedule the routings of released production orders.
+
+    Loads the orders (one query), their work and machine centers (one
+    query each) and the timelines of their calendars (cached, at most one
+    query), schedules them together and writes the operation start/end
+    times, start_date and has_capacity_shortage back with one bulk_write.
+
+    Args:
+        tenant_id: Laboratory/tenant identifier
+        direction: "forward" (from origin / start_date) or "backward" (from due_date)
+        order_nos: Only these orders (None = every released order); other
+            released orders are not taken into account for capacity
+        origin: Schedule start, rounded down to the minute (default: now, UTC)
+        save: Write the schedule to the orders
+
+    Returns:
+        {direction, origin, orders, operations, late, errors, results: [...]}
+    """
+    from pymongo import UpdateOne
+    from models.production import MachineCenter, ProductionOrder, WorkCenter
+
+    if direction not in SCHEDULE_DIRECTIONS:
+        raise ValueError(f"direction must be one of {', '.join(SCHEDULE_DIRECTIONS)}")
+
+    tenant_id = str(tenant_id)
+    origin = (origin or datetime.utcnow()).replace(second=0, microsecond=0)
+    origin_day = datetime.combine(origin.date(), datetime.min.time())
+    offset = (origin - origin_day).total_seconds() / 60.0  # windows are relative to midnight
+
+    def minutes(value: datetime) -> float:
+        return (value - origin_day).total_seconds() / 60.0
+
+    def to_datetime(value: float) -> datetime:
+        return origin_day + timedelta(minutes=value)
+
+    orders = ProductionOrder.objects(tenant_id=tenant_id, status="Released")
+    if order_nos:
+        orders = orders.filter(order_no__in=list(order_nos))
+    orders = list(orders.only(
+        "id", "order_no", "quantity", "priority", "start_date", "due_date", "routing_lines"
+    ))
+
+    work_centers = list(WorkCenter.objects(tenant_id=tenant_id).only(
+        "code", "capacity", "efficiency_pct", "queue_time", "blocked", "calendar_code"))
+    machine_centers = list(MachineCenter.objects(tenant_id=tenant_id).only(
+        "code", "work_center_code", "capacity", "efficiency_pct", "queue_time", "blocked", "calendar_code"))
+    calendar_codes = {center.calendar_code for center in work_centers + machine_centers if center.calendar_code}
+    resources = build_resources(
+        work_centers,
+        machine_centers,
+        calendar_timeline_cache.get_many(tenant_id, calendar_codes),
+        origin_day.date(),
+    )
+
+    jobs = []
+    for po in orders:
+        release = offset
+        if po.start_date:
+            release = max(release, minutes(datetime.combine(po.start_date, datetime.min.time())))
+        due = None
+        if po.due_date:
+            due = minutes(datetime.combine(po.due_date, datetime.min.time())) + MINUTES_PER_DAY
+        lines = sorted(po.routing_lines, key=lambda line: line.operation_no)
+        jobs.append(Job(
+            order_no=po.order_no,
+            priority=po.priority or 0,
+            release=release,
+            due=due,
+            operations=[
+                Operation(
+                    operation_no=line.operation_no,
+                    resource=resource_key(line.work_center_code, line.machine_center_code),
+                    setup_time=line.setup_time or 0.0,
+                    run_time=line.run_time or 0.0,
+                    quantity=po.quantity or 1.0,
+                    wait_time=line.wait_time or 0.0,
+                    move_time=line.move_time or 0.0,
+                    send_ahead_quantity=line.send_ahead_quantity or 0.0,
+                )
+                for line in lines
+            ],
+        ))
+
+    FiniteScheduler(resources).schedule(jobs, direction)
+
+    results = []
+    updates = []
+    for po, job in zip(orders, jobs):
+        result = {
+            "order_no": job.order_no,
+            "start": to_datetime(job.start).isoformat() if job.start is not None else None,
+            "end": to_datetime(job.end).isoformat() if job.end is not None else None,
+            "late": job.late,
+            "error": job.error,
+            "operations": [
+                {
+                    "operation_no": op.operation_no,
+                    "resource": op.resource,
+                    "start": to_datetime(op.start).isoformat() if op.start is not None else None,
+                    "end": to_datetime(op.end).isoformat() if op.end is not None else None,
+                }
+                for op in job.operations
+            ],
+        }
+        results.append(result)
+
+        if save and job.error is None and job.operations:
+            scheduled = {op.operation_no: op for op in job.operations}
+            fields = {"has_capacity_shortage": job.late, "updated_at": datetime.utcnow()}
+            fields["start_date"] = datetime.combine(to_datetime(job.start).date(), datetime.min.time())
+            for i, line in enumerate(po.routing_lines):
+                op = scheduled.get(line.operation_no)
+                if op is not None:
+                    fields[f"routing_lines.{i}.starting_datetime"] = to_datetime(op.start)
+                    fields[f"routing_lines.{i}.ending_datetime"] = to_datetime(op.end)
+            updates.append(UpdateOne({"_id": po.id}, {"$set": fields}))
+
+    if updates:
+        ProductionOrder._get_collection().bulk_write(updates, ordered=False)
+
+    return {
+        "direction": direction,
+        "origin": origin.isoformat(),
+        "orders": len(jobs),
+        "operations": sum(len(job.operations) for job in jobs),
+        "late": sum(1 for job in jobs if job.late),
+        "errors": sum(1 for job in jobs if job.error),
+        "results": results,
+    }
+
+
+def resource_key(work_center_code: str, machine_center_code: Optional[str] = None) -> str:
+    """Resource an operation runs on: its machine center if set, else its work center"""
+    if machine_center_code:
+        return f"{work_center_code}/{machine_center_code}"
+    return work_center_code
+
+
+def build_resources(work_centers, machine_centers=(), timelines=None, origin_day: Optional[date] = None) -> Dict[str, Resource]:
+    """
+    Resources of a tenant (blocked centers get no capacity).
+
+    timelines maps calendar codes to CapacityTimelines; a center whose
+    calendar_code (a machine center's, else its work center's) is in it
+    works the calendar's shifts instead of its flat daily capacity.
+    origin_day is the date minute 0 of the schedule falls on.
+    """
+    timelines = timelines or {}
+
+    def resource(key, center, calendar_code):
+        timeline = timelines.get(calendar_code) if calendar_code else None
+        if timeline is None:
+            return Resource(key, 0.0 if center.blocked else center.capacity,
+                            center.efficiency_pct, center.queue_time)
+        shift = (origin_day - timeline.start_date).days * MINUTES_PER_DAY if origin_day else 0.0
+        return Resource(key, 0.0 if center.blocked else MINUTES_PER_DAY,
+                        center.efficiency_pct, center.queue_time, timeline, shift)
+
+    resources: Dict[str, Resource] = {}
+    calendars: Dict[str, Optional[str]] = {}
+    for wc in work_centers:
+        calendar_code = getattr(wc, "calendar_code", None)
+        calendars[wc.code] = calendar_code
+        resources[wc.code] = resource(wc.code, wc, calendar_code)
+    for mc in machine_centers:
+        key = resource_key(mc.work_center_code, mc.code)
+        calendar_code = getattr(mc, "calendar_code", None) or calendars.get(mc.work_center_code)
+        resources[key] = resource(key, mc, calendar_code)
+    return resources
@@ -0,0 +1,275 @@
+# backend/services/production/where_used.py
+"""
+Where-Used Service - Reverse BOM lookups over the where-used index
+
+Uses the BOMWhereUsed collection (one entry per BOM line, keyed by
+component) maintained by BOM.save()/delete()/certify(). BOM.save() only
+indexes the saved version, so the index is complete only after a tenant's
+first rebuild, which leaves a BOMWhereUsedState marker:
+- where_used(): multi-level where-used, breadth-first upwards with one
+  `$in` query per level
+- where_used_page(): one page of the same rows; the walk only groups the
+  parents per level in Mongo, and only the page's entries are loaded
+  (skip/limit on the level query)
+- count_bom_usage(): cheap "is this item used in a BOM" check (from the
+  BOM documents until the tenant's index is built)
+- ensure_where_used_index(): build a tenant's index once (the lookups
+  above call it first)
+- rebuild_where_used_index(): backfill/repair from the BOM documents
+
+Usage:
+    from services.production.where_used import where_used
+
+    rows = where_used(tenant_id, "RM-ZIRCONIA-98")
+    for row in rows:
+        print(row["level"], row["parent_item_no"], row["path"])
+"""
+
+from datetime import datetime, timedelta
+from typing import Dict, List, Optional
+
+from pymongo.errors import DuplicateKeyError
+
+from models.production import BOM, BOMWhereUsed, BOMWhereUsedState
+
+# Upper bound for multi-level lookups (guards against runaway structures)
+MAX_WHERE_USED_LEVELS = 50
+
+# A build claimed longer ago than this is taken over (the process died)
+INDEX_BUILD_TIMEOUT = timedelta(minutes=10)
+
+
+class WhereUsedIndexBuilding(Exception):
+    """Another process is building the tenant's where-used index"""
+
+
+def where_used_index_ready(tenant_id: str) -> bool:
+    """True once the tenant's index holds every BOM (built by a rebuild)"""
+    return BOMWhereUsedState.objects(tenant_id=str(tenant_id), status="Built").only("id").first() is not None
+
+
+def ensure_where_used_index(tenant_id: str) -> None:
+    """
+    Build the tenant's index from its BOMs unless it has been built.
+
+    The build is claimed atomically on the tenant's BOMWhereUsedState, so
+    only one process rebuilds; a claim older than INDEX_BUILD_TIMEOUT is
+    taken over.
+
+    Raises:
+        WhereUsedIndexBuilding: another process is building it
+    """
+    tenant_id = str(tenant_id)
+    if where_used_index_ready(tenant_id):
+        return
+
+    now = datetime.utcnow()
+    try:
+        BOMWhereUsedState._get_collection().find_one_and_update(
+            {
+                "tenant_id": tenant_id,
+                "status": {"$ne": "Built"},
+                "$or": [
+                    {"status": {"$ne": "Building"}},
+                    {"started_at": {"$lt": now - INDEX_BUILD_TIMEOUT}},
+                ],
+            },
+            {"$set": {"status": "Building", "started_at": now}},
+            upsert=True,
+        )
+    except DuplicateKeyError:
+        # Built or being built since the check above
+        if where_used_index_ready(tenant_id):
+            return
+        raise WhereUsedIndexBuilding(f"Where-used index of tenant {tenant_id} is being built")
+    rebuild_where_used_index(tenant_id)
+
+
+def where_used(
+    tenant_id: str,
+    item_no: str,
+    max_levels: int = MAX_WHERE_USED_LEVELS,
+    status: Optional[str] = "Certified"
+) -> List[dict]:
+    """
+    Every BOM that uses an item, directly or through sub-assemblies.
+
+    Walks the index upwards level by level: level 1 are the BOMs that list
+    item_no as a component, level 2 the BOMs that use those parents, and so
+    on. Each parent is walked once, from the first (shortest) path that
+    reached it; reaching it again (shared sub-assembly or cycle) still
+    lists the BOM line but does not walk further.
+
+    Args:
+        tenant_id: Laboratory/tenant identifier
+        item_no: Component to look up
+        max_levels: How many levels to walk up (1 = direct parents only)
+        status: BOM status to include (None = every version)
+
+    Returns:
+        Rows ordered by level, parent and line: index entry fields plus
+        level and path (item numbers from the looked-up item to the parent,
+        via the first path that reached the component)
+    """
+    tenant_id = str(tenant_id)
+    max_levels = max(1, min(max_levels, MAX_WHERE_USED_LEVELS))
+    ensure_where_used_index(tenant_id)
+
+    rows: List[dict] = []
+    # component -> path from item_no to that component
+    paths: Dict[str, List[str]] = {item_no: [item_no]}
+    expanded = {item_no}
+
+    for level in range(1, max_levels + 1):
+        filters = {"tenant_id": tenant_id, "component_item_no__in": list(paths)}
+        if status:
+            filters["status"] = status
+        entries = sorted(
+            BOMWhereUsed.objects(**filters),
+            key=lambda e: (e.parent_item_no, e.version_code or "", e.line_no or 0),
+        )
+
+        next_paths: Dict[str, List[str]] = {}
+        for entry in entries:
+            parent_path = paths[entry.component_item_no] + [entry.parent_item_no]
+            rows.append({**entry.to_dict(), "level": level, "path": parent_path})
+            if entry.parent_item_no not in expanded:
+                next_paths.setdefault(entry.parent_item_no, parent_path)
+
+        expanded.update(next_paths)
+        if not next_paths:
+            break
+        paths = next_paths
+
+    return rows
+
+
+def where_used_page(
+    tenant_id: str,
+    item_no: str,
+    max_levels: int = MAX_WHERE_USED_LEVELS,
+    status: Optional[str] = "Certified",
+    offset: int = 0,
+    limit: int = 50
+) -> dict:
+    """
+    One page of where_used() rows, without loading the other rows.
+
+    Each level is one $group aggregation (parents of the level with their
+    first component and row count, which is all the walk and the total
+    need); the entries of the levels the page overlaps are read with
+    order_by + skip/limit.
+
+    Returns:
+        {"total": int, "max_level": int, "items": [rows as where_used()]}
+    """
+    tenant_id = str(tenant_id)
+    max_levels = max(1, min(max_levels, MAX_WHERE_USED_LEVELS))
+    offset = max(0, offset)
+    ensure_where_used_index(tenant_id)
+    order = ("parent_item_no", "version_code", "line_no")
+
+    items: List[dict] = []
+    total = 0
+    max_level = 0
+    paths: Dict[str, List[str]] = {item_no: [item_no]}
+    expanded = {item_no}
+
+    for level in range(1, max_levels + 1):
+        match = {"tenant_id": tenant_id, "component_item_no": {"$in": list(paths)}}
+        if status:
+            match["status"] = status
+        parents = list(BOMWhereUsed._get_collection().aggregate([
+            {"$match": match},
+            {"$sort": {field: 1 for field in order}},
+            {"$group": {
+                "_id": "$parent_item_no",
+                "component_item_no": {"$first": "$component_item_no"},
+                "count": {"$sum": 1},
+            }},
+        ]))
+        count = sum(parent["count"] for parent in parents)
+        if not count:
+            break
+
+        # Rows of this level are total .. total + count - 1
+        start = max(offset - total, 0)
+        wanted = offset + limit - total - start
+        if start < count and wanted > 0:
+            for entry in BOMWhereUsed.objects(__raw__=match).order_by(*order).skip(start).limit(wanted):
+                items.append({
+                    **entry.to_dict(),
+                    "level": level,
+                    "path": paths[entry.component_item_no] + [entry.parent_item_no],
+                })
+        total += count
+        max_level = level
+
+        next_paths = {
+            parent["_id"]: paths[parent["component_item_no"]] + [parent["_id"]]
+            for parent in sorted(parents, key=lambda parent: parent["_id"])
+            if parent["_id"] not in expanded
+        }
+        expanded.update(next_paths)
+        if not next_paths:
+            break
+        paths = next_paths
+
+    return {"total": total, "max_level": max_level, "items": items}
+
+
+def count_bom_usage(tenant_id: str, item_no: str) -> int:
+    """
+    Number of BOM lines (any version) that use an item as a component.
+
+    Counts the where-used index once the tenant's index is built; before
+    that (BOMs created before the index, never rebuilt) the index may hold
+    only the BOMs saved since, so the BOM documents are counted instead.
+    """
+    tenant_id = str(tenant_id)
+    if where_used_index_ready(tenant_id):
+        return BOMWhereUsed.objects(tenant_id=tenant_id, component_item_no=item_no).count()
+
+    counted = list(BOM._get_collection().aggregate([
+        {"$match": {"tenant_id": tenant_id, "lines.component_item_no": item_no}},
+        {"$unwind": "$lines"},
+        {"$match": {"lines.component_item_no": item_no}},
+        {"$count": "lines"},
+    ]))
+    return counted[0]["lines"] if counted else 0
+
+
+def rebuild_where_used_index(tenant_id: Optional[str] = None) -> int:
+    """
+    Rebuild the where-used index from the BOM documents.
+
+    Marks every rebuilt tenant's index as built (BOMWhereUsedState).
+
+    Args:
+        tenant_id: Only rebuild this tenant (None = all tenants)
+
+    Returns:
+        Number of index entries written
+    """
+    boms = BOM.objects(tenant_id=str(tenant_id)) if tenant_id else BOM.objects
+    index = BOMWhereUsed.objects(tenant_id=str(tenant_id)) if tenant_id else BOMWhereUsed.objects
+    index.delete()
+
+    written: Dict[str, int] = {str(tenant_id): 0} if tenant_id else {}
+    batch: List[BOMWhereUsed] = []
+    for bom in boms.only("tenant_id", "item_no", "version_code", "status", "lines"):
+        entries = BOMWhereUsed.entries_for(bom)
+        written[bom.tenant_id] = written.get(bom.tenant_id, 0) + len(entries)
+        batch.extend(entries)
+        if len(batch) >= 1000:
+            BOMWhereUsed.objects.insert(batch, load_bulk=False)
+            batch = []
+    if batch:
+        BOMWhereUsed.objects.insert(batch, load_bulk=False)
+
+    now = datetime.utcnow()
+    for built_tenant, entries in written.items():
+        BOMWhereUsedState.objects(tenant_id=built_tenant).update_one(
+            set__status="Built", set__built_at=now, set__entries=entries, upsert=True
+        )
+    return sum(written.values())